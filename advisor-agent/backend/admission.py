@@ -0,0 +1,228 @@
+"""Admission control and load shedding for expensive routes.
+
+Same controller as the compliance API (backend/app/admission.py); this
+service builds from its own directory, so keep the two copies in sync.
+
+Each request has a cost (estimated pages, from the upload size) and a user.
+Admission happens in three steps:
+
+1. Quota: the user's token bucket must cover the cost, or the request is
+   rejected at once with 429 and a Retry-After for when it would fit.
+2. Concurrency: it runs immediately if both the global and the per-user
+   in-flight limits allow it.
+3. Otherwise it waits in a bounded FIFO queue. When the queue is full, or
+   the request is still queued at its deadline, it is shed with 503 and a
+   Retry-After. Its quota is refunded because no work was done.
+
+Excess load waits a bounded time or fails fast. It never piles onto the
+thread pool, so admitted requests (and /health) keep a predictable latency.
+
+    ticket = await admission.acquire(user, cost)
+    try:
+        ...
+    finally:
+        admission.release(ticket)
+"""
+import asyncio
+import math
+import os
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+
+from fastapi import HTTPException
+
+ADMISSION_MAX_CONCURRENT = int(os.getenv("ADMISSION_MAX_CONCURRENT", 4))
+ADMISSION_MAX_PER_USER = int(os.getenv("ADMISSION_MAX_PER_USER", 2))
+ADMISSION_QUEUE_SIZE = int(os.getenv("ADMISSION_QUEUE_SIZE", 32))
+ADMISSION_QUEUE_TIMEOUT = float(os.getenv("ADMISSION_QUEUE_TIMEOUT", 15))
+# Quota, in estimated pages: sustained pages per second per user and burst size
+ADMISSION_PAGES_PER_SECOND = float(os.getenv("ADMISSION_PAGES_PER_SECOND", 2))
+ADMISSION_PAGE_BURST = float(os.getenv("ADMISSION_PAGE_BURST", 200))
+ADMISSION_BYTES_PER_PAGE = int(os.getenv("ADMISSION_BYTES_PER_PAGE", 100 * 1024))
+ADMISSION_MAX_FILES = int(os.getenv("ADMISSION_MAX_FILES", 20))
+
+try:
+    from prometheus_client import Counter, Gauge
+    _EVENTS = Counter("admission_requests_total", "Admission decisions", ["route", "outcome"])
+    _INFLIGHT = Gauge("admission_inflight", "Requests holding an admission slot")
+    _QUEUED = Gauge("admission_queue_depth", "Requests waiting for an admission slot")
+except ImportError:  # metrics are optional outside the service image
+    _EVENTS = _INFLIGHT = _QUEUED = None
+
+
+def estimate_pages(sizes):
+    """Cost of an upload: at least one page per file, more for large files"""
+    return sum(max(1, math.ceil((size or 0) / ADMISSION_BYTES_PER_PAGE)) for size in sizes)
+
+
+class QuotaBucket:
+    """Non-blocking token bucket; ``take`` returns 0 or the seconds to wait"""
+
+    def __init__(self, capacity, refill_per_second):
+        self.capacity = capacity
+        self.rate = refill_per_second
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def take(self, amount):
+        amount = min(amount, self.capacity)  # a huge upload costs at most a full burst
+        self._refill()
+        if self.tokens >= amount:
+            self.tokens -= amount
+            return 0.0
+        return (amount - self.tokens) / self.rate if self.rate else float("inf")
+
+    def refund(self, amount):
+        self.tokens = min(self.capacity, self.tokens + min(amount, self.capacity))
+
+
+class Ticket:
+    __slots__ = ("user", "cost", "route", "admitted_at")
+
+    def __init__(self, user, cost, route):
+        self.user = user
+        self.cost = cost
+        self.route = route
+        self.admitted_at = None
+
+
+class AdmissionController:
+    def __init__(self, max_concurrent=ADMISSION_MAX_CONCURRENT, max_per_user=ADMISSION_MAX_PER_USER,
+                 queue_size=ADMISSION_QUEUE_SIZE, queue_timeout=ADMISSION_QUEUE_TIMEOUT,
+                 rate=ADMISSION_PAGES_PER_SECOND, burst=ADMISSION_PAGE_BURST):
+        self.max_concurrent = max_concurrent
+        self.max_per_user = max_per_user
+        self.queue_size = queue_size
+        self.queue_timeout = queue_timeout
+        self.rate = rate
+        self.burst = burst
+        self.inflight = 0
+        self.per_user = {}
+        self.buckets = {}
+        self.waiters = deque()  # (ticket, future), FIFO
+        self.counts = {"admitted": 0, "queued": 0, "rejected_quota": 0, "shed_queue_full": 0, "shed_deadline": 0}
+        self.service_time = None  # moving average, for Retry-After hints
+
+    # --- decisions ---
+    def _can_run(self, user):
+        return self.inflight < self.max_concurrent and self.per_user.get(user, 0) < self.max_per_user
+
+    def _start(self, ticket):
+        self.inflight += 1
+        self.per_user[ticket.user] = self.per_user.get(ticket.user, 0) + 1
+        ticket.admitted_at = time.monotonic()
+        self._count(ticket.route, "admitted")
+
+    def _retry_after(self):
+        """Seconds until a slot is likely free: queue ahead / throughput"""
+        per_request = self.service_time or 1.0
+        return max(1, math.ceil(per_request * (len(self.waiters) + 1) / self.max_concurrent))
+
+    def _reject(self, ticket, outcome, status, detail, retry_after):
+        self._count(ticket.route, outcome)
+        raise HTTPException(status_code=status, detail=detail, headers={"Retry-After": str(retry_after)})
+
+    async def acquire(self, user, cost=1, route="upload"):
+        ticket = Ticket(user or "anonymous", cost, route)
+        bucket = self.buckets.get(ticket.user)
+        if bucket is None:
+            if len(self.buckets) >= 10000:  # forget users whose quota has refilled
+                for key in [k for k, v in self.buckets.items() if (v._refill() or v.tokens) >= v.capacity]:
+                    del self.buckets[key]
+            bucket = self.buckets[ticket.user] = QuotaBucket(self.burst, self.rate)
+        wait = bucket.take(cost)
+        if wait:
+            self._reject(ticket, "rejected_quota", 429,
+                         f"Upload quota exceeded ({cost} pages requested)", max(1, math.ceil(wait)))
+
+        # Waiters only remain queued while the global limit is full or their own
+        # user is at its limit, so a request that can run now jumps no one
+        if self._can_run(ticket.user):
+            self._start(ticket)
+            self._gauges()
+            return ticket
+        if len(self.waiters) >= self.queue_size:
+            bucket.refund(cost)
+            self._reject(ticket, "shed_queue_full", 503, "Server busy, try again later", self._retry_after())
+
+        future = asyncio.get_running_loop().create_future()
+        entry = (ticket, future)
+        self.waiters.append(entry)
+        self._count(route, "queued")
+        self._gauges()
+        try:
+            await asyncio.wait_for(asyncio.shield(future), self.queue_timeout)
+            return ticket
+        except asyncio.TimeoutError:
+            if future.done():  # admitted just as the deadline passed
+                return ticket
+            self.waiters.remove(entry)
+            bucket.refund(cost)
+            self._reject(ticket, "shed_deadline", 503, "Server busy, try again later", self._retry_after())
+        except asyncio.CancelledError:  # client went away while queued
+            if entry in self.waiters:
+                self.waiters.remove(entry)
+                bucket.refund(cost)
+            elif future.done():
+                self.release(ticket)
+            raise
+        finally:
+            self._gauges()
+
+    def release(self, ticket):
+        self.inflight -= 1
+        self.per_user[ticket.user] -= 1
+        if not self.per_user[ticket.user]:
+            del self.per_user[ticket.user]
+        elapsed = time.monotonic() - ticket.admitted_at
+        self.service_time = elapsed if self.service_time is None else 0.8 * self.service_time + 0.2 * elapsed
+        self._wake()
+        self._gauges()
+
+    def _wake(self):
+        # Oldest first; a waiter whose user is at its limit lets others pass
+        for entry in list(self.waiters):
+            if self.inflight >= self.max_concurrent:
+                break
+            ticket, future = entry
+            if future.done() or not self._can_run(ticket.user):
+                continue
+            self.waiters.remove(entry)
+            self._start(ticket)
+            future.set_result(True)
+
+    @asynccontextmanager
+    async def admit(self, user, cost=1, route="upload"):
+        ticket = await self.acquire(user, cost, route)
+        try:
+            yield ticket
+        finally:
+            self.release(ticket)
+
+    # --- metrics ---
+    def _count(self, route, outcome):
+        self.counts[outcome] += 1
+        if _EVENTS is not None:
+            _EVENTS.labels(route=route, outcome=outcome).inc()
+
+    def _gauges(self):
+        if _INFLIGHT is not None:
+            _INFLIGHT.set(self.inflight)
+            _QUEUED.set(len(self.waiters))
+
+    def stats(self):
+        return {
+            **self.counts,
+            "inflight": self.inflight,
+            "queue_depth": len(self.waiters),
+            "max_concurrent": self.max_concurrent,
+            "max_per_user": self.max_per_user,
+            "queue_size": self.queue_size,
+            "avg_service_seconds": round(self.service_time, 3) if self.service_time else None,
+        }
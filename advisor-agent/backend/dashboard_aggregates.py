@@ -0,0 +1,281 @@
+import json
+import os
+import time
+import uuid
+
+from redis.exceptions import WatchError
+
+DASHBOARD_TOP_KEEP = int(os.getenv("DASHBOARD_TOP_KEEP", 200))
+DASHBOARD_RECONCILE_SECONDS = int(os.getenv("DASHBOARD_RECONCILE_SECONDS", 900))
+# session_logs rows reach the database through the outbox, so the newest
+# uploads are missing there for a while; reconcile leaves documents recorded
+# within this window as they are (covers the outbox's retries plus a margin)
+DASHBOARD_RECONCILE_LAG = int(os.getenv("DASHBOARD_RECONCILE_LAG_SECONDS", 3600))
+
+SEVERITY_RANK = {"CRITICAL": 4, "HIGH": 3, "MEDIUM": 2, "LOW": 1}
+# Document score: 100 minus a penalty per finding, floored at 0
+SEVERITY_PENALTY = {"CRITICAL": 60, "HIGH": 30, "MEDIUM": 15, "LOW": 5}
+SCORE_BUCKETS = [f"{lo}-{lo + 9}" for lo in range(0, 90, 10)] + ["90-100"]
+
+
+def document_score(findings):
+    penalty = sum(SEVERITY_PENALTY.get((f.get("severity") or "").upper(), 0) for f in findings)
+    return max(0, 100 - penalty)
+
+
+def score_bucket(score):
+    return SCORE_BUCKETS[min(int(score) // 10, 9)]
+
+
+def contribution(findings, score):
+    """What one document adds to its scopes' counters"""
+    out = {"documents": 1, "findings": len(findings), "score_sum": score, f"bucket:{score_bucket(score)}": 1}
+    for f in findings:
+        severity = (f.get("severity") or "").upper()
+        if severity:
+            out[f"severity:{severity}"] = out.get(f"severity:{severity}", 0) + 1
+        regulation = (f.get("regulation") or "").upper()
+        if regulation:
+            out[f"regulation:{regulation}"] = out.get(f"regulation:{regulation}", 0) + 1
+    if findings:
+        out["flagged"] = 1
+    return out
+
+
+def worst_severity(findings):
+    return max(((f.get("severity") or "").upper() for f in findings), key=lambda s: SEVERITY_RANK.get(s, 0),
+               default=None)
+
+
+class DashboardAggregates:
+    """
+    Dashboard metrics maintained incrementally in Redis.
+
+    Every ingestion event updates, in one transaction, the counters of the
+    global scope and of the uploading user's scope:
+      dash:{scope}:counts  hash of documents / findings / score_sum /
+                           severity:* / regulation:* / bucket:* counters
+      dash:{scope}:top     sorted set of flagged documents, worst and newest
+                           first (trimmed to DASHBOARD_TOP_KEEP)
+      dash:{scope}:recent  sorted set of flagged documents by time
+    and remembers the document's own contribution in dash:doc:{id}, so
+    re-ingesting a document replaces its numbers instead of adding to them.
+
+    A dashboard read is a fixed handful of commands over bounded keys,
+    independent of how many documents exist. ``reconcile`` rebuilds
+    everything from the database periodically to repair drift (missed
+    events, trimmed top lists), keeping documents recorded too recently for
+    the database to have them yet.
+    """
+
+    def __init__(self, client, prefix: str = "dash", top_keep: int = DASHBOARD_TOP_KEEP):
+        self.r = client
+        self.prefix = prefix
+        self.top_keep = top_keep
+
+    def _key(self, scope, name):
+        return f"{self.prefix}:{scope}:{name}"
+
+    def _doc_key(self, doc_id):
+        return f"{self.prefix}:doc:{doc_id}"
+
+    @staticmethod
+    def scopes(user_id):
+        return ["all", f"user:{user_id}"] if user_id else ["all"]
+
+    # --- writes ---
+    def record(self, doc_id: str, file: str, user_id: str, findings, ts: float = None):
+        """Apply one ingestion event; returns the document's score"""
+        score = document_score(findings)
+        self._put(doc_id, file, user_id, contribution(findings, score), score, worst_severity(findings),
+                  ts or time.time())
+        return score
+
+    def _put(self, doc_id, file, user_id, new, score, severity, ts):
+        doc_key = self._doc_key(doc_id)
+        while True:
+            pipe = self.r.pipeline()
+            try:
+                pipe.watch(doc_key)
+                old_doc = pipe.hgetall(doc_key)
+                old = json.loads(old_doc["contribution"]) if old_doc else {}
+                old_scopes = self.scopes(old_doc.get("user_id")) if old_doc else []
+                pipe.multi()
+                for scope in old_scopes:
+                    self._apply(pipe, scope, old, -1)
+                    pipe.zrem(self._key(scope, "top"), doc_id)
+                    pipe.zrem(self._key(scope, "recent"), doc_id)
+                for scope in self.scopes(user_id):
+                    self._apply(pipe, scope, new, 1)
+                    if severity:
+                        self._rank(pipe, scope, doc_id, severity, ts)
+                    pipe.sadd(f"{self.prefix}:scopes", scope)
+                pipe.hset(doc_key, mapping={
+                    "file": file, "user_id": user_id or "", "severity": severity or "", "score": score,
+                    "ts": ts, "contribution": json.dumps(new),
+                })
+                pipe.execute()
+                return
+            except WatchError:
+                continue  # the document was re-recorded meanwhile; apply on top of that
+            finally:
+                pipe.reset()
+
+    def _apply(self, pipe, scope, counts, sign):
+        key = self._key(scope, "counts")
+        for field, value in counts.items():
+            pipe.hincrby(key, field, sign * int(value))
+
+    def _rank(self, pipe, scope, doc_id, severity, ts):
+        # worst severity first, then newest: rank in the high digits, time below
+        pipe.zadd(self._key(scope, "top"), {doc_id: SEVERITY_RANK.get(severity, 0) * 1e10 + ts})
+        pipe.zremrangebyrank(self._key(scope, "top"), 0, -self.top_keep - 1)
+        pipe.zadd(self._key(scope, "recent"), {doc_id: ts})
+        pipe.zremrangebyrank(self._key(scope, "recent"), 0, -self.top_keep - 1)
+
+    # --- reads ---
+    def overview(self, role: str = "auditor", user_id: str = None, limit: int = 5):
+        scope = f"user:{user_id}" if user_id else "all"
+        pipe = self.r.pipeline(transaction=False)
+        pipe.hgetall(self._key(scope, "counts"))
+        pipe.zrevrange(self._key(scope, "top" if role == "executive" else "recent"), 0, limit - 1)
+        counts, doc_ids = pipe.execute()
+        counts = {k: int(v) for k, v in counts.items()}
+        docs = self._docs(doc_ids)
+        documents = counts.get("documents", 0)
+        by = lambda kind: {k.split(":", 1)[1]: v for k, v in counts.items() if k.startswith(kind + ":") and v}
+        summary = {
+            "documents": documents,
+            "flagged_documents": counts.get("flagged", 0),
+            "findings": counts.get("findings", 0),
+            "by_severity": by("severity"),
+        }
+        if role == "executive":
+            return {
+                "role": "executive",
+                "score": round(counts.get("score_sum", 0) / documents) if documents else None,
+                "score_distribution": {b: counts.get(f"bucket:{b}", 0) for b in SCORE_BUCKETS},
+                "top_issues": [{"doc": d["file"], "severity": d["severity"].title(), "score": int(d["score"])}
+                               for d in docs],
+                **summary,
+            }
+        return {
+            "role": "auditor",
+            "recent_flags": [{"doc": d["file"], "severity": d["severity"].title(), "user_id": d["user_id"],
+                              "timestamp": float(d["ts"])} for d in docs],
+            "by_regulation": by("regulation"),
+            **summary,
+        }
+
+    def _docs(self, doc_ids):
+        if not doc_ids:
+            return []
+        pipe = self.r.pipeline(transaction=False)
+        for doc_id in doc_ids:
+            pipe.hmget(self._doc_key(doc_id), "file", "severity", "score", "user_id", "ts")
+        keys = ("file", "severity", "score", "user_id", "ts")
+        return [dict(zip(keys, values)) for values in pipe.execute() if values[0] is not None]
+
+    # --- reconciliation ---
+    def reconcile(self, records, watermark: float = None):
+        """
+        Rebuild every aggregate from ``records`` (the database's view), each
+        ``{"doc_id", "file", "user_id", "findings", "ts"}``. Documents
+        recorded live after ``watermark`` (default: now minus
+        DASHBOARD_RECONCILE_LAG) keep their live numbers, since the database
+        may not have them yet. New keys are built under a temporary prefix and
+        swapped in with RENAME, so readers never see a half-built dashboard.
+        Returns the number of documents.
+        """
+        watermark = time.time() - DASHBOARD_RECONCILE_LAG if watermark is None else watermark
+        staging = DashboardAggregates(self.r, f"{self.prefix}:rebuild:{uuid.uuid4().hex[:8]}", self.top_keep)
+        recent = {}
+        for key in self.r.scan_iter(f"{self.prefix}:doc:*"):
+            doc = self.r.hgetall(key)
+            if doc and float(doc["ts"]) > watermark:
+                recent[key[len(self.prefix) + len(":doc:"):]] = doc
+        for doc_id, doc in recent.items():
+            staging._put(doc_id, doc["file"], doc["user_id"] or None, json.loads(doc["contribution"]),
+                         int(float(doc["score"])), doc["severity"] or None, float(doc["ts"]))
+        count = len(recent)
+        for rec in records:
+            if rec["doc_id"] in recent:
+                continue
+            staging.record(rec["doc_id"], rec["file"], rec.get("user_id"), rec.get("findings") or [], rec.get("ts"))
+            count += 1
+        built = self.r.smembers(f"{staging.prefix}:scopes")
+        live = self.r.smembers(f"{self.prefix}:scopes")
+        pipe = self.r.pipeline()
+        for scope in live | built:
+            for name in ("counts", "top", "recent"):
+                src, dst = staging._key(scope, name), self._key(scope, name)
+                if scope in built and self.r.exists(src):
+                    pipe.rename(src, dst)
+                else:
+                    pipe.delete(dst)
+        stale = {k for k in self.r.scan_iter(f"{self.prefix}:doc:*")}
+        for key in self.r.scan_iter(f"{staging.prefix}:doc:*"):
+            dst = self._doc_key(key[len(staging.prefix) + len(":doc:"):])
+            stale.discard(dst)
+            pipe.rename(key, dst)
+        for key in stale:
+            pipe.delete(key)
+        pipe.delete(f"{self.prefix}:scopes")
+        if built:
+            pipe.sadd(f"{self.prefix}:scopes", *built)
+        pipe.delete(f"{staging.prefix}:scopes")
+        pipe.execute()
+        return count
+
+    def try_lock(self, ttl: int = DASHBOARD_RECONCILE_SECONDS):
+        """Only one replica reconciles per period"""
+        return bool(self.r.set(f"{self.prefix}:reconcile_lock", os.getpid(), nx=True, ex=ttl))
+
+
+def records_from_session_logs(rows):
+    """Latest upload per (user, file) from Supabase session_logs rows"""
+    latest = {}
+    for row in rows:
+        if row.get("status") != "uploaded":
+            continue
+        doc_id = f"{row.get('user_id')}:{row.get('file')}"
+        latest[doc_id] = row  # rows arrive oldest first
+    for doc_id, row in latest.items():
+        severity = row.get("severity")
+        ts = row.get("timestamp")
+        yield {
+            "doc_id": doc_id,
+            "file": row.get("file"),
+            "user_id": row.get("user_id"),
+            "findings": [{"severity": severity}] if severity else [],
+            "ts": _epoch(ts) if ts else None,
+        }
+
+
+def _epoch(value):
+    from datetime import datetime, timezone
+    dt = datetime.fromisoformat(str(value).replace("Z", "+00:00"))
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return dt.timestamp()
+
+
+def fetch_session_logs(supabase_url: str, supabase_key: str, page: int = 1000):
+    """All session_logs rows, oldest first, paged through PostgREST"""
+    import httpx
+    headers = {"apikey": supabase_key, "Authorization": f"Bearer {supabase_key}"}
+    offset = 0
+    with httpx.Client(timeout=30) as client:
+        while True:
+            res = client.get(f"{supabase_url}/rest/v1/session_logs", headers=headers, params={
+                "select": "user_id,file,status,severity,timestamp",
+                "order": "timestamp.asc",
+                "limit": page,
+                "offset": offset,
+            })
+            res.raise_for_status()
+            rows = res.json()
+            yield from rows
+            if len(rows) < page:
+                return
+            offset += page
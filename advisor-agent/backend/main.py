@@ -2,17 +2,23 @@ import os
 import io
 import json
 import base64
+import asyncio
+import threading
+import time
+from contextlib import asynccontextmanager
 from datetime import datetime
-from fastapi import FastAPI, UploadFile, File, Depends, HTTPException
+from fastapi import FastAPI, UploadFile, File, Depends, HTTPException, Request
+from fastapi.concurrency import run_in_threadpool
 from fastapi.responses import JSONResponse
 import redis
-import requests
 from prometheus_fastapi_instrumentator import Instrumentator
-from pdf2image import convert_from_bytes
-import pytesseract
-from sentence_transformers import SentenceTransformer
-import numpy as np
-from supabase import create_client, Client
+from uploads import MAX_UPLOAD_BYTES, body_too_large, store_upload
+from outbox import Outbox, Dispatcher, http_senders
+from vector_shards import ShardedVectorStore
+from semantic_cache import SemanticCache
+from admission import AdmissionController, estimate_pages
+from dashboard_aggregates import (DashboardAggregates, DASHBOARD_RECONCILE_SECONDS, fetch_session_logs,
+                                  records_from_session_logs)
 
 # --------------------
 # Environment & Config
@@ -24,27 +30,144 @@ JIRA_USER = os.getenv("JIRA_USER", "")
 JIRA_API_TOKEN = os.getenv("JIRA_API_TOKEN", "")
 SUPABASE_URL = os.getenv("SUPABASE_URL", "")
 SUPABASE_KEY = os.getenv("SUPABASE_KEY", "")
+OPENAI_API_KEY = os.getenv("OPENAI_API_KEY", "")
+OPENAI_BASE_URL = os.getenv("OPENAI_BASE_URL", "https://api.openai.com/v1")
+CHAT_MODEL = os.getenv("CHAT_MODEL", "gpt-4o-mini")
+EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "sentence-transformers/all-MiniLM-L6-v2")
 
-app = FastAPI(title="Advisor Agent - Backend (Dev)")
-
-# Redis client
+# Redis client (connects lazily, on the first command)
 r = redis.Redis.from_url(REDIS_URL, decode_responses=True)
 
-# Supabase client
-supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
+# Supabase client, created at startup when configured
+supabase = None
+
+# Sentence embedding model: sentence_transformers (and torch) are imported
+# on first use, so importing this module and answering /health stay fast
+_model = None
+_model_lock = threading.Lock()
+
+
+def get_model():
+    global _model
+    if _model is None:
+        with _model_lock:
+            if _model is None:
+                from sentence_transformers import SentenceTransformer
+                _model = SentenceTransformer(EMBEDDING_MODEL)
+    return _model
+
+
+def embed(texts, **kwargs):
+    return get_model().encode(texts, **kwargs)
+
+
+# Per-tenant, sharded vector store; searches only touch the caller's shards
+vectors = ShardedVectorStore()
+
+# Answers to semantically similar questions, per tenant and document-set version
+answer_cache = SemanticCache(r, embed)
+
+# Uploads are admitted by per-user quota and global/per-user concurrency;
+# overload is queued briefly, then shed with 429/503 and Retry-After
+admission = AdmissionController()
+
+# /dashboard/overview reads counters kept up to date on every upload;
+# a periodic reconcile against Supabase session_logs repairs any drift
+dashboard = DashboardAggregates(r)
+
+# Slack / Jira / Supabase side effects go through a durable outbox that is
+# drained in the background, so uploads never wait on third parties
+outbox = Outbox()
+dispatcher = Dispatcher(outbox, http_senders(
+    slack_webhook=SLACK_WEBHOOK,
+    jira_url=JIRA_URL,
+    jira_user=JIRA_USER,
+    jira_token=JIRA_API_TOKEN,
+    supabase_url=SUPABASE_URL,
+    supabase_key=SUPABASE_KEY,
+))
+
+# --------------------
+# Lifecycle: /health is liveness (the process is up); /ready is readiness
+# (the model is loaded and Redis answers), so traffic waits for warm-up
+# --------------------
+readiness = {"model": "pending", "redis": "pending", "supabase": "disabled"}
+
+
+def create_supabase():
+    global supabase
+    if not (SUPABASE_URL and SUPABASE_KEY):
+        return
+    try:
+        from supabase import create_client
+        supabase = create_client(SUPABASE_URL, SUPABASE_KEY)
+        readiness["supabase"] = "ok"
+    except Exception as e:
+        # Supabase writes go through the outbox; a bad config must not stop the API
+        print(f"⚠️ Supabase client unavailable: {e}")
+        readiness["supabase"] = f"error: {e}"
+
+
+async def warm_up():
+    started = time.perf_counter()
+    try:
+        await run_in_threadpool(get_model)
+        readiness["model"] = "ok"
+    except Exception as e:
+        print(f"⚠️ Embedding model failed to load: {e}")
+        readiness["model"] = f"error: {e}"
+    readiness["warmup_seconds"] = round(time.perf_counter() - started, 3)
+
+
+def reconcile_dashboard():
+    if not dashboard.try_lock():
+        return None
+    return dashboard.reconcile(records_from_session_logs(fetch_session_logs(SUPABASE_URL, SUPABASE_KEY)))
+
+
+async def reconcile_loop():
+    while True:
+        await asyncio.sleep(DASHBOARD_RECONCILE_SECONDS)
+        try:
+            await run_in_threadpool(reconcile_dashboard)
+        except Exception as e:
+            print(f"⚠️ Dashboard reconcile failed: {e}")
+
+
+@asynccontextmanager
+async def lifespan(app):
+    create_supabase()
+    await dispatcher.start()
+    tasks = [asyncio.create_task(warm_up())]
+    if SUPABASE_URL and SUPABASE_KEY and DASHBOARD_RECONCILE_SECONDS > 0:
+        tasks.append(asyncio.create_task(reconcile_loop()))
+    yield
+    for task in tasks:
+        task.cancel()
+    await dispatcher.stop()
+
+
+app = FastAPI(title="Advisor Agent - Backend (Dev)", lifespan=lifespan)
 
 # Prometheus instrumentation
 Instrumentator().instrument(app).expose(app)
 
-# Sentence embedding model
-model = SentenceTransformer("sentence-transformers/all-MiniLM-L6-v2")
+
+# Oversized uploads are refused from their Content-Length, before the
+# multipart body is parsed and spooled to disk
+@app.middleware("http")
+async def reject_oversized_uploads(request: Request, call_next):
+    if request.url.path == "/upload" and body_too_large(request.headers.get("content-length")):
+        return JSONResponse({"detail": f"File exceeds {MAX_UPLOAD_BYTES} bytes"}, status_code=413)
+    return await call_next(request)
+
 
 # --------------------
 # Helper Integrations
 # --------------------
 def slack_notify(text: str, severity: str = "Warning"):
     if not SLACK_WEBHOOK:
-        return
+        return None
     payload = {
         "attachments": [{
             "color": "danger" if severity.lower() == "critical" else "warning",
@@ -52,16 +175,12 @@ def slack_notify(text: str, severity: str = "Warning"):
             "text": text
         }]
     }
-    try:
-        requests.post(SLACK_WEBHOOK, json=payload, timeout=5)
-    except Exception as e:
-        print("⚠️ Slack notify failed:", e)
+    return outbox.enqueue("slack", payload)
 
 
 def create_jira_ticket(summary: str, description: str, severity: str = "High"):
     if not (JIRA_URL and JIRA_USER and JIRA_API_TOKEN):
         return None
-    auth = (JIRA_USER, JIRA_API_TOKEN)
     payload = {
         "fields": {
             "project": {"key": "COMPLIANCE"},
@@ -70,25 +189,27 @@ def create_jira_ticket(summary: str, description: str, severity: str = "High"):
             "issuetype": {"name": "Task"}
         }
     }
-    try:
-        r = requests.post(f"{JIRA_URL}/rest/api/3/issue", json=payload, auth=auth, timeout=10)
-        return r.json()
-    except Exception as e:
-        print("⚠️ Jira failed:", e)
-        return None
+    return outbox.enqueue("jira", payload)
 
 
 def log_to_supabase(user_id: str, file: str, status: str, severity: str = None):
-    try:
-        supabase.table("session_logs").insert({
+    if not (SUPABASE_URL and SUPABASE_KEY):
+        return None
+    return outbox.enqueue("supabase", {
+        "table": "session_logs",
+        "row": {
             "user_id": user_id,
             "file": file,
             "status": status,
             "severity": severity,
             "timestamp": datetime.utcnow().isoformat()
-        }).execute()
-    except Exception as e:
-        print("⚠️ Supabase log failed:", e)
+        }
+    })
+
+
+@app.get("/outbox/status")
+def outbox_status(dead_limit: int = 20):
+    return {"counts": outbox.stats(), "dead_letters": outbox.dead_letters(dead_limit)}
 
 # --------------------
 # OCR + Upload Endpoint
@@ -103,65 +224,162 @@ async def upload_doc(user_id: str, file: UploadFile = File(...)):
     - Sends Slack & Jira alerts for risky content
     - Logs ingestion to Supabase
     """
-    contents = await file.read()
+    async with admission.admit(user_id, estimate_pages([file.size]), "upload"):
+        return await ingest_upload(user_id, file)
+
+
+async def ingest_upload(user_id: str, file: UploadFile):
+    digest, path, size, duplicate = await store_upload(file)
+    cache_key = f"upload:{user_id}:{digest}"
+    if duplicate:
+        cached = await run_in_threadpool(r.get, cache_key)
+        if cached:
+            return JSONResponse({**json.loads(cached), "file": file.filename, "duplicate": True})
+    # OCR, embedding, the index writes and Redis all block: keep them off the event loop
+    text = await run_in_threadpool(extract_text, path, file.filename)
+    if not text:
+        raise HTTPException(status_code=400, detail="No text extracted")
+    response = await run_in_threadpool(index_upload, user_id, file.filename, digest, text)
+    await run_in_threadpool(r.set, cache_key, json.dumps(response))
+    return JSONResponse(response)
+
+
+def extract_text(path: str, filename: str) -> str:
     text = ""
 
-    if file.filename.lower().endswith(".pdf"):
+    if filename.lower().endswith(".pdf"):
         try:
-            images = convert_from_bytes(contents)
+            from pdf2image import convert_from_path
+            import pytesseract
+            images = convert_from_path(path)
             for im in images:
                 text += pytesseract.image_to_string(im)
         except Exception:
-            text = contents.decode(errors="ignore")
+            with open(path, "rb") as f:
+                text = f.read().decode(errors="ignore")
     else:
         try:
-            text = contents.decode()
+            with open(path, "rb") as f:
+                text = f.read().decode()
         except:
             try:
                 from PIL import Image
-                im = Image.open(io.BytesIO(contents))
+                import pytesseract
+                im = Image.open(path)
                 text = pytesseract.image_to_string(im)
             except Exception:
                 text = ""
+    return text
 
-    if not text:
-        raise HTTPException(status_code=400, detail="No text extracted")
 
+def index_upload(user_id: str, filename: str, digest: str, text: str) -> dict:
     # Chunk text & store embeddings
     chunk_size = 1500
-    all_chunks = []
-    for i in range(0, len(text), chunk_size):
-        chunk = text[i:i+chunk_size]
-        embedding = model.encode(chunk).tolist()
-        all_chunks.append({"chunk": chunk, "embedding": embedding})
-        r.rpush(f"doc:{user_id}", json.dumps({"chunk": chunk, "file": file.filename}))
+    all_chunks = [text[i:i+chunk_size] for i in range(0, len(text), chunk_size)]
+    embeddings = embed(all_chunks, batch_size=64)
+    metas = [{"chunk": chunk, "file": filename} for chunk in all_chunks]
+    vectors.add(user_id, embeddings, metas)
+    r.rpush(f"doc:{user_id}", *[json.dumps(m) for m in metas])
+    # Earlier answers may no longer hold for the new document set
+    answer_cache.invalidate(user_id)
 
     # Detect risk keywords
     severity = None
     if "confidential" in text.lower() or "personal data" in text.lower():
         severity = "Critical"
-        slack_notify(f"⚠️ File {file.filename} uploaded by {user_id} flagged as {severity}", severity)
+        slack_notify(f"⚠️ File {filename} uploaded by {user_id} flagged as {severity}", severity)
         create_jira_ticket(
-            f"Flagged doc {file.filename}",
+            f"Flagged doc {filename}",
             f"Auto-detected risky content in upload by {user_id}",
             severity
         )
 
     # Log ingestion to Supabase
-    log_to_supabase(user_id, file.filename, "uploaded", severity)
-
-    # Save vector store locally
-    os.makedirs("vector_store", exist_ok=True)
-    vec_path = f"vector_store/{file.filename}.json"
-    with open(vec_path, "w") as f:
-        json.dump(all_chunks, f)
+    log_to_supabase(user_id, filename, "uploaded", severity)
+    try:
+        dashboard.record(f"{user_id}:{filename}", filename, user_id,
+                         [{"severity": severity}] if severity else [])
+    except redis.RedisError as e:
+        # the next reconcile picks the upload up from session_logs
+        print(f"⚠️ Dashboard update failed: {e}")
 
-    return JSONResponse({
+    return {
         "status": "ok",
         "stored_chunks": len(all_chunks),
         "severity": severity,
-        "file": file.filename
-    })
+        "file": filename,
+        "sha256": digest
+    }
+
+
+@app.get("/search")
+def search(user_id: str, q: str, k: int = 5):
+    """Semantic search over one tenant's chunks"""
+    if k < 1 or k > 100:
+        raise HTTPException(status_code=400, detail="k must be between 1 and 100")
+    hits = vectors.search(user_id, embed(q), k)
+    return {"results": hits}
+
+
+async def answer_query(query: str, passages: list) -> str:
+    """Answer from retrieved passages with the LLM, or extractively without one"""
+    if not OPENAI_API_KEY:
+        return "\n\n".join(p["chunk"] for p in passages[:3])
+    import httpx
+    context = "\n\n".join(f"[{p['file']}] {p['chunk']}" for p in passages)
+    async with httpx.AsyncClient(timeout=60) as client:
+        res = await client.post(
+            f"{OPENAI_BASE_URL}/chat/completions",
+            headers={"Authorization": f"Bearer {OPENAI_API_KEY}"},
+            json={
+                "model": CHAT_MODEL,
+                "temperature": 0.1,
+                "messages": [
+                    {"role": "system", "content": "Answer compliance questions using only the provided excerpts."},
+                    {"role": "user", "content": f"Excerpts:\n{context}\n\nQuestion: {query}"},
+                ],
+            },
+        )
+    if res.status_code != 200:
+        raise HTTPException(status_code=502, detail=f"LLM error {res.status_code}")
+    return res.json()["choices"][0]["message"]["content"]
+
+
+@app.post("/chat")
+async def chat(user_id: str, query: str, k: int = 5):
+    """
+    Answers a question over the tenant's documents.
+    Semantically equivalent questions asked since the last ingestion are
+    served from the answer cache without retrieval or an LLM call.
+    """
+    # model inference, Redis and the shard scan block; keep them off the event loop
+    query_vec = await run_in_threadpool(embed, query)
+    cached = await run_in_threadpool(answer_cache.lookup, user_id, query, embedding=query_vec)
+    if cached:
+        return {"answer": cached["answer"], "cached": True,
+                "matched_query": cached["query"], "similarity": cached["similarity"]}
+    passages = await run_in_threadpool(vectors.search, user_id, query_vec, k)
+    if not passages:
+        raise HTTPException(status_code=404, detail="No documents ingested for this user")
+    answer = await answer_query(query, passages)
+    await run_in_threadpool(answer_cache.store, user_id, query, answer, embedding=query_vec)
+    sources = sorted({p["file"] for p in passages})
+    return {"answer": answer, "cached": False, "sources": sources}
+
+
+@app.get("/admission/stats")
+def admission_stats():
+    return admission.stats()
+
+
+@app.get("/cache/stats")
+def cache_stats():
+    return answer_cache.stats()
+
+
+@app.get("/vectors/stats")
+def vector_stats(user_id: str = None):
+    return vectors.stats(user_id)
 
 
 # --------------------
@@ -183,19 +401,21 @@ def save_session(user_id: str, query: str, response: str):
 # Dashboards & Health
 # --------------------
 @app.get("/dashboard/overview")
-def overview(role: str = "auditor"):
-    if role == "executive":
-        return {
-            "role": "executive",
-            "score": 92,
-            "top_issues": [{"doc": "contract_A.pdf", "severity": "High"}]
-        }
-    return {
-        "role": "auditor",
-        "recent_flags": [{"doc": "contract_B.pdf", "severity": "Critical"}]
-    }
+def overview(role: str = "auditor", user_id: str = None):
+    return dashboard.overview(role, user_id)
 
 
 @app.get("/health")
 def health():
     return {"status": "ok"}
+
+
+@app.get("/ready")
+def ready():
+    try:
+        r.ping()
+        readiness["redis"] = "ok"
+    except redis.RedisError as e:
+        readiness["redis"] = f"error: {e}"
+    ok = readiness["model"] == "ok" and readiness["redis"] == "ok"
+    return JSONResponse(readiness, status_code=200 if ok else 503)
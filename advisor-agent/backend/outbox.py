@@ -0,0 +1,340 @@
+import asyncio
+import json
+import os
+import random
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from collections import defaultdict
+
+import httpx
+
+# --------------------
+# Config
+# --------------------
+OUTBOX_PATH = os.getenv("OUTBOX_PATH", "outbox.sqlite3")
+OUTBOX_MAX_ATTEMPTS = int(os.getenv("OUTBOX_MAX_ATTEMPTS", 8))
+OUTBOX_BACKOFF_BASE = float(os.getenv("OUTBOX_BACKOFF_BASE", 1.0))
+OUTBOX_BACKOFF_MAX = float(os.getenv("OUTBOX_BACKOFF_MAX", 300.0))
+OUTBOX_POLL_INTERVAL = float(os.getenv("OUTBOX_POLL_INTERVAL", 1.0))
+OUTBOX_CLAIM_SIZE = int(os.getenv("OUTBOX_CLAIM_SIZE", 100))
+# A claim not finished within this many seconds of its last touch is considered
+# abandoned (its dispatcher died) and the row is handed out again
+OUTBOX_LEASE_SECONDS = float(os.getenv("OUTBOX_LEASE_SECONDS", 60.0))
+SUPABASE_BATCH_SIZE = int(os.getenv("SUPABASE_BATCH_SIZE", 50))
+HTTP_TIMEOUT = float(os.getenv("OUTBOX_HTTP_TIMEOUT", 10.0))
+
+# Max concurrent in-flight deliveries per target
+TARGET_CONCURRENCY = {"slack": 4, "jira": 2, "supabase": 2}
+
+
+class PermanentError(Exception):
+    """Delivery failed in a way retries cannot fix (e.g. HTTP 400)"""
+
+
+class Outbox:
+    """
+    Durable SQLite outbox for third-party side effects.
+    Requests enqueue a row (a local insert) and return; a Dispatcher
+    delivers the rows in the background.
+
+    Claimed rows record who claimed them and when. Several processes can
+    share the file: a row is only handed out again once its claim's lease
+    has expired, never while its owner may still be sending it. An owner
+    renews the lease of every row it holds (``touch``), including rows still
+    queued behind a busy target, and only changes rows it still owns.
+    """
+
+    def __init__(self, path: str = OUTBOX_PATH, owner: str = None, lease: float = OUTBOX_LEASE_SECONDS):
+        self.owner = owner or f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.lease = lease
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS outbox (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                target TEXT NOT NULL,
+                payload TEXT NOT NULL,
+                status TEXT NOT NULL DEFAULT 'pending',
+                attempts INTEGER NOT NULL DEFAULT 0,
+                next_attempt_at REAL NOT NULL,
+                last_error TEXT,
+                created_at REAL NOT NULL,
+                claimed_by TEXT,
+                claimed_at REAL
+            )
+        """)
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(outbox)")}
+        for column, kind in (("claimed_by", "TEXT"), ("claimed_at", "REAL")):
+            if column not in columns:  # outbox files created before claims had owners
+                self._conn.execute(f"ALTER TABLE outbox ADD COLUMN {column} {kind}")
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS ix_outbox_due ON outbox (status, next_attempt_at)"
+        )
+        self.wakeup = None  # set by the dispatcher so enqueue can nudge it
+
+    def _execute(self, sql, params=()):
+        with self._lock:
+            return self._conn.execute(sql, params).fetchall()
+
+    def enqueue(self, target: str, payload: dict) -> int:
+        now = time.time()
+        with self._lock:
+            cur = self._conn.execute(
+                "INSERT INTO outbox (target, payload, next_attempt_at, created_at) VALUES (?,?,?,?)",
+                (target, json.dumps(payload), now, now),
+            )
+        if self.wakeup is not None:
+            self.wakeup()
+        return cur.lastrowid
+
+    def recover(self):
+        """Return rows whose claim has expired (their dispatcher died) to the queue"""
+        self._execute(
+            "UPDATE outbox SET status='pending', claimed_by=NULL "
+            "WHERE status='inflight' AND claimed_at<=?",
+            (time.time() - self.lease,),
+        )
+
+    def claim_due(self, limit: int):
+        """Claim due rows, and rows whose previous claim expired, for this owner"""
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            rows = self._conn.execute(
+                "SELECT id, target, payload, attempts FROM outbox "
+                "WHERE (status='pending' AND next_attempt_at<=?) OR (status='inflight' AND claimed_at<=?) "
+                "ORDER BY id LIMIT ?",
+                (now, now - self.lease, limit),
+            ).fetchall()
+            self._conn.executemany(
+                "UPDATE outbox SET status='inflight', claimed_by=?, claimed_at=? WHERE id=?",
+                [(self.owner, now, row[0]) for row in rows],
+            )
+            self._conn.execute("COMMIT")
+        return [(id_, target, json.loads(payload), attempts) for id_, target, payload, attempts in rows]
+
+    def touch(self, ids):
+        """Renew this owner's lease on rows it holds"""
+        with self._lock:
+            self._conn.executemany(
+                "UPDATE outbox SET claimed_at=? WHERE id=? AND claimed_by=?",
+                [(time.time(), i, self.owner) for i in ids],
+            )
+
+    def release(self, ids):
+        """Give unsent rows back without counting an attempt (e.g. on shutdown)"""
+        with self._lock:
+            self._conn.executemany(
+                "UPDATE outbox SET status='pending', claimed_by=NULL WHERE id=? AND claimed_by=? AND status='inflight'",
+                [(i, self.owner) for i in ids],
+            )
+
+    def mark_done(self, ids):
+        with self._lock:
+            self._conn.executemany(
+                "DELETE FROM outbox WHERE id=? AND claimed_by=?", [(i, self.owner) for i in ids]
+            )
+
+    def mark_failed(self, ids, attempts: int, error: str, permanent: bool = False):
+        attempts += 1
+        if permanent or attempts >= OUTBOX_MAX_ATTEMPTS:
+            status, next_at = "dead", time.time()
+        else:
+            delay = min(OUTBOX_BACKOFF_MAX, OUTBOX_BACKOFF_BASE * 2 ** (attempts - 1))
+            status, next_at = "pending", time.time() + delay * random.uniform(0.5, 1.0)
+        # a claim that expired and was taken over belongs to the new owner now
+        with self._lock:
+            self._conn.executemany(
+                "UPDATE outbox SET status=?, attempts=?, next_attempt_at=?, last_error=?, claimed_by=NULL "
+                "WHERE id=? AND claimed_by=?",
+                [(status, attempts, next_at, error[:1000], i, self.owner) for i in ids],
+            )
+
+    def dead_letters(self, limit: int = 100):
+        rows = self._execute(
+            "SELECT id, target, payload, attempts, last_error FROM outbox "
+            "WHERE status='dead' ORDER BY id DESC LIMIT ?",
+            (limit,),
+        )
+        return [
+            {"id": i, "target": t, "payload": json.loads(p), "attempts": a, "error": e}
+            for i, t, p, a, e in rows
+        ]
+
+    def stats(self):
+        return dict(self._execute("SELECT status, COUNT(*) FROM outbox GROUP BY status"))
+
+
+# --------------------
+# HTTP senders
+# --------------------
+def _check(resp: httpx.Response):
+    if resp.status_code in (408, 429) or resp.status_code >= 500:
+        resp.raise_for_status()
+    if resp.status_code >= 400:
+        raise PermanentError(f"{resp.status_code}: {resp.text[:200]}")
+
+
+def http_senders(slack_webhook="", jira_url="", jira_user="", jira_token="",
+                 supabase_url="", supabase_key=""):
+    """Builds the per-target delivery functions; each takes (client, payloads)"""
+
+    async def send_slack(client, payloads):
+        _check(await client.post(slack_webhook, json=payloads[0]))
+
+    async def send_jira(client, payloads):
+        _check(await client.post(
+            f"{jira_url}/rest/api/3/issue", json=payloads[0], auth=(jira_user, jira_token)
+        ))
+
+    async def send_supabase(client, payloads):
+        # One bulk insert per table for the whole batch
+        by_table = defaultdict(list)
+        for p in payloads:
+            by_table[p["table"]].append(p["row"])
+        headers = {
+            "apikey": supabase_key,
+            "Authorization": f"Bearer {supabase_key}",
+            "Prefer": "return=minimal",
+        }
+        for table, rows in by_table.items():
+            _check(await client.post(f"{supabase_url}/rest/v1/{table}", json=rows, headers=headers))
+
+    return {"slack": send_slack, "jira": send_jira, "supabase": send_supabase}
+
+
+# --------------------
+# Dispatcher
+# --------------------
+BATCHED_TARGETS = {"supabase": SUPABASE_BATCH_SIZE}
+
+
+class Dispatcher:
+    """
+    Drains the outbox in the background with one pooled AsyncClient.
+    Each target gets its own concurrency limit, Supabase rows are sent in
+    batches, failures retry with exponential backoff and are dead-lettered
+    after OUTBOX_MAX_ATTEMPTS.
+
+    Up to OUTBOX_CLAIM_SIZE rows are held at once, most of them waiting on
+    their target's limit, so a background task renews the lease on all of
+    them every third of the lease; a row this dispatcher already holds is
+    never delivered twice even if it is claimed again.
+    """
+
+    def __init__(self, outbox: Outbox, senders: dict, concurrency: dict = None,
+                 client: httpx.AsyncClient = None):
+        self.outbox = outbox
+        self.senders = senders
+        limits = {**TARGET_CONCURRENCY, **(concurrency or {})}
+        self._semaphores = {t: asyncio.Semaphore(limits.get(t, 1)) for t in senders}
+        self._client = client
+        self._owns_client = client is None
+        self._inflight = set()
+        self._held = set()  # ids of rows claimed and not yet finished
+        self._wake = asyncio.Event()
+        self._task = None
+        self._renewer = None
+        self._stopping = False
+
+    def _nudge(self):
+        try:
+            self._loop.call_soon_threadsafe(self._wake.set)
+        except RuntimeError:
+            pass  # loop already closed; the row is picked up on next start
+
+    async def start(self):
+        self._loop = asyncio.get_running_loop()
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                timeout=HTTP_TIMEOUT,
+                limits=httpx.Limits(max_connections=sum(TARGET_CONCURRENCY.values())),
+            )
+        self.outbox.recover()
+        self.outbox.wakeup = self._nudge
+        self._task = asyncio.create_task(self._run())
+        self._renewer = asyncio.create_task(self._renew())
+
+    async def stop(self, timeout: float = 5.0):
+        """Let deliveries finish for up to ``timeout``, then cancel the rest and close the client"""
+        self._stopping = True
+        self.outbox.wakeup = None
+        self._wake.set()
+        if self._task:
+            await self._task
+        if self._inflight:
+            await asyncio.wait(self._inflight, timeout=timeout)
+        pending = list(self._inflight)
+        for task in pending:
+            task.cancel()  # their rows are released for the next dispatcher
+        await asyncio.gather(*pending, return_exceptions=True)
+        if self._renewer:
+            self._renewer.cancel()
+            await asyncio.gather(self._renewer, return_exceptions=True)
+        if self._owns_client and self._client:
+            await self._client.aclose()
+
+    async def _run(self):
+        while not self._stopping:
+            self._wake.clear()
+            capacity = OUTBOX_CLAIM_SIZE - len(self._inflight)
+            rows = self.outbox.claim_due(capacity) if capacity > 0 else []
+            # an expired claim of our own is still queued here; claiming it renewed it
+            rows = [row for row in rows if row[0] not in self._held]
+            self._held.update(row[0] for row in rows)
+            for target, group in self._group(rows):
+                task = asyncio.create_task(self._deliver(target, group))
+                self._inflight.add(task)
+                task.add_done_callback(self._inflight.discard)
+            if not rows:
+                try:
+                    await asyncio.wait_for(self._wake.wait(), OUTBOX_POLL_INTERVAL)
+                except asyncio.TimeoutError:
+                    pass
+            else:
+                await asyncio.sleep(0)
+
+    async def _renew(self):
+        while True:
+            await asyncio.sleep(self.outbox.lease / 3)
+            if self._held:
+                self.outbox.touch(list(self._held))
+
+    def _group(self, rows):
+        by_target = defaultdict(list)
+        for row in rows:
+            by_target[row[1]].append(row)
+        for target, items in by_target.items():
+            size = BATCHED_TARGETS.get(target, 1)
+            for i in range(0, len(items), size):
+                yield target, items[i:i + size]
+
+    async def _deliver(self, target, rows):
+        ids = [row[0] for row in rows]
+        attempts = max(row[3] for row in rows)
+        sender = self.senders.get(target)
+        if sender is None:
+            self.outbox.mark_failed(ids, attempts, f"no sender for target {target!r}", permanent=True)
+            self._held.difference_update(ids)
+            return
+        try:
+            async with self._semaphores[target]:
+                self.outbox.touch(ids)
+                await sender(self._client, [row[2] for row in rows])
+        except asyncio.CancelledError:
+            self.outbox.release(ids)
+            raise
+        except PermanentError as e:
+            self.outbox.mark_failed(ids, attempts, str(e), permanent=True)
+        except Exception as e:
+            print(f"⚠️ Outbox delivery to {target} failed:", e)
+            self.outbox.mark_failed(ids, attempts, repr(e))
+        else:
+            self.outbox.mark_done(ids)
+        finally:
+            self._held.difference_update(ids)
@@ -0,0 +1,222 @@
+import base64
+import json
+import os
+import threading
+import time
+import uuid
+
+import numpy as np
+
+SEMANTIC_CACHE_THRESHOLD = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", 0.92))
+SEMANTIC_CACHE_TTL = int(os.getenv("SEMANTIC_CACHE_TTL", 24 * 3600))
+SEMANTIC_CACHE_MAX_ENTRIES = int(os.getenv("SEMANTIC_CACHE_MAX_ENTRIES", 5000))
+SEMANTIC_CACHE_MAX_SCOPES = int(os.getenv("SEMANTIC_CACHE_MAX_SCOPES", 1000))
+
+try:
+    from prometheus_client import Counter
+    CACHE_REQUESTS = Counter("semantic_cache_requests_total", "Semantic cache lookups", ["result"])
+except ImportError:  # metrics are optional outside the service image
+    CACHE_REQUESTS = None
+
+
+def _encode(vec: np.ndarray) -> str:
+    return base64.b64encode(vec.astype(np.float32).tobytes()).decode()
+
+
+def _decode(raw: str) -> np.ndarray:
+    return np.frombuffer(base64.b64decode(raw), dtype=np.float32)
+
+
+class _ScopeIndex:
+    """
+    Flat in-process index of one scope's cached queries (normalised rows).
+    Updates replace ids, creation times and rows together under a lock
+    (copy on write), so a lookup always scores a consistent snapshot while
+    another thread adds or evicts. ``cursor`` is the last entry of the
+    scope's Redis log this index has seen.
+    """
+
+    def __init__(self, dim: int, ids=(), vectors=(), created=(), cursor: str = "0-0"):
+        self._lock = threading.Lock()
+        self.ids = list(ids)
+        self.created = np.asarray(created, dtype=np.float64)
+        self.matrix = np.asarray(vectors, dtype=np.float32).reshape(len(self.ids), dim)
+        self.cursor = cursor
+
+    def __len__(self):
+        return len(self.ids)
+
+    def add(self, entry_id, vec, created):
+        self.extend([entry_id], [vec], [created])
+
+    def extend(self, ids, vectors, created, cursor: str = None):
+        """Add entries not already present; ``cursor`` advances the log position"""
+        with self._lock:
+            known = set(self.ids)
+            fresh = [k for k, entry_id in enumerate(ids) if entry_id not in known]
+            if fresh:
+                self.ids = self.ids + [ids[k] for k in fresh]
+                self.created = np.append(self.created, [created[k] for k in fresh])
+                self.matrix = np.vstack([self.matrix] + [vectors[k][None, :] for k in fresh])
+            if cursor is not None:
+                self.cursor = cursor
+            return len(fresh)
+
+    def evict(self, keep: int):
+        """Drop the oldest entries until at most ``keep`` remain; returns their ids"""
+        with self._lock:
+            if len(self.ids) <= keep:
+                return []
+            order = np.argsort(self.created, kind="stable")
+            drop = order[:len(self.ids) - keep]
+            evicted = [self.ids[i] for i in drop]
+            mask = np.ones(len(self.ids), dtype=bool)
+            mask[drop] = False
+            self.ids = [entry_id for entry_id, kept in zip(self.ids, mask) if kept]
+            self.created = self.created[mask]
+            self.matrix = self.matrix[mask]
+            return evicted
+
+    def best(self, vec, min_created):
+        with self._lock:
+            ids, created, matrix = self.ids, self.created, self.matrix
+        if not ids:
+            return None, 0.0
+        scores = matrix @ vec
+        scores[created < min_created] = -1.0
+        i = int(scores.argmax())
+        return ids[i], float(scores[i])
+
+
+class SemanticCache:
+    """
+    Answer cache keyed by query meaning rather than exact text.
+
+    Entries live in Redis (one hash per scope, expiring with the TTL) so all
+    replicas share them; each process keeps a flat numpy index per scope for
+    millisecond lookups. Every store is also appended to the scope's log (a
+    capped stream), and a lookup that misses locally first pulls the entries
+    other replicas logged since the index last looked. A scope is a tenant plus the version of its document
+    set: re-ingesting documents bumps the version, which makes every older
+    answer unreachable without scanning for them.
+    """
+
+    def __init__(self, client, embed, threshold: float = SEMANTIC_CACHE_THRESHOLD,
+                 ttl: int = SEMANTIC_CACHE_TTL, max_entries: int = SEMANTIC_CACHE_MAX_ENTRIES):
+        self.r = client
+        self.embed = embed
+        self.threshold = threshold
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.indexes = {}
+        self.hits = self.misses = self.evictions = 0
+        self._lock = threading.Lock()
+
+    # --- scopes & invalidation ---
+    def docs_version(self, tenant: str) -> int:
+        return int(self.r.get(f"docset:{tenant}:version") or 0)
+
+    def invalidate(self, tenant: str) -> int:
+        """Call after (re-)ingesting a tenant's documents; returns the new version"""
+        version = self.r.incr(f"docset:{tenant}:version")
+        with self._lock:
+            for scope in [s for s in self.indexes if s.startswith(f"{tenant}:")]:
+                del self.indexes[scope]
+        return version
+
+    def scope(self, tenant: str, doc_set: str = "all") -> str:
+        return f"{tenant}:{doc_set}:v{self.docs_version(tenant)}"
+
+    def _vector(self, query: str, embedding=None) -> np.ndarray:
+        vec = np.asarray(self.embed(query) if embedding is None else embedding, dtype=np.float32).ravel()
+        return vec / max(float(np.linalg.norm(vec)), 1e-12)
+
+    def _index(self, scope: str, dim: int) -> _ScopeIndex:
+        with self._lock:
+            index = self.indexes.get(scope)
+            if index is None:
+                # read the log position first: entries logged meanwhile are pulled again, not lost
+                last = self.r.xrevrange(f"semcache:{scope}:log", count=1)
+                entries = {k: json.loads(v) for k, v in self.r.hgetall(f"semcache:{scope}").items()}
+                index = _ScopeIndex(dim, entries, [_decode(e["embedding"]) for e in entries.values()],
+                                    [e["created"] for e in entries.values()], last[0][0] if last else "0-0")
+                self.indexes[scope] = index
+                if len(self.indexes) > SEMANTIC_CACHE_MAX_SCOPES:
+                    del self.indexes[next(iter(self.indexes))]
+            return index
+
+    def _sync(self, scope: str, index: _ScopeIndex) -> int:
+        """
+        Add the entries other replicas stored since ``index`` last looked;
+        returns how many were new. Entries already evicted are skipped.
+        """
+        logged = self.r.xrange(f"semcache:{scope}:log", min=f"({index.cursor}", max="+")
+        if not logged:
+            return 0
+        ids = [fields["id"] for _, fields in logged]
+        found = [(i, json.loads(raw)) for i, raw in zip(ids, self.r.hmget(f"semcache:{scope}", ids)) if raw]
+        return index.extend([i for i, _ in found], [_decode(e["embedding"]) for _, e in found],
+                            [e["created"] for _, e in found], cursor=logged[-1][0])
+
+    # --- lookups ---
+    def lookup(self, tenant: str, query: str, doc_set: str = "all", embedding=None):
+        """
+        Cached ``{"answer", "query", "similarity"}`` for a similar query, else None.
+        Pass the query's ``embedding`` when the caller has it, to embed only once.
+        """
+        scope = self.scope(tenant, doc_set)
+        vec = self._vector(query, embedding)
+        index = self._index(scope, len(vec))
+        entry_id, score = index.best(vec, time.time() - self.ttl)
+        if score < self.threshold and self._sync(scope, index):
+            entry_id, score = index.best(vec, time.time() - self.ttl)
+        raw = self.r.hget(f"semcache:{scope}", entry_id) if score >= self.threshold else None
+        if raw is None:
+            self._count("miss")
+            return None
+        self._count("hit")
+        entry = json.loads(raw)
+        return {"answer": entry["answer"], "query": entry["query"], "similarity": round(score, 4)}
+
+    def store(self, tenant: str, query: str, answer, doc_set: str = "all", embedding=None):
+        """Cache an answer; a full scope makes room by evicting its oldest entries"""
+        scope = self.scope(tenant, doc_set)
+        vec = self._vector(query, embedding)
+        index = self._index(scope, len(vec))
+        entry_id = uuid.uuid4().hex
+        created = time.time()
+        key = f"semcache:{scope}"
+        pipe = self.r.pipeline()
+        evicted = index.evict(self.max_entries - 1)
+        if evicted:
+            pipe.hdel(key, *evicted)
+            self.evictions += len(evicted)
+        pipe.hset(key, entry_id, json.dumps({
+            "query": query, "answer": answer, "created": created, "embedding": _encode(vec),
+        }))
+        pipe.expire(key, self.ttl)
+        pipe.xadd(key + ":log", {"id": entry_id}, maxlen=self.max_entries, approximate=True)
+        pipe.expire(key + ":log", self.ttl)
+        pipe.execute()
+        index.add(entry_id, vec, created)
+        return entry_id
+
+    # --- metrics ---
+    def _count(self, result: str):
+        if result == "hit":
+            self.hits += 1
+        else:
+            self.misses += 1
+        if CACHE_REQUESTS is not None:
+            CACHE_REQUESTS.labels(result=result).inc()
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+            "evictions": self.evictions,
+            "scopes_loaded": len(self.indexes),
+            "threshold": self.threshold,
+        }
@@ -0,0 +1,78 @@
+"""Streaming, content-addressed upload storage.
+
+Same hash-on-write store as the compliance API
+(backend/app/storage/blob_store.py). This service is built from its own
+directory, so changes to one copy must be made to the other.
+"""
+import hashlib
+import os
+import tempfile
+
+from fastapi import HTTPException, UploadFile
+from starlette.concurrency import run_in_threadpool
+
+UPLOAD_DIR = os.getenv("UPLOAD_DIR", "uploads")
+CHUNK_SIZE = int(os.getenv("UPLOAD_CHUNK_SIZE", 1024 * 1024))
+MAX_UPLOAD_BYTES = int(os.getenv("MAX_UPLOAD_BYTES", 100 * 1024 * 1024))
+# Room for multipart boundaries and part headers around the file itself
+MULTIPART_OVERHEAD = 64 * 1024
+
+
+def blob_path(digest: str) -> str:
+    return os.path.join(UPLOAD_DIR, digest[:2], digest[2:4], digest)
+
+
+def body_too_large(content_length, max_bytes: int = MAX_UPLOAD_BYTES) -> bool:
+    """
+    Whether a request's Content-Length already rules the upload out, so it
+    can be rejected before the multipart body is parsed and spooled
+    """
+    return bool(content_length and content_length.isdigit()
+                and int(content_length) > max_bytes + MULTIPART_OVERHEAD)
+
+
+def _write(out, h, chunk):
+    h.update(chunk)
+    out.write(chunk)
+
+
+def _commit(tmp_path, digest):
+    path = blob_path(digest)
+    if os.path.exists(path):
+        os.unlink(tmp_path)
+        return path, True
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    os.replace(tmp_path, path)
+    return path, False
+
+
+async def store_upload(file: UploadFile, max_bytes: int = MAX_UPLOAD_BYTES):
+    """
+    Streams an upload to content-addressed storage in fixed-size chunks.
+    Each chunk is hashed and written in the thread pool, so neither SHA-256
+    nor disk I/O runs on the event loop, and memory stays at one chunk per
+    upload regardless of file size.
+    Returns (sha256, path, size, duplicate).
+    """
+    if file.size is not None and file.size > max_bytes:
+        raise HTTPException(status_code=413, detail=f"File exceeds {max_bytes} bytes")
+
+    tmp_dir = os.path.join(UPLOAD_DIR, "tmp")
+    os.makedirs(tmp_dir, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=tmp_dir)
+    h = hashlib.sha256()
+    size = 0
+    try:
+        with os.fdopen(fd, "wb") as out:
+            while chunk := await file.read(CHUNK_SIZE):
+                size += len(chunk)
+                if size > max_bytes:
+                    raise HTTPException(status_code=413, detail=f"File exceeds {max_bytes} bytes")
+                await run_in_threadpool(_write, out, h, chunk)
+        digest = h.hexdigest()
+        path, duplicate = await run_in_threadpool(_commit, tmp_path, digest)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+    return digest, path, size, duplicate
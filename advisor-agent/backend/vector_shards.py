@@ -0,0 +1,248 @@
+import hashlib
+import heapq
+import json
+import os
+import shutil
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+VECTOR_STORE_DIR = os.getenv("VECTOR_STORE_DIR", "vector_store")
+SHARD_MAX_VECTORS = int(os.getenv("SHARD_MAX_VECTORS", 50000))
+VECTOR_CACHE_BYTES = int(os.getenv("VECTOR_CACHE_BYTES", 512 * 1024 * 1024))
+SEARCH_WORKERS = int(os.getenv("SEARCH_WORKERS", os.cpu_count() or 4))
+
+
+def _line_offset(path, lines):
+    """Byte offset just past the first ``lines`` lines of a file"""
+    if not os.path.exists(path):
+        return 0
+    offset = 0
+    with open(path, "rb") as f:
+        for _, line in zip(range(lines), f):
+            offset += len(line)
+    return offset
+
+
+def _tenant_key(tenant: str) -> str:
+    # A digest, not a sanitised id: distinct tenants never share a directory
+    # and no id (e.g. "..") can point outside the store root
+    return hashlib.sha256(tenant.encode()).hexdigest()
+
+
+class ShardCache:
+    """
+    LRU cache of loaded shards bounded by total bytes.
+    Each entry is (vectors, metadata); its size counts the vector matrix
+    plus the serialized metadata. Tenants share one budget, so idle
+    tenants are evicted first.
+    """
+
+    def __init__(self, max_bytes: int = VECTOR_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()
+        self.bytes = 0
+        self.hits = self.misses = self.evictions = 0
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key, value, nbytes: int):
+        with self._lock:
+            old = self.entries.pop(key, None)
+            if old:
+                self.bytes -= old[1]
+            if nbytes > self.max_bytes:
+                return  # larger than the whole budget: serve uncached
+            self.entries[key] = (value, nbytes)
+            self.bytes += nbytes
+            while self.bytes > self.max_bytes:
+                _, (_, size) = self.entries.popitem(last=False)
+                self.bytes -= size
+                self.evictions += 1
+
+    def drop(self, prefix):
+        with self._lock:
+            for key in [k for k in self.entries if k[0] == prefix]:
+                self.bytes -= self.entries.pop(key)[1]
+
+    def stats(self):
+        return {
+            "entries": len(self.entries),
+            "bytes": self.bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+
+class ShardedVectorStore:
+    """
+    Vector search partitioned by tenant, and by shard within a tenant.
+
+    Layout: <root>/<sha256(tenant)>/manifest.json (which records the tenant
+    id) plus one directory per shard with an append-only float32 matrix
+    (vectors.f32) and one JSON line of metadata per vector (meta.jsonl).
+    Vectors are L2-normalised on write, so inner product is cosine similarity.
+    The manifest is the commit point: rows an interrupted ``add`` wrote past
+    a shard's manifest count are cut off before the next append to it.
+
+    A query touches only its tenant's shards: each is scored on the thread
+    pool (numpy releases the GIL in the matrix product), the per-shard top-k
+    are merged with a heap, and latency does not depend on how many other
+    tenants exist.
+    """
+
+    def __init__(self, root: str = VECTOR_STORE_DIR, shard_size: int = SHARD_MAX_VECTORS,
+                 cache: ShardCache = None, workers: int = SEARCH_WORKERS):
+        self.root = root
+        self.shard_size = shard_size
+        self.cache = cache or ShardCache()
+        self.pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="shard-search")
+        self._locks = {}
+        self._locks_guard = threading.Lock()
+
+    # --- layout ---
+    def _tenant_dir(self, tenant):
+        return os.path.join(self.root, _tenant_key(tenant))
+
+    def _shard_dir(self, tenant, shard):
+        return os.path.join(self._tenant_dir(tenant), f"shard-{shard:04d}")
+
+    def _lock(self, tenant):
+        with self._locks_guard:
+            return self._locks.setdefault(tenant, threading.Lock())
+
+    def manifest(self, tenant):
+        path = os.path.join(self._tenant_dir(tenant), "manifest.json")
+        if not os.path.exists(path):
+            return {"tenant": tenant, "dim": None, "shards": []}
+        with open(path) as f:
+            return json.load(f)
+
+    def _save_manifest(self, tenant, manifest):
+        path = os.path.join(self._tenant_dir(tenant), "manifest.json")
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path + ".tmp", "w") as f:
+            json.dump(manifest, f)
+        os.replace(path + ".tmp", path)
+
+    # --- writes ---
+    def _trim_shard(self, shard_dir, shard, dim):
+        """Drop rows past the manifest's count, so vectors and metadata stay aligned"""
+        if "meta_bytes" not in shard:  # manifests written before it was recorded
+            shard["meta_bytes"] = _line_offset(os.path.join(shard_dir, "meta.jsonl"), shard["count"])
+        for name, size in (("vectors.f32", shard["count"] * dim * 4), ("meta.jsonl", shard["meta_bytes"])):
+            path = os.path.join(shard_dir, name)
+            if os.path.exists(path) and os.path.getsize(path) > size:
+                with open(path, "r+b") as f:
+                    f.truncate(size)
+
+    def add(self, tenant: str, vectors, metas):
+        """Append vectors (n x dim) with one metadata dict each; returns the count"""
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if vectors.ndim == 1:
+            vectors = vectors[None, :]
+        if len(vectors) != len(metas):
+            raise ValueError("need one metadata entry per vector")
+        if not len(vectors):
+            return 0
+        vectors = vectors / np.clip(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12, None)
+        with self._lock(tenant):
+            manifest = self.manifest(tenant)
+            if manifest["dim"] is None:
+                manifest["dim"] = int(vectors.shape[1])
+            elif manifest["dim"] != vectors.shape[1]:
+                raise ValueError(f"tenant {tenant} uses dim {manifest['dim']}, got {vectors.shape[1]}")
+            start = 0
+            while start < len(vectors):
+                if not manifest["shards"] or manifest["shards"][-1]["count"] >= self.shard_size:
+                    manifest["shards"].append({"id": len(manifest["shards"]), "count": 0, "meta_bytes": 0})
+                shard = manifest["shards"][-1]
+                take = min(self.shard_size - shard["count"], len(vectors) - start)
+                shard_dir = self._shard_dir(tenant, shard["id"])
+                os.makedirs(shard_dir, exist_ok=True)
+                self._trim_shard(shard_dir, shard, manifest["dim"])
+                with open(os.path.join(shard_dir, "vectors.f32"), "ab") as f:
+                    f.write(vectors[start:start + take].tobytes())
+                meta = "".join(json.dumps(m) + "\n" for m in metas[start:start + take]).encode()
+                with open(os.path.join(shard_dir, "meta.jsonl"), "ab") as f:
+                    f.write(meta)
+                shard["count"] += take
+                shard["meta_bytes"] += len(meta)
+                start += take
+            self._save_manifest(tenant, manifest)
+        return len(vectors)
+
+    # --- reads ---
+    def _load_shard(self, tenant, shard, dim, count):
+        key = (tenant, shard)
+        cached = self.cache.get(key)
+        # Shards only grow, so a cached copy is current iff its length matches
+        if cached is not None and len(cached[0]) == count:
+            return cached
+        shard_dir = self._shard_dir(tenant, shard)
+        # Only read what the manifest has committed; a concurrent append may be mid-write
+        vectors = np.fromfile(os.path.join(shard_dir, "vectors.f32"), dtype=np.float32,
+                              count=count * dim).reshape(count, dim)
+        with open(os.path.join(shard_dir, "meta.jsonl")) as f:
+            raw = [next(f) for _ in range(count)]
+        metas = [json.loads(line) for line in raw]
+        self.cache.put(key, (vectors, metas), vectors.nbytes + sum(len(line) for line in raw))
+        return vectors, metas
+
+    def _search_shard(self, tenant, shard, dim, count, query, k):
+        vectors, metas = self._load_shard(tenant, shard, dim, count)
+        scores = vectors @ query
+        if len(scores) > k:
+            top = np.argpartition(-scores, k - 1)[:k]
+        else:
+            top = np.arange(len(scores))
+        return [(float(scores[i]), shard, int(i), metas[i]) for i in top]
+
+    def search(self, tenant: str, query, k: int = 5):
+        """Top-k (score, metadata) across the tenant's shards, best first"""
+        manifest = self.manifest(tenant)
+        if not manifest["shards"]:
+            return []
+        query = np.asarray(query, dtype=np.float32).ravel()
+        query = query / max(float(np.linalg.norm(query)), 1e-12)
+        dim = manifest["dim"]
+        shards = [s for s in manifest["shards"] if s["count"]]
+        if len(shards) == 1:
+            partials = [self._search_shard(tenant, shards[0]["id"], dim, shards[0]["count"], query, k)]
+        else:
+            futures = [
+                self.pool.submit(self._search_shard, tenant, s["id"], dim, s["count"], query, k)
+                for s in shards
+            ]
+            partials = [f.result() for f in futures]
+        best = heapq.nlargest(k, (hit for part in partials for hit in part), key=lambda h: h[0])
+        return [{"score": score, "shard": shard, **meta} for score, shard, _, meta in best]
+
+    def delete_tenant(self, tenant: str):
+        with self._lock(tenant):
+            shutil.rmtree(self._tenant_dir(tenant), ignore_errors=True)
+            self.cache.drop(tenant)
+
+    def stats(self, tenant: str = None):
+        out = {"cache": self.cache.stats()}
+        if tenant is not None:
+            manifest = self.manifest(tenant)
+            out["tenant"] = {
+                "dim": manifest["dim"],
+                "shards": len(manifest["shards"]),
+                "vectors": sum(s["count"] for s in manifest["shards"]),
+            }
+        return out
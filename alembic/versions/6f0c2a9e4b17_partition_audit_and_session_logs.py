@@ -0,0 +1,170 @@
+"""partition audit_entries and session_logs by month
+
+Revision ID: 6f0c2a9e4b17
+Revises: dd78afb17f24
+Create Date: 2026-10-19 11:02:47.551930
+
+"""
+from datetime import datetime, timezone
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '6f0c2a9e4b17'
+down_revision: Union[str, Sequence[str], None] = 'dd78afb17f24'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Months created ahead; app.retention.partitions keeps this window moving
+MONTHS_AHEAD = 3
+
+COLUMNS = {
+    'audit_entries': [
+        ('created_at', 'timestamptz NOT NULL DEFAULT now()'),
+        ('actor', 'varchar(128)'),
+        ('action', 'varchar(256)'),
+        ('payload', 'text'),
+        ('sha256', 'varchar(128)'),
+        ('previous_hash', 'varchar(128)'),
+        ('hmac_signature', 'varchar(256)'),
+    ],
+    'session_logs': [
+        ('created_at', 'timestamptz NOT NULL DEFAULT now()'),
+        ('user_id', 'varchar(128)'),
+        ('session_id', 'varchar(128)'),
+        ('query', 'text'),
+        ('response', 'text'),
+        ('risk_score', 'double precision'),
+    ],
+}
+ID_TYPE = {'audit_entries': 'serial', 'session_logs': 'bigserial'}
+
+
+def _month(dt):
+    return datetime(dt.year, dt.month, 1, tzinfo=timezone.utc)
+
+
+def _next_month(month):
+    return datetime(month.year + month.month // 12, month.month % 12 + 1, 1, tzinfo=timezone.utc)
+
+
+def _partition(table):
+    """Rebuild ``table`` as a monthly range-partitioned table, keeping its rows and ids"""
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+    legacy = f'{table}_unpartitioned'
+    legacy_columns, seq = set(), None
+    if inspector.has_table(table):
+        legacy_columns = {c['name'] for c in inspector.get_columns(table)}
+        # hand the id sequence (and every index/constraint name) over to the new table
+        seq = bind.execute(sa.text("SELECT pg_get_serial_sequence(:t, 'id')"), {'t': table}).scalar()
+        if seq:
+            op.execute(f'ALTER SEQUENCE {seq} OWNED BY NONE')
+        for index in inspector.get_indexes(table):
+            op.execute(f'DROP INDEX {index["name"]}')
+        pk = inspector.get_pk_constraint(table).get('name')
+        op.execute(f'ALTER TABLE {table} RENAME TO {legacy}')
+        if pk:
+            op.execute(f'ALTER TABLE {legacy} RENAME CONSTRAINT {pk} TO {legacy}_pkey')
+        id_column = f"id {'bigint' if ID_TYPE[table] == 'bigserial' else 'integer'} NOT NULL DEFAULT nextval('{seq}')" \
+            if seq else f'id {ID_TYPE[table]}'
+    else:
+        id_column = f'id {ID_TYPE[table]}'
+
+    columns = ', '.join([id_column] + [f'{name} {ddl}' for name, ddl in COLUMNS[table]])
+    op.execute(f'CREATE TABLE {table} ({columns}, PRIMARY KEY (id, created_at)) PARTITION BY RANGE (created_at)')
+    op.execute(f'CREATE TABLE {table}_default PARTITION OF {table} DEFAULT')
+
+    now = _month(datetime.now(timezone.utc))
+    first = now
+    if 'created_at' in legacy_columns:
+        oldest = bind.execute(sa.text(f'SELECT min(created_at) FROM {legacy}')).scalar()
+        if oldest is not None:
+            first = min(first, _month(oldest))
+    month, last = first, now
+    for _ in range(MONTHS_AHEAD):
+        last = _next_month(last)
+    while month <= last:
+        op.execute(f"CREATE TABLE {table}_p{month:%Y_%m} PARTITION OF {table} "
+                   f"FOR VALUES FROM ('{month.isoformat()}') TO ('{_next_month(month).isoformat()}')")
+        month = _next_month(month)
+
+    if legacy_columns:
+        copied = [c for c in ['id'] + [name for name, _ in COLUMNS[table]] if c in legacy_columns]
+        select = ['coalesce(created_at, now())' if c == 'created_at' else c for c in copied]
+        op.execute(f"INSERT INTO {table} ({', '.join(copied)}) SELECT {', '.join(select)} FROM {legacy}")
+        if seq:
+            op.execute(f'ALTER SEQUENCE {seq} OWNED BY {table}.id')
+        if 'id' in copied:
+            op.execute(f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), coalesce(max(id), 0) + 1, false) "
+                       f"FROM {table}")
+        op.execute(f'DROP TABLE {legacy}')
+
+    # BRIN: created_at follows insertion order, so a few pages of block
+    # ranges index a month; it is inherited by every partition
+    op.create_index(f'ix_{table}_created_brin', table, ['created_at'], postgresql_using='brin')
+    if table == 'audit_entries':
+        op.create_index(op.f('ix_audit_entries_id'), 'audit_entries', ['id'], unique=False)
+
+
+def _unpartition(table):
+    partitioned = f'{table}_partitioned'
+    seq = op.get_bind().execute(sa.text("SELECT pg_get_serial_sequence(:t, 'id')"), {'t': table}).scalar()
+    op.execute(f'ALTER SEQUENCE {seq} OWNED BY NONE')
+    op.execute(f'DROP INDEX ix_{table}_created_brin')
+    if table == 'audit_entries':
+        op.execute('DROP INDEX ix_audit_entries_id')
+    op.execute(f'ALTER TABLE {table} RENAME TO {partitioned}')
+    op.execute(f'ALTER TABLE {partitioned} RENAME CONSTRAINT {table}_pkey TO {partitioned}_pkey')
+    id_type = 'bigint' if ID_TYPE[table] == 'bigserial' else 'integer'
+    columns = ', '.join([f"id {id_type} NOT NULL DEFAULT nextval('{seq}')"]
+                        + [f'{name} {ddl}' for name, ddl in COLUMNS[table]])
+    op.execute(f'CREATE TABLE {table} ({columns}, PRIMARY KEY (id))')
+    op.execute(f'INSERT INTO {table} SELECT * FROM {partitioned}')
+    op.execute(f'ALTER SEQUENCE {seq} OWNED BY {table}.id')
+    op.execute(f'DROP TABLE {partitioned} CASCADE')
+    if table == 'audit_entries':
+        op.create_index(op.f('ix_audit_entries_id'), 'audit_entries', ['id'], unique=False)
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    if op.get_bind().dialect.name == 'postgresql':
+        _partition('audit_entries')
+        _partition('session_logs')
+        return
+    # Other databases (local SQLite) get the same tables and index names, unpartitioned
+    op.execute('UPDATE audit_entries SET created_at = CURRENT_TIMESTAMP WHERE created_at IS NULL')
+    with op.batch_alter_table('audit_entries') as batch_op:
+        batch_op.alter_column('created_at', existing_type=sa.DateTime(timezone=True), nullable=False,
+                              existing_server_default=sa.func.now())
+    op.create_index('ix_audit_entries_created_brin', 'audit_entries', ['created_at'], unique=False)
+    op.create_table('session_logs',
+    sa.Column('id', sa.BigInteger().with_variant(sa.Integer(), 'sqlite'), nullable=False),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=False),
+    sa.Column('user_id', sa.String(length=128), nullable=True),
+    sa.Column('session_id', sa.String(length=128), nullable=True),
+    sa.Column('query', sa.Text(), nullable=True),
+    sa.Column('response', sa.Text(), nullable=True),
+    sa.Column('risk_score', sa.Float(), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_session_logs_created_brin', 'session_logs', ['created_at'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    if op.get_bind().dialect.name == 'postgresql':
+        # session_logs may predate this migration, so it is kept as a plain table
+        _unpartition('session_logs')
+        _unpartition('audit_entries')
+        return
+    op.drop_index('ix_session_logs_created_brin', table_name='session_logs')
+    op.drop_table('session_logs')
+    op.drop_index('ix_audit_entries_created_brin', table_name='audit_entries')
+    with op.batch_alter_table('audit_entries') as batch_op:
+        batch_op.alter_column('created_at', existing_type=sa.DateTime(timezone=True), nullable=True,
+                              existing_server_default=sa.func.now())
@@ -0,0 +1,52 @@
+"""add findings
+
+Revision ID: dd78afb17f24
+Revises: 53c224c0ea98
+Create Date: 2026-10-19 09:41:12.318204
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'dd78afb17f24'
+down_revision: Union[str, Sequence[str], None] = '53c224c0ea98'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('findings',
+    sa.Column('id', sa.BigInteger().with_variant(sa.Integer(), 'sqlite'), nullable=False),
+    sa.Column('document_id', sa.Integer(), nullable=True),
+    sa.Column('document_sha256', sa.String(length=64), nullable=False),
+    sa.Column('document_name', sa.String(length=512), nullable=False),
+    sa.Column('severity', sa.String(length=16), nullable=False),
+    sa.Column('regulation', sa.String(length=64), nullable=False),
+    sa.Column('category', sa.String(length=256), nullable=True),
+    sa.Column('description', sa.Text(), nullable=True),
+    sa.Column('recommendation', sa.Text(), nullable=True),
+    sa.Column('citations', sa.Text(), nullable=True),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=False),
+    sa.ForeignKeyConstraint(['document_id'], ['documents.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_findings_severity_regulation_created', 'findings', ['severity', 'regulation', 'created_at', 'id'], unique=False)
+    op.create_index('ix_findings_severity_created', 'findings', ['severity', 'created_at', 'id'], unique=False)
+    op.create_index('ix_findings_regulation_created', 'findings', ['regulation', 'created_at', 'id'], unique=False)
+    op.create_index('ix_findings_document_created', 'findings', ['document_sha256', 'created_at', 'id'], unique=False)
+    op.create_index('ix_findings_created', 'findings', ['created_at', 'id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_findings_created', table_name='findings')
+    op.drop_index('ix_findings_document_created', table_name='findings')
+    op.drop_index('ix_findings_regulation_created', table_name='findings')
+    op.drop_index('ix_findings_severity_created', table_name='findings')
+    op.drop_index('ix_findings_severity_regulation_created', table_name='findings')
+    op.drop_table('findings')
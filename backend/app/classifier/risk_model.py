@@ -0,0 +1,198 @@
+"""RBI risk-type classifier used as a cheap pre-filter before the LLM.
+
+Models are trained offline (see ``rbi_risk_classifier.py``) and saved as
+versioned artifacts::
+
+    <RISK_MODEL_DIR>/<version>/model.joblib
+    <RISK_MODEL_DIR>/<version>/meta.json
+    <RISK_MODEL_DIR>/LATEST            name of the current version
+
+Two pipelines are supported:
+
+- ``tfidf``:   TF-IDF + logistic regression, fitted in one pass
+- ``hashing``: HashingVectorizer + SGD (log loss), trained with
+  ``partial_fit`` over batches so corpora larger than memory can be streamed
+
+Both are linear over sparse features, so ``predict_proba`` on a batch of a
+few thousand chunks is a single sparse matrix product.
+"""
+import json
+import os
+import re
+import threading
+import time
+from collections import Counter
+
+import numpy as np
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# A relative path is taken from backend/, so the API (started in backend/) and
+# the training CLI (run from the repository root) read and write the same place
+RISK_MODEL_DIR = os.path.join(BACKEND_DIR, os.environ.get("RISK_MODEL_DIR", os.path.join("models", "risk_classifier")))
+RISK_TAG_THRESHOLD = float(os.environ.get("RISK_TAG_THRESHOLD", 0.35))
+HASHING_FEATURES = 2 ** 20
+
+_CLEAN_RE = re.compile(r"[^a-z\s]")
+_SPACE_RE = re.compile(r"\s+")
+
+
+def preprocess_text(text):
+    text = _CLEAN_RE.sub("", text.lower())
+    return _SPACE_RE.sub(" ", text).strip()
+
+
+def _hashing_vectorizer():
+    from sklearn.feature_extraction.text import HashingVectorizer
+    return HashingVectorizer(n_features=HASHING_FEATURES, ngram_range=(1, 2),
+                             alternate_sign=False, norm="l2")
+
+
+class RiskClassifier:
+    """A fitted vectorizer + linear model with its label set and version"""
+
+    def __init__(self, vectorizer, model, version=None, meta=None):
+        self.vectorizer = vectorizer
+        self.model = model
+        self.labels = [str(c) for c in model.classes_]
+        self.version = version
+        self.meta = meta or {}
+
+    def predict_proba(self, texts):
+        """``(len(texts), len(labels))`` probability matrix"""
+        X = self.vectorizer.transform([preprocess_text(t) for t in texts])
+        return self.model.predict_proba(X)
+
+    def predict(self, texts):
+        """Most likely label per text"""
+        if not texts:
+            return []
+        return [self.labels[i] for i in self.predict_proba(texts).argmax(axis=1)]
+
+    def tag(self, texts, threshold=RISK_TAG_THRESHOLD):
+        """Best ``(label, probability)`` per text, or None below ``threshold``"""
+        if not texts:
+            return []
+        proba = self.predict_proba(texts)
+        best = proba.argmax(axis=1)
+        return [
+            (self.labels[i], float(p)) if p >= threshold else None
+            for i, p in zip(best, proba[np.arange(len(best)), best])
+        ]
+
+
+# --- Training ---
+def train(texts, labels, mode="tfidf"):
+    """Fit a classifier on in-memory data"""
+    if mode == "hashing":
+        trainer = OnlineTrainer(sorted(set(labels)))
+        trainer.partial_fit(texts, labels)
+        return trainer.classifier()
+    from sklearn.feature_extraction.text import TfidfVectorizer
+    from sklearn.linear_model import LogisticRegression
+    vectorizer = TfidfVectorizer(ngram_range=(1, 2), min_df=1, sublinear_tf=True)
+    X = vectorizer.fit_transform([preprocess_text(t) for t in texts])
+    model = LogisticRegression(max_iter=1000, C=10.0)
+    model.fit(X, labels)
+    return RiskClassifier(vectorizer, model, meta={"mode": "tfidf", "samples": len(texts)})
+
+
+def holdout(texts, labels, test_size=0.3, seed=42):
+    """
+    ``(train_texts, train_labels, test_texts, test_labels)``, stratified by
+    label when every label has enough examples to appear on both sides
+    """
+    from sklearn.model_selection import train_test_split
+    stratify = labels if min(Counter(labels).values()) >= 2 else None
+    try:
+        train_x, test_x, train_y, test_y = train_test_split(
+            texts, labels, test_size=test_size, random_state=seed, stratify=stratify)
+    except ValueError:  # too few examples per label for the test size
+        train_x, test_x, train_y, test_y = train_test_split(
+            texts, labels, test_size=test_size, random_state=seed)
+    return train_x, train_y, test_x, test_y
+
+
+def evaluate(classifier, texts, labels):
+    """``(report, accuracy)`` on held-out data; ``report`` is sklearn's classification report"""
+    from sklearn.metrics import accuracy_score, classification_report
+    predicted = classifier.predict(texts)
+    return classification_report(labels, predicted, zero_division=0), float(accuracy_score(labels, predicted))
+
+
+class OnlineTrainer:
+    """Streaming trainer: call ``partial_fit`` once per batch of circulars.
+
+    The hashing vectorizer is stateless, so nothing but the model weights
+    grows with the corpus. ``classes`` must list every label up front.
+    """
+
+    def __init__(self, classes):
+        from sklearn.linear_model import SGDClassifier
+        self.classes = list(classes)
+        self.vectorizer = _hashing_vectorizer()
+        self.model = SGDClassifier(loss="log_loss", alpha=1e-5)
+        self.samples = 0
+
+    def partial_fit(self, texts, labels):
+        X = self.vectorizer.transform([preprocess_text(t) for t in texts])
+        self.model.partial_fit(X, labels, classes=self.classes)
+        self.samples += len(texts)
+
+    def classifier(self):
+        return RiskClassifier(self.vectorizer, self.model,
+                              meta={"mode": "hashing", "samples": self.samples})
+
+
+# --- Artifacts ---
+def save(classifier, model_dir=RISK_MODEL_DIR, version=None):
+    """Write a new artifact version and point LATEST at it; returns the version"""
+    version = version or time.strftime("%Y%m%d%H%M%S")
+    import joblib
+    path = os.path.join(model_dir, version)
+    os.makedirs(path, exist_ok=True)
+    joblib.dump({"vectorizer": classifier.vectorizer, "model": classifier.model},
+                os.path.join(path, "model.joblib"))
+    meta = {**classifier.meta, "version": version, "labels": classifier.labels}
+    with open(os.path.join(path, "meta.json"), "w") as f:
+        json.dump(meta, f, indent=2)
+    latest = os.path.join(model_dir, "LATEST")
+    with open(latest + ".tmp", "w") as f:
+        f.write(version)
+    os.replace(latest + ".tmp", latest)
+    classifier.version = version
+    return version
+
+
+def load(model_dir=RISK_MODEL_DIR, version=None):
+    import joblib
+    if version is None:
+        with open(os.path.join(model_dir, "LATEST")) as f:
+            version = f.read().strip()
+    path = os.path.join(model_dir, version)
+    artifact = joblib.load(os.path.join(path, "model.joblib"))
+    with open(os.path.join(path, "meta.json")) as f:
+        meta = json.load(f)
+    return RiskClassifier(artifact["vectorizer"], artifact["model"], version, meta)
+
+
+_classifier = None
+_classifier_loaded = False
+_lock = threading.Lock()
+
+
+def get_classifier():
+    """Lazily load the latest artifact; None when no model has been trained"""
+    global _classifier, _classifier_loaded
+    if not _classifier_loaded:
+        with _lock:
+            if not _classifier_loaded:
+                try:
+                    _classifier = load(RISK_MODEL_DIR)
+                except FileNotFoundError:
+                    print(f"⚠️ No risk classifier found in {RISK_MODEL_DIR}; pre-classification disabled")
+                except ImportError as e:
+                    print(f"⚠️ Risk classifier unavailable ({e}); pre-classification disabled")
+                except Exception as e:
+                    print(f"⚠️ Failed to load risk classifier: {e}")
+                _classifier_loaded = True
+    return _classifier
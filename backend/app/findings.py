@@ -0,0 +1,118 @@
+"""Persisted analysis findings with filtered, keyset-paginated queries.
+
+The pipeline writes every analyzed document's risks in one bulk insert
+(replacing any earlier rows for the same content). Listing walks newest
+first on ``(created_at, id)``. The cursor is the last row's key, so page N
+costs the same as page 1: an index range scan, with no OFFSET and no sort.
+
+    rows, cursor = query_findings(session, severity="HIGH", regulation="GDPR",
+                                  since=datetime(2025, 7, 1), until=datetime(2025, 10, 1))
+"""
+import base64
+import json
+from datetime import datetime, timezone
+
+from sqlalchemy import delete, insert, select, tuple_
+
+from app.models import Finding
+
+MAX_PAGE_SIZE = 500
+
+
+def _norm(value):
+    return (value or "UNKNOWN").strip().upper()
+
+
+def finding_rows(document_sha256, document_name, risks, created_at=None):
+    """Insert parameters for one document's risks (as returned by the LLM)"""
+    created_at = created_at or datetime.now(timezone.utc)
+    return [{
+        "document_sha256": document_sha256,
+        "document_name": document_name,
+        "severity": _norm(risk.get("severity")),
+        "regulation": _norm(risk.get("regulation"))[:64],
+        "category": (risk.get("category") or "")[:256],
+        "description": risk.get("description"),
+        "recommendation": risk.get("recommendation"),
+        "citations": json.dumps(risk["citations"]) if risk.get("citations") else None,
+        "created_at": created_at,
+    } for risk in risks]
+
+
+def bulk_insert(session, rows):
+    """Insert many findings in one executemany round trip"""
+    if rows:
+        session.execute(insert(Finding), rows)
+    return len(rows)
+
+
+def replace_document_findings(session, document_sha256, document_name, risks):
+    """Store a document's findings, replacing any from an earlier analysis"""
+    session.execute(delete(Finding).where(Finding.document_sha256 == document_sha256))
+    return bulk_insert(session, finding_rows(document_sha256, document_name, risks))
+
+
+def save_findings(document_sha256, document_name, risks):
+    """Pipeline hook; a no-op when no database is configured"""
+    from app.db import Session, engine
+    if engine is None:
+        return 0
+    with Session() as session, session.begin():
+        return replace_document_findings(session, document_sha256, document_name, risks)
+
+
+# --- keyset pagination ---
+def encode_cursor(created_at, finding_id):
+    raw = f"{created_at.isoformat()}|{finding_id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        created_at, finding_id = raw.rsplit("|", 1)
+        return datetime.fromisoformat(created_at), int(finding_id)
+    except Exception:
+        raise ValueError("invalid cursor")
+
+
+def query_findings(session, severity=None, regulation=None, document=None, since=None, until=None,
+                   limit=100, cursor=None):
+    """One page of findings, newest first; returns ``(rows, next_cursor)``"""
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+    stmt = select(Finding)
+    if severity:
+        stmt = stmt.where(Finding.severity == _norm(severity))
+    if regulation:
+        stmt = stmt.where(Finding.regulation == _norm(regulation))
+    if document:
+        stmt = stmt.where(Finding.document_sha256 == document)
+    if since:
+        stmt = stmt.where(Finding.created_at >= since)
+    if until:
+        stmt = stmt.where(Finding.created_at < until)
+    if cursor:
+        created_at, finding_id = decode_cursor(cursor)
+        stmt = stmt.where(tuple_(Finding.created_at, Finding.id) < tuple_(created_at, finding_id))
+    stmt = stmt.order_by(Finding.created_at.desc(), Finding.id.desc()).limit(limit + 1)
+    rows = session.execute(stmt).scalars().all()
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1].created_at, rows[-1].id)
+    return rows, next_cursor
+
+
+def to_dict(finding):
+    return {
+        "id": finding.id,
+        "document_sha256": finding.document_sha256,
+        "document": finding.document_name,
+        "severity": finding.severity,
+        "regulation": finding.regulation,
+        "category": finding.category,
+        "description": finding.description,
+        "recommendation": finding.recommendation,
+        "citations": json.loads(finding.citations) if finding.citations else [],
+        "created_at": finding.created_at.isoformat(),
+    }
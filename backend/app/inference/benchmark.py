@@ -0,0 +1,93 @@
+"""Throughput and memory benchmark for the inference backends.
+
+Each backend runs in a fresh process so memory numbers are not polluted by
+the others::
+
+    cd backend && python -m app.inference.benchmark --sentences 2000
+    python -m app.inference.benchmark --model ./my_fine_tuned_model --classifier
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import random
+import time
+
+from app.inference.engine import BACKENDS, EMBEDDING_MODEL, PARITY_PROBES, load_runner, parity
+
+
+def rss_mb():
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) / 1024
+    return 0.0
+
+
+def synthetic_sentences(n, seed=0):
+    rng = random.Random(seed)
+    words = " ".join(PARITY_PROBES).split()
+    return [" ".join(rng.choice(words) for _ in range(rng.randint(8, 60))) for _ in range(n)]
+
+
+def _run(backend, model, classifier, sentences, batch_size):
+    # count the model, not the libraries
+    import transformers  # noqa: F401
+    if backend == "onnx":
+        import onnxruntime  # noqa: F401
+    else:
+        import torch  # noqa: F401
+    before = rss_mb()
+    started = time.perf_counter()
+    runner = load_runner(model, backend, classifier)
+    load_s = time.perf_counter() - started
+    loaded = rss_mb()
+    run = runner.predict_proba if classifier else runner.encode
+    run(sentences[:batch_size], batch_size=batch_size)  # warm-up
+    started = time.perf_counter()
+    run(sentences, batch_size=batch_size)
+    elapsed = time.perf_counter() - started
+    report = {
+        "backend": backend,
+        "sentences_per_sec": round(len(sentences) / elapsed, 1),
+        "load_seconds": round(load_s, 2),
+        "model_rss_mb": round(loaded - before, 1),
+        "peak_rss_mb": round(rss_mb(), 1),
+    }
+    if backend != "torch":
+        reference = load_runner(model, "torch", classifier)
+        try:
+            report["parity"] = parity(reference, runner)
+        except Exception as e:
+            report["parity"] = {"ok": False, "error": str(e)}
+    return report
+
+
+def benchmark(model=EMBEDDING_MODEL, backends=BACKENDS, sentences=1000, batch_size=64, classifier=False):
+    texts = synthetic_sentences(sentences)
+    ctx = multiprocessing.get_context("spawn")
+    results = []
+    for backend in backends:
+        with ctx.Pool(1) as pool:
+            results.append(pool.apply(_run, (backend, model, classifier, texts, batch_size)))
+    base = next((r["sentences_per_sec"] for r in results if r["backend"] == "torch"), None)
+    for r in results:
+        if base:
+            r["speedup"] = round(r["sentences_per_sec"] / base, 2)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model", default=EMBEDDING_MODEL)
+    parser.add_argument("--backends", default=",".join(BACKENDS))
+    parser.add_argument("--sentences", type=int, default=1000)
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--classifier", action="store_true", help="benchmark a train_model.py classifier")
+    args = parser.parse_args()
+    for row in benchmark(args.model, args.backends.split(","), args.sentences, args.batch_size, args.classifier):
+        print(json.dumps(row))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,414 @@
+"""CPU inference backends for the embedding and clause-classification models.
+
+``INFERENCE_BACKEND`` selects how transformer encoders run:
+
+- ``torch``: FP32 PyTorch (reference)
+- ``int8``:  PyTorch with dynamic int8 quantization of every ``nn.Linear``
+- ``onnx``:  ONNX Runtime on an exported graph; with ``ONNX_QUANTIZE=1``
+  the graph is also dynamically quantized to int8
+
+Every backend exposes the same ``encode(texts, batch_size=...)`` as
+``SentenceTransformer`` (mean pooling + L2 normalisation, as used by
+all-MiniLM-L6-v2), so callers can switch without code changes. Inputs are
+sorted by length before batching so each batch pads only to its own longest
+text. Non-reference backends are checked against FP32 on a small probe set
+when first loaded and fall back to ``torch`` if they drift past
+``INFERENCE_PARITY_TOLERANCE``.
+
+ONNX exports are keyed by a fingerprint of the checkpoint, so a retrained
+model is exported again, and the parity result is saved next to each
+exported graph, so later startups skip loading the FP32 reference.
+"""
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import threading
+from contextlib import contextmanager
+
+import numpy as np
+
+from app.observability.stages import stage
+
+INFERENCE_BACKEND = os.environ.get("INFERENCE_BACKEND", "torch")
+EMBEDDING_MODEL = os.environ.get("EMBEDDING_MODEL", "sentence-transformers/all-MiniLM-L6-v2")
+ONNX_EXPORT_DIR = os.environ.get("ONNX_EXPORT_DIR", "models/onnx")
+ONNX_QUANTIZE = os.environ.get("ONNX_QUANTIZE", "1") == "1"
+# Checkpoint exports kept per model: the current one plus the newest others,
+# so replicas still on the previous checkpoint do not have theirs removed
+ONNX_EXPORT_KEEP = int(os.environ.get("ONNX_EXPORT_KEEP", 2))
+INFERENCE_THREADS = int(os.environ.get("INFERENCE_THREADS", os.cpu_count() or 1))
+INFERENCE_PARITY_TOLERANCE = float(os.environ.get("INFERENCE_PARITY_TOLERANCE", 0.98))
+INFERENCE_MAX_LENGTH = int(os.environ.get("INFERENCE_MAX_LENGTH", 256))
+
+BACKENDS = ("torch", "int8", "onnx")
+
+PARITY_PROBES = [
+    "The processor shall notify the controller of a personal data breach without undue delay.",
+    "Customer due diligence must be refreshed for high-risk accounts every year.",
+    "Either party may terminate this agreement with thirty days written notice.",
+    "Card data is stored unencrypted on the merchant's application servers.",
+    "Interest rates on microfinance loans are capped as per the latest circular.",
+    "All cross-border remittances above the threshold are reported to the regulator.",
+]
+
+
+class ParityError(Exception):
+    """A quantized/exported model drifted too far from the FP32 reference"""
+
+    def __init__(self, message, report=None):
+        super().__init__(message)
+        self.report = report
+
+
+def _batches(texts, batch_size):
+    """Index batches of similar length, longest first"""
+    order = sorted(range(len(texts)), key=lambda i: -len(texts[i]))
+    for i in range(0, len(order), batch_size):
+        yield order[i:i + batch_size]
+
+
+def _mean_pool(hidden, mask):
+    mask = mask[..., None].astype(hidden.dtype)
+    return (hidden * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+
+
+def _normalize(x):
+    return x / np.clip(np.linalg.norm(x, axis=1, keepdims=True), 1e-12, None)
+
+
+class _Runner:
+    """Shared batching/pooling; subclasses implement ``_forward``"""
+
+    backend = None
+
+    def __init__(self, model_name, max_length=INFERENCE_MAX_LENGTH):
+        from transformers import AutoTokenizer
+        self.model_name = model_name
+        self.max_length = max_length
+        self.tokenizer = AutoTokenizer.from_pretrained(model_name)
+
+    def _tokenize(self, texts):
+        return self.tokenizer(texts, padding=True, truncation=True,
+                              max_length=self.max_length, return_tensors="np")
+
+    def _forward(self, enc):
+        """``(last_hidden_state, logits_or_None)`` as numpy arrays"""
+        raise NotImplementedError
+
+    def encode(self, texts, batch_size=64, normalize_embeddings=True,
+               convert_to_numpy=True, show_progress_bar=False):
+        if isinstance(texts, str):
+            texts = [texts]
+        out = None
+        with stage("encode", items=len(texts)) as s:
+            for idx in _batches(texts, batch_size):
+                enc = self._tokenize([texts[i] for i in idx])
+                hidden, _ = self._forward(enc)
+                emb = _mean_pool(hidden, enc["attention_mask"])
+                if out is None:
+                    out = np.empty((len(texts), emb.shape[1]), dtype="float32")
+                out[idx] = emb
+                s.add(tokens=int(enc["attention_mask"].sum()))
+        if out is None:
+            return np.empty((0, 0), dtype="float32")
+        return _normalize(out) if normalize_embeddings else out
+
+    def predict_proba(self, texts, batch_size=64):
+        """Class probabilities for a model saved by ``train_model.py``"""
+        out = None
+        for idx in _batches(texts, batch_size):
+            _, logits = self._forward(self._tokenize([texts[i] for i in idx]))
+            logits = logits - logits.max(axis=1, keepdims=True)
+            proba = np.exp(logits)
+            proba /= proba.sum(axis=1, keepdims=True)
+            if out is None:
+                out = np.empty((len(texts), proba.shape[1]), dtype="float32")
+            out[idx] = proba
+        return out
+
+
+class TorchRunner(_Runner):
+    backend = "torch"
+
+    def __init__(self, model_name, classifier=False, quantize=False, **kwargs):
+        super().__init__(model_name, **kwargs)
+        import torch
+        from transformers import AutoModel, AutoModelForSequenceClassification
+        torch.set_num_threads(INFERENCE_THREADS)
+        cls = AutoModelForSequenceClassification if classifier else AutoModel
+        model = cls.from_pretrained(model_name).eval()
+        if quantize:
+            model = torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+            self.backend = "int8"
+        self.model = model
+        self.classifier = classifier
+
+    def _forward(self, enc):
+        import torch
+        inputs = {k: torch.from_numpy(v) for k, v in enc.items()}
+        with torch.inference_mode():
+            out = self.model(**inputs, output_hidden_states=self.classifier)
+        if self.classifier:
+            return out.hidden_states[-1].numpy(), out.logits.numpy()
+        return out.last_hidden_state.numpy(), None
+
+
+def checkpoint_fingerprint(model_name):
+    """
+    Short digest identifying a checkpoint: the name, size and mtime of the
+    files of a local model directory, or the commit of a cached hub snapshot
+    """
+    if not os.path.isdir(model_name):
+        from transformers.utils import cached_file
+        return os.path.basename(os.path.dirname(cached_file(model_name, "config.json")))[:16]
+    h = hashlib.sha256()
+    for name in sorted(os.listdir(model_name)):
+        path = os.path.join(model_name, name)
+        if os.path.isfile(path):
+            st = os.stat(path)
+            h.update(f"{name}\0{st.st_size}\0{st.st_mtime_ns}\n".encode())
+    return h.hexdigest()[:16]
+
+
+@contextmanager
+def export_lock(out_dir, exclusive=True):
+    """
+    File lock over an export directory, shared by processes: exporting and
+    cleanup hold it exclusively, loading a graph holds it shared
+    """
+    import fcntl
+    os.makedirs(out_dir, exist_ok=True)
+    with open(os.path.join(out_dir, ".lock"), "a") as f:
+        fcntl.flock(f, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def _remove_old_exports(out_dir, current, keep=ONNX_EXPORT_KEEP):
+    """Drop leftovers of interrupted exports and all but the newest ``keep`` checkpoints; hold the lock"""
+    exports = []
+    for name in os.listdir(out_dir):
+        path = os.path.join(out_dir, name)
+        if name == ".lock" or name == current:
+            continue
+        if not os.path.isdir(path):
+            os.remove(path)
+        elif name.startswith("."):
+            shutil.rmtree(path, ignore_errors=True)
+        else:
+            exports.append((os.path.getmtime(path), path))
+    for _, path in sorted(exports, reverse=True)[max(0, keep - 1):]:
+        shutil.rmtree(path, ignore_errors=True)
+
+
+def export_onnx(model_name, out_dir, classifier=False, quantize=ONNX_QUANTIZE):
+    """
+    Export a HuggingFace model to ONNX (once per checkpoint) and return the
+    graph path, ``<out_dir>/<checkpoint fingerprint>/model[.int8].onnx``.
+
+    Several processes may share ``out_dir``: the export is written to a
+    private temporary directory and renamed into place, and exporting and
+    removing old checkpoints happen under ``export_lock``.
+    """
+    import torch
+    from transformers import AutoModel, AutoModelForSequenceClassification, AutoTokenizer
+
+    class ExportWrapper(torch.nn.Module):
+        """Positional inputs in, first output tensor out, for the ONNX tracer"""
+
+        def __init__(self, model, names):
+            super().__init__()
+            self.model = model
+            self.names = names
+
+        def forward(self, *inputs):
+            return self.model(**dict(zip(self.names, inputs)))[0]
+
+    fingerprint = checkpoint_fingerprint(model_name)
+    final = os.path.join(out_dir, fingerprint)
+    fp32_path = os.path.join(final, "model.onnx")
+    int8_path = os.path.join(final, "model.int8.onnx")
+    with export_lock(out_dir):
+        _remove_old_exports(out_dir, fingerprint)
+        if not os.path.exists(fp32_path):
+            shutil.rmtree(final, ignore_errors=True)
+            staging = tempfile.mkdtemp(dir=out_dir, prefix=f".{fingerprint}-")
+            try:
+                cls = AutoModelForSequenceClassification if classifier else AutoModel
+                enc = AutoTokenizer.from_pretrained(model_name)(["export probe"], return_tensors="pt")
+                names = [n for n in ("input_ids", "attention_mask", "token_type_ids") if n in enc]
+                model = ExportWrapper(cls.from_pretrained(model_name).eval(), names)
+                dynamic = {n: {0: "batch", 1: "sequence"} for n in names}
+                output = "logits" if classifier else "last_hidden_state"
+                torch.onnx.export(
+                    model, tuple(enc[n] for n in names), os.path.join(staging, "model.onnx"),
+                    input_names=names, output_names=[output],
+                    dynamic_axes={**dynamic, output: {0: "batch"} if classifier else {0: "batch", 1: "sequence"}},
+                    opset_version=17, dynamo=False,
+                )
+                os.rename(staging, final)
+            finally:
+                shutil.rmtree(staging, ignore_errors=True)
+        if not quantize:
+            return fp32_path
+        if not os.path.exists(int8_path):
+            from onnxruntime.quantization import QuantType, quantize_dynamic
+            fd, tmp = tempfile.mkstemp(dir=final, prefix=".model.int8-", suffix=".onnx")
+            os.close(fd)
+            try:
+                quantize_dynamic(fp32_path, tmp, weight_type=QuantType.QInt8)
+                os.replace(tmp, int8_path)
+            finally:
+                if os.path.exists(tmp):
+                    os.remove(tmp)
+    return int8_path
+
+
+class OnnxRunner(_Runner):
+    backend = "onnx"
+
+    def __init__(self, model_name, classifier=False, export_dir=None, quantize=ONNX_QUANTIZE, **kwargs):
+        super().__init__(model_name, **kwargs)
+        import onnxruntime as ort
+        export_dir = export_dir or os.path.join(
+            ONNX_EXPORT_DIR, model_name.strip("/").replace("/", "--") + ("-cls" if classifier else ""))
+        options = ort.SessionOptions()
+        options.intra_op_num_threads = INFERENCE_THREADS
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        for _ in range(3):  # another process may remove the export between the two locks
+            path = export_onnx(model_name, export_dir, classifier, quantize)
+            with export_lock(export_dir, exclusive=False):
+                if os.path.exists(path):
+                    self.session = ort.InferenceSession(path, options, providers=["CPUExecutionProvider"])
+                    break
+        else:
+            raise RuntimeError(f"ONNX export {path} kept disappearing")
+        self.input_names = [i.name for i in self.session.get_inputs()]
+        self.classifier = classifier
+        self.path = path
+
+    def _forward(self, enc):
+        feeds = {n: enc[n].astype("int64") for n in self.input_names}
+        (out,) = self.session.run(None, feeds)
+        if self.classifier:
+            return None, out
+        return out, None
+
+
+def resolve_model(model_name):
+    """Accept SentenceTransformer short names such as ``all-MiniLM-L6-v2``"""
+    if "/" not in model_name and not os.path.isdir(model_name):
+        return "sentence-transformers/" + model_name
+    return model_name
+
+
+def load_runner(model_name, backend=INFERENCE_BACKEND, classifier=False, **kwargs):
+    model_name = resolve_model(model_name)
+    if backend not in BACKENDS:
+        raise ValueError(f"INFERENCE_BACKEND must be one of {BACKENDS}, got {backend!r}")
+    if backend == "onnx":
+        return OnnxRunner(model_name, classifier=classifier, **kwargs)
+    return TorchRunner(model_name, classifier=classifier, quantize=backend == "int8", **kwargs)
+
+
+def parity(reference, candidate, texts=PARITY_PROBES, tolerance=INFERENCE_PARITY_TOLERANCE):
+    """Compare a candidate backend with the FP32 reference.
+
+    Embeddings are compared by cosine similarity, classifiers by their
+    probabilities and argmax agreement. Raises ``ParityError`` when the
+    minimum cosine (or ``1 - max |Δp|``) is below ``tolerance``.
+    """
+    if getattr(reference, "classifier", False):
+        ref, cand = reference.predict_proba(texts), candidate.predict_proba(texts)
+        report = {
+            "max_abs_diff": float(np.abs(ref - cand).max()),
+            "argmax_agreement": float((ref.argmax(1) == cand.argmax(1)).mean()),
+        }
+        score = 1 - report["max_abs_diff"]
+    else:
+        cos = (reference.encode(texts) * candidate.encode(texts)).sum(axis=1)
+        report = {"min_cosine": float(cos.min()), "mean_cosine": float(cos.mean())}
+        score = report["min_cosine"]
+    report["ok"] = score >= tolerance
+    if not report["ok"]:
+        raise ParityError(f"{candidate.backend} backend below tolerance {tolerance}: {report}", report)
+    return report
+
+
+def _parity_key(tolerance=INFERENCE_PARITY_TOLERANCE, texts=PARITY_PROBES):
+    return hashlib.sha256(json.dumps([tolerance, texts]).encode()).hexdigest()[:16]
+
+
+def cached_parity(candidate):
+    """
+    ``parity`` against the FP32 reference, computed once per exported graph
+    and saved beside it as ``<graph>.parity.json``. Backends without an
+    artifact on disk (``int8``) are checked on every load.
+    """
+    path = getattr(candidate, "path", None)
+    cache = path + ".parity.json" if path else None
+    key = _parity_key()
+    if cache and os.path.exists(cache):
+        with open(cache) as f:
+            saved = json.load(f)
+        if saved.get("key") == key:
+            report = saved["report"]
+            if not report["ok"]:
+                raise ParityError(f"{candidate.backend} backend failed parity when exported: {report}", report)
+            return {**report, "cached": True}
+    reference = load_runner(candidate.model_name, "torch", getattr(candidate, "classifier", False))
+    try:
+        report = parity(reference, candidate)
+    except ParityError as e:
+        _save_parity(cache, key, e.report)
+        raise
+    _save_parity(cache, key, report)
+    return report
+
+
+def _save_parity(cache, key, report):
+    if cache:
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(cache), suffix=".parity.tmp")
+        with os.fdopen(fd, "w") as f:
+            json.dump({"key": key, "report": report}, f)
+        os.replace(tmp, cache)
+
+
+_encoder = None
+_lock = threading.Lock()
+
+
+def get_encoder():
+    """Process-wide sentence encoder for the configured backend.
+
+    A backend that fails to load or fails the parity check falls back to
+    FP32 PyTorch with a warning, so a bad export never degrades retrieval.
+    """
+    global _encoder
+    if _encoder is None:
+        with _lock:
+            if _encoder is None:
+                _encoder = _load_checked(EMBEDDING_MODEL, INFERENCE_BACKEND)
+    return _encoder
+
+
+def _load_checked(model_name, backend, classifier=False):
+    if backend == "torch":
+        return load_runner(model_name, "torch", classifier)
+    try:
+        candidate = load_runner(model_name, backend, classifier)
+        report = cached_parity(candidate)
+        print(f"✅ {backend} inference backend for {model_name}: {report}")
+        return candidate
+    except Exception as e:
+        print(f"⚠️ {backend} inference backend unavailable for {model_name}, using torch: {e}")
+        return load_runner(model_name, "torch", classifier)
+
+
+def load_classifier(model_dir, backend=INFERENCE_BACKEND):
+    """Clause classifier saved by ``train_model.py`` (packed or not), parity-checked like the encoder"""
+    return _load_checked(model_dir, backend, classifier=True)
@@ -0,0 +1,187 @@
+import json
+import os
+import time
+import uuid
+from dataclasses import dataclass
+
+REDIS_URL = os.environ.get("REDIS_URL", "redis://redis:6379/0")
+JOB_STREAM = os.environ.get("JOB_STREAM", "ingest:jobs")
+JOB_GROUP = os.environ.get("JOB_GROUP", "ingest-workers")
+JOB_STREAM_MAXLEN = int(os.environ.get("JOB_STREAM_MAXLEN", 100000))
+JOB_TTL = int(os.environ.get("JOB_TTL_SECONDS", 60 * 60 * 24 * 7))
+MAX_DELIVERIES = int(os.environ.get("JOB_MAX_DELIVERIES", 5))
+
+# Pipeline stages in order; a worker acks a stage only after queueing the next
+STAGES = ("extract", "analyze", "render")
+
+
+@dataclass
+class Task:
+    message_id: str
+    job_id: str
+    stage: str
+    deliveries: int = 1
+
+
+class JobQueue:
+    """Ingestion job queue on a Redis Stream with one consumer group.
+
+    Every stage of a job is one stream entry. Workers claim entries with
+    XREADGROUP, acknowledge them once the next stage is queued, and reclaim
+    entries from crashed workers with XAUTOCLAIM, one at a time so that every
+    held entry is the running one; a worker still busy with an entry
+    refreshes its claim with ``touch``. Job state lives in a
+    ``job:<id>`` hash so the API can report status without touching the
+    stream.
+    """
+
+    def __init__(self, client, stream=JOB_STREAM, group=JOB_GROUP):
+        self.r = client
+        self.stream = stream
+        self.group = group
+        self.dead_stream = stream + ":dead"
+        self._group_ready = False
+
+    @classmethod
+    def from_url(cls, url=REDIS_URL, **kwargs):
+        import redis  # deferred: only the job endpoints and the worker need it
+        return cls(redis.from_url(url, decode_responses=True), **kwargs)
+
+    def ensure_group(self):
+        if self._group_ready:
+            return
+        import redis
+        try:
+            self.r.xgroup_create(self.stream, self.group, id="0", mkstream=True)
+        except redis.ResponseError as e:
+            if "BUSYGROUP" not in str(e):
+                raise
+        self._group_ready = True
+
+    # --- Producer side ---
+    def _key(self, job_id):
+        return f"job:{job_id}"
+
+    def submit(self, payload, stage=STAGES[0]):
+        """Create a job and queue its first stage; returns the job id"""
+        self.ensure_group()
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        pipe = self.r.pipeline()
+        pipe.hset(self._key(job_id), mapping={
+            "status": "queued",
+            "stage": stage,
+            "payload": json.dumps(payload),
+            "created_at": now,
+            "updated_at": now,
+        })
+        pipe.expire(self._key(job_id), JOB_TTL)
+        pipe.xadd(self.stream, {"job_id": job_id, "stage": stage}, maxlen=JOB_STREAM_MAXLEN, approximate=True)
+        pipe.execute()
+        return job_id
+
+    def status(self, job_id):
+        data = self.r.hgetall(self._key(job_id))
+        if not data:
+            return None
+        for field in ("payload", "result"):
+            if field in data:
+                data[field] = json.loads(data[field])
+        return data
+
+    # --- Consumer side ---
+    def claim(self, consumer, count=1, block_ms=5000):
+        self.ensure_group()
+        resp = self.r.xreadgroup(self.group, consumer, {self.stream: ">"}, count=count, block=block_ms)
+        return [
+            Task(msg_id, fields["job_id"], fields["stage"])
+            for _, messages in resp or []
+            for msg_id, fields in messages
+        ]
+
+    def reclaim_stalled(self, consumer, min_idle_ms, count=1):
+        """Take over entries a dead worker claimed but never acknowledged"""
+        self.ensure_group()
+        _, messages, _ = self.r.xautoclaim(self.stream, self.group, consumer, min_idle_ms, "0-0", count=count)
+        tasks = [Task(msg_id, fields["job_id"], fields["stage"]) for msg_id, fields in messages if fields]
+        pipe = self.r.pipeline()
+        for task in tasks:
+            pipe.xpending_range(self.stream, self.group, min=task.message_id, max=task.message_id, count=1)
+        for task, pending in zip(tasks, pipe.execute() if tasks else []):
+            task.deliveries = pending[0]["times_delivered"] if pending else 1
+        return tasks
+
+    def _pending(self, task):
+        found = self.r.xpending_range(self.stream, self.group, min=task.message_id, max=task.message_id, count=1)
+        return found[0] if found else None
+
+    def touch(self, task, consumer, min_idle_ms=0):
+        """
+        Reset the entry's idle time if ``consumer`` still holds it (XCLAIM
+        JUSTID does not count a delivery). ``min_idle_ms`` keeps it from
+        taking back an entry another worker has just reclaimed and refreshed.
+        Returns False once the entry belongs to someone else.
+        """
+        pending = self._pending(task)
+        if pending is None or pending["consumer"] != consumer:
+            return False
+        return bool(self.r.xclaim(self.stream, self.group, consumer, min_idle_ms, [task.message_id], justid=True))
+
+    def start(self, task, consumer):
+        self.r.hset(self._key(task.job_id), mapping={
+            "status": "running", "stage": task.stage, "worker": consumer, "updated_at": time.time(),
+        })
+
+    def advance(self, task, next_stage, **fields):
+        """Queue the next stage, then acknowledge the current one"""
+        pipe = self.r.pipeline()
+        pipe.hset(self._key(task.job_id), mapping={
+            "status": "queued", "stage": next_stage, "updated_at": time.time(), **fields,
+        })
+        pipe.xadd(self.stream, {"job_id": task.job_id, "stage": next_stage}, maxlen=JOB_STREAM_MAXLEN, approximate=True)
+        pipe.xack(self.stream, self.group, task.message_id)
+        pipe.execute()
+
+    def complete(self, task, result):
+        pipe = self.r.pipeline()
+        pipe.hset(self._key(task.job_id), mapping={
+            "status": "done", "result": json.dumps(result), "updated_at": time.time(),
+        })
+        pipe.xack(self.stream, self.group, task.message_id)
+        pipe.execute()
+
+    def fail(self, task, error):
+        """Give up on a job: record the error and move the entry to the dead stream"""
+        pipe = self.r.pipeline()
+        pipe.hset(self._key(task.job_id), mapping={
+            "status": "failed", "error": str(error)[:2000], "updated_at": time.time(),
+        })
+        pipe.xadd(self.dead_stream, {"job_id": task.job_id, "stage": task.stage, "error": str(error)[:2000]})
+        pipe.xack(self.stream, self.group, task.message_id)
+        pipe.execute()
+
+    def update(self, job_id, **fields):
+        self.r.hset(self._key(job_id), mapping=fields)
+
+    # --- Metrics ---
+    def stats(self):
+        """Queue depth, pending (claimed, unacked) entries and consumer lag"""
+        self.ensure_group()
+        group = next(g for g in self.r.xinfo_groups(self.stream) if g["name"] == self.group)
+        return {
+            "length": self.r.xlen(self.stream),
+            "pending": group["pending"],
+            "lag": group.get("lag") or 0,
+            "consumers": group["consumers"],
+            "dead": self.r.xlen(self.dead_stream),
+        }
+
+
+_queue = None
+
+
+def get_job_queue():
+    global _queue
+    if _queue is None:
+        _queue = JobQueue.from_url()
+    return _queue
@@ -0,0 +1,105 @@
+"""Minimal OpenAI-compatible /chat/completions server for tests and benchmarks.
+
+    python -m app.llm.fake_openai --port 8089 --latency 0.5
+    OPENAI_BASE_URL=http://127.0.0.1:8089/v1 OPENAI_API_KEY=fake uvicorn main:app
+"""
+import argparse
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+DEFAULT_RISKS = {
+    "risks": [{
+        "category": "Data Retention",
+        "severity": "HIGH",
+        "description": "Retention period for personal data is not defined.",
+        "recommendation": "Define a retention schedule\nDocument deletion procedures",
+        "regulation": "GDPR",
+    }]
+}
+
+
+class FakeOpenAI:
+    """Threaded fake server; ``failures`` is a list of status codes to return first"""
+
+    def __init__(self, host="127.0.0.1", port=0, latency=0.0, failures=None, content=None):
+        self.latency = latency
+        self.failures = list(failures or [])
+        self.content = content or (lambda messages: json.dumps(DEFAULT_RISKS))
+        self.requests = []
+        self._lock = threading.Lock()
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+                with fake._lock:
+                    fake.requests.append(body)
+                    status = fake.failures.pop(0) if fake.failures else 200
+                time.sleep(fake.latency)
+                if status != 200:
+                    self._send(status, {"error": {"message": "fake failure"}}, {"Retry-After": "0"})
+                    return
+                content = fake.content(body["messages"])
+                prompt_tokens = len(json.dumps(body["messages"])) // 4
+                completion_tokens = len(content) // 4
+                self._send(200, {
+                    "id": f"chatcmpl-{len(fake.requests)}",
+                    "object": "chat.completion",
+                    "model": body.get("model"),
+                    "choices": [{
+                        "index": 0,
+                        "message": {"role": "assistant", "content": content},
+                        "finish_reason": "stop",
+                    }],
+                    "usage": {
+                        "prompt_tokens": prompt_tokens,
+                        "completion_tokens": completion_tokens,
+                        "total_tokens": prompt_tokens + completion_tokens,
+                    },
+                })
+
+            def _send(self, status, payload, headers=None):
+                data = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                for k, v in (headers or {}).items():
+                    self.send_header(k, v)
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer((host, port), Handler)
+        self.httpd.daemon_threads = True
+        self.base_url = f"http://{host}:{self.httpd.server_port}/v1"
+
+    def start(self):
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8089)
+    parser.add_argument("--latency", type=float, default=0.0)
+    args = parser.parse_args()
+    server = FakeOpenAI(args.host, args.port, args.latency)
+    print(f"Fake OpenAI listening on {server.base_url}")
+    server.httpd.serve_forever()
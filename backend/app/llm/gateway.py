@@ -0,0 +1,226 @@
+import asyncio
+import hashlib
+import json
+import os
+import random
+import time
+import weakref
+from collections import deque
+from dataclasses import asdict, dataclass
+
+OPENAI_BASE_URL = os.environ.get("OPENAI_BASE_URL", "https://api.openai.com/v1")
+OPENAI_API_KEY = os.environ.get("OPENAI_API_KEY")
+LLM_MODEL = os.environ.get("LLM_MODEL", "gpt-4-turbo")
+LLM_REQUESTS_PER_MINUTE = int(os.environ.get("LLM_REQUESTS_PER_MINUTE", 500))
+LLM_TOKENS_PER_MINUTE = int(os.environ.get("LLM_TOKENS_PER_MINUTE", 300000))
+LLM_MAX_CONCURRENCY = int(os.environ.get("LLM_MAX_CONCURRENCY", 8))
+LLM_TIMEOUT = float(os.environ.get("LLM_TIMEOUT", 120))
+LLM_MAX_RETRIES = int(os.environ.get("LLM_MAX_RETRIES", 4))
+LLM_DEFAULT_MAX_TOKENS = 1024
+
+RETRYABLE_STATUS = {408, 409, 429, 500, 502, 503, 504}
+
+
+class LLMError(Exception):
+    """The provider rejected the request or retries were exhausted"""
+
+
+def estimate_tokens(text):
+    """Cheap token estimate (~4 characters per token) used for rate limiting"""
+    return max(1, len(text) // 4)
+
+
+class TokenBucket:
+    """Async token bucket; the balance may go negative to repay underestimates"""
+
+    def __init__(self, capacity, refill_per_second):
+        self.capacity = capacity
+        self.rate = refill_per_second
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self, amount=1):
+        amount = min(amount, self.capacity)
+        async with self._lock:  # FIFO: later callers queue behind the waiter
+            while True:
+                self._refill()
+                if self.tokens >= amount:
+                    self.tokens -= amount
+                    return
+                await asyncio.sleep((amount - self.tokens) / self.rate)
+
+    def consume(self, amount):
+        self._refill()
+        self.tokens -= amount
+
+
+@dataclass
+class CallMetrics:
+    model: str
+    latency_s: float
+    prompt_tokens: int
+    completion_tokens: int
+    attempts: int
+    status: str
+
+
+class LLMGateway:
+    """OpenAI-compatible chat client shared by everything on one event loop.
+
+    - one pooled ``httpx.AsyncClient``
+    - request and token buckets sized from the provider's per-minute limits
+    - a concurrency cap on in-flight calls
+    - identical in-flight requests are coalesced into a single call
+    - timeouts and retries with backoff (honouring ``Retry-After``)
+    - per-call latency / token metrics
+    """
+
+    def __init__(self, base_url=OPENAI_BASE_URL, api_key=None, model=LLM_MODEL,
+                 requests_per_minute=LLM_REQUESTS_PER_MINUTE,
+                 tokens_per_minute=LLM_TOKENS_PER_MINUTE,
+                 max_concurrency=LLM_MAX_CONCURRENCY, timeout=LLM_TIMEOUT,
+                 max_retries=LLM_MAX_RETRIES, client=None):
+        self.base_url = base_url.rstrip("/")
+        self.api_key = api_key if api_key is not None else os.environ.get("OPENAI_API_KEY")
+        self.model = model
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.request_bucket = TokenBucket(requests_per_minute, requests_per_minute / 60)
+        self.token_bucket = TokenBucket(tokens_per_minute, tokens_per_minute / 60)
+        self.max_concurrency = max_concurrency
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._client = client
+        self._inflight = {}
+        self.metrics = deque(maxlen=1000)
+        self.coalesced = 0
+
+    @property
+    def client(self):
+        if self._client is None:
+            import httpx  # deferred to keep API cold start fast
+            self._client = httpx.AsyncClient(
+                base_url=self.base_url,
+                timeout=self.timeout,
+                limits=httpx.Limits(max_connections=self.max_concurrency * 2),
+            )
+        return self._client
+
+    async def aclose(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def chat(self, messages, model=None, **params):
+        """POST /chat/completions and return the decoded response body"""
+        payload = {"model": model or self.model, "messages": messages, **params}
+        key = hashlib.sha256(json.dumps(payload, sort_keys=True).encode()).hexdigest()
+        task = self._inflight.get(key)
+        if task is not None:
+            self.coalesced += 1
+        else:
+            task = asyncio.ensure_future(self._call(payload))
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        # shield: one caller giving up must not cancel the call for the others
+        return await asyncio.shield(task)
+
+    async def _call(self, payload):
+        import httpx
+        estimate = estimate_tokens(json.dumps(payload["messages"])) + payload.get(
+            "max_tokens", LLM_DEFAULT_MAX_TOKENS
+        )
+        headers = {"Authorization": f"Bearer {self.api_key}"}
+        started = time.perf_counter()
+        attempt = 0
+        while True:
+            attempt += 1
+            await self.request_bucket.acquire(1)
+            await self.token_bucket.acquire(estimate)
+            delay = None
+            try:
+                async with self._semaphore:
+                    resp = await self.client.post("/chat/completions", json=payload, headers=headers)
+            except (httpx.TimeoutException, httpx.TransportError) as e:
+                error = f"{type(e).__name__}: {e}"
+            else:
+                if resp.status_code < 400:
+                    data = resp.json()
+                    usage = data.get("usage") or {}
+                    used = usage.get("total_tokens", estimate)
+                    if used > estimate:
+                        self.token_bucket.consume(used - estimate)
+                    self._record(payload, started, usage, attempt, "ok")
+                    return data
+                error = f"HTTP {resp.status_code}: {resp.text[:200]}"
+                if resp.status_code not in RETRYABLE_STATUS:
+                    self._record(payload, started, {}, attempt, "error")
+                    raise LLMError(error)
+                retry_after = resp.headers.get("retry-after")
+                if retry_after:
+                    try:
+                        delay = float(retry_after)
+                    except ValueError:
+                        pass
+            if attempt > self.max_retries:
+                self._record(payload, started, {}, attempt, "error")
+                raise LLMError(f"LLM call failed after {attempt} attempts: {error}")
+            if delay is None:
+                delay = min(30.0, 0.5 * 2 ** (attempt - 1)) * random.uniform(0.5, 1.0)
+            await asyncio.sleep(delay)
+
+    def _record(self, payload, started, usage, attempts, status):
+        self.metrics.append(CallMetrics(
+            model=payload["model"],
+            latency_s=time.perf_counter() - started,
+            prompt_tokens=usage.get("prompt_tokens", 0),
+            completion_tokens=usage.get("completion_tokens", 0),
+            attempts=attempts,
+            status=status,
+        ))
+
+    def summary(self):
+        calls = list(self.metrics)
+        latencies = sorted(c.latency_s for c in calls)
+
+        def pct(p):
+            return latencies[min(len(latencies) - 1, int(p * len(latencies)))] if latencies else None
+
+        return {
+            "calls": len(calls),
+            "errors": sum(c.status != "ok" for c in calls),
+            "retries": sum(c.attempts - 1 for c in calls),
+            "coalesced": self.coalesced,
+            "prompt_tokens": sum(c.prompt_tokens for c in calls),
+            "completion_tokens": sum(c.completion_tokens for c in calls),
+            "latency_p50_s": pct(0.5),
+            "latency_p95_s": pct(0.95),
+            "recent": [asdict(c) for c in calls[-10:]],
+        }
+
+
+# One gateway per event loop: its lock, semaphore and pooled connections
+# belong to the loop they were first used on, so a gateway is never shared
+# between the server's loop and, say, a test's or a script's asyncio.run()
+_gateways = weakref.WeakKeyDictionary()
+
+
+def get_gateway():
+    """The running loop's gateway, created on first use from the module settings"""
+    loop = asyncio.get_running_loop()
+    gateway = _gateways.get(loop)
+    if gateway is None:
+        gateway = _gateways[loop] = LLMGateway(base_url=OPENAI_BASE_URL, api_key=OPENAI_API_KEY, model=LLM_MODEL)
+    return gateway
+
+
+async def close_gateway():
+    """Close the running loop's gateway, if it has one"""
+    gateway = _gateways.pop(asyncio.get_running_loop(), None)
+    if gateway is not None:
+        await gateway.aclose()
@@ -1,5 +1,5 @@
 # backend/app/models.py
-from sqlalchemy import Column, Integer, String, Text, DateTime, func
+from sqlalchemy import BigInteger, Column, DateTime, Float, ForeignKey, Index, Integer, String, Text, func
 from sqlalchemy.orm import declarative_base
 
 Base = declarative_base()
@@ -19,14 +19,56 @@ class Document(Base):
     hash = Column(String, nullable=True)
 
 # 🔐 Immutable audit trail
+# On PostgreSQL this and session_logs are range-partitioned by month on
+# created_at (primary key (id, created_at)); see app/retention/partitions.py
 class AuditEntry(Base):
     __tablename__ = "audit_entries"
+    __table_args__ = (Index("ix_audit_entries_created_brin", "created_at", postgresql_using="brin"),)
 
     id = Column(Integer, primary_key=True, index=True)
-    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    created_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
     actor = Column(String(128))
     action = Column(String(256))
     payload = Column(Text)
     sha256 = Column(String(128))
     previous_hash = Column(String(128), nullable=True)
     hmac_signature = Column(String(256), nullable=True)
+
+# 💬 Chat turns persisted for audit (session_store.persist_audit)
+class SessionLog(Base):
+    __tablename__ = "session_logs"
+    __table_args__ = (Index("ix_session_logs_created_brin", "created_at", postgresql_using="brin"),)
+
+    id = Column(BigInteger().with_variant(Integer, "sqlite"), primary_key=True)
+    created_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
+    user_id = Column(String(128))
+    session_id = Column(String(128))
+    query = Column(Text)
+    response = Column(Text)
+    risk_score = Column(Float)
+
+# 🚩 Risks found by document analysis, one row per risk
+class Finding(Base):
+    __tablename__ = "findings"
+    # Listing queries filter by some of severity / regulation / document and
+    # page newest first on (created_at, id); each index serves one filter
+    # shape and ends with the keyset columns, so no sort step is needed
+    __table_args__ = (
+        Index("ix_findings_severity_regulation_created", "severity", "regulation", "created_at", "id"),
+        Index("ix_findings_severity_created", "severity", "created_at", "id"),
+        Index("ix_findings_regulation_created", "regulation", "created_at", "id"),
+        Index("ix_findings_document_created", "document_sha256", "created_at", "id"),
+        Index("ix_findings_created", "created_at", "id"),
+    )
+
+    id = Column(BigInteger().with_variant(Integer, "sqlite"), primary_key=True)
+    document_id = Column(Integer, ForeignKey("documents.id", ondelete="CASCADE"), nullable=True)
+    document_sha256 = Column(String(64), nullable=False)
+    document_name = Column(String(512), nullable=False)
+    severity = Column(String(16), nullable=False)
+    regulation = Column(String(64), nullable=False)
+    category = Column(String(256), nullable=True)
+    description = Column(Text, nullable=True)
+    recommendation = Column(Text, nullable=True)
+    citations = Column(Text, nullable=True)  # JSON list of excerpt spans, when available
+    created_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
@@ -0,0 +1,93 @@
+"""Opt-in sampling profiler for a single request.
+
+A background thread samples the stacks of every other thread at a fixed
+interval while the request runs, and the result is kept in collapsed-stack
+format (``frame;frame;frame count`` per line), which flamegraph.pl,
+speedscope and py-spy's viewers read directly. Nothing runs unless a request
+asks for it and ``PROFILING_ENABLED=1``.
+"""
+import os
+import sys
+import threading
+import time
+import uuid
+from collections import Counter, OrderedDict
+
+PROFILING_ENABLED = os.environ.get("PROFILING_ENABLED", "0") == "1"
+PROFILE_INTERVAL = float(os.environ.get("PROFILE_INTERVAL", 0.005))
+PROFILE_KEEP = int(os.environ.get("PROFILE_KEEP", 20))
+
+
+def _frame_name(frame):
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})"
+
+
+class SamplingProfiler:
+    def __init__(self, interval=PROFILE_INTERVAL):
+        self.interval = interval
+        self.samples = Counter()
+        self.count = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+
+    def _run(self):
+        me = threading.get_ident()
+        names = {}
+        while not self._stop.wait(self.interval):
+            for t in threading.enumerate():
+                names[t.ident] = t.name
+            for ident, frame in sys._current_frames().items():
+                if ident == me:
+                    continue
+                stack = []
+                while frame is not None:
+                    stack.append(_frame_name(frame))
+                    frame = frame.f_back
+                if len(stack) <= 2:
+                    continue  # idle worker threads waiting on a queue
+                stack.append(names.get(ident, str(ident)))
+                self.samples[";".join(reversed(stack))] += 1
+            self.count += 1
+
+    def start(self):
+        self.started = time.perf_counter()
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        self.seconds = time.perf_counter() - self.started
+        return self
+
+    def collapsed(self):
+        return "\n".join(f"{stack} {n}" for stack, n in self.samples.most_common())
+
+
+class ProfileStore:
+    """The last ``keep`` profiles, by id"""
+
+    def __init__(self, keep=PROFILE_KEEP):
+        self.keep = keep
+        self.profiles = OrderedDict()
+        self._lock = threading.Lock()
+
+    def add(self, profiler, label=""):
+        profile_id = uuid.uuid4().hex[:12]
+        with self._lock:
+            self.profiles[profile_id] = {
+                "label": label,
+                "seconds": round(profiler.seconds, 3),
+                "samples": profiler.count,
+                "collapsed": profiler.collapsed(),
+            }
+            while len(self.profiles) > self.keep:
+                self.profiles.popitem(last=False)
+        return profile_id
+
+    def get(self, profile_id):
+        return self.profiles.get(profile_id)
+
+
+profiles = ProfileStore()
@@ -0,0 +1,157 @@
+"""Per-stage timing and size metrics for the ingestion/analysis hot path.
+
+    with stage("ocr") as s:
+        text = run_ocr(path)
+        s.add(pages=n_pages, bytes=os.path.getsize(path))
+
+    @timed("render")
+    def generate_summary_pdf(...): ...
+
+Every stage records a duration histogram plus page/byte/token/item counters
+labelled by stage. Metrics go to ``prometheus_client`` when it is installed
+(and show up on the app's /metrics); otherwise they are aggregated in
+process and available from ``snapshot()``. The stages of the current request
+are also collected in a context-local trace.
+
+``STAGE_METRICS=0`` turns everything off: ``timed`` returns the function
+unchanged and ``stage`` yields a shared no-op record.
+"""
+import contextvars
+import functools
+import inspect
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+STAGE_METRICS = os.environ.get("STAGE_METRICS", "1") == "1"
+
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+COUNTERS = ("pages", "bytes", "tokens", "items")
+
+try:
+    from prometheus_client import Counter, Histogram
+    _SECONDS = Histogram("pipeline_stage_seconds", "Time spent per pipeline stage", ["stage"], buckets=BUCKETS)
+    _ERRORS = Counter("pipeline_stage_errors_total", "Pipeline stage failures", ["stage"])
+    _TOTALS = {
+        name: Counter(f"pipeline_stage_{name}_total", f"{name.capitalize()} processed per pipeline stage", ["stage"])
+        for name in COUNTERS
+    }
+except ImportError:
+    _SECONDS = _ERRORS = _TOTALS = None
+
+_local = {}  # stage -> {"count", "sum", "errors", "buckets", <counters>}
+_local_lock = threading.Lock()
+_trace = contextvars.ContextVar("stage_trace", default=None)
+
+
+class StageRecord:
+    __slots__ = ("name", "counts")
+
+    def __init__(self, name):
+        self.name = name
+        self.counts = {}
+
+    def add(self, **counts):
+        for key, value in counts.items():
+            if value:
+                self.counts[key] = self.counts.get(key, 0) + value
+
+
+class _NoopRecord:
+    def add(self, **counts):
+        pass
+
+
+_NOOP = _NoopRecord()
+
+
+def _record(name, seconds, counts, failed):
+    if _SECONDS is not None:
+        _SECONDS.labels(stage=name).observe(seconds)
+        for key, value in counts.items():
+            if key in _TOTALS:
+                _TOTALS[key].labels(stage=name).inc(value)
+        if failed:
+            _ERRORS.labels(stage=name).inc()
+        return
+    with _local_lock:
+        agg = _local.setdefault(name, {"count": 0, "sum": 0.0, "errors": 0, "buckets": [0] * len(BUCKETS)})
+        agg["count"] += 1
+        agg["sum"] += seconds
+        agg["errors"] += failed
+        for i, bound in enumerate(BUCKETS):
+            if seconds <= bound:
+                agg["buckets"][i] += 1
+                break
+        for key, value in counts.items():
+            agg[key] = agg.get(key, 0) + value
+
+
+@contextmanager
+def stage(name, **counts):
+    """Time a block as pipeline stage ``name``; extra counts via ``record.add``"""
+    if not STAGE_METRICS:
+        yield _NOOP
+        return
+    record = StageRecord(name)
+    record.add(**counts)
+    failed = False
+    started = time.perf_counter()
+    try:
+        yield record
+    except BaseException:
+        failed = True
+        raise
+    finally:
+        seconds = time.perf_counter() - started
+        _record(name, seconds, record.counts, failed)
+        trace = _trace.get()
+        if trace is not None:
+            trace.append({"stage": name, "seconds": round(seconds, 6), **record.counts})
+
+
+def timed(name, counts=None):
+    """Decorator form of ``stage``; ``counts(result, *args, **kwargs)`` may return counts"""
+    def decorate(fn):
+        if not STAGE_METRICS:
+            return fn
+        if inspect.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def async_wrapper(*args, **kwargs):
+                with stage(name) as record:
+                    result = await fn(*args, **kwargs)
+                    if counts:
+                        record.add(**counts(result, *args, **kwargs))
+                    return result
+            return async_wrapper
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with stage(name) as record:
+                result = fn(*args, **kwargs)
+                if counts:
+                    record.add(**counts(result, *args, **kwargs))
+                return result
+        return wrapper
+    return decorate
+
+
+@contextmanager
+def collect_trace():
+    """Collect the stages run in this context (and tasks/threads started from it)"""
+    trace = []
+    token = _trace.set(trace)
+    try:
+        yield trace
+    finally:
+        _trace.reset(token)
+
+
+def snapshot():
+    """In-process aggregates (only populated when prometheus_client is absent)"""
+    with _local_lock:
+        return {
+            name: {**agg, "buckets": dict(zip(map(str, BUCKETS), agg["buckets"]))}
+            for name, agg in _local.items()
+        }
@@ -0,0 +1,175 @@
+"""Single chunking engine for ingestion, indexing and upload analysis.
+
+Chunks are ``(start, end)`` character spans into the original text, so no
+word lists or re-joined strings are built and every chunk records exactly
+where it came from. Callers slice ``text[start:end]`` only when they need
+the string (e.g. to embed it).
+
+Modes:
+- ``word``:  ``size``/``overlap`` counted in whitespace-separated words
+- ``char``:  ``size``/``overlap`` counted in characters
+- ``token``: ``size``/``overlap`` counted in tokenizer tokens (needs a fast
+  HuggingFace tokenizer, or any callable returning character offsets)
+- ``section``: content-defined chunks of whole lines (see
+  ``iter_section_spans``); an edit only changes the chunk it falls in, which
+  is what version diffing needs
+
+Chunks never cross a page break when ``page_breaks`` (sorted character
+offsets where pages start) is given.
+"""
+import re
+import zlib
+from array import array
+from bisect import bisect_right
+from collections import deque
+
+WORD = "word"
+CHAR = "char"
+TOKEN = "token"
+SECTION = "section"
+
+_WORD_RE = re.compile(r"\S+")
+_LINE_RE = re.compile(r"\S[^\n]*")
+
+
+def iter_word_bounds(text):
+    for m in _WORD_RE.finditer(text):
+        yield m.span()
+
+
+def iter_token_bounds(text, tokenizer):
+    if callable(tokenizer) and not hasattr(tokenizer, "is_fast"):
+        offsets = tokenizer(text)
+    else:
+        offsets = tokenizer(text, return_offsets_mapping=True, add_special_tokens=False)["offset_mapping"]
+    for s, e in offsets:
+        if e > s:
+            yield s, e
+
+
+def token_boundaries(text, mode=WORD, tokenizer=None):
+    """Precompute boundaries as one flat ``array('q')`` of start/end pairs.
+
+    Only worth it when the same text is chunked several times; ``iter_spans``
+    otherwise walks the text lazily and keeps just one window of boundaries.
+    """
+    bounds = iter_token_bounds(text, tokenizer) if mode == TOKEN else iter_word_bounds(text)
+    flat = array("q")
+    for s, e in bounds:
+        flat.append(s)
+        flat.append(e)
+    return flat
+
+
+def _pairs(flat):
+    return zip(flat[0::2], flat[1::2])
+
+
+def _window_spans(bounds, size, overlap, page_breaks):
+    step = size - overlap
+    window = deque()
+    fresh = 0  # boundaries added since the last emitted span
+    breaks = iter(page_breaks or ())
+    next_break = next(breaks, None)
+    for s, e in bounds:
+        while next_break is not None and s >= next_break:
+            if fresh:
+                yield window[0][0], window[-1][1]
+            window.clear()
+            fresh = 0
+            next_break = next(breaks, None)
+        window.append((s, e))
+        fresh += 1
+        if len(window) == size:
+            yield window[0][0], window[-1][1]
+            fresh = 0
+            for _ in range(step):
+                window.popleft()
+    if fresh:
+        yield window[0][0], window[-1][1]
+
+
+def _char_spans(length, size, overlap, page_breaks):
+    step = size - overlap
+    edges = [0, *(b for b in page_breaks or () if 0 < b < length), length]
+    for a, b in zip(edges, edges[1:]):
+        for start in range(a, b, step):
+            end = min(start + size, b)
+            yield start, end
+            if end == b:
+                break
+
+
+def iter_section_spans(text, size=500, page_breaks=None, divisor=8):
+    """Content-defined chunks made of whole lines.
+
+    A chunk ends after a line whose content hash is divisible by ``divisor``
+    (about every ``divisor`` lines), at a page break, or once it reaches
+    ``size`` words. Cut points depend only on nearby content, so inserting or
+    editing a clause leaves the other chunks byte-identical.
+    """
+    breaks = iter(page_breaks or ())
+    next_break = next(breaks, None)
+    start = end = None
+    words = 0
+    for m in _LINE_RE.finditer(text):
+        p_start, p_end = m.span()
+        while next_break is not None and p_start >= next_break:
+            if start is not None:
+                yield start, end
+                start = None
+                words = 0
+            next_break = next(breaks, None)
+        if start is None:
+            start = p_start
+        end = p_end
+        words += sum(1 for _ in _WORD_RE.finditer(text, p_start, p_end))
+        if words >= size or zlib.crc32(" ".join(m.group().split()).encode()) % divisor == 0:
+            yield start, end
+            start = None
+            words = 0
+    if start is not None:
+        yield start, end
+
+
+def iter_spans(text, mode=WORD, size=500, overlap=50, page_breaks=None,
+               tokenizer=None, boundaries=None):
+    """Yield ``(start, end)`` character spans covering ``text``"""
+    if mode == SECTION:
+        return iter_section_spans(text, size, page_breaks)
+    if size <= 0 or not 0 <= overlap < size:
+        raise ValueError("need size > 0 and 0 <= overlap < size")
+    if mode == CHAR:
+        return _char_spans(len(text), size, overlap, page_breaks)
+    if boundaries is not None:
+        bounds = _pairs(boundaries)
+    elif mode == WORD:
+        bounds = iter_word_bounds(text)
+    elif mode == TOKEN:
+        if tokenizer is None:
+            raise ValueError("token mode needs a tokenizer")
+        bounds = iter_token_bounds(text, tokenizer)
+    else:
+        raise ValueError(f"unknown chunking mode {mode!r}")
+    return _window_spans(bounds, size, overlap, page_breaks)
+
+
+def iter_chunks(text, **kwargs):
+    """Yield ``(start, end, chunk_text)`` for callers that need the strings"""
+    for start, end in iter_spans(text, **kwargs):
+        yield start, end, text[start:end]
+
+
+def page_breaks_from(text, separator="\f"):
+    """Page start offsets for text whose pages are joined by ``separator``"""
+    breaks = []
+    i = text.find(separator)
+    while i != -1:
+        breaks.append(i + len(separator))
+        i = text.find(separator, i + 1)
+    return breaks
+
+
+def page_of(offset, page_breaks):
+    """0-based page number containing a character offset"""
+    return bisect_right(page_breaks, offset)
@@ -1,18 +1,15 @@
-from sentence_transformers import SentenceTransformer
 import faiss, json, numpy as np
+from app.rag.chunking import iter_spans
+from app.inference.engine import get_encoder
 
-EMBED_MODEL = "all-MiniLM-L6-v2"
-model = SentenceTransformer(EMBED_MODEL)
+def chunk_spans(text, chunk_size=800, overlap=100, page_breaks=None):
+    return iter_spans(text, "word", chunk_size, overlap, page_breaks=page_breaks)
 
 def chunk_text(text, chunk_size=800, overlap=100):
-    words = text.split()
-    chunks = []
-    for i in range(0, len(words), chunk_size - overlap):
-        chunks.append(" ".join(words[i:i+chunk_size]))
-    return chunks
+    return [text[s:e] for s, e in chunk_spans(text, chunk_size, overlap)]
 
 def build_index(chunks, meta, out_path):
-    embs = model.encode(chunks, convert_to_numpy=True, show_progress_bar=True)
+    embs = get_encoder().encode(chunks, convert_to_numpy=True, show_progress_bar=True)
     faiss.normalize_L2(embs)
     index = faiss.IndexFlatIP(embs.shape[1])
     index.add(embs)
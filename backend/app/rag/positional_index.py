@@ -0,0 +1,162 @@
+"""Word positions for turning text spans into PDF highlights.
+
+While a document's text is extracted, every word is also recorded with its
+page, its ``[start, end)`` character span in the extracted text and its
+bounding box in PDF points (origin top-left, as PyMuPDF uses). They are kept
+as flat NumPy arrays sorted by offset: ``uint16`` pages, ``uint32`` offsets and
+``float32`` boxes, about 26 bytes a word. The index is saved next to the
+document as ``<path>.words.npz``.
+
+Mapping a citation span or a chunk to page rectangles is then two binary
+searches and one vectorized pass that merges words into line rectangles.
+The PDF is never parsed again:
+
+    index = PositionalIndex.load(positions_path(pdf_path))
+    annotate_pdf(pdf_path, index.highlights(risks), out_path)
+"""
+import csv
+import io
+import os
+from array import array
+
+import numpy as np
+
+# Words whose tops differ by less than this fraction of their height share a line
+LINE_TOLERANCE = 0.5
+
+
+def positions_path(doc_path):
+    return doc_path + ".words.npz"
+
+
+class PositionalIndexBuilder:
+    """Collects words page by page while the text is being assembled"""
+
+    def __init__(self):
+        self.page = array("H")
+        self.offsets = array("I")  # start/end pairs
+        self.boxes = array("f")  # x0/top/x1/bottom quads
+
+    def add_word(self, page, start, end, box):
+        self.page.append(page)
+        self.offsets.extend((start, end))
+        self.boxes.extend(box)
+
+    def add_textmap(self, page_no, offset, textmap):
+        """Words of a pdfplumber ``TextMap`` whose ``as_string`` starts at ``offset``"""
+        start = None
+        for i, (ch, char) in enumerate(textmap.tuples):
+            if char is None or ch.isspace():
+                if start is not None:
+                    self.add_word(page_no, offset + start, offset + i, box)
+                    start = None
+                continue
+            if start is None:
+                start, box = i, [char["x0"], char["top"], char["x1"], char["bottom"]]
+            else:
+                box = [min(box[0], char["x0"]), min(box[1], char["top"]),
+                       max(box[2], char["x1"]), max(box[3], char["bottom"])]
+        if start is not None:
+            self.add_word(page_no, offset + start, offset + len(textmap.tuples), box)
+
+    def add_ocr_words(self, page_no, offset, page_text, tsv, scale):
+        """
+        Words from Tesseract TSV output (pixels, times ``scale`` for points),
+        located in ``page_text``, the plain-text output of the same run
+        """
+        cursor = 0
+        for row in csv.DictReader(io.StringIO(tsv), delimiter="\t", quoting=csv.QUOTE_NONE):
+            word = (row.get("text") or "").strip()
+            if row.get("level") != "5" or not word:
+                continue
+            at = page_text.find(word, cursor)
+            if at == -1:
+                continue
+            cursor = at + len(word)
+            left, top = int(row["left"]) * scale, int(row["top"]) * scale
+            self.add_word(page_no, offset + at, offset + cursor,
+                          (left, top, left + int(row["width"]) * scale, top + int(row["height"]) * scale))
+
+    def build(self):
+        return PositionalIndex(
+            np.frombuffer(self.page, dtype=np.uint16),
+            np.frombuffer(self.offsets, dtype=np.uint32).reshape(-1, 2),
+            np.frombuffer(self.boxes, dtype=np.float32).reshape(-1, 4),
+        )
+
+
+class PositionalIndex:
+    def __init__(self, page, offsets, boxes, chunks=None):
+        self.page = page
+        self.start = offsets[:, 0]
+        self.end = offsets[:, 1]
+        self.offsets = offsets
+        self.boxes = boxes
+        # optional (start, end) spans of the document's chunks, by chunk number
+        self.chunks = chunks
+
+    def __len__(self):
+        return len(self.page)
+
+    def save(self, path):
+        arrays = {"page": self.page, "offsets": self.offsets, "boxes": self.boxes}
+        if self.chunks is not None:
+            arrays["chunks"] = np.asarray(self.chunks, dtype=np.uint32).reshape(-1, 2)
+        with open(path + ".tmp", "wb") as f:
+            np.savez_compressed(f, **arrays)
+        os.replace(path + ".tmp", path)
+        return path
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            return cls(data["page"], data["offsets"], data["boxes"], data["chunks"] if "chunks" in data else None)
+
+    def page_breaks(self):
+        """Offsets where a page's first word starts, for chunking without crossing pages"""
+        return self.start[np.flatnonzero(np.diff(self.page)) + 1].tolist()
+
+    def word_range(self, start, end):
+        """Index range of the words overlapping ``[start, end)``"""
+        lo = int(np.searchsorted(self.end, start, side="right"))
+        hi = int(np.searchsorted(self.start, end, side="left"))
+        return lo, max(lo, hi)
+
+    def span_rects(self, start, end):
+        """``[{"page", "rect"}]`` covering a text span, one rectangle per line"""
+        lo, hi = self.word_range(start, end)
+        if lo == hi:
+            return []
+        page, boxes = self.page[lo:hi], self.boxes[lo:hi]
+        height = boxes[:, 3] - boxes[:, 1]
+        new_line = np.ones(hi - lo, dtype=bool)
+        new_line[1:] = ((page[1:] != page[:-1])
+                        | (np.abs(boxes[1:, 1] - boxes[:-1, 1]) > LINE_TOLERANCE * np.maximum(height[1:], height[:-1]))
+                        | (boxes[1:, 0] < boxes[:-1, 0]))
+        starts = np.flatnonzero(new_line)
+        x0 = np.minimum.reduceat(boxes[:, 0], starts)
+        top = np.minimum.reduceat(boxes[:, 1], starts)
+        x1 = np.maximum.reduceat(boxes[:, 2], starts)
+        bottom = np.maximum.reduceat(boxes[:, 3], starts)
+        return [{"page": int(p), "rect": (float(a), float(b), float(c), float(d))}
+                for p, a, b, c, d in zip(page[starts], x0, top, x1, bottom)]
+
+    def chunk_rects(self, chunk_id):
+        """Rectangles of a chunk by number or excerpt reference (``3`` or ``"C3"``)"""
+        if self.chunks is None:
+            raise KeyError("index has no chunk spans")
+        number = int(chunk_id[1:]) if isinstance(chunk_id, str) else int(chunk_id)
+        start, end = self.chunks[number]
+        return self.span_rects(int(start), int(end))
+
+    def highlights(self, risks):
+        """``annotate_pdf`` annotations for every cited span of every risk"""
+        annotations = []
+        for risk in risks:
+            note = f"{risk.get('severity', '')}: {risk.get('category', '')}".strip(": ")
+            for citation in risk.get("citations") or []:
+                rects = self.span_rects(citation["start"], citation["end"])
+                if rects:
+                    rects[0]["note"] = note
+                annotations += rects
+        return annotations
@@ -0,0 +1,132 @@
+"""Pick the parts of a document worth sending to the LLM.
+
+Contracts are mostly boilerplate. Instead of pasting the whole text into the
+analysis prompt, the document is chunked, chunks and a fixed set of
+compliance topic probes are embedded with the shared encoder, and each probe
+claims its best-matching chunks in turn (round robin, so every topic gets
+coverage) until the token budget is spent. The selected excerpts keep their
+character spans, so every risk the LLM reports can cite where it came from.
+"""
+import os
+from dataclasses import asdict, dataclass
+
+import numpy as np
+
+from app.llm.gateway import estimate_tokens
+from app.observability.stages import stage
+from app.rag.chunking import iter_spans, page_of
+
+ANALYSIS_TOKEN_BUDGET = int(os.environ.get("ANALYSIS_TOKEN_BUDGET", 3000))
+SLIM_CHUNK_WORDS = int(os.environ.get("SLIM_CHUNK_WORDS", 150))
+SLIM_MIN_SCORE = float(os.environ.get("SLIM_MIN_SCORE", 0.2))
+
+TOPIC_PROBES = {
+    "retention": "how long personal data is stored, retention period and deletion of records",
+    "consent": "consent of the data subject, lawful basis and opt-out of processing",
+    "breach": "notification of a security incident or personal data breach within hours",
+    "transfer": "international transfer of data outside the country, cross-border processing",
+    "subprocessors": "use of subcontractors, sub-processors and third-party vendors",
+    "security": "encryption, access control and technical security measures",
+    "rights": "data subject rights to access, rectify, erase or port their data",
+    "audit": "audit rights, inspections and compliance reporting obligations",
+    "liability": "limitation of liability, indemnification and penalties",
+    "kyc_aml": "customer due diligence, know your customer and anti-money laundering checks",
+    "health": "protected health information, medical records and HIPAA safeguards",
+    "financial": "financial reporting controls, record keeping and SOX obligations",
+    "payments": "payment card data, PCI DSS and fraud prevention",
+    "termination": "termination of the agreement and return or destruction of data",
+}
+
+
+@dataclass
+class Excerpt:
+    ref: str
+    start: int
+    end: int
+    topic: str
+    score: float
+    page: int = None
+
+    def citation(self):
+        return asdict(self)
+
+
+_probe_cache = {}
+
+
+def _probe_matrix(encoder, probes):
+    key = (id(encoder), tuple(probes.values()))
+    if _probe_cache.get("key") != key:
+        _probe_cache["key"] = key
+        _probe_cache["matrix"] = np.asarray(encoder.encode(list(probes.values())), dtype=np.float32)
+    return _probe_cache["matrix"]
+
+
+def select_excerpts(text, budget=ANALYSIS_TOKEN_BUDGET, encoder=None, probes=TOPIC_PROBES,
+                    chunk_words=SLIM_CHUNK_WORDS, min_score=SLIM_MIN_SCORE, page_breaks=None):
+    """Excerpts covering the topic probes within ``budget`` tokens, in document order"""
+    if encoder is None:
+        from app.inference.engine import get_encoder
+        encoder = get_encoder()
+    with stage("chunk", bytes=len(text)) as s:
+        spans = list(iter_spans(text, "word", chunk_words, 0, page_breaks=page_breaks))
+        s.add(items=len(spans))
+    if not spans:
+        return []
+    chunks = [text[s:e] for s, e in spans]
+    emb = np.asarray(encoder.encode(chunks), dtype=np.float32)
+    probe_emb = _probe_matrix(encoder, probes)
+    scores = emb @ probe_emb.T  # (chunks, probes); both sides are normalised
+    topics = list(probes)
+
+    # Round robin over probes; each takes its best chunk not yet chosen
+    ranked = np.argsort(-scores, axis=0).T
+    pointers = [0] * len(topics)
+    chosen, used = {}, 0
+    advanced = True
+    while advanced:
+        advanced = False
+        for j, order in enumerate(ranked):
+            while pointers[j] < len(order) and order[pointers[j]] in chosen:
+                pointers[j] += 1
+            if pointers[j] == len(order):
+                continue
+            i = int(order[pointers[j]])
+            pointers[j] += 1
+            advanced = True
+            if scores[i, j] < min_score:
+                pointers[j] = len(order)  # the rest score even lower
+                continue
+            cost = estimate_tokens(chunks[i])
+            if used + cost <= budget:
+                chosen[i] = (topics[j], float(scores[i, j]))
+                used += cost
+
+    excerpts = []
+    for i in sorted(chosen):
+        s, e = spans[i]
+        topic, score = chosen[i]
+        page = page_of(s, page_breaks) if page_breaks else None
+        excerpts.append(Excerpt(f"C{i}", s, e, topic, round(score, 4), page))
+    return excerpts
+
+
+def slim_text(text, excerpts):
+    """Prompt body with each excerpt tagged by its citation reference"""
+    return "\n\n".join(f"[{x.ref}] {text[x.start:x.end]}" for x in excerpts)
+
+
+def attach_citations(risks, excerpts):
+    """Replace the ``source`` refs the LLM returned with full citations"""
+    by_ref = {x.ref: x for x in excerpts}
+    for risk in risks:
+        refs = risk.pop("source", None) or []
+        if isinstance(refs, str):
+            refs = [refs]
+        risk["citations"] = [by_ref[r].citation() for r in refs if r in by_ref]
+    return risks
+
+
+def section_excerpts(spans):
+    """Whole sections as excerpts ``S0``, ``S1``... so the LLM can cite them"""
+    return [Excerpt(f"S{i}", s, e, "section", 1.0) for i, (s, e) in enumerate(spans)]
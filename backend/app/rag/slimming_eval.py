@@ -0,0 +1,121 @@
+"""Compare slim (retrieval-selected excerpts) with full-text risk analysis.
+
+Each document is analyzed twice through the real pipeline and gateway;
+full-text risks are the reference. A slim risk matches a full one when they
+cite the same regulation and their categories share a word.
+
+    cd backend
+    OPENAI_API_KEY=... python -m app.rag.slimming_eval contracts/*.pdf
+    python -m app.rag.slimming_eval --fake contracts/*.txt   # plumbing only
+"""
+import argparse
+import asyncio
+import json
+import re
+import time
+
+from app.llm import gateway as gateway_mod
+
+_WORD_RE = re.compile(r"[a-z]+")
+
+
+def _words(category):
+    return set(_WORD_RE.findall((category or "").lower())) - {"and", "of", "the", "data"}
+
+
+def match_risks(reference, candidate):
+    """Greedy one-to-one matching; returns the number of matched pairs"""
+    unmatched = list(candidate)
+    matched = 0
+    for ref in reference:
+        for cand in unmatched:
+            same_reg = (ref.get("regulation") or "").upper() == (cand.get("regulation") or "").upper()
+            if same_reg and (_words(ref.get("category")) & _words(cand.get("category"))):
+                unmatched.remove(cand)
+                matched += 1
+                break
+    return matched
+
+
+async def _run_mode(analyze, text, mode):
+    gateway = gateway_mod.get_gateway()
+    before = len(gateway.metrics)
+    started = time.perf_counter()
+    risks, _ = await analyze(text, mode=mode)
+    calls = list(gateway.metrics)[before:]
+    return {
+        "risks": risks,
+        "seconds": time.perf_counter() - started,
+        "prompt_tokens": sum(c.prompt_tokens for c in calls),
+    }
+
+
+async def evaluate(paths):
+    from main import analyze_document_text, extract_text
+    from app.inference.engine import get_encoder
+
+    get_encoder()  # load the encoder up front so it is not billed to the first slim run
+    rows = []
+    for path in paths:
+        if path.lower().endswith(".pdf"):
+            text = extract_text(path)
+        else:
+            with open(path) as f:
+                text = f.read()
+        full = await _run_mode(analyze_document_text, text, "full")
+        slim = await _run_mode(analyze_document_text, text, "slim")
+        matched = match_risks(full["risks"], slim["risks"])
+        rows.append({
+            "document": path,
+            "full_risks": len(full["risks"]),
+            "slim_risks": len(slim["risks"]),
+            "recall": matched / len(full["risks"]) if full["risks"] else 1.0,
+            "precision": matched / len(slim["risks"]) if slim["risks"] else 1.0,
+            "full_prompt_tokens": full["prompt_tokens"],
+            "slim_prompt_tokens": slim["prompt_tokens"],
+            "full_seconds": round(full["seconds"], 3),
+            "slim_seconds": round(slim["seconds"], 3),
+            "cited": sum(bool(r.get("citations")) for r in slim["risks"]),
+        })
+    return rows
+
+
+def summarize(rows):
+    n = len(rows) or 1
+    full_tokens = sum(r["full_prompt_tokens"] for r in rows) or 1
+    full_seconds = sum(r["full_seconds"] for r in rows) or 1
+    return {
+        "documents": len(rows),
+        "mean_recall": round(sum(r["recall"] for r in rows) / n, 3),
+        "mean_precision": round(sum(r["precision"] for r in rows) / n, 3),
+        "prompt_token_ratio": round(sum(r["slim_prompt_tokens"] for r in rows) / full_tokens, 3),
+        "latency_ratio": round(sum(r["slim_seconds"] for r in rows) / full_seconds, 3),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("paths", nargs="+")
+    parser.add_argument("--fake", action="store_true", help="use the local fake OpenAI server")
+    args = parser.parse_args()
+
+    async def run():
+        try:
+            return await evaluate(args.paths)
+        finally:
+            await gateway_mod.close_gateway()
+
+    if args.fake:
+        from app.llm.fake_openai import FakeOpenAI
+        with FakeOpenAI(latency=0.2) as server:
+            gateway_mod.OPENAI_BASE_URL, gateway_mod.OPENAI_API_KEY = server.base_url, "fake"
+            rows = asyncio.run(run())
+    else:
+        rows = asyncio.run(run())
+    for row in rows:
+        print(json.dumps(row))
+    print(json.dumps({"summary": summarize(rows)}))
+
+
+if __name__ == "__main__":
+    main()
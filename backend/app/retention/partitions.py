@@ -0,0 +1,194 @@
+"""Monthly range partitions for the append-only log tables.
+
+On PostgreSQL, ``audit_entries`` and ``session_logs`` are partitioned by
+``created_at`` (migration ``6f0c2a9e4b17``). Each month is its own child
+table, e.g. ``audit_entries_p2025_07``. A ``<table>_default`` partition
+catches rows that fall outside every month, so a late maintenance run never
+rejects writes. Any query filtered on ``created_at`` scans only the months
+it overlaps. Purging a month means detaching and dropping it, not a DELETE.
+
+    python -m app.retention.partitions    # create upcoming months, archive expired ones
+
+Expired months are only dropped once exported to ``PARTITION_ARCHIVE_DIR``,
+which must be an absolute path on durable storage (a mounted volume or an
+object-store mount, not the container's own disk). Until it is set, expired
+months stay attached.
+"""
+import csv
+import gzip
+import os
+import re
+from datetime import datetime, timezone
+
+from sqlalchemy import text
+
+PARTITIONED_TABLES = ("audit_entries", "session_logs")
+# Months created ahead of time, so inserts never land in the default partition
+PARTITION_PREMAKE_MONTHS = int(os.environ.get("PARTITION_PREMAKE_MONTHS", 3))
+# Full months kept online; older ones are exported to the archive and dropped
+# (7 years, the same as apply_default_retention for documents)
+PARTITION_RETAIN_MONTHS = int(os.environ.get("PARTITION_RETAIN_MONTHS", 84))
+PARTITION_ARCHIVE_DIR = os.environ.get("PARTITION_ARCHIVE_DIR") or None
+PARTITION_MAINTENANCE_SECONDS = int(os.environ.get("PARTITION_MAINTENANCE_SECONDS", 24 * 3600))
+
+_MONTH_SUFFIX = re.compile(r"_p(\d{4})_(\d{2})$")
+
+
+def month_start(dt):
+    return datetime(dt.year, dt.month, 1, tzinfo=timezone.utc)
+
+
+def add_months(month, n):
+    year, index = divmod(month.year * 12 + month.month - 1 + n, 12)
+    return datetime(year, index + 1, 1, tzinfo=timezone.utc)
+
+
+def months(first, last):
+    """Month starts from ``first`` through ``last``, inclusive"""
+    month, last = month_start(first), month_start(last)
+    while month <= last:
+        yield month
+        month = add_months(month, 1)
+
+
+def partition_name(table, month):
+    return f"{table}_p{month:%Y_%m}"
+
+
+def partition_month(name):
+    match = _MONTH_SUFFIX.search(name)
+    return datetime(int(match[1]), int(match[2]), 1, tzinfo=timezone.utc) if match else None
+
+
+def partition_bounds(month):
+    return f"FROM ('{month.isoformat()}') TO ('{add_months(month, 1).isoformat()}')"
+
+
+def list_partitions(conn, table):
+    """Monthly partitions of ``table``, oldest first (the default one excluded)"""
+    rows = conn.execute(text(
+        "SELECT c.relname FROM pg_inherits i "
+        "JOIN pg_class c ON c.oid = i.inhrelid JOIN pg_class p ON p.oid = i.inhparent "
+        "WHERE p.relname = :table"), {"table": table})
+    return sorted((name for (name,) in rows if partition_month(name)), key=partition_month)
+
+
+def create_partition(conn, table, month):
+    name = partition_name(table, month)
+    window = {"lo": month, "hi": add_months(month, 1)}
+    stray = conn.execute(text(
+        f"SELECT count(*) FROM {table}_default WHERE created_at >= :lo AND created_at < :hi"), window).scalar()
+    if not stray:
+        conn.execute(text(f"CREATE TABLE IF NOT EXISTS {name} PARTITION OF {table} "
+                          f"FOR VALUES {partition_bounds(month)}"))
+        return name
+    # The month already has rows in the default partition, and PostgreSQL
+    # refuses a partition that overlaps them; move them over, then attach
+    conn.execute(text(f"CREATE TABLE {name} (LIKE {table} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)"))
+    conn.execute(text(
+        f"WITH moved AS (DELETE FROM {table}_default WHERE created_at >= :lo AND created_at < :hi "
+        f"RETURNING *) INSERT INTO {name} SELECT * FROM moved"), window)
+    conn.execute(text(f"ALTER TABLE {table} ATTACH PARTITION {name} FOR VALUES {partition_bounds(month)}"))
+    print(f"⚠️ Moved {stray} {table} rows from the default partition into {name}")
+    return name
+
+
+def _locked(conn, table):
+    # Every replica runs maintenance; only one at a time touches a table
+    return conn.execute(text("SELECT pg_try_advisory_xact_lock(hashtext(:key))"),
+                        {"key": f"partitions:{table}"}).scalar()
+
+
+def ensure_partitions(engine, table, ahead=PARTITION_PREMAKE_MONTHS, now=None):
+    """Create any missing month from the newest existing one through ``ahead`` months from now"""
+    now = month_start(now or datetime.now(timezone.utc))
+    with engine.begin() as conn:
+        if not _locked(conn, table):
+            return []
+        existing = list_partitions(conn, table)
+        first = partition_month(existing[-1]) if existing else now
+        return [create_partition(conn, table, month) for month in months(first, add_months(now, ahead))
+                if partition_name(table, month) not in existing]
+
+
+def archive_target(archive_dir=None):
+    """The archive directory to export to (default ``PARTITION_ARCHIVE_DIR``); None when archival must be skipped"""
+    archive_dir = archive_dir or PARTITION_ARCHIVE_DIR
+    if archive_dir and not os.path.isabs(archive_dir):
+        print(f"⚠️ Partition archive {archive_dir!r} is not an absolute path; expired partitions are kept")
+        return None
+    return archive_dir
+
+
+def export_partition(conn, name, archive_dir):
+    """Stream one partition to ``<archive_dir>/<name>.csv.gz`` and fsync it; returns ``(path, rows)``"""
+    os.makedirs(archive_dir, exist_ok=True)
+    path = os.path.join(archive_dir, f"{name}.csv.gz")
+    result = conn.execution_options(stream_results=True).execute(text(f"SELECT * FROM {name} ORDER BY id"))
+    count = 0
+    with open(path + ".tmp", "wb") as raw:
+        with gzip.open(raw, "wt", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(result.keys())
+            for row in result:
+                writer.writerow(row)
+                count += 1
+        raw.flush()
+        os.fsync(raw.fileno())
+    os.replace(path + ".tmp", path)
+    # the partition is dropped next, so the rename must be on disk too
+    fd = os.open(archive_dir, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+    return path, count
+
+
+def archive_partitions(engine, table, retain=PARTITION_RETAIN_MONTHS, archive_dir=None, now=None):
+    """
+    Export, detach and drop every month older than ``retain`` full months.
+    Each month is one transaction: it is only dropped once its file is
+    written, and a failed export leaves it attached. Without an archive
+    directory nothing is dropped.
+    """
+    cutoff = add_months(month_start(now or datetime.now(timezone.utc)), -retain)
+    with engine.connect() as conn:
+        expired = [name for name in list_partitions(conn, table) if add_months(partition_month(name), 1) <= cutoff]
+    archive_dir = archive_target(archive_dir) if expired else None
+    if expired and not archive_dir:
+        print(f"⚠️ {len(expired)} expired {table} partitions kept: set PARTITION_ARCHIVE_DIR to archive them")
+        return []
+    archived = []
+    for name in expired:
+        with engine.begin() as conn:
+            if not _locked(conn, table):
+                break
+            path, count = export_partition(conn, name, archive_dir)
+            conn.execute(text(f"ALTER TABLE {table} DETACH PARTITION {name}"))
+            conn.execute(text(f"DROP TABLE {name}"))
+        archived.append({"partition": name, "path": path, "rows": count})
+    return archived
+
+
+def maintain(engine=None, now=None):
+    """Create upcoming months and archive expired ones; None without PostgreSQL"""
+    if engine is None:
+        from app.db import engine
+    if engine is None or engine.dialect.name != "postgresql":
+        return None
+    report = {}
+    for table in PARTITIONED_TABLES:
+        report[table] = {
+            "created": ensure_partitions(engine, table, now=now),
+            "archived": archive_partitions(engine, table, now=now),
+        }
+    return report
+
+
+if __name__ == "__main__":
+    import json
+    report = maintain()
+    if report is None:
+        raise SystemExit("DATABASE_URL must point at PostgreSQL")
+    print(json.dumps(report, indent=2))
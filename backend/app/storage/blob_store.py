@@ -0,0 +1,117 @@
+import hashlib
+import json
+import os
+import tempfile
+from dataclasses import dataclass
+
+from starlette.concurrency import run_in_threadpool
+
+CHUNK_SIZE = int(os.getenv("UPLOAD_CHUNK_SIZE", 1024 * 1024))
+MAX_UPLOAD_BYTES = int(os.getenv("MAX_UPLOAD_BYTES", 100 * 1024 * 1024))
+
+
+class UploadTooLarge(Exception):
+    """Raised as soon as an upload exceeds the configured size limit"""
+
+    def __init__(self, limit):
+        super().__init__(f"Upload exceeds the {limit} byte limit")
+        self.limit = limit
+
+
+def _write(out, h, chunk):
+    h.update(chunk)
+    out.write(chunk)
+
+
+@dataclass
+class StoredBlob:
+    sha256: str
+    path: str
+    size: int
+    duplicate: bool
+
+
+class BlobStore:
+    """Content-addressed file store.
+
+    Blobs live at ``<root>/<aa>/<bb>/<sha256>`` so identical uploads share one
+    file. Uploads are streamed in fixed-size chunks to a temp file in the same
+    filesystem while the SHA-256 is computed, then atomically renamed into
+    place, so memory per upload stays at one chunk. The advisor agent keeps a
+    copy of this logic in advisor-agent/backend/uploads.py; keep them in sync.
+    """
+
+    def __init__(self, root, chunk_size=CHUNK_SIZE, max_bytes=MAX_UPLOAD_BYTES):
+        self.root = root
+        self.chunk_size = chunk_size
+        self.max_bytes = max_bytes
+        self.tmp_dir = os.path.join(root, "tmp")
+        os.makedirs(self.tmp_dir, exist_ok=True)
+
+    def path_for(self, digest):
+        return os.path.join(self.root, digest[:2], digest[2:4], digest)
+
+    def exists(self, digest):
+        return os.path.exists(self.path_for(digest))
+
+    # --- Cached downstream results ---
+    def _result_path(self, digest):
+        return self.path_for(digest) + ".result.json"
+
+    def load_result(self, digest):
+        try:
+            with open(self._result_path(digest)) as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+
+    def save_result(self, digest, result):
+        path = self._result_path(digest)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(result, f)
+        os.replace(tmp_path, path)
+
+    # --- Writing ---
+    def _commit(self, tmp_path, digest, size):
+        path = self.path_for(digest)
+        if os.path.exists(path):
+            os.unlink(tmp_path)
+            return StoredBlob(digest, path, size, duplicate=True)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        os.replace(tmp_path, path)
+        return StoredBlob(digest, path, size, duplicate=False)
+
+    async def save_stream(self, read, max_bytes=None):
+        """Stream chunks from ``await read(n)`` into the store.
+
+        Hashing and disk writes run in the thread pool so the event loop is
+        never blocked.
+        Raises ``UploadTooLarge`` without keeping any partial data.
+        """
+        limit = max_bytes or self.max_bytes
+        fd, tmp_path = tempfile.mkstemp(dir=self.tmp_dir)
+        h = hashlib.sha256()
+        size = 0
+        try:
+            with os.fdopen(fd, "wb") as out:
+                while True:
+                    chunk = await read(self.chunk_size)
+                    if not chunk:
+                        break
+                    size += len(chunk)
+                    if size > limit:
+                        raise UploadTooLarge(limit)
+                    await run_in_threadpool(_write, out, h, chunk)
+            return await run_in_threadpool(self._commit, tmp_path, h.hexdigest(), size)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+
+    async def save_upload(self, upload, max_bytes=None):
+        """Store a FastAPI ``UploadFile``, rejecting oversized files up front"""
+        limit = max_bytes or self.max_bytes
+        if upload.size is not None and upload.size > limit:
+            raise UploadTooLarge(limit)
+        return await self.save_stream(upload.read, limit)
@@ -1,13 +1,82 @@
+import os
+import shutil
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+
 import fitz
 
-def annotate_pdf(in_path, annotations, out_path):
-    doc = fitz.open(in_path)
+MAX_WORKERS = int(os.getenv("PDF_ANNOTATE_WORKERS", os.cpu_count() or 1))
+
+
+def group_by_page(annotations):
+    """Group annotations by page number so each page is loaded only once"""
+    pages = defaultdict(list)
     for ann in annotations:
-        page = doc[ann["page"]]
-        rect = fitz.Rect(*ann["rect"])
-        highlight = page.add_highlight_annot(rect)
-        if "note" in ann:
-            page.add_text_annot(rect.tl, ann["note"])
-        highlight.update()
-    doc.save(out_path)
-    doc.close()
+        pages[ann["page"]].append(ann)
+    return dict(sorted(pages.items()))
+
+
+def _apply(doc, annotations):
+    for page_no, page_anns in group_by_page(annotations).items():
+        page = doc.load_page(page_no)
+        for ann in page_anns:
+            rect = fitz.Rect(*ann["rect"])
+            highlight = page.add_highlight_annot(rect)
+            if "note" in ann:
+                page.add_text_annot(rect.tl, ann["note"])
+            highlight.update()
+
+
+def annotate_pdf(in_path, annotations, out_path=None, incremental=True):
+    """Highlight annotations in a PDF.
+
+    With ``incremental`` (the default) only the new annotation objects are
+    appended to the file instead of rewriting the whole document. Incremental
+    saves always target the file that was opened, so when ``out_path`` differs
+    from ``in_path`` the source is copied first and the copy is annotated.
+    """
+    out_path = out_path or in_path
+    if incremental and os.path.abspath(out_path) != os.path.abspath(in_path):
+        shutil.copyfile(in_path, out_path)
+        in_path = out_path
+
+    doc = fitz.open(in_path)
+    try:
+        _apply(doc, annotations)
+        if incremental and doc.can_save_incrementally():
+            doc.saveIncr()
+            return out_path
+        # Full rewrite: a document cannot be saved over itself, so write a
+        # sibling file and swap it in.
+        tmp_path = out_path + ".tmp"
+        doc.save(tmp_path)
+    finally:
+        doc.close()
+    os.replace(tmp_path, out_path)
+    return out_path
+
+
+def _run_job(job):
+    return annotate_pdf(
+        job["in_path"],
+        job["annotations"],
+        job.get("out_path"),
+        job.get("incremental", True),
+    )
+
+
+def annotate_many(jobs, max_workers=None):
+    """Annotate several documents in parallel from one job spec.
+
+    ``jobs`` is a list of dicts with ``in_path``, ``annotations`` and optional
+    ``out_path``/``incremental`` keys. PyMuPDF is not thread-safe, so the work
+    is spread over a process pool. Returns the output paths in job order.
+    """
+    jobs = list(jobs)
+    if not jobs:
+        return []
+    workers = min(max_workers or MAX_WORKERS, len(jobs))
+    if workers <= 1:
+        return [_run_job(job) for job in jobs]
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(_run_job, jobs))
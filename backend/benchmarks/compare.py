@@ -0,0 +1,73 @@
+"""Compare a benchmark run with a baseline and flag regressions.
+
+A benchmark regresses when its median is more than ``--threshold`` slower
+than the baseline *and* at least ``--min-delta`` seconds slower (so
+sub-millisecond noise on tiny inputs does not fail a build). Exits 1 when
+anything regressed, which makes it usable as a CI gate.
+
+    python -m benchmarks.compare benchmarks/baselines/main.json /tmp/now.json --threshold 0.2
+"""
+import argparse
+import json
+import sys
+
+
+def compare(baseline, current, threshold=0.2, min_delta=0.002):
+    """One row per benchmark in either run, with its ratio and status"""
+    base, cur = baseline["benchmarks"], current["benchmarks"]
+    rows = []
+    for name in sorted(set(base) | set(cur)):
+        if name not in cur:
+            rows.append({"name": name, "status": "missing", "baseline_s": base[name]["median_s"]})
+            continue
+        if name not in base:
+            rows.append({"name": name, "status": "new", "current_s": cur[name]["median_s"]})
+            continue
+        b, c = base[name]["median_s"], cur[name]["median_s"]
+        ratio = c / b if b else float("inf")
+        if ratio > 1 + threshold and c - b >= min_delta:
+            status = "regressed"
+        elif ratio < 1 - threshold and b - c >= min_delta:
+            status = "improved"
+        else:
+            status = "ok"
+        rows.append({"name": name, "status": status, "baseline_s": b, "current_s": c, "ratio": round(ratio, 3)})
+    return rows
+
+
+def format_rows(rows):
+    lines = [f"{'benchmark':28s} {'baseline':>12s} {'current':>12s} {'ratio':>7s}  status"]
+    for r in rows:
+        base = f"{r['baseline_s'] * 1000:.2f} ms" if "baseline_s" in r else "-"
+        cur = f"{r['current_s'] * 1000:.2f} ms" if "current_s" in r else "-"
+        ratio = f"{r['ratio']:.2f}x" if "ratio" in r else "-"
+        flag = "❌ " if r["status"] == "regressed" else ""
+        lines.append(f"{r['name']:28s} {base:>12s} {cur:>12s} {ratio:>7s}  {flag}{r['status']}")
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("baseline")
+    parser.add_argument("current")
+    parser.add_argument("--threshold", type=float, default=0.2, help="allowed slowdown, 0.2 = 20%%")
+    parser.add_argument("--min-delta", type=float, default=0.002, help="ignore slowdowns below this many seconds")
+    parser.add_argument("--json", action="store_true", help="print rows as JSON")
+    args = parser.parse_args()
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    with open(args.current) as f:
+        current = json.load(f)
+    if baseline["meta"].get("cpu_count") != current["meta"].get("cpu_count"):
+        print("⚠️ Baseline was recorded on a machine with a different CPU count; ratios may be off")
+    rows = compare(baseline, current, args.threshold, args.min_delta)
+    print(json.dumps(rows, indent=2) if args.json else format_rows(rows))
+    regressed = [r["name"] for r in rows if r["status"] == "regressed"]
+    if regressed:
+        print(f"❌ {len(regressed)} regression(s): {', '.join(regressed)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
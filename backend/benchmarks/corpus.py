@@ -0,0 +1,139 @@
+"""Deterministic synthetic compliance documents for benchmarks.
+
+The same ``(pages, seed)`` always produces the same text and the same PDF
+bytes, so timings from different runs and machines measure the code, not
+the input. Documents mix boilerplate with clauses the analysis looks for
+(retention, breach notification, transfers, KYC, ...).
+
+    python -m benchmarks.corpus --pages 20 --seed 1 --out /tmp/contract.pdf
+    python -m benchmarks.corpus --pages 5 --scanned --out /tmp/scan.pdf
+"""
+import argparse
+import os
+import random
+
+WORDS_PER_PAGE = 450
+
+BOILERPLATE = [
+    "The parties agree that this agreement constitutes the entire understanding between them.",
+    "Nothing in this agreement shall be construed as creating a partnership or joint venture.",
+    "Headings are for convenience only and shall not affect the interpretation of this agreement.",
+    "Each party shall bear its own costs in connection with the negotiation of this agreement.",
+    "Any notice under this agreement shall be given in writing to the address set out above.",
+    "This agreement may be executed in any number of counterparts, each of which is an original.",
+    "No failure or delay by a party in exercising any right shall operate as a waiver of it.",
+    "If any provision is held invalid, the remaining provisions shall continue in full force.",
+]
+
+CLAUSES = [
+    "The {party} shall retain personal data for {n} years after termination of the services.",
+    "Personal data may be stored indefinitely for analytics and product improvement purposes.",
+    "The {party} shall notify the customer of any personal data breach within {n} hours.",
+    "Customer data may be transferred to and processed in {country} without additional safeguards.",
+    "The {party} may engage sub-processors without prior written notice to the customer.",
+    "All data at rest shall be encrypted using industry standard algorithms and keys rotated every {n} days.",
+    "The {party} shall perform customer due diligence and know your customer checks before onboarding.",
+    "Suspicious transactions above {n} lakh rupees shall be reported to the financial intelligence unit.",
+    "Protected health information shall only be disclosed to personnel with a need to know.",
+    "The {party} shall maintain records of financial controls for at least {n} years for audit.",
+    "Cardholder data shall not be stored after authorization except as permitted by PCI DSS.",
+    "Data subjects may request access to, rectification or erasure of their personal data.",
+    "The customer may audit the {party}'s compliance with this agreement once every {n} months.",
+    "Liability of the {party} for data protection breaches shall not exceed the fees paid.",
+    "On termination the {party} shall return or destroy all customer data within {n} days.",
+]
+
+PARTIES = ["processor", "vendor", "service provider", "bank", "contractor"]
+COUNTRIES = ["Singapore", "the United States", "Ireland", "India", "Brazil"]
+
+
+def synthetic_pages(pages=1, seed=0, words_per_page=WORDS_PER_PAGE, clause_ratio=0.3):
+    """``pages`` strings of roughly ``words_per_page`` words each"""
+    rng = random.Random(seed)
+    out = []
+    for _ in range(pages):
+        sentences, words = [], 0
+        while words < words_per_page:
+            if rng.random() < clause_ratio:
+                sentence = rng.choice(CLAUSES).format(
+                    party=rng.choice(PARTIES), country=rng.choice(COUNTRIES), n=rng.randint(2, 90)
+                )
+            else:
+                sentence = rng.choice(BOILERPLATE)
+            sentences.append(f"{len(sentences) + 1}. {sentence}")
+            words += len(sentence.split()) + 1
+        out.append("\n".join(sentences))
+    return out
+
+
+def synthetic_text(pages=1, seed=0, **kwargs):
+    """The pages joined with form feeds (see ``chunking.page_breaks_from``)"""
+    return "\f".join(synthetic_pages(pages, seed, **kwargs))
+
+
+def write_text_pdf(path, pages=1, seed=0, **kwargs):
+    """A PDF with a text layer; returns the page strings it contains"""
+    from reportlab.lib.pagesizes import A4
+    from reportlab.pdfgen import canvas
+
+    content = synthetic_pages(pages, seed, **kwargs)
+    width, height = A4
+    # invariant=1 drops timestamps and ids so the bytes are reproducible
+    c = canvas.Canvas(path, pagesize=A4, invariant=1)
+    for page in content:
+        text = c.beginText(40, height - 50)
+        text.setFont("Helvetica", 8)
+        for line in page.split("\n"):
+            while line:
+                head, line = _wrap(line, c, width - 80)
+                text.textLine(head)
+        c.drawText(text)
+        c.showPage()
+    c.save()
+    return content
+
+
+def _wrap(line, c, max_width):
+    if c.stringWidth(line, "Helvetica", 8) <= max_width:
+        return line, ""
+    words = line.split(" ")
+    for cut in range(len(words) - 1, 0, -1):
+        head = " ".join(words[:cut])
+        if c.stringWidth(head, "Helvetica", 8) <= max_width:
+            return head, " ".join(words[cut:])
+    return line, ""
+
+
+def write_scanned_pdf(path, pages=1, seed=0, dpi=150, **kwargs):
+    """An image-only PDF (no text layer), as a scanner would produce"""
+    import fitz
+
+    content = write_text_pdf(path + ".src", pages, seed, **kwargs)
+    src = fitz.open(path + ".src")
+    out = fitz.open()
+    for page in src:
+        pix = page.get_pixmap(dpi=dpi, colorspace=fitz.csGRAY)
+        out.new_page(width=page.rect.width, height=page.rect.height).insert_image(
+            page.rect, stream=pix.tobytes("png")
+        )
+    out.save(path, garbage=3, deflate=True, no_new_id=True)
+    src.close()
+    out.close()
+    os.remove(path + ".src")
+    return content
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--scanned", action="store_true")
+    parser.add_argument("--out", required=True)
+    args = parser.parse_args()
+    write = write_scanned_pdf if args.scanned else write_text_pdf
+    write(args.out, args.pages, args.seed)
+    print(args.out)
+
+
+if __name__ == "__main__":
+    main()
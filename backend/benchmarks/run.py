@@ -0,0 +1,305 @@
+"""Microbenchmarks for each pipeline stage plus an end-to-end upload.
+
+Inputs come from ``benchmarks.corpus`` (deterministic), and the LLM is the
+local fake server, so only our own code is measured. Each benchmark reports
+median/min/p95 seconds over ``--repeat`` runs after a warm-up; stages whose
+dependencies are missing (tesseract, the embedding model, ...) are listed
+under ``skipped`` rather than failing the run.
+
+    cd backend
+    python -m benchmarks.run --pages 1,10,50 --out benchmarks/baselines/main.json
+    python -m benchmarks.run --only chunk,render --out /tmp/now.json
+    python -m benchmarks.compare benchmarks/baselines/main.json /tmp/now.json
+"""
+import argparse
+import datetime
+import json
+import os
+import platform
+import statistics
+import subprocess
+import tempfile
+import time
+
+from benchmarks.corpus import synthetic_pages, synthetic_text, write_scanned_pdf, write_text_pdf
+
+
+class Skip(Exception):
+    """Raised by a benchmark whose dependencies are not available"""
+
+
+def measure(fn, repeat=5, warmup=1):
+    """Call ``fn(i)`` ``warmup + repeat`` times; timings of the last ``repeat``"""
+    for i in range(warmup):
+        fn(i)
+    times = []
+    for i in range(warmup, warmup + repeat):
+        started = time.perf_counter()
+        fn(i)
+        times.append(time.perf_counter() - started)
+    times.sort()
+    return {
+        "median_s": round(statistics.median(times), 6),
+        "min_s": round(times[0], 6),
+        "p95_s": round(times[min(len(times) - 1, int(len(times) * 0.95))], 6),
+        "runs": repeat,
+    }
+
+
+# --- benchmarks: each takes (workdir, pages) and returns (fn, units) ---
+def bench_extract(workdir, pages):
+    from main import extract_text
+    path = os.path.join(workdir, f"text-{pages}.pdf")
+    write_text_pdf(path, pages)
+    return (lambda i: extract_text(path)), {"pages": pages, "bytes": os.path.getsize(path)}
+
+
+def bench_ocr(workdir, pages):
+    try:
+        from ingest.ocr import ocr_pdf
+    except ImportError as e:
+        raise Skip(str(e))
+    path = os.path.join(workdir, f"scan-{pages}.pdf")
+    write_scanned_pdf(path, pages)
+    try:
+        ocr_pdf(path)
+    except Exception as e:  # tesseract or poppler binaries missing
+        raise Skip(str(e))
+    return (lambda i: ocr_pdf(path)), {"pages": pages, "bytes": os.path.getsize(path)}
+
+
+def bench_chunk(workdir, pages):
+    from app.rag.chunking import iter_spans, page_breaks_from
+    text = synthetic_text(pages)
+    breaks = page_breaks_from(text)
+    return (lambda i: list(iter_spans(text, "word", 500, 50, page_breaks=breaks))), {
+        "pages": pages, "bytes": len(text)
+    }
+
+
+def bench_chunk_section(workdir, pages):
+    from app.rag.chunking import iter_section_spans, page_breaks_from
+    text = synthetic_text(pages)
+    breaks = page_breaks_from(text)
+    return (lambda i: list(iter_section_spans(text, page_breaks=breaks))), {"pages": pages, "bytes": len(text)}
+
+
+def _chunks(pages):
+    from app.rag.chunking import iter_spans
+    text = synthetic_text(pages)
+    return [text[s:e] for s, e in iter_spans(text, "word", 200, 0)]
+
+
+def bench_embed(workdir, pages):
+    from app.inference.engine import get_encoder
+    try:
+        encoder = get_encoder()
+    except Exception as e:  # no model files offline
+        raise Skip(f"encoder unavailable: {e}")
+    chunks = _chunks(pages)
+    return (lambda i: encoder.encode(chunks)), {"pages": pages, "items": len(chunks)}
+
+
+def bench_index(workdir, pages):
+    import faiss
+    import numpy as np
+    n = len(_chunks(pages)) * 20  # a corpus of ~20 such documents
+    rng = np.random.default_rng(0)
+    vectors = rng.standard_normal((n, 384)).astype("float32")
+    faiss.normalize_L2(vectors)
+    queries = vectors[:32].copy()
+
+    def run(i):
+        index = faiss.IndexFlatIP(vectors.shape[1])
+        index.add(vectors)
+        index.search(queries, 5)
+    return run, {"items": n}
+
+
+def _risks(pages):
+    rng_pages = synthetic_pages(pages, seed=1, words_per_page=60)
+    severities = ["CRITICAL", "HIGH", "MEDIUM", "LOW"]
+    return [{
+        "category": f"Finding {k + 1}",
+        "severity": severities[k % 4],
+        "description": page,
+        "recommendation": "Review the clause\nUpdate the contract\nRecord the decision",
+        "regulation": "GDPR",
+    } for k, page in enumerate(rng_pages)]
+
+
+def bench_render_summary(workdir, pages):
+    from pdf_generator import generate_summary_pdf
+    risks = _risks(pages)
+    out = os.path.join(workdir, "pdfs")
+    os.makedirs(out, exist_ok=True)
+    return (lambda i: generate_summary_pdf(risks, f"bench-{i}", 60, out)), {"items": len(risks)}
+
+
+def bench_render_risk(workdir, pages):
+    from pdf_generator import generate_risk_pdf
+    risks = _risks(pages)
+    out = os.path.join(workdir, "pdfs")
+    os.makedirs(out, exist_ok=True)
+
+    def run(i):
+        for risk in risks:
+            generate_risk_pdf(risk, f"bench-{i}", out)
+    return run, {"items": len(risks)}
+
+
+def bench_highlight(workdir, pages):
+    """Citation spans of 300 findings to highlight rectangles, from the saved word positions"""
+    from main import extract_text
+    from app.rag.positional_index import PositionalIndex, positions_path
+    path = os.path.join(workdir, f"highlight-{pages}.pdf")
+    write_text_pdf(path, pages)
+    text = extract_text(path, positions_path(path))
+    step = max(1, len(text) // 300)
+    risks = [{"severity": "HIGH", "category": f"Finding {k}", "citations": [{"start": s, "end": s + 400}]}
+             for k, s in enumerate(range(0, len(text), step))][:300]
+    return (lambda i: PositionalIndex.load(positions_path(path)).highlights(risks)), {
+        "pages": pages, "items": len(risks)
+    }
+
+
+def bench_upload(workdir, pages, llm_latency=0.0):
+    """POST /upload_documents/ with a fresh document each run (no dedupe)"""
+    from fastapi.testclient import TestClient
+
+    import main
+    from app.llm import gateway as gateway_mod
+    from app.llm.fake_openai import FakeOpenAI
+    from app.storage.blob_store import BlobStore
+    from ingest.near_duplicate import NearDuplicateIndex
+
+    root = os.path.join(workdir, f"upload-{pages}")
+    saved = main.PDF_DIR, main.blob_store, main.near_duplicates
+    main.PDF_DIR = os.path.join(root, "pdfs")
+    os.makedirs(main.PDF_DIR, exist_ok=True)
+    main.blob_store = BlobStore(os.path.join(root, "uploads"))
+    main.near_duplicates = NearDuplicateIndex(os.path.join(root, "near_duplicates.sig"))
+    settings = gateway_mod.OPENAI_BASE_URL, gateway_mod.OPENAI_API_KEY
+
+    def restore():
+        gateway_mod.OPENAI_BASE_URL, gateway_mod.OPENAI_API_KEY = settings
+        main.PDF_DIR, main.blob_store, main.near_duplicates = saved
+
+    server = None
+    try:
+        server = FakeOpenAI(latency=llm_latency).__enter__()
+        gateway_mod.OPENAI_BASE_URL, gateway_mod.OPENAI_API_KEY = server.base_url, "bench"
+        client = TestClient(main.app).__enter__()  # started once, like a server: lifespan runs
+    except BaseException:
+        if server:
+            server.__exit__(None, None, None)
+        restore()
+        raise
+    docs = []
+
+    def run(i):
+        while len(docs) <= i:
+            path = os.path.join(root, f"doc-{len(docs)}.pdf")
+            write_text_pdf(path, pages, seed=1000 + len(docs))
+            with open(path, "rb") as f:
+                docs.append(f.read())
+        res = client.post("/upload_documents/", files=[("files", (f"doc-{i}.pdf", docs[i], "application/pdf"))])
+        if res.status_code != 200:
+            raise RuntimeError(f"upload failed: {res.status_code} {res.text[:200]}")
+
+    def cleanup():
+        try:
+            client.__exit__(None, None, None)
+            server.__exit__(None, None, None)
+        finally:
+            restore()
+
+    run.cleanup = cleanup
+    return run, {"pages": pages}
+
+
+BENCHMARKS = {
+    "extract": bench_extract,
+    "ocr": bench_ocr,
+    "chunk": bench_chunk,
+    "chunk_section": bench_chunk_section,
+    "embed": bench_embed,
+    "index": bench_index,
+    "render_summary": bench_render_summary,
+    "render_risk": bench_render_risk,
+    "highlight": bench_highlight,
+    "upload": bench_upload,
+}
+
+
+def _git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except Exception:
+        return None
+
+
+def run_suite(names=None, sizes=(10,), repeat=5, warmup=1, llm_latency=0.0, log=print):
+    results, skipped = {}, {}
+    with tempfile.TemporaryDirectory(prefix="bench-") as workdir:
+        for name, bench in BENCHMARKS.items():
+            if names and not any(name == n or name.startswith(n + "_") for n in names):
+                continue
+            for pages in sizes:
+                key = f"{name}/{pages}p"
+                kwargs = {"llm_latency": llm_latency} if bench is bench_upload else {}
+                try:
+                    fn, units = bench(workdir, pages, **kwargs)
+                except Skip as e:
+                    skipped[name] = str(e)
+                    log(f"⚠️ {name} skipped: {e}")
+                    break
+                try:
+                    stats = measure(fn, repeat, warmup)
+                finally:
+                    getattr(fn, "cleanup", lambda: None)()
+                for unit, value in units.items():
+                    stats[unit] = value
+                    stats[f"{unit}_per_s"] = round(value / stats["median_s"], 1) if stats["median_s"] else None
+                results[key] = stats
+                log(f"{key:28s} median {stats['median_s'] * 1000:9.2f} ms   p95 {stats['p95_s'] * 1000:9.2f} ms")
+    return {
+        "meta": {
+            "created": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds"),
+            "commit": _git_commit(),
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "cpu_count": os.cpu_count(),
+            "repeat": repeat,
+            "llm_latency": llm_latency,
+        },
+        "benchmarks": results,
+        "skipped": skipped,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--only", help=f"comma-separated subset of: {', '.join(BENCHMARKS)}")
+    parser.add_argument("--pages", default="10", help="comma-separated document sizes in pages")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--warmup", type=int, default=1)
+    parser.add_argument("--llm-latency", type=float, default=0.0, help="seconds the fake LLM waits per call")
+    parser.add_argument("--out", help="write the results JSON here (e.g. a baseline)")
+    args = parser.parse_args()
+
+    names = args.only.split(",") if args.only else None
+    sizes = [int(p) for p in args.pages.split(",")]
+    report = run_suite(names, sizes, args.repeat, args.warmup, args.llm_latency)
+    if args.out:
+        os.makedirs(os.path.dirname(os.path.abspath(args.out)), exist_ok=True)
+        with open(args.out, "w") as f:
+            json.dump(report, f, indent=2, sort_keys=True)
+        print(f"✅ Results written to {args.out}")
+    else:
+        print(json.dumps(report, indent=2, sort_keys=True))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,318 @@
+"""Bulk, resumable ingestion of a document archive.
+
+    cd backend
+    python -m ingest.bulk /archive/2019 '/archive/2020/**/*.pdf' --out vector_store --workers 8
+
+The driver first hashes every new file (on threads; hashing is I/O bound)
+and dispatches each content once: a copy of a file that is already done is
+recorded as skipped, and a copy of one earlier in the same run is recorded
+with the outcome of that original once it is known. Files are
+spread over a process pool. Each worker loads the encoder once, pinned to
+``--threads`` threads, so N workers use N cores without oversubscribing
+them. A worker takes a batch of files, extracts the text of each one (OCR
+when a PDF has no text layer) and chunks it. It then embeds the chunks of
+the whole batch in one pass and writes:
+- the batch as one vector shard, ``shards/<id>.index`` plus ``.meta.json``
+- each document's word positions, ``positions/<sha256>.words.npz``
+
+Every finished file is appended to ``manifest.jsonl``. A rerun skips files
+that are already done, matched by the same path, size and mtime, or else
+by the same SHA-256. An interrupted back-load resumes where it stopped, and
+failed files are retried on the next run.
+"""
+import argparse
+import glob
+import hashlib
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+
+BULK_WORKERS = int(os.environ.get("BULK_WORKERS", os.cpu_count() or 1))
+BULK_BATCH_FILES = int(os.environ.get("BULK_BATCH_FILES", 16))
+BULK_EMBED_BATCH = int(os.environ.get("BULK_EMBED_BATCH", 128))
+EXTENSIONS = (".pdf",)
+
+# Per-process state, set up once by init_worker
+_worker = {"ocr": True, "threads": 1, "encoder": None}
+
+
+def discover(patterns, extensions=EXTENSIONS):
+    """Files under directories or matching globs, sorted and without repeats"""
+    found = set()
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            for root, _, names in os.walk(pattern):
+                found.update(os.path.join(root, n) for n in names if n.lower().endswith(extensions))
+        else:
+            found.update(p for p in glob.glob(pattern, recursive=True)
+                         if os.path.isfile(p) and p.lower().endswith(extensions))
+    return sorted(os.path.abspath(p) for p in found)
+
+
+def sha256_of_file(path, chunk_size=1024 * 1024):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def _hash(path):
+    """``(sha256, None)``, or ``(None, error)`` for a file that cannot be read"""
+    try:
+        return sha256_of_file(path), None
+    except OSError as e:
+        return None, f"{type(e).__name__}: {e}"
+
+
+# --- manifest ---
+def load_manifest(path):
+    """``(done_shas, done_stats)`` of files finished (or found identical to one) by earlier runs"""
+    done, stats, skipped = set(), set(), []
+    if not os.path.exists(path):
+        return done, stats
+    with open(path) as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue  # a line torn by a crash
+            if record.get("status") == "done":
+                done.add(record["sha256"])
+                stats.add((record["path"], record["size"], record["mtime_ns"]))
+            elif record.get("status") == "skipped":
+                skipped.append(record)
+    # a copy only counts once the content it copies was ingested
+    stats.update((r["path"], r["size"], r["mtime_ns"]) for r in skipped if r["sha256"] in done)
+    return done, stats
+
+
+def append_manifest(f, records):
+    for record in records:
+        f.write(json.dumps(record) + "\n")
+    f.flush()
+    os.fsync(f.fileno())
+
+
+def remove_orphan_shards(out, manifest_path):
+    """Drop shards written by a batch that crashed before reaching the manifest"""
+    shard_dir = os.path.join(out, "shards")
+    if not os.path.isdir(shard_dir):
+        return 0
+    kept = set()
+    if os.path.exists(manifest_path):
+        with open(manifest_path) as f:
+            for line in f:
+                try:
+                    kept.add(json.loads(line).get("shard"))
+                except ValueError:
+                    continue
+    removed = 0
+    for name in os.listdir(shard_dir):
+        if name.split(".", 1)[0] not in kept:
+            os.remove(os.path.join(shard_dir, name))
+            removed += 1
+    return removed
+
+
+# --- worker side ---
+def init_worker(ocr=True, threads=1):
+    _worker.update(ocr=ocr, threads=threads, encoder=None)
+
+
+def load_encoder(threads):
+    from app.inference import engine
+    engine.INFERENCE_THREADS = threads
+    return engine.get_encoder()
+
+
+def _encoder():
+    if _worker["encoder"] is None:
+        _worker["encoder"] = load_encoder(_worker["threads"])
+    return _worker["encoder"]
+
+
+def extract_document(path, ocr=True):
+    """``(text, pages, positions)`` of a PDF; OCR only when it has no text layer"""
+    import fitz
+    from app.rag.positional_index import PositionalIndexBuilder
+    from ingest.extract import extract_text
+    with fitz.open(path) as doc:
+        pages = doc.page_count
+    builder = PositionalIndexBuilder()
+    text = extract_text(path, builder)
+    positions = builder.build()
+    if not text.strip() and ocr:
+        from ingest.ocr import ocr_pdf
+        builder = PositionalIndexBuilder()
+        text = ocr_pdf(path, positions=builder)
+        positions = builder.build()
+    return text, pages, positions
+
+
+def ingest_batch(files, out):
+    """
+    Ingest ``files`` (``(path, size, mtime_ns, sha256)`` tuples) as one shard.
+    Returns one manifest record per file; failures are recorded, not raised.
+    """
+    import numpy as np
+    from app.rag.positional_index import positions_path
+    from ingest.embed import chunk_spans
+
+    records, docs = [], []
+    for path, size, mtime_ns, sha256 in files:
+        started = time.perf_counter()
+        record = {"path": path, "size": size, "mtime_ns": mtime_ns, "sha256": sha256}
+        try:
+            text, pages, positions = extract_document(path, _worker["ocr"])
+            spans = list(chunk_spans(text, page_breaks=positions.page_breaks()))
+            if not spans:
+                raise ValueError("no text extracted")
+            positions.chunks = spans
+            docs.append((record, text, spans, positions, started))
+            record.update(pages=pages, chunks=len(spans))
+        except Exception as e:
+            records.append({**record, "status": "failed", "error": f"{type(e).__name__}: {e}",
+                            "seconds": round(time.perf_counter() - started, 3)})
+    if not docs:
+        return records
+
+    shard_id = hashlib.sha256("".join(r["sha256"] for r, *_ in docs).encode()).hexdigest()[:16]
+    try:
+        chunks = [text[s:e] for _, text, spans, _, _ in docs for s, e in spans]
+        embeddings = np.asarray(_encoder().encode(chunks, batch_size=BULK_EMBED_BATCH), dtype="float32")
+        meta = []
+        for record, _, spans, positions, _ in docs:
+            os.makedirs(os.path.join(out, "positions"), exist_ok=True)
+            positions.save(positions_path(os.path.join(out, "positions", record["sha256"])))
+            for s, e in spans:
+                lo, hi = positions.word_range(s, e)
+                page = int(positions.page[lo]) if lo < hi else None
+                meta.append({"sha256": record["sha256"], "file": record["path"], "start": s, "end": e, "page": page})
+        write_shard(os.path.join(out, "shards", shard_id), embeddings, meta)
+    except Exception as e:
+        error = f"{type(e).__name__}: {e}"
+        return records + [{**r, "status": "failed", "error": error} for r, *_ in docs]
+    return records + [{**r, "status": "done", "shard": shard_id, "seconds": round(time.perf_counter() - started, 3)}
+                      for r, _, _, _, started in docs]
+
+
+def write_shard(base, embeddings, meta):
+    """One faiss index per batch, laid out like ``build_index`` output"""
+    import faiss
+    os.makedirs(os.path.dirname(base), exist_ok=True)
+    index = faiss.IndexFlatL2(embeddings.shape[1])
+    index.add(embeddings)
+    faiss.write_index(index, base + ".index.tmp")
+    with open(base + ".index.meta.json.tmp", "w") as f:
+        json.dump({"count": len(meta), "chunks": meta}, f)
+    os.replace(base + ".index.meta.json.tmp", base + ".index.meta.json")
+    os.replace(base + ".index.tmp", base + ".index")
+
+
+# --- driver ---
+def run(patterns, out="vector_store", workers=BULK_WORKERS, batch_files=BULK_BATCH_FILES, threads=1, ocr=True,
+        manifest=None, log=print):
+    """Ingest everything matching ``patterns`` that is not done yet; returns the throughput report"""
+    started = time.perf_counter()
+    os.makedirs(out, exist_ok=True)
+    manifest = manifest or os.path.join(out, "manifest.jsonl")
+    remove_orphan_shards(out, manifest)
+    done, stats = load_manifest(manifest)
+
+    files = discover(patterns)
+    pending = []
+    for path in files:
+        st = os.stat(path)
+        if (path, st.st_size, st.st_mtime_ns) not in stats:
+            pending.append((path, st.st_size, st.st_mtime_ns))
+    with ThreadPoolExecutor(max_workers=2 * max(1, workers)) as pool:
+        hashes = list(pool.map(_hash, [path for path, _, _ in pending]))
+    todo, resolved, copies = [], [], {}
+    for (path, size, mtime_ns), (sha256, error) in zip(pending, hashes):
+        record = {"path": path, "size": size, "mtime_ns": mtime_ns}
+        if error:
+            resolved.append({**record, "status": "failed", "error": error})
+        elif sha256 in done:
+            resolved.append({**record, "sha256": sha256, "status": "skipped"})
+        elif sha256 in copies:  # settled when the first file with this content is
+            copies[sha256].append({**record, "sha256": sha256})
+        else:
+            copies[sha256] = []
+            todo.append((path, size, mtime_ns, sha256))
+    batches = [todo[i:i + batch_files] for i in range(0, len(todo), batch_files)]
+    report = {"files": len(files), "done": 0, "skipped": len(files) - len(pending), "failed": 0,
+              "pages": 0, "chunks": 0, "failures": []}
+    log(f"{len(files)} files, {len(todo)} to ingest in {len(batches)} batches on {workers} workers")
+
+    def collect(records, f):
+        settled = []
+        for record in records:
+            for copy in copies.get(record.get("sha256"), ()):
+                if record["status"] == "done":
+                    settled.append({**copy, "status": "skipped"})
+                else:
+                    settled.append({**copy, "status": "failed", "error": f"copy of {record['path']}: {record['error']}"})
+        records = records + settled
+        append_manifest(f, records)
+        for record in records:
+            status = record["status"]
+            report[status] += 1
+            if status == "done":
+                report["pages"] += record["pages"]
+                report["chunks"] += record["chunks"]
+            elif status == "failed":
+                report["failures"].append({"path": record["path"], "error": record["error"]})
+        elapsed = time.perf_counter() - started
+        log(f"{report['done'] + report['skipped'] + report['failed']}/{len(files)} files, "
+            f"{report['done'] / elapsed:.2f} docs/s, {report['pages'] / elapsed:.1f} pages/s, {report['failed']} failed")
+
+    with open(manifest, "a") as f:
+        if resolved:
+            collect(resolved, f)
+        if workers <= 1 or len(batches) <= 1:
+            init_worker(ocr, threads)
+            for batch in batches:
+                collect(ingest_batch(batch, out), f)
+        else:
+            with ProcessPoolExecutor(max_workers=workers, initializer=init_worker,
+                                     initargs=(ocr, threads)) as pool:
+                futures = [pool.submit(ingest_batch, batch, out) for batch in batches]
+                for future in as_completed(futures):
+                    collect(future.result(), f)
+
+    seconds = time.perf_counter() - started
+    report.update(
+        seconds=round(seconds, 3),
+        docs_per_s=round(report["done"] / seconds, 3),
+        pages_per_s=round(report["pages"] / seconds, 3),
+        workers=workers,
+    )
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("paths", nargs="+", help="directories or glob patterns")
+    parser.add_argument("--out", default="vector_store")
+    parser.add_argument("--workers", type=int, default=BULK_WORKERS)
+    parser.add_argument("--batch-files", type=int, default=BULK_BATCH_FILES, help="files embedded together")
+    parser.add_argument("--threads", type=int, default=1, help="inference threads per worker")
+    parser.add_argument("--no-ocr", action="store_true", help="fail PDFs without a text layer instead of OCR")
+    parser.add_argument("--manifest", help="defaults to <out>/manifest.jsonl")
+    parser.add_argument("--report", help="also write the JSON report here")
+    args = parser.parse_args(argv)
+
+    report = run(args.paths, args.out, args.workers, args.batch_files, args.threads, not args.no_ocr,
+                 args.manifest, log=lambda msg: print(msg, file=sys.stderr))
+    print(json.dumps(report, indent=2))
+    if args.report:
+        with open(args.report, "w") as f:
+            json.dump(report, f, indent=2)
+    return 1 if report["failed"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,20 +1,15 @@
-from sentence_transformers import SentenceTransformer
 import faiss, numpy as np, json, os
+from app.rag.chunking import iter_spans
+from app.inference.engine import get_encoder
 
-MODEL = os.environ.get("EMBEDDING_MODEL", "all-MiniLM-L6-v2")
-model = SentenceTransformer(MODEL)
+def chunk_spans(text, size=500, overlap=50, page_breaks=None):
+    return iter_spans(text, "word", size, overlap, page_breaks=page_breaks)
 
 def chunk_text(text, size=500, overlap=50):
-    words = text.split()
-    chunks = []
-    i = 0
-    while i < len(words):
-        chunks.append(" ".join(words[i:i+size]))
-        i += size - overlap
-    return [c for c in chunks if c.strip()]
+    return [text[s:e] for s, e in chunk_spans(text, size, overlap)]
 
 def build_index(chunks, out="vector_store.index"):
-    embs = model.encode(chunks, show_progress_bar=True)
+    embs = get_encoder().encode(chunks, show_progress_bar=True)
     embs = np.array(embs).astype("float32")
     dim = embs.shape[1]
     index = faiss.IndexFlatL2(dim)
@@ -0,0 +1,22 @@
+"""Text of PDFs that have a text layer, shared by the API, the worker and bulk ingestion"""
+import os
+
+from app.observability.stages import stage
+
+
+def extract_text(pdf_path, words=None):
+    """Text of every page, one line break after each; ``words`` (a
+    ``PositionalIndexBuilder``) also receives every word's position"""
+    import pdfplumber
+    text = ""
+    with stage("extract", bytes=os.path.getsize(pdf_path)) as s, pdfplumber.open(pdf_path) as pdf:
+        for page_no, page in enumerate(pdf.pages):
+            # the text map is what page.extract_text() renders, kept with its chars
+            textmap = page.get_textmap()
+            page_text = textmap.as_string
+            if page_text:
+                if words is not None:
+                    words.add_textmap(page_no, len(text), textmap)
+                text += page_text + "\n"
+        s.add(pages=len(pdf.pages))
+    return text
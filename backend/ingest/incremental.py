@@ -0,0 +1,160 @@
+"""Version-aware, chunk-level re-ingestion.
+
+Each document keeps a small store under ``<outdir>/<doc_key>/``:
+
+- ``chunks.json``     version, document hash and one record per chunk
+                      (content hash, span, findings)
+- ``embeddings.npy``  one row per chunk, aligned with ``chunks.json``
+- ``index.faiss``     inner-product index keyed by stable 63-bit chunk ids
+
+A new version is chunked with content-defined ``section`` chunks, so an
+amendment only changes the chunks it touches. Unchanged chunks keep their
+embeddings and findings; only added chunks are embedded and analyzed, and
+the FAISS index is updated in place with ``remove_ids``/``add_with_ids``.
+"""
+import hashlib
+import json
+import os
+
+import faiss
+import numpy as np
+
+from app.rag.chunking import iter_spans
+
+CHUNK_WORDS = int(os.environ.get("INCREMENTAL_CHUNK_WORDS", 300))
+
+
+def chunk_hash(chunk):
+    return hashlib.sha256(" ".join(chunk.split()).encode()).hexdigest()
+
+
+def chunk_id(digest):
+    """Stable FAISS id (positive int64) derived from a chunk hash"""
+    return int(digest[:16], 16) & 0x7FFFFFFFFFFFFFFF
+
+
+def _paths(store_dir):
+    return (
+        os.path.join(store_dir, "chunks.json"),
+        os.path.join(store_dir, "embeddings.npy"),
+        os.path.join(store_dir, "index.faiss"),
+    )
+
+
+def load_version(store_dir):
+    """Previous manifest and embeddings, or ``(None, None)`` for a new document"""
+    manifest_path, emb_path, _ = _paths(store_dir)
+    if not os.path.exists(manifest_path):
+        return None, None
+    with open(manifest_path) as f:
+        manifest = json.load(f)
+    return manifest, np.load(emb_path)
+
+
+def _save_atomic(path, write, mode="wb"):
+    """Write through ``write(file)`` to a temp file, fsync it, then swap it in"""
+    tmp_path = path + ".tmp"
+    with open(tmp_path, mode) as f:
+        write(f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def reingest(store_dir, text, embed, analyze=None, page_breaks=None):
+    """Ingest ``text`` as the next version of the document stored in ``store_dir``.
+
+    ``embed(list_of_str) -> np.ndarray`` and the optional
+    ``analyze(list_of_str) -> list_of_findings_lists`` are only called for
+    chunks that did not exist in the previous version. Returns a report with
+    the new version number and the added/removed/unchanged counts.
+
+    Raises ``ValueError`` for a first version without any text: there is
+    nothing to size the vector index by. A later empty version is fine and
+    removes every chunk.
+    """
+    os.makedirs(store_dir, exist_ok=True)
+    manifest_path, emb_path, index_path = _paths(store_dir)
+    previous, old_embeddings = load_version(store_dir)
+    old_rows = {}
+    if previous:
+        old_rows = {c["hash"]: (row, c) for row, c in enumerate(previous["chunks"])}
+
+    spans = list(iter_spans(text, "section", CHUNK_WORDS, page_breaks=page_breaks))
+    chunks = []
+    new_positions = []
+    seen = set()
+    for start, end in spans:
+        digest = chunk_hash(text[start:end])
+        if digest in seen:
+            continue  # identical boilerplate repeated in the document
+        seen.add(digest)
+        record = {"id": chunk_id(digest), "hash": digest, "start": start, "end": end}
+        if digest in old_rows:
+            record["findings"] = old_rows[digest][1].get("findings", [])
+        else:
+            new_positions.append(len(chunks))
+        chunks.append(record)
+
+    if not chunks and previous is None:
+        raise ValueError("no text to ingest for a new document")
+
+    added_texts = [text[chunks[i]["start"]:chunks[i]["end"]] for i in new_positions]
+    added_embeddings = None
+    if added_texts:
+        added_embeddings = np.asarray(embed(added_texts), dtype="float32")
+        faiss.normalize_L2(added_embeddings)
+    if analyze is not None and added_texts:
+        for i, findings in zip(new_positions, analyze(added_texts)):
+            chunks[i]["findings"] = findings
+    for i in new_positions:
+        chunks[i].setdefault("findings", [])
+
+    # Carry unchanged rows over, slot in the fresh ones
+    dim = added_embeddings.shape[1] if added_embeddings is not None else old_embeddings.shape[1]
+    embeddings = np.empty((len(chunks), dim), dtype="float32")
+    fresh = dict(zip(new_positions, range(len(new_positions))))
+    for i, record in enumerate(chunks):
+        if i in fresh:
+            embeddings[i] = added_embeddings[fresh[i]]
+        else:
+            embeddings[i] = old_embeddings[old_rows[record["hash"]][0]]
+
+    # Update the vector index in place
+    if os.path.exists(index_path):
+        index = faiss.read_index(index_path)
+    else:
+        index = faiss.IndexIDMap2(faiss.IndexFlatIP(dim))
+    current = {c["hash"] for c in chunks}
+    removed_ids = [c["id"] for h, (_, c) in old_rows.items() if h not in current]
+    if removed_ids:
+        index.remove_ids(np.array(removed_ids, dtype="int64"))
+    if new_positions:
+        index.add_with_ids(added_embeddings, np.array([chunks[i]["id"] for i in new_positions], dtype="int64"))
+
+    version = (previous["version"] + 1) if previous else 1
+    manifest = {
+        "version": version,
+        "hash": hashlib.sha256(text.encode()).hexdigest(),
+        "chunks": chunks,
+    }
+    # The manifest goes last: until it is replaced, the previous version stands
+    _save_atomic(emb_path, lambda f: np.save(f, embeddings))
+    _save_atomic(index_path, lambda f: f.write(faiss.serialize_index(index).tobytes()))
+    _save_atomic(manifest_path, lambda f: json.dump(manifest, f), mode="w")
+
+    return {
+        "version": version,
+        "hash": manifest["hash"],
+        "chunks": len(chunks),
+        "added": len(new_positions),
+        "removed": len(removed_ids),
+        "unchanged": len(chunks) - len(new_positions),
+        "findings": [f for c in chunks for f in c["findings"]],
+    }
+
+
+def apply_to_document(doc, report):
+    """Record the ingested version on a ``Document`` row"""
+    doc.version = report["version"]
+    doc.hash = report["hash"]
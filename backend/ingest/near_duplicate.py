@@ -0,0 +1,280 @@
+"""Near-duplicate detection for uploaded documents (MinHash + LSH).
+
+Lightly edited copies of a template contract get a MinHash signature over
+word shingles. Signatures are split into LSH bands; a lookup only compares
+against documents sharing at least one band, a binary search per band
+regardless of index size. Per-document payloads (risks tagged with the
+sections they rest on, section digests) are read only for the best match and
+let the caller reuse an earlier analysis and only analyze the sections that
+changed.
+"""
+import hashlib
+import json
+import os
+import re
+import threading
+import zlib
+
+import numpy as np
+
+NUM_PERM = int(os.environ.get("MINHASH_PERMUTATIONS", 128))
+LSH_BANDS = int(os.environ.get("MINHASH_BANDS", 32))
+SHINGLE_SIZE = 5
+NEAR_DUPLICATE_THRESHOLD = float(os.environ.get("NEAR_DUPLICATE_THRESHOLD", 0.9))
+LSH_MERGE_EVERY = int(os.environ.get("LSH_MERGE_EVERY", 50000))
+
+# One signature record: id (a SHA-256 hex digest fits) then the signature
+_ID_BYTES = 64
+_RECORD = np.dtype([("id", f"S{_ID_BYTES}"), ("sig", "<u4", (NUM_PERM,))])
+_BAND_MIX = np.uint64(0x9E3779B97F4A7C15)
+
+_MERSENNE = np.uint64((1 << 61) - 1)
+_rng = np.random.RandomState(1)
+_A = _rng.randint(1, 1 << 32, size=NUM_PERM, dtype=np.uint64)
+_B = _rng.randint(0, 1 << 32, size=NUM_PERM, dtype=np.uint64)
+
+_WORD_RE = re.compile(r"\w+")
+_SECTION_RE = re.compile(r"\n\s*\n")
+_LINE_RE = re.compile(r"[^\n\r\v\f\x1c\x1d\x1e\x85\u2028\u2029]+")  # what str.splitlines splits on
+
+
+def _shingle_hashes(text):
+    words = _WORD_RE.findall(text.lower())
+    if len(words) < SHINGLE_SIZE:
+        words = words + [""] * (SHINGLE_SIZE - len(words))
+    grams = {" ".join(words[i:i + SHINGLE_SIZE]) for i in range(len(words) - SHINGLE_SIZE + 1)}
+    return np.fromiter((zlib.crc32(g.encode()) for g in grams), dtype=np.uint64, count=len(grams))
+
+
+def minhash(text, block=8192):
+    """128 x uint32 MinHash signature of the document's word 5-gram set"""
+    hashes = _shingle_hashes(text)
+    sig = np.full(NUM_PERM, np.iinfo(np.uint32).max, dtype=np.uint64)
+    for i in range(0, len(hashes), block):
+        # a, b, h < 2**32 so a*h+b fits in uint64
+        h = hashes[i:i + block, None]
+        perm = (h * _A + _B) % _MERSENNE & np.uint64(0xFFFFFFFF)
+        np.minimum(sig, perm.min(axis=0), out=sig)
+    return sig.astype(np.uint32)
+
+
+def similarity(sig_a, sig_b):
+    """Estimated Jaccard similarity of two signatures"""
+    return float(np.count_nonzero(sig_a == sig_b)) / len(sig_a)
+
+
+# --- Section diffing ---
+def section_spans(text):
+    """``(start, end)`` of each paragraph (blank-line separated), falling back to lines"""
+    spans, pos = [], 0
+    for m in _SECTION_RE.finditer(text):
+        spans.append((pos, m.start()))
+        pos = m.end()
+    spans.append((pos, len(text)))
+    spans = [(s, e) for s, e in spans if text[s:e].strip()]
+    if len(spans) < 2:
+        spans = [m.span() for m in _LINE_RE.finditer(text) if m.group().strip()]
+    return spans
+
+
+def split_sections(text):
+    return [text[s:e] for s, e in section_spans(text)]
+
+
+def _digest(section):
+    return hashlib.sha1(" ".join(section.lower().split()).encode()).hexdigest()
+
+
+def section_digests(text):
+    return [_digest(s) for s in split_sections(text)]
+
+
+def differing_sections(text, previous_digests):
+    """Sections of ``text`` that do not appear in the previous version"""
+    seen = set(previous_digests)
+    return [s for s in split_sections(text) if _digest(s) not in seen]
+
+
+def join_sections(text, spans, sep="\n\n"):
+    """Some sections of ``text`` as one text, with their ``(start, end)`` in it"""
+    joined, pos = [], 0
+    for s, e in spans:
+        joined.append((pos, pos + e - s))
+        pos += e - s + len(sep)
+    return sep.join(text[s:e] for s, e in spans), joined
+
+
+def cited_sections(citations, spans):
+    """Indices of the sections a risk's citations overlap"""
+    return [i for i, (s, e) in enumerate(spans)
+            if any(c["start"] < e and s < c["end"] for c in citations or ())]
+
+
+def rebase_citations(citations, from_spans, to_spans):
+    """
+    Move citations from one text onto another, section by section:
+    ``from_spans[i]`` and ``to_spans[i]`` hold the same section in each. A
+    citation crossing sections is split; one outside all of them is dropped.
+    """
+    rebased = []
+    for c in citations or ():
+        for (fs, fe), (ts, te) in zip(from_spans, to_spans):
+            s, e = max(c["start"], fs), min(c["end"], fe)
+            if s < e:
+                rebased.append({**c, "start": ts + min(s - fs, te - ts), "end": ts + min(e - fs, te - ts)})
+    return rebased
+
+
+# --- Index ---
+class NearDuplicateIndex:
+    """LSH index over signatures; payloads are kept apart and read on demand.
+
+    Memory holds only ids, signatures and band hashes. With a ``path`` the
+    signatures are an append-only file of fixed-size records, memory-mapped,
+    and each payload is a JSON file under ``<path>.payloads/``, written before
+    its record so a match always has one. Several processes (API, workers,
+    bulk ingestion) can share one path; each picks up the others' records by
+    reading the tail on the next lookup.
+
+    The band hashes of most records sit in one sorted array per band, so a
+    lookup is a binary search per band. Records added since then go to small
+    dict buckets until ``merge_every`` of them are folded in.
+    """
+
+    def __init__(self, path=None, bands=LSH_BANDS, merge_every=LSH_MERGE_EVERY):
+        if NUM_PERM % bands:
+            raise ValueError("bands must divide the number of permutations")
+        self.path = path
+        self.payload_dir = path + ".payloads" if path else None
+        self.bands = bands
+        self.rows = NUM_PERM // bands
+        self.merge_every = merge_every
+        self._lock = threading.Lock()
+        self._payloads = {}  # only without a path
+        self._base = np.zeros(0, dtype=_RECORD)
+        self._sorted = self._sort(self._base)
+        self._recent = []  # (doc_id, sig) added after the base
+        self._recent_buckets = [dict() for _ in range(bands)]
+        self._loaded = 0  # records read from the file
+        self.refresh()
+
+    def __len__(self):
+        return len(self._base) + len(self._recent)
+
+    def _band_hashes(self, sigs):
+        """``(n, bands)`` uint64 hash of each band of each signature"""
+        x = sigs.reshape(len(sigs), self.bands, self.rows).astype(np.uint64)
+        h = np.zeros(x.shape[:2], dtype=np.uint64)
+        for r in range(self.rows):
+            h = h * _BAND_MIX + x[:, :, r]  # wraps modulo 2**64
+        return h
+
+    def _sort(self, base, block=65536):
+        hashes = np.empty((len(base), self.bands), dtype=np.uint64)
+        for i in range(0, len(base), block):
+            hashes[i:i + block] = self._band_hashes(np.asarray(base["sig"][i:i + block]))
+        order = np.argsort(hashes, axis=0, kind="stable")
+        return [(hashes[order[:, b], b], order[:, b]) for b in range(self.bands)]
+
+    def _merge(self, base):
+        self._base = base
+        self._sorted = self._sort(base)
+        self._recent = []
+        self._recent_buckets = [dict() for _ in range(self.bands)]
+
+    def _insert(self, doc_id, sig):
+        for band, key in zip(self._recent_buckets, self._band_hashes(sig[None])[0].tolist()):
+            band.setdefault(key, []).append(len(self._recent))
+        self._recent.append((doc_id, sig))
+
+    def refresh(self):
+        """Load records appended since the last read"""
+        if not self.path or not os.path.exists(self.path):
+            return
+        # A record still being written by another process is not counted yet
+        total = os.path.getsize(self.path) // _RECORD.itemsize
+        with self._lock:
+            if total <= self._loaded:
+                return
+            if total - len(self._base) >= self.merge_every:
+                self._merge(np.memmap(self.path, dtype=_RECORD, mode="r", shape=(total,)))
+            else:
+                new = np.fromfile(self.path, dtype=_RECORD, count=total - self._loaded,
+                                  offset=self._loaded * _RECORD.itemsize)
+                for rec in new:
+                    self._insert(rec["id"].decode(), rec["sig"])
+            self._loaded = total
+
+    def _payload_path(self, doc_id):
+        key = hashlib.sha256(doc_id.encode()).hexdigest()
+        return os.path.join(self.payload_dir, key[:2], key + ".json")
+
+    def payload(self, doc_id):
+        """The metadata stored with ``doc_id``, read from disk when file-backed"""
+        if not self.path:
+            return self._payloads.get(doc_id, {})
+        try:
+            with open(self._payload_path(doc_id)) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+
+    def add(self, doc_id, sig, meta=None):
+        doc_id = str(doc_id)
+        record = np.zeros(1, dtype=_RECORD)
+        record["id"] = doc_id.encode()
+        if record["id"][0].decode() != doc_id:
+            raise ValueError(f"document ids are limited to {_ID_BYTES} bytes")
+        record["sig"] = sig
+        if not self.path:
+            with self._lock:
+                self._payloads[doc_id] = meta or {}
+                self._insert(doc_id, record["sig"][0])
+                if len(self._recent) >= self.merge_every:
+                    recent = np.array(self._recent, dtype=_RECORD)
+                    self._merge(np.concatenate([self._base, recent]))
+            return
+        if meta:
+            path = self._payload_path(doc_id)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path + ".tmp", "w") as f:
+                json.dump(meta, f)
+            os.replace(path + ".tmp", path)
+        with open(self.path, "ab") as f:
+            f.write(record.tobytes())
+        self.refresh()
+
+    def query(self, sig, threshold=NEAR_DUPLICATE_THRESHOLD, exclude=None):
+        """Best match as ``(doc_id, similarity, payload)`` at or above ``threshold``, else None"""
+        self.refresh()
+        keys = self._band_hashes(np.asarray(sig)[None])[0]
+        rows, recent = set(), set()
+        with self._lock:
+            for (hashes, order), bucket, key in zip(self._sorted, self._recent_buckets, keys):
+                lo, hi = np.searchsorted(hashes, key, "left"), np.searchsorted(hashes, key, "right")
+                rows.update(order[lo:hi].tolist())
+                recent.update(bucket.get(int(key), ()))
+            candidates = [(self._base["id"][r].decode(), self._base["sig"][r]) for r in rows]
+            candidates += [self._recent[i] for i in recent]
+        best = None
+        for doc_id, candidate in candidates:
+            if exclude is not None and doc_id == str(exclude):
+                continue
+            score = similarity(sig, candidate)
+            if score >= threshold and (best is None or score > best[1]):
+                best = (doc_id, score)
+        if best is None:
+            return None
+        return best[0], best[1], self.payload(best[0])
+
+
+_shared = {}
+_shared_lock = threading.Lock()
+
+
+def shared_index(path):
+    """One index per log path for the whole process, instead of one per call"""
+    with _shared_lock:
+        if path not in _shared:
+            _shared[path] = NearDuplicateIndex(path)
+        return _shared[path]
@@ -1,9 +1,55 @@
 from pdf2image import convert_from_path
 import pytesseract
+import hashlib, os
+from app.observability.stages import stage
 
-def ocr_pdf(path):
-    images = convert_from_path(path)
-    text = []
-    for img in images:
-        text.append(pytesseract.image_to_string(img))
+# Render resolution; word boxes are scaled back to PDF points with 72 / OCR_DPI
+OCR_DPI = int(os.environ.get("OCR_DPI", 200))
+
+def _tesseract(img, words):
+    if not words:
+        return pytesseract.image_to_string(img)
+    # text and word boxes from a single recognition pass
+    text, tsv = pytesseract.run_and_get_multiple_output(img, extensions=["txt", "tsv"])
+    return text, tsv
+
+def ocr_page(img, cache_dir=None, words=False):
+    # Pages are cached by the hash of their rendered pixels, so an unchanged
+    # page of a new document version is never re-OCR'd. With ``words`` the
+    # result is ``(text, tsv)``, the TSV holding Tesseract's word boxes
+    if not cache_dir:
+        return _tesseract(img, words)
+    key = hashlib.sha256(img.tobytes()).hexdigest()
+    path = os.path.join(cache_dir, key + ".txt")
+    if os.path.exists(path) and (not words or os.path.exists(path[:-4] + ".tsv")):
+        with open(path) as f:
+            text = f.read()
+        if not words:
+            return text
+        with open(path[:-4] + ".tsv") as f:
+            return text, f.read()
+    result = _tesseract(img, words)
+    os.makedirs(cache_dir, exist_ok=True)
+    for ext, content in zip((".txt", ".tsv"), result if words else (result,)):
+        out = path[:-4] + ext
+        with open(out + ".tmp", "w") as f:
+            f.write(content)
+        os.replace(out + ".tmp", out)
+    return result
+
+def ocr_pdf(path, cache_dir=None, positions=None):
+    """OCR text of a scanned PDF; word positions go into ``positions`` (a PositionalIndexBuilder)"""
+    with stage("ocr") as s:
+        images = convert_from_path(path, dpi=OCR_DPI)
+        text = []
+        offset = 0
+        for page_no, img in enumerate(images):
+            if positions is None:
+                page_text = ocr_page(img, cache_dir)
+            else:
+                page_text, tsv = ocr_page(img, cache_dir, words=True)
+                positions.add_ocr_words(page_no, offset, page_text, tsv, 72 / OCR_DPI)
+            text.append(page_text)
+            offset += len(page_text) + 1
+        s.add(pages=len(images), bytes=os.path.getsize(path))
     return "\n".join(text)
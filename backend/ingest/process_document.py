@@ -1,27 +1,76 @@
 import os, hashlib, json
 from ingest.ocr import ocr_pdf
-from ingest.embed import chunk_text, build_index
+from ingest.embed import chunk_spans, build_index
+from app.inference.engine import get_encoder
+from ingest.incremental import reingest
+from ingest.near_duplicate import minhash, section_digests, shared_index
+from app.rag.chunking import page_breaks_from, page_of
+from app.rag.positional_index import PositionalIndexBuilder, positions_path
+from app.observability.stages import stage
 
-def sha256_of_file(p):
-    import hashlib
+def sha256_of_file(p, chunk_size=1024 * 1024):
     h = hashlib.sha256()
     with open(p,"rb") as f:
-        h.update(f.read())
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            h.update(chunk)
     return h.hexdigest()
 
 def process_pdf(filepath, outdir="vector_store"):
     os.makedirs(outdir, exist_ok=True)
-    text = ocr_pdf(filepath)
-    chunks = chunk_text(text)
+    words = PositionalIndexBuilder()
+    text = ocr_pdf(filepath, positions=words)
+    # Tesseract ends every page with a form feed
+    breaks = page_breaks_from(text)
+    with stage("chunk", bytes=len(text)) as s:
+        spans = list(chunk_spans(text, page_breaks=breaks))
+        s.add(items=len(spans))
+    chunks = [text[s:e] for s, e in spans]
     idx_file = build_index(chunks, out=os.path.join(outdir, os.path.basename(filepath)+".index"))
-    meta = {"file": filepath, "chunks": len(chunks)}
+    # chunk N of the vector index highlights as positions.chunk_rects(N)
+    positions = words.build()
+    positions.chunks = spans
+    positions_file = positions.save(positions_path(idx_file))
+    meta = {
+        "file": filepath,
+        "chunks": len(chunks),
+        "positions": positions_file,
+        "spans": [{"start": s, "end": e, "page": page_of(s, breaks)} for s, e in spans],
+    }
+
+    # Record the document's signature so later near-duplicates can be spotted
+    near_duplicates = shared_index(os.path.join(outdir, "near_duplicates.sig"))
+    doc_id = sha256_of_file(filepath)
+    signature = minhash(text)
+    match = near_duplicates.query(signature, exclude=doc_id)
+    if match:
+        meta["near_duplicate_of"] = {"file": match[2].get("file"), "similarity": match[1]}
+    near_duplicates.add(doc_id, signature, {"file": filepath, "sections": section_digests(text)})
     with open(idx_file + ".meta.json","w") as f:
         json.dump(meta,f)
     return idx_file
 
+def process_version(filepath, doc_key=None, outdir="vector_store", analyze=None):
+    """Ingest a new version of a document, redoing only the chunks that changed.
+
+    ``doc_key`` identifies the document across versions (defaults to the file
+    name). Returns the ``reingest`` report; pass it to
+    ``incremental.apply_to_document`` to update the ``Document`` row.
+    The upload API neither indexes chunks nor writes ``Document`` rows, so
+    this runs from the command line (``--doc``) or a batch job.
+    """
+    doc_key = doc_key or os.path.splitext(os.path.basename(filepath))[0]
+    text = ocr_pdf(filepath, cache_dir=os.path.join(outdir, "ocr_cache"))
+    embed = lambda chunks: get_encoder().encode(chunks, batch_size=64)
+    return reingest(os.path.join(outdir, "versions", doc_key), text, embed,
+                    analyze=analyze, page_breaks=page_breaks_from(text))
+
 if __name__ == "__main__":
     import sys
     if len(sys.argv) < 2:
-        print("Usage: python process_document.py <path-to-pdf>")
+        print("Usage: python process_document.py <path-to-pdf> [--doc <doc-key>]")
+    elif "--doc" in sys.argv:
+        report = process_version(sys.argv[1], sys.argv[sys.argv.index("--doc") + 1])
+        report.pop("findings")
+        print(json.dumps(report))
     else:
         process_pdf(sys.argv[1])
@@ -1,20 +1,41 @@
+import asyncio
 import os
 import datetime
-import pdfplumber
-from fastapi import FastAPI, UploadFile, File, HTTPException
-from fastapi.responses import JSONResponse
+import time
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, UploadFile, File, HTTPException, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse, PlainTextResponse, Response, StreamingResponse
 from fastapi.staticfiles import StaticFiles
 from typing import List
-import shutil
-import openai
 from fastapi.middleware.cors import CORSMiddleware
 import json
-from pdf_generator import generate_risk_pdf, generate_summary_pdf
+from app.storage.blob_store import BlobStore, UploadTooLarge
+from app.llm.gateway import LLMError, close_gateway, estimate_tokens, get_gateway
+from app.jobs.queue import get_job_queue
+from ingest.extract import extract_text as extract_pdf_text
+from ingest.near_duplicate import (
+    NearDuplicateIndex, cited_sections, join_sections, minhash, rebase_citations, section_digests,
+    section_spans,
+)
+from app.classifier.risk_model import get_classifier
+from app.rag.chunking import iter_spans
+from app.rag.positional_index import PositionalIndex, PositionalIndexBuilder, positions_path
+from app.rag.prompt_slimming import (
+    ANALYSIS_TOKEN_BUDGET, attach_citations, section_excerpts, select_excerpts, slim_text,
+)
+from app.observability.stages import collect_trace, snapshot, stage
+from app.observability.profiler import PROFILING_ENABLED, SamplingProfiler, profiles
+from app.admission import ADMISSION_MAX_FILES, AdmissionController, estimate_pages, trusted_proxy
 
 # --- Configuration ---
 # REMEMBER to set your OpenAI API key as an environment variable
 # For example: export OPENAI_API_KEY='your-api-key'
-openai.api_key = os.environ.get("OPENAI_API_KEY")
+# LLM calls go through app.llm.gateway (pooled, rate-limited, coalesced);
+# OPENAI_BASE_URL can point it at any OpenAI-compatible server.
+# ANALYSIS_MODE=slim sends only the excerpts most relevant to compliance
+# topics (up to ANALYSIS_TOKEN_BUDGET tokens) instead of the full text.
+ANALYSIS_MODE = os.environ.get("ANALYSIS_MODE", "full")
 
 UPLOAD_DIR = "uploads"
 PDF_DIR = "generated_pdfs"
@@ -24,7 +45,69 @@ os.makedirs(PDF_DIR, exist_ok=True)
 # PDF directory configuration
 PDF_DIR = "generated_pdfs"
 
-app = FastAPI()
+# Uploads are stored content-addressed so duplicates cost no extra disk or work
+blob_store = BlobStore(UPLOAD_DIR)
+
+# Signatures of analyzed documents; near-duplicates reuse earlier risks
+NEAR_DUPLICATE_INDEX = os.environ.get("NEAR_DUPLICATE_INDEX", os.path.join(UPLOAD_DIR, "near_duplicates.sig"))
+near_duplicates = NearDuplicateIndex(NEAR_DUPLICATE_INDEX)
+
+# Upload routes are admitted by per-user quota and global/per-user
+# concurrency; overload is queued briefly, then shed with 429/503
+admission = AdmissionController()
+
+# Heavy libraries (pdfplumber, reportlab, redis, models) are imported where
+# they are used, so the process answers /health right away. Lifespan warms
+# them up in the background and /ready reports 503 until that is done.
+readiness = {"warmup": "pending"}
+
+
+def warm_up():
+    import httpx  # noqa: F401
+    import app.findings  # noqa: F401
+    import pdfplumber  # noqa: F401
+    import pdf_generator  # noqa: F401
+    get_classifier()
+    if ANALYSIS_MODE == "slim":
+        from app.inference.engine import get_encoder
+        get_encoder()
+
+
+async def run_warm_up():
+    started = time.perf_counter()
+    try:
+        await run_in_threadpool(warm_up)
+        readiness["warmup"] = "done"
+    except Exception as e:
+        # Each component falls back on first use; serve traffic degraded
+        print(f"⚠️ Warm-up failed: {e}")
+        readiness.update(warmup="failed", error=str(e))
+    readiness["seconds"] = round(time.perf_counter() - started, 3)
+
+
+async def maintain_partitions():
+    # Keeps monthly audit/session log partitions created ahead and archives
+    # expired ones; stops right away unless the database is PostgreSQL
+    from app.retention import partitions
+    while True:
+        try:
+            if await run_in_threadpool(partitions.maintain) is None:
+                return
+        except Exception as e:
+            print(f"⚠️ Partition maintenance failed: {e}")
+        await asyncio.sleep(partitions.PARTITION_MAINTENANCE_SECONDS)
+
+
+@asynccontextmanager
+async def lifespan(app):
+    tasks = [asyncio.create_task(run_warm_up()), asyncio.create_task(maintain_partitions())]
+    yield
+    for task in tasks:
+        task.cancel()
+    await close_gateway()
+
+
+app = FastAPI(lifespan=lifespan)
 
 # Configure CORS to allow requests from the frontend
 app.add_middleware(
@@ -35,30 +118,99 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Per-stage timings of each request are returned in a Server-Timing header.
+# With PROFILING_ENABLED=1, a request sent with "X-Profile: 1" is also sampled;
+# the collapsed stacks are served from /debug/profiles/<X-Profile-Id>.
+@app.middleware("http")
+async def trace_stages(request: Request, call_next):
+    profiler = None
+    if PROFILING_ENABLED and request.headers.get("x-profile") == "1":
+        profiler = SamplingProfiler().start()
+    with collect_trace() as trace:
+        response = await call_next(request)
+    if trace:
+        response.headers["Server-Timing"] = ", ".join(
+            f'{t["stage"]};dur={t["seconds"] * 1000:.1f}' for t in trace
+        )
+    if profiler:
+        profile_id = profiles.add(profiler.stop(), label=f"{request.method} {request.url.path}")
+        response.headers["X-Profile-Id"] = profile_id
+    return response
+
 # Mount the directory to serve generated PDFs
 app.mount("/generated_pdfs", StaticFiles(directory=PDF_DIR), name="generated_pdfs")
 
 # PDF generation is now handled by pdf_generator.py module
 
 # --- Text extraction ---
-def extract_text(pdf_path):
-    text = ""
+def extract_text(pdf_path, positions=None):
+    """Text of a PDF; with ``positions`` (a path), also save its word positions there"""
+    builder = PositionalIndexBuilder() if positions else None
     try:
-        with pdfplumber.open(pdf_path) as pdf:
-            for page in pdf.pages:
-                page_text = page.extract_text()
-                if page_text:
-                    text += page_text + "\n"
+        text = extract_pdf_text(pdf_path, builder)
+        if builder:
+            builder.build().save(positions)
         return text
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to extract text from PDF: {e}")
 
 # --- AI Risk Analysis ---
-def analyze_document_text(text):
-    """Analyze document text and extract compliance risks dynamically"""
-    if not openai.api_key:
+def score_risks(risks):
+    """Calculate compliance score based on severity"""
+    if risks:
+        severity_scores = {"CRITICAL": 0, "HIGH": 25, "MEDIUM": 50, "LOW": 75}
+        total_score = sum(severity_scores.get(r.get('severity', 'MEDIUM').upper(), 50) for r in risks)
+        compliance_score = max(0, 100 - (total_score / len(risks)))
+    else:
+        compliance_score = 95  # No risks found
+    return int(compliance_score)
+
+def pre_classify(text, chunk_words=200):
+    """Tag chunks by RBI risk type with the local classifier (no LLM call).
+
+    Returns ``{risk_type: chunk_count}``, empty when no model is available.
+    """
+    classifier = get_classifier()
+    if classifier is None:
+        return {}
+    chunks = [text[s:e] for s, e in iter_spans(text, "word", chunk_words, 0)]
+    counts = {}
+    for tag in classifier.tag(chunks):
+        if tag:
+            counts[tag[0]] = counts.get(tag[0], 0) + 1
+    return dict(sorted(counts.items(), key=lambda kv: -kv[1]))
+
+async def analyze_document_text(text, risk_types=None, mode=None, sections=None):
+    """Analyze document text and extract compliance risks dynamically
+
+    ``sections`` are ``(start, end)`` spans of ``text``. Unless the text is
+    slimmed, each is labelled ``S<i>`` in the prompt and every risk comes
+    back citing the sections it rests on.
+    """
+    gateway = get_gateway()
+    if not gateway.api_key:
         raise HTTPException(status_code=500, detail="OpenAI API key not configured.")
 
+    excerpts = None
+    source_field = ""
+    if (mode or ANALYSIS_MODE) == "slim" and estimate_tokens(text) > ANALYSIS_TOKEN_BUDGET:
+        try:
+            excerpts = await run_in_threadpool(select_excerpts, text)
+        except Exception as e:
+            print(f"⚠️ Prompt slimming failed, sending full text: {e}")
+        if excerpts:
+            text = slim_text(text, excerpts)
+            source_field = '\n    - "source": List of excerpt references the risk is based on (e.g. ["C3"])'
+    if not excerpts and sections:
+        excerpts = section_excerpts(sections)
+        text = slim_text(text, excerpts)
+        source_field = '\n    - "source": List of section references the risk is based on (e.g. ["S3"])'
+
+    hints = ""
+    if risk_types:
+        flagged = ", ".join(f"{k} ({v} sections)" for k, v in risk_types.items())
+        hints = f"\n    A local classifier flagged these RBI risk areas: {flagged}.\n"
+
     prompt = f'''
     Analyze the following compliance document. Detect all risks dynamically.
     For each risk, return:
@@ -66,10 +218,10 @@ def analyze_document_text(text):
     - "severity": "CRITICAL", "HIGH", "MEDIUM", or "LOW"
     - "description": Detailed explanation of the issue
     - "recommendation": Actionable steps as a checklist (use \\n for separating steps)
-    - "regulation": Relevant regulation (GDPR, CCPA, HIPAA, SOX, etc.)
+    - "regulation": Relevant regulation (GDPR, CCPA, HIPAA, SOX, etc.){source_field}
     
     Return response as: {{"risks": [...]}}
-    
+    {hints}
     Document content:
     """
     {text}
@@ -77,80 +229,236 @@ def analyze_document_text(text):
     '''
     
     try:
-        response = openai.ChatCompletion.create(
-            model="gpt-4-turbo",
-            messages=[{"role": "user", "content": prompt}],
-            temperature=0.1,
-            response_format={"type": "json_object"}
-        )
-        content = response.choices[0].message['content']
+        with stage("llm_analysis") as s:
+            response = await gateway.chat(
+                [{"role": "user", "content": prompt}],
+                temperature=0.1,
+                response_format={"type": "json_object"}
+            )
+            s.add(tokens=(response.get("usage") or {}).get("total_tokens", 0))
+        content = response["choices"][0]["message"]["content"]
         risks_data = json.loads(content)
         risks = risks_data.get('risks', []) if isinstance(risks_data, dict) else []
-        
-        # Calculate compliance score based on severity
-        if risks:
-            severity_scores = {"CRITICAL": 0, "HIGH": 25, "MEDIUM": 50, "LOW": 75}
-            total_score = sum(severity_scores.get(r.get('severity', 'MEDIUM').upper(), 50) for r in risks)
-            compliance_score = max(0, 100 - (total_score / len(risks)))
-        else:
-            compliance_score = 95  # No risks found
-        
-        return risks, int(compliance_score)
+        if excerpts:
+            attach_citations(risks, excerpts)
+        return risks, score_risks(risks)
 
     except json.JSONDecodeError as e:
         print(f"JSON Decode Error: {e}")
         raise HTTPException(status_code=500, detail="Failed to parse AI response.")
+    except LLMError as e:
+        print(f"AI Analysis Error: {e}")
+        raise HTTPException(status_code=502, detail=f"Error during AI analysis: {e}")
     except Exception as e:
         print(f"AI Analysis Error: {e}")
         raise HTTPException(status_code=500, detail=f"Error during AI analysis: {e}")
 
 
-# --- Main API Route ---
-@app.post("/upload_documents/")
-async def upload_documents(files: List[UploadFile] = File(...)):
-    if not files:
-        raise HTTPException(status_code=400, detail="No files were uploaded.")
+# --- Per-document pipeline ---
+def store_findings(sha256, document_name, risks):
+    """Persist risks for filtered queries (/findings); never fails the upload"""
+    from app.findings import save_findings
+    try:
+        save_findings(sha256, document_name, risks)
+    except Exception as e:
+        print(f"⚠️ Could not store findings for {document_name}: {e}")
 
-    saved_paths = []
+
+def annotate_citations(pdf_path, risks, document_name):
+    """Copy of the upload with every cited span highlighted, from the saved word positions"""
+    index_path = positions_path(pdf_path)
+    if not os.path.exists(index_path) or not any(r.get("citations") for r in risks):
+        return None
+    from app.utils.pdf_annotate import annotate_pdf
+    try:
+        with stage("annotate") as s:
+            annotations = PositionalIndex.load(index_path).highlights(risks)
+            s.add(items=len(annotations))
+            if not annotations:
+                return None
+            return annotate_pdf(pdf_path, annotations, os.path.join(PDF_DIR, f"{document_name}_annotated.pdf"))
+    except Exception as e:
+        print(f"⚠️ Could not annotate {document_name}: {e}")
+        return None
+
+
+async def store_uploads(files):
+    saved = []
     for file in files:
-        file_path = os.path.join(UPLOAD_DIR, file.filename)
         try:
-            with open(file_path, "wb") as buffer:
-                shutil.copyfileobj(file.file, buffer)
-            saved_paths.append(file_path)
+            blob = await blob_store.save_upload(file)
+        except UploadTooLarge as e:
+            raise HTTPException(status_code=413, detail=f"{file.filename}: {e}")
         except Exception as e:
             raise HTTPException(status_code=500, detail=f"Failed to save uploaded file: {e}")
+        saved.append((os.path.splitext(os.path.basename(file.filename))[0], blob))
+    return saved
+
+
+async def analyze_with_reuse(doc_id, document_name, text, risk_types=None):
+    """Analyze text, reusing the risks of a near-duplicate document if one exists.
+
+    Each stored risk is tagged with the digests of the sections it cites. A
+    near-duplicate's risks are kept only while all of those sections are
+    still present; sections that are new, or that backed a dropped risk, are
+    sent to the LLM. Citations always point into ``text``: those of reused
+    risks are moved to where their sections are now, those of the changed
+    sections from the text sent to the LLM. Returns
+    ``(risks, compliance_score, reuse_info)``.
+    """
+    signature = await run_in_threadpool(minhash, text)
+    spans, digests = await run_in_threadpool(lambda: (section_spans(text), section_digests(text)))
+
+    def tag(risks, analyzed):
+        # a risk citing nothing rests on everything it was analyzed with
+        tagged = []
+        for risk in risks:
+            cited = cited_sections(risk.get("citations"), spans) or analyzed
+            tagged.append({"risk": risk, "sections": [digests[i] for i in cited], "spans": [spans[i] for i in cited]})
+        return tagged
+
+    # index reads are memory-mapped file I/O and adds may re-sort the band arrays
+    match = await run_in_threadpool(near_duplicates.query, signature, exclude=doc_id)
+    if match:
+        match_id, similarity, previous = match
+        seen = set(previous["sections"])
+        where = {d: span for d, span in reversed(list(zip(digests, spans)))}
+        tagged, redo = [], set()
+        for entry in previous["risks"]:
+            if not all(d in where for d in entry["sections"]):
+                redo.update(entry["sections"])
+                continue
+            risk, now = entry["risk"], [where[d] for d in entry["sections"]]
+            if risk.get("citations"):
+                risk = {**risk, "citations": rebase_citations(risk["citations"], entry["spans"], now)}
+            tagged.append({"risk": risk, "sections": entry["sections"], "spans": now})
+        reused = len(tagged)
+        targets = [i for i, d in enumerate(digests) if d not in seen or d in redo]
+        if targets:
+            changed, changed_spans = join_sections(text, [spans[i] for i in targets])
+            new_risks, _ = await analyze_document_text(changed, risk_types, sections=changed_spans)
+            for risk in new_risks:
+                if risk.get("citations"):
+                    risk["citations"] = rebase_citations(risk["citations"], changed_spans, [spans[i] for i in targets])
+            tagged += tag(new_risks, targets)
+        reuse = {
+            "near_duplicate_of": previous.get("document", match_id),
+            "similarity": round(similarity, 3),
+            "changed_sections": len(targets),
+            "reused_risks": reused,
+        }
+    else:
+        new_risks, _ = await analyze_document_text(text, risk_types, sections=spans)
+        tagged = tag(new_risks, list(range(len(spans))))
+        reuse = {}
+    await run_in_threadpool(near_duplicates.add, doc_id, signature, {
+        "document": document_name,
+        "risks": tagged,
+        "sections": digests,
+    })
+    risks = [entry["risk"] for entry in tagged]
+    return risks, score_risks(risks), reuse
+
+
+async def process_document(document_name, blob):
+    """Run one stored upload through the pipeline, yielding an event per stage.
+
+    Ends with a ``result`` event, or ``skipped`` when no text was found.
+    Blocking stages run in the thread pool so other documents and streamed
+    responses keep flowing.
+    """
+    # Identical content was already analyzed: reuse its reports
+    cached = await run_in_threadpool(blob_store.load_result, blob.sha256) if blob.duplicate else None
+    if cached:
+        yield {"event": "result", **cached, "document": document_name, "duplicate": True}
+        return
+
+    text = await run_in_threadpool(extract_text, blob.path, positions_path(blob.path))
+    yield {"event": "progress", "document": document_name, "stage": "extracted", "characters": len(text)}
+
+    if not text.strip():
+        yield {"event": "skipped", "document": document_name, "reason": "No text extracted"}
+        return
+
+    risk_types = await run_in_threadpool(pre_classify, text)
+    risks, compliance_score, reuse = await analyze_with_reuse(blob.sha256, document_name, text, risk_types)
+    yield {"event": "progress", "document": document_name, "stage": "analyzed", "risk_count": len(risks), **reuse}
+
+    # Generate individual risk PDFs and the summary PDF
+    from pdf_generator import generate_risk_pdf, generate_summary_pdf
+    risk_files = await run_in_threadpool(
+        lambda: [generate_risk_pdf(risk, document_name, PDF_DIR) for risk in risks]
+    )
+    summary_file = await run_in_threadpool(
+        generate_summary_pdf, risks, document_name, compliance_score, PDF_DIR
+    )
+    annotated_file = await run_in_threadpool(annotate_citations, blob.path, risks, document_name)
+    yield {"event": "progress", "document": document_name, "stage": "rendered"}
+
+    result = {
+        "document": document_name,
+        "sha256": blob.sha256,
+        "compliance_score": compliance_score,
+        "risk_count": len(risks),
+        "risks": risks,
+        "risk_types": risk_types,
+        "risk_pdfs": risk_files,
+        "summary_pdf": summary_file,
+        **({"annotated_pdf": annotated_file} if annotated_file else {}),
+        **reuse
+    }
+    await run_in_threadpool(blob_store.save_result, blob.sha256, result)
+    await run_in_threadpool(store_findings, blob.sha256, document_name, risks)
+    yield {"event": "result", **result}
+
+
+# --- Admission ---
+def client_id(request):
+    """
+    Caller identity for quotas: the client address, or X-User-Id when the
+    request comes through a trusted proxy. Anyone else could set the header
+    to get a fresh quota per request.
+    """
+    host = request.client.host if request.client else None
+    if host and trusted_proxy(host) and request.headers.get("x-user-id"):
+        return request.headers["x-user-id"]
+    return host or "anonymous"
+
+
+async def admit_upload(request, files, route):
+    if len(files) > ADMISSION_MAX_FILES:
+        raise HTTPException(status_code=413, detail=f"At most {ADMISSION_MAX_FILES} files per request.")
+    return await admission.acquire(client_id(request), estimate_pages(f.size for f in files), route)
+
+
+# --- Main API Route ---
+@app.post("/upload_documents/")
+async def upload_documents(request: Request, files: List[UploadFile] = File(...)):
+    if not files:
+        raise HTTPException(status_code=400, detail="No files were uploaded.")
+
+    ticket = await admit_upload(request, files, "upload_documents")
+    try:
+        return await analyze_uploads(files)
+    finally:
+        admission.release(ticket)
+
+
+async def analyze_uploads(files):
+    saved = await store_uploads(files)
 
     all_risk_files = []
     all_summary_files = []
     all_results = []
     
-    for file_path in saved_paths:
-        document_name = os.path.splitext(os.path.basename(file_path))[0]
-        text = extract_text(file_path)
-        
-        if not text.strip():
-            continue 
-
-        risks, compliance_score = analyze_document_text(text)
-        
-        risk_files = []
-        if risks:
-            # Generate individual risk PDFs
-            risk_files = [generate_risk_pdf(risk, document_name, PDF_DIR) for risk in risks]
-            all_risk_files.extend(risk_files)
-        
-        # Generate summary PDF
-        summary_file = generate_summary_pdf(risks, document_name, compliance_score, PDF_DIR)
-        all_summary_files.append(summary_file)
-        
-        all_results.append({
-            "document": document_name,
-            "compliance_score": compliance_score,
-            "risk_count": len(risks),
-            "risk_pdfs": risk_files,
-            "summary_pdf": summary_file
-        })
+    for document_name, blob in saved:
+        async for event in process_document(document_name, blob):
+            if event["event"] != "result":
+                continue
+            result = {k: v for k, v in event.items() if k != "event"}
+            all_risk_files.extend(result["risk_pdfs"])
+            all_summary_files.append(result["summary_pdf"])
+            all_results.append(result)
     
     return JSONResponse(content={
         "success": True,
@@ -161,6 +469,101 @@ async def upload_documents(files: List[UploadFile] = File(...)):
         "message": f"{len(files)} documents analyzed successfully. Generated {len(all_risk_files)} risk reports and {len(all_summary_files)} summary reports."
     })
 
+
+# --- Streaming variant ---
+def format_event(event, sse):
+    data = json.dumps(event)
+    if sse:
+        return f"event: {event['event']}\ndata: {data}\n\n"
+    return data + "\n"
+
+
+@app.post("/upload_documents/stream")
+async def upload_documents_stream(request: Request, files: List[UploadFile] = File(...)):
+    """Same pipeline as /upload_documents/, but each document's result is sent
+    as soon as it is ready. Responds with NDJSON, or Server-Sent Events when
+    the client sends ``Accept: text/event-stream``."""
+    if not files:
+        raise HTTPException(status_code=400, detail="No files were uploaded.")
+
+    # The admission slot is held until the stream ends. Uploads are stored
+    # before streaming starts; the UploadFiles are closed once the handler returns.
+    ticket = await admit_upload(request, files, "upload_documents_stream")
+    try:
+        saved = await store_uploads(files)
+    except BaseException:
+        admission.release(ticket)
+        raise
+    sse = "text/event-stream" in request.headers.get("accept", "")
+
+    async def events():
+        try:
+            yield format_event({"event": "start", "documents": [name for name, _ in saved]}, sse)
+            processed = 0
+            for document_name, blob in saved:
+                yield format_event({"event": "progress", "document": document_name, "stage": "stored", "sha256": blob.sha256}, sse)
+                try:
+                    async for event in process_document(document_name, blob):
+                        yield format_event(event, sse)
+                except HTTPException as e:
+                    yield format_event({"event": "error", "document": document_name, "status_code": e.status_code, "detail": e.detail}, sse)
+                    continue
+                processed += 1
+            yield format_event({"event": "done", "documents_processed": processed}, sse)
+        finally:
+            admission.release(ticket)
+
+    media_type = "text/event-stream" if sse else "application/x-ndjson"
+    return StreamingResponse(events(), media_type=media_type, headers={"Cache-Control": "no-cache"})
+
+# --- Background jobs (processed by worker.py) ---
+@app.post("/jobs", status_code=202)
+async def submit_jobs(files: List[UploadFile] = File(...)):
+    """Store the uploads and queue them for the worker tier; returns job IDs right away"""
+    if not files:
+        raise HTTPException(status_code=400, detail="No files were uploaded.")
+
+    saved = await store_uploads(files)
+    queue = get_job_queue()
+    jobs = []
+    for document_name, blob in saved:
+        payload = {"document": document_name, "sha256": blob.sha256, "path": blob.path}
+        job_id = await run_in_threadpool(queue.submit, payload)
+        jobs.append({"document": document_name, "job_id": job_id, "status_url": f"/jobs/{job_id}"})
+    return {"jobs": jobs}
+
+
+@app.get("/jobs/metrics", response_class=PlainTextResponse)
+def job_metrics():
+    """Queue depth and consumer lag in Prometheus text format, for autoscaling"""
+    stats = get_job_queue().stats()
+    lines = []
+    for name, help_text in (
+        ("length", "Entries in the ingestion stream"),
+        ("pending", "Entries claimed by a worker but not yet acknowledged"),
+        ("lag", "Entries not yet delivered to any worker"),
+        ("consumers", "Workers registered in the consumer group"),
+        ("dead", "Jobs that exhausted their retries"),
+    ):
+        lines += [f"# HELP ingest_queue_{name} {help_text}", f"# TYPE ingest_queue_{name} gauge",
+                  f"ingest_queue_{name} {stats[name]}"]
+    return "\n".join(lines) + "\n"
+
+
+@app.get("/jobs/{job_id}")
+def job_status(job_id: str):
+    job = get_job_queue().status(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return {
+        "job_id": job_id,
+        "document": job["payload"]["document"],
+        "status": job["status"],
+        "stage": job["stage"],
+        "error": job.get("error"),
+        "result": job.get("result"),
+    }
+
 # Health check endpoint
 @app.get("/")
 def read_root():
@@ -169,3 +572,51 @@ def read_root():
 @app.get("/health")
 def health():
     return {"status": "ok"}
+
+@app.get("/ready")
+def ready():
+    status = 503 if readiness["warmup"] == "pending" else 200
+    return JSONResponse(readiness, status_code=status)
+
+@app.get("/llm/metrics")
+async def llm_metrics():
+    return get_gateway().summary()
+
+@app.get("/findings")
+def list_findings(severity: str = None, regulation: str = None, document: str = None,
+                  since: datetime.datetime = None, until: datetime.datetime = None,
+                  limit: int = 100, cursor: str = None):
+    """Stored findings, newest first; pass ``next_cursor`` back for the next page"""
+    from app.db import Session, engine
+    from app.findings import query_findings, to_dict
+    if engine is None:
+        raise HTTPException(status_code=503, detail="Findings store not configured (set DATABASE_URL).")
+    with Session() as session:
+        try:
+            rows, next_cursor = query_findings(session, severity, regulation, document, since, until, limit, cursor)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        return {"findings": [to_dict(f) for f in rows], "next_cursor": next_cursor}
+
+@app.get("/admission/stats")
+def admission_stats():
+    return admission.stats()
+
+@app.get("/metrics/stages")
+def stage_metrics():
+    return snapshot()
+
+@app.get("/metrics")
+def prometheus_metrics():
+    try:
+        from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
+    except ImportError:
+        raise HTTPException(status_code=404, detail="prometheus_client is not installed; see /metrics/stages")
+    return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
+
+@app.get("/debug/profiles/{profile_id}", response_class=PlainTextResponse)
+def get_profile(profile_id: str):
+    profile = profiles.get(profile_id) if PROFILING_ENABLED else None
+    if profile is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return profile["collapsed"]
@@ -1,7 +1,10 @@
 from pdf2image import convert_from_path
 import pytesseract
+from app.observability.stages import stage
 
 def extract_text_from_scanned_pdf(pdf_path):
-    images = convert_from_path(pdf_path)
-    text = "\n".join(pytesseract.image_to_string(img) for img in images)
+    with stage("ocr") as s:
+        images = convert_from_path(pdf_path)
+        text = "\n".join(pytesseract.image_to_string(img) for img in images)
+        s.add(pages=len(images))
     return text
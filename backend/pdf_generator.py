@@ -4,9 +4,14 @@ from reportlab.lib.pagesizes import A4
 from reportlab.pdfgen import canvas
 from reportlab.lib.colors import red, yellow, green, black
 from reportlab.lib.units import inch
+from app.observability.stages import timed
 
 SEVERITY_COLOR = {"HIGH": red, "CRITICAL": red, "MEDIUM": yellow, "LOW": green}
 
+def _output_size(filename, *args, **kwargs):
+    return {"bytes": os.path.getsize(filename)}
+
+@timed("render_risk_pdf", _output_size)
 def generate_risk_pdf(risk, document_name, output_dir="generated_pdfs"):
     """Generate a PDF for a single risk with color-coded severity and checklist"""
     os.makedirs(output_dir, exist_ok=True)
@@ -84,6 +89,7 @@ def generate_risk_pdf(risk, document_name, output_dir="generated_pdfs"):
     c.save()
     return filename
 
+@timed("render_summary_pdf", _output_size)
 def generate_summary_pdf(risks, document_name, compliance_score, output_dir="generated_pdfs"):
     """Generate a summary PDF with all risks and overall compliance score"""
     os.makedirs(output_dir, exist_ok=True)
@@ -0,0 +1,133 @@
+# tests for upload admission control and load shedding
+import asyncio
+import io
+import ipaddress
+import os
+import sys
+from types import SimpleNamespace
+
+import pytest
+from fastapi import HTTPException
+from fastapi.testclient import TestClient
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import main
+from app import admission as admission_mod
+from app.admission import AdmissionController, QuotaBucket, estimate_pages
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def test_estimate_pages_counts_at_least_one_per_file():
+    assert estimate_pages([0, 10, 250 * 1024]) == 1 + 1 + 3
+
+
+def test_user_header_is_only_trusted_from_configured_proxies(monkeypatch):
+    def request(host, user=None):
+        return SimpleNamespace(client=SimpleNamespace(host=host), headers={"x-user-id": user} if user else {})
+
+    monkeypatch.setattr(admission_mod, "ADMISSION_TRUSTED_PROXIES", [ipaddress.ip_network("10.0.0.0/8")])
+    assert main.client_id(request("10.1.2.3", "alice")) == "alice"
+    assert main.client_id(request("10.1.2.3")) == "10.1.2.3"
+    assert main.client_id(request("203.0.113.9", "alice")) == "203.0.113.9"
+    assert main.client_id(request("testclient", "alice")) == "testclient"
+
+
+def test_quota_bucket_reports_wait():
+    bucket = QuotaBucket(capacity=10, refill_per_second=2)
+    assert bucket.take(8) == 0
+    assert bucket.take(6) == pytest.approx(2.0, abs=0.05)
+    bucket.refund(8)
+    assert bucket.take(6) == 0
+
+
+def test_quota_rejection_has_retry_after():
+    async def scenario():
+        ctl = AdmissionController(burst=5, rate=1)
+        await ctl.acquire("alice", 5)
+        with pytest.raises(HTTPException) as e:
+            await ctl.acquire("alice", 3)
+        return ctl, e.value
+
+    ctl, err = run(scenario())
+    assert err.status_code == 429 and err.headers["Retry-After"] == "3"
+    assert ctl.stats()["rejected_quota"] == 1
+
+
+def test_queue_full_and_deadline_are_shed():
+    async def scenario():
+        ctl = AdmissionController(max_concurrent=1, max_per_user=5, queue_size=1, queue_timeout=0.1)
+        first = await ctl.acquire("a")
+        queued = asyncio.ensure_future(ctl.acquire("b"))
+        await asyncio.sleep(0)
+        with pytest.raises(HTTPException) as full:
+            await ctl.acquire("c")
+        with pytest.raises(HTTPException) as late:
+            await queued
+        ctl.release(first)
+        return ctl, full.value, late.value
+
+    ctl, full, late = run(scenario())
+    assert full.status_code == 503 and int(full.headers["Retry-After"]) >= 1
+    assert late.status_code == 503
+    stats = ctl.stats()
+    assert (stats["shed_queue_full"], stats["shed_deadline"], stats["inflight"], stats["queue_depth"]) == (1, 1, 0, 0)
+    # shed requests got their quota back
+    assert ctl.buckets["b"].tokens == pytest.approx(ctl.burst, abs=0.01)
+
+
+def test_release_admits_waiters_fifo_but_skips_users_at_their_limit():
+    async def scenario():
+        ctl = AdmissionController(max_concurrent=2, max_per_user=1, queue_size=10, queue_timeout=5)
+        a1 = await ctl.acquire("a")
+        b1 = await ctl.acquire("b")
+        a2 = asyncio.ensure_future(ctl.acquire("a"))
+        c1 = asyncio.ensure_future(ctl.acquire("c"))
+        await asyncio.sleep(0)
+        assert ctl.stats()["queue_depth"] == 2
+        ctl.release(b1)  # a is still at its limit, so c goes first
+        assert ctl.per_user == {"a": 1, "c": 1}
+        await asyncio.wait_for(c1, 1)
+        ctl.release(a1)
+        await asyncio.wait_for(a2, 1)
+        return ctl
+
+    ctl = run(scenario())
+    assert ctl.stats()["inflight"] == 2 and ctl.stats()["admitted"] == 4
+
+
+def test_new_user_runs_while_others_wait_on_their_own_limit():
+    async def scenario():
+        ctl = AdmissionController(max_concurrent=4, max_per_user=1, queue_size=10, queue_timeout=5)
+        await ctl.acquire("a")
+        waiting = asyncio.ensure_future(ctl.acquire("a"))
+        await asyncio.sleep(0)
+        await asyncio.wait_for(ctl.acquire("b"), 0.1)
+        waiting.cancel()
+        return ctl
+
+    ctl = run(scenario())
+    assert ctl.stats()["queue_depth"] == 0 and ctl.stats()["inflight"] == 2
+
+
+def pdf_file(name):
+    return ("files", (name, io.BytesIO(b"%PDF-1.4\n%%EOF\n"), "application/pdf"))
+
+
+def test_upload_route_limits_files_and_quota(monkeypatch):
+    monkeypatch.setattr(main, "ADMISSION_MAX_FILES", 2)
+    monkeypatch.setattr(main, "admission", AdmissionController(burst=1, rate=0.01))
+    client = TestClient(main.app)
+
+    res = client.post("/upload_documents/", files=[pdf_file("a.pdf"), pdf_file("b.pdf"), pdf_file("c.pdf")])
+    assert res.status_code == 413
+
+    # quotas follow the client address; a header from an untrusted peer does not reset them
+    main.admission.buckets["testclient"] = QuotaBucket(1, 0.01)
+    main.admission.buckets["testclient"].tokens = 0
+    res = client.post("/upload_documents/", files=[pdf_file("a.pdf")], headers={"X-User-Id": "someone-else"})
+    assert res.status_code == 429 and int(res.headers["retry-after"]) > 1
+    assert client.get("/admission/stats").json()["rejected_quota"] == 1
@@ -0,0 +1,71 @@
+# tests for the benchmark corpus generator, harness and regression check
+import os
+import sys
+
+import pytest
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from benchmarks.compare import compare
+from benchmarks.corpus import synthetic_pages, synthetic_text, write_text_pdf
+from benchmarks.run import measure, run_suite
+
+
+def test_corpus_is_deterministic():
+    assert synthetic_text(3, seed=7) == synthetic_text(3, seed=7)
+    assert synthetic_text(3, seed=7) != synthetic_text(3, seed=8)
+    pages = synthetic_pages(4, words_per_page=200)
+    assert len(pages) == 4
+    assert all(200 <= len(p.split()) < 260 for p in pages)
+
+
+def test_text_pdf_is_reproducible(tmp_path):
+    pytest.importorskip("reportlab")
+    pdfplumber = pytest.importorskip("pdfplumber")
+    a, b = tmp_path / "a.pdf", tmp_path / "b.pdf"
+    content = write_text_pdf(str(a), 2, seed=3)
+    write_text_pdf(str(b), 2, seed=3)
+    assert a.read_bytes() == b.read_bytes()
+    with pdfplumber.open(str(a)) as pdf:
+        assert len(pdf.pages) == 2
+        assert pdf.pages[0].extract_text().split()[:4] == content[0].split()[:4]
+
+
+def test_measure_reports_order_statistics():
+    calls = []
+    stats = measure(calls.append, repeat=4, warmup=2)
+    assert calls == [0, 1, 2, 3, 4, 5]
+    assert stats["runs"] == 4
+    assert stats["min_s"] <= stats["median_s"] <= stats["p95_s"]
+
+
+def test_run_suite_records_units():
+    report = run_suite(["chunk"], sizes=(1, 2), repeat=2, log=lambda *a: None)
+    assert set(report["benchmarks"]) == {"chunk/1p", "chunk/2p", "chunk_section/1p", "chunk_section/2p"}
+    row = report["benchmarks"]["chunk/2p"]
+    assert row["pages"] == 2 and row["pages_per_s"] > 0
+    assert report["meta"]["repeat"] == 2
+
+
+def test_upload_bench_restores_app_globals():
+    pytest.importorskip("reportlab")
+    import main
+    before = main.PDF_DIR, main.blob_store, main.near_duplicates
+    report = run_suite(["upload"], sizes=(1,), repeat=1, warmup=0, log=lambda *a: None)
+    assert "upload/1p" in report["benchmarks"]
+    assert (main.PDF_DIR, main.blob_store, main.near_duplicates) == before
+
+
+def result(**medians):
+    return {"meta": {}, "benchmarks": {k: {"median_s": v} for k, v in medians.items()}}
+
+
+def test_compare_flags_regressions_beyond_threshold():
+    baseline = result(extract=1.0, chunk=0.001, render=0.5, gone=0.1)
+    current = result(extract=1.3, chunk=0.002, render=0.3, added=0.2)
+    rows = {r["name"]: r for r in compare(baseline, current, threshold=0.2, min_delta=0.002)}
+    assert rows["extract"]["status"] == "regressed" and rows["extract"]["ratio"] == 1.3
+    assert rows["chunk"]["status"] == "ok"  # 2x slower but only by 1 ms
+    assert rows["render"]["status"] == "improved"
+    assert rows["gone"]["status"] == "missing"
+    assert rows["added"]["status"] == "new"
@@ -0,0 +1,51 @@
+# tests for streaming, content-addressed upload storage
+import asyncio
+import hashlib
+import io
+import os
+import sys
+
+import pytest
+from starlette.datastructures import UploadFile
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from app.storage.blob_store import BlobStore, UploadTooLarge
+
+
+def upload(data, name="contract.pdf"):
+    return UploadFile(file=io.BytesIO(data), filename=name)
+
+
+def test_hash_on_write_and_dedup(tmp_path):
+    store = BlobStore(str(tmp_path), chunk_size=7)
+    data = b"%PDF-1.4\n" + b"clause " * 100
+
+    first = asyncio.run(store.save_upload(upload(data)))
+    second = asyncio.run(store.save_upload(upload(data, "copy.pdf")))
+
+    assert first.sha256 == hashlib.sha256(data).hexdigest()
+    assert first.size == len(data)
+    assert not first.duplicate and second.duplicate
+    assert first.path == second.path
+    with open(first.path, "rb") as f:
+        assert f.read() == data
+    assert os.listdir(store.tmp_dir) == []
+
+
+def test_size_limit_discards_partial_data(tmp_path):
+    store = BlobStore(str(tmp_path), chunk_size=4, max_bytes=10)
+
+    with pytest.raises(UploadTooLarge):
+        asyncio.run(store.save_upload(upload(b"x" * 64)))
+
+    assert os.listdir(store.tmp_dir) == []
+
+
+def test_result_cache_round_trip(tmp_path):
+    store = BlobStore(str(tmp_path))
+    blob = asyncio.run(store.save_upload(upload(b"policy")))
+
+    assert store.load_result(blob.sha256) is None
+    store.save_result(blob.sha256, {"compliance_score": 80})
+    assert store.load_result(blob.sha256) == {"compliance_score": 80}
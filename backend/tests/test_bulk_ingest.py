@@ -0,0 +1,118 @@
+# tests for resumable bulk ingestion
+import json
+import os
+import shutil
+import sys
+
+import pytest
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+np = pytest.importorskip("numpy")
+fitz = pytest.importorskip("fitz")
+pytest.importorskip("faiss")
+pytest.importorskip("pdfplumber")
+
+from benchmarks.corpus import write_text_pdf
+from ingest import bulk
+
+
+class FakeEncoder:
+    calls = []
+
+    def encode(self, texts, batch_size=64):
+        FakeEncoder.calls.append(len(texts))
+        return np.array([[len(t), t.count(" "), 1.0] for t in texts], dtype="float32")
+
+
+@pytest.fixture
+def archive(tmp_path, monkeypatch):
+    monkeypatch.setattr(bulk, "load_encoder", lambda threads: FakeEncoder())
+    FakeEncoder.calls = []
+    root = tmp_path / "archive"
+    (root / "2024").mkdir(parents=True)
+    for i in range(5):
+        write_text_pdf(str(root / "2024" / f"doc{i}.pdf"), pages=2, seed=i)
+    blank = fitz.open()
+    blank.new_page()
+    blank.save(str(root / "scan.pdf"))
+    (root / "notes.txt").write_text("not a pdf")
+    return root, str(tmp_path / "store")
+
+
+def manifest(out):
+    with open(os.path.join(out, "manifest.jsonl")) as f:
+        return [json.loads(line) for line in f]
+
+
+def test_ingests_batches_and_reports(archive):
+    root, out = archive
+    report = bulk.run([str(root)], out, workers=1, batch_files=3, ocr=False, log=lambda msg: None)
+
+    assert (report["files"], report["done"], report["failed"], report["pages"]) == (6, 5, 1, 10)
+    assert report["failures"][0]["path"].endswith("scan.pdf")
+    assert report["docs_per_s"] > 0 and report["pages_per_s"] > 0
+    # embeddings are batched across the files of a batch
+    assert len(FakeEncoder.calls) == 2 and sum(FakeEncoder.calls) == report["chunks"]
+
+    done = [r for r in manifest(out) if r["status"] == "done"]
+    shards = {r["shard"] for r in done}
+    for shard in shards:
+        with open(os.path.join(out, "shards", f"{shard}.index.meta.json")) as f:
+            chunks = json.load(f)["chunks"]
+        assert {c["page"] for c in chunks} == {0, 1}
+    assert sorted(os.listdir(os.path.join(out, "positions"))) == sorted(f"{r['sha256']}.words.npz" for r in done)
+
+
+def test_rerun_skips_completed_files_and_retries_failures(archive):
+    root, out = archive
+    bulk.run([str(root)], out, workers=1, batch_files=3, ocr=False, log=lambda msg: None)
+    with open(os.path.join(out, "shards", "0123abcd.index"), "w") as f:
+        f.write("left by a crashed batch")
+    shutil.copy(root / "2024" / "doc0.pdf", root / "copy-of-doc0.pdf")
+    FakeEncoder.calls = []
+
+    report = bulk.run([str(root / "**" / "*.pdf")], out, workers=1, ocr=False, log=lambda msg: None)
+
+    # doc0-4 match on path/size/mtime, the copy on its SHA-256; the blank scan is retried
+    assert (report["done"], report["skipped"], report["failed"]) == (0, 6, 1)
+    assert FakeEncoder.calls == []
+    assert not os.path.exists(os.path.join(out, "shards", "0123abcd.index"))
+
+
+def test_process_pool_gives_the_same_result(archive):
+    root, out = archive
+    report = bulk.run([str(root / "2024")], out, workers=2, batch_files=2, ocr=False, log=lambda msg: None)
+    assert (report["done"], report["failed"], report["workers"]) == (5, 0, 2)
+    assert len({r["shard"] for r in manifest(out)}) == 3
+
+
+def test_copies_within_one_run_are_embedded_once(archive):
+    root, out = archive
+    shutil.copy(root / "2024" / "doc0.pdf", root / "2024" / "doc0-copy.pdf")
+    report = bulk.run([str(root / "2024")], out, workers=1, batch_files=10, ocr=False, log=lambda msg: None)
+
+    assert (report["done"], report["skipped"], report["failed"]) == (5, 1, 0)
+    assert sum(FakeEncoder.calls) == report["chunks"]
+    records = {os.path.basename(r["path"]): r for r in manifest(out)}
+    assert records["doc0.pdf"]["status"] != records["doc0-copy.pdf"]["status"]
+    assert records["doc0.pdf"]["sha256"] == records["doc0-copy.pdf"]["sha256"]
+
+
+def test_copies_of_a_failed_file_are_retried_with_it(archive, monkeypatch):
+    root, out = archive
+    shutil.copy(root / "2024" / "doc0.pdf", root / "2024" / "doc0-copy.pdf")
+    real_extract = bulk.extract_document
+
+    def broken(path, ocr=True):
+        if "doc0" in os.path.basename(path):
+            raise OSError("disk hiccup")
+        return real_extract(path, ocr)
+
+    monkeypatch.setattr(bulk, "extract_document", broken)
+    report = bulk.run([str(root / "2024")], out, workers=1, ocr=False, log=lambda msg: None)
+    assert (report["done"], report["skipped"], report["failed"]) == (4, 0, 2)
+
+    monkeypatch.setattr(bulk, "extract_document", real_extract)
+    report = bulk.run([str(root / "2024")], out, workers=1, ocr=False, log=lambda msg: None)
+    assert (report["done"], report["skipped"], report["failed"]) == (1, 5, 0)
@@ -0,0 +1,77 @@
+# tests for the span-based chunking engine
+import os
+import sys
+
+import pytest
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from app.rag.chunking import iter_spans, page_breaks_from, page_of, token_boundaries
+
+TEXT = " ".join(f"w{i}" for i in range(1000))
+
+
+def legacy_word_chunks(text, size, overlap):
+    words = text.split()
+    return [" ".join(words[i:i + size]) for i in range(0, len(words), size - overlap)]
+
+
+def test_word_spans_match_legacy_chunker():
+    spans = list(iter_spans(TEXT, "word", 500, 50))
+    assert [TEXT[s:e] for s, e in spans] == legacy_word_chunks(TEXT, 500, 50)
+
+
+def test_no_trailing_chunk_made_only_of_overlap():
+    text = " ".join(f"w{i}" for i in range(950))
+    spans = list(iter_spans(text, "word", 500, 50))
+    assert len(spans) == 2
+    assert text[spans[-1][0]:spans[-1][1]].split()[-1] == "w949"
+
+
+def test_precomputed_boundaries_give_same_spans():
+    flat = token_boundaries(TEXT)
+    assert len(flat) == 2000
+    assert list(iter_spans(TEXT, size=120, overlap=20, boundaries=flat)) == list(iter_spans(TEXT, size=120, overlap=20))
+
+
+def test_chunks_do_not_cross_pages():
+    text = "a b c d e\fpage two starts here\fthird"
+    breaks = page_breaks_from(text)
+    spans = list(iter_spans(text, "word", 4, 1, page_breaks=breaks))
+    chunks = [text[s:e] for s, e in spans]
+    assert chunks == ["a b c d", "d e", "page two starts here", "third"]
+    assert [page_of(s, breaks) for s, _ in spans] == [0, 0, 1, 2]
+
+
+def test_char_mode_respects_overlap_and_pages():
+    text = "x" * 25 + "\f" + "y" * 5
+    spans = list(iter_spans(text, "char", 10, 2, page_breaks=page_breaks_from(text)))
+    assert spans == [(0, 10), (8, 18), (16, 26), (26, 31)]
+
+
+def test_token_mode_uses_tokenizer_offsets():
+    def tokenizer(text):
+        # two-character "tokens"
+        return [(i, min(i + 2, len(text))) for i in range(0, len(text), 2)]
+
+    spans = list(iter_spans("abcdefghij", "token", 2, 0, tokenizer=tokenizer))
+    assert spans == [(0, 4), (4, 8), (8, 10)]
+
+
+def test_rejects_bad_sizes():
+    with pytest.raises(ValueError):
+        list(iter_spans(TEXT, size=10, overlap=10))
+
+
+def test_section_chunks_survive_an_inserted_line():
+    lines = [f"Clause {i}: the parties agree to term {i * 7}." for i in range(400)]
+    old = "\n".join(lines)
+    new = "\n".join(lines[:200] + ["Clause 199a: personal data is kept for ten years."] + lines[200:])
+    old_chunks = {old[s:e] for s, e in iter_spans(old, "section", 300)}
+    new_chunks = {new[s:e] for s, e in iter_spans(new, "section", 300)}
+
+    # only the edited chunk changes, plus at most its neighbour when the
+    # ``size`` cap rather than a content cut point ended it
+    assert 1 <= len(old_chunks - new_chunks) <= 2
+    assert 1 <= len(new_chunks - old_chunks) <= 2
+    assert len(old_chunks) > 40
@@ -0,0 +1,37 @@
+# tests for deferred imports and liveness/readiness
+import os
+import subprocess
+import sys
+import time
+
+from fastapi.testclient import TestClient
+
+BACKEND_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.append(BACKEND_DIR)
+
+import main
+
+
+def test_importing_main_skips_heavy_libraries():
+    code = (
+        "import sys, main; "
+        "print(','.join(m for m in ('pdfplumber', 'reportlab', 'httpx', 'redis', 'torch') if m in sys.modules))"
+    )
+    out = subprocess.run([sys.executable, "-c", code], cwd=BACKEND_DIR, capture_output=True, text=True, check=True)
+    assert out.stdout.strip() == ""
+
+
+def test_ready_waits_for_warm_up(monkeypatch):
+    monkeypatch.setitem(main.readiness, "warmup", "pending")
+    client = TestClient(main.app)  # no lifespan: nothing warms up
+    assert client.get("/health").status_code == 200
+    assert client.get("/ready").status_code == 503
+
+    with TestClient(main.app) as client:
+        deadline = time.monotonic() + 30
+        while client.get("/ready").status_code != 200 and time.monotonic() < deadline:
+            time.sleep(0.05)
+        res = client.get("/ready")
+    assert res.status_code == 200
+    assert res.json()["warmup"] in ("done", "failed")
+    assert "pdfplumber" in sys.modules
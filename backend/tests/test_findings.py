@@ -0,0 +1,106 @@
+# tests for the findings store and keyset pagination
+import os
+import sys
+from datetime import datetime, timedelta
+
+import pytest
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+sqlalchemy = pytest.importorskip("sqlalchemy")
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import sessionmaker
+from fastapi.testclient import TestClient
+
+import main
+from app import db
+from app.findings import (bulk_insert, decode_cursor, finding_rows, query_findings,
+                          replace_document_findings, save_findings)
+from app.models import Base
+
+SEVERITIES = ["CRITICAL", "HIGH", "MEDIUM", "LOW"]
+REGULATIONS = ["GDPR", "HIPAA", "SOX", "RBI"]
+START = datetime(2025, 1, 1)
+
+
+@pytest.fixture
+def Session(tmp_path, monkeypatch):
+    engine = create_engine(f"sqlite:///{tmp_path / 'findings.db'}")
+    Base.metadata.create_all(engine)
+    factory = sessionmaker(bind=engine, expire_on_commit=False)
+    monkeypatch.setattr(db, "engine", engine)
+    monkeypatch.setattr(db, "Session", factory)
+    return factory
+
+
+def seed(session, n):
+    rows = []
+    for i in range(n):
+        risk = {"severity": SEVERITIES[i % 4].lower(), "regulation": REGULATIONS[(i // 4) % 4], "category": f"c{i}"}
+        rows += finding_rows(f"doc{i % 50}", f"doc{i % 50}.pdf", [risk], created_at=START + timedelta(hours=i // 3))
+    bulk_insert(session, rows)
+    session.commit()
+
+
+def test_filters_and_keyset_pages_cover_everything_once(Session):
+    with Session() as s:
+        seed(s, 2000)
+        since, until = START + timedelta(days=10), START + timedelta(days=20)
+        expected = s.execute(text(
+            "select count(*) from findings where severity='HIGH' and regulation='GDPR' "
+            "and created_at >= :a and created_at < :b"), {"a": since, "b": until}).scalar()
+        assert expected > 0
+
+        seen, cursor, pages = [], None, 0
+        while True:
+            rows, cursor = query_findings(s, severity="high", regulation="gdpr", since=since, until=until,
+                                          limit=7, cursor=cursor)
+            seen += [(r.created_at, r.id) for r in rows]
+            pages += 1
+            if cursor is None:
+                break
+    assert len(seen) == expected and len(set(seen)) == expected
+    assert seen == sorted(seen, reverse=True)
+    assert pages == -(-expected // 7)
+
+
+def test_replace_document_findings(Session):
+    with Session() as s, s.begin():
+        replace_document_findings(s, "abc", "a.pdf", [{"severity": "HIGH", "regulation": "GDPR"}] * 3)
+    save_findings("abc", "a.pdf", [{"severity": "LOW", "regulation": "SOX", "citations": [{"ref": "C1"}]}])
+    with Session() as s:
+        rows, _ = query_findings(s, document="abc")
+    assert [(r.severity, r.regulation) for r in rows] == [("LOW", "SOX")]
+
+
+def test_listing_uses_a_composite_index_without_sorting(Session):
+    with Session() as s:
+        seed(s, 200)
+        plan = " ".join(row[3] for row in s.execute(text(
+            "explain query plan select * from findings where severity='HIGH' and regulation='GDPR' "
+            "and created_at >= '2025-01-02' order by created_at desc, id desc limit 50")))
+    assert "ix_findings_severity_regulation_created" in plan
+    assert "TEMP B-TREE" not in plan
+
+
+def test_invalid_cursor():
+    with pytest.raises(ValueError):
+        decode_cursor("not-a-cursor")
+
+
+def test_findings_endpoint(Session):
+    with Session() as s:
+        seed(s, 40)
+    client = TestClient(main.app)
+    res = client.get("/findings", params={"severity": "HIGH", "limit": 4})
+    body = res.json()
+    assert res.status_code == 200 and len(body["findings"]) == 4
+    assert {f["severity"] for f in body["findings"]} == {"HIGH"}
+    nxt = client.get("/findings", params={"severity": "HIGH", "limit": 4, "cursor": body["next_cursor"]}).json()
+    assert not {f["id"] for f in nxt["findings"]} & {f["id"] for f in body["findings"]}
+    assert client.get("/findings", params={"cursor": "garbage"}).status_code == 400
+
+
+def test_findings_endpoint_without_database(monkeypatch):
+    monkeypatch.setattr(db, "engine", None)
+    assert TestClient(main.app).get("/findings").status_code == 503
@@ -0,0 +1,85 @@
+# tests for chunk-level incremental re-ingestion
+import os
+import sys
+
+import pytest
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+np = pytest.importorskip("numpy")
+faiss = pytest.importorskip("faiss")
+
+from ingest.incremental import load_version, reingest
+
+
+class CountingEmbedder:
+    def __init__(self):
+        self.calls = []
+
+    def __call__(self, chunks):
+        self.calls.append(len(chunks))
+        return np.array([[len(c), c.count("e"), 1.0] for c in chunks], dtype="float32")
+
+
+def agreement(extra=None):
+    lines = [f"Clause {i}: the supplier shall perform service level {i * 3}." for i in range(2000)]
+    if extra:
+        lines.insert(1000, extra)
+    return "\n".join(lines)
+
+
+def test_amendment_only_reprocesses_changed_chunks(tmp_path):
+    store = str(tmp_path / "msa")
+    embed = CountingEmbedder()
+    analyzed = []
+
+    def analyze(chunks):
+        analyzed.append(len(chunks))
+        return [[{"risk": "retention"}] if "personal data" in c else [] for c in chunks]
+
+    first = reingest(store, agreement(), embed, analyze)
+    assert first["version"] == 1 and first["added"] == first["chunks"]
+    before, before_embeddings = load_version(store)
+
+    second = reingest(store, agreement("Clause 999a: personal data is kept forever."), embed, analyze)
+    assert second["version"] == 2
+    assert second["added"] == 1 and second["removed"] == 1
+    assert second["unchanged"] == first["chunks"] - 1
+    assert embed.calls[-1] == 1 and analyzed[-1] == 1
+    assert second["findings"] == [{"risk": "retention"}]
+
+    manifest, embeddings = load_version(store)
+    index = faiss.read_index(os.path.join(store, "index.faiss"))
+    assert index.ntotal == len(manifest["chunks"]) == len(embeddings)
+
+    # unchanged chunks keep their ids and vectors, in the store and in the index
+    old = {c["hash"]: (c["id"], before_embeddings[row]) for row, c in enumerate(before["chunks"])}
+    kept = [(row, c) for row, c in enumerate(manifest["chunks"]) if c["hash"] in old]
+    assert len(kept) == second["unchanged"]
+    for row, c in kept:
+        old_id, old_vector = old[c["hash"]]
+        assert c["id"] == old_id
+        assert np.array_equal(embeddings[row], old_vector)
+        assert np.array_equal(index.reconstruct(c["id"]), old_vector)
+
+
+def test_unchanged_version_embeds_nothing(tmp_path):
+    store = str(tmp_path / "msa")
+    embed = CountingEmbedder()
+    reingest(store, agreement(), embed)
+    report = reingest(store, agreement(), embed)
+
+    assert report["added"] == report["removed"] == 0
+    assert len(embed.calls) == 1
+
+
+def test_empty_first_version_is_rejected_and_empty_later_version_removes_all(tmp_path):
+    store = str(tmp_path / "msa")
+    with pytest.raises(ValueError):
+        reingest(store, "   ", CountingEmbedder())
+    assert load_version(store) == (None, None)
+
+    reingest(store, agreement(), CountingEmbedder())
+    report = reingest(store, "", CountingEmbedder())
+    assert report["version"] == 2 and report["chunks"] == 0 and report["removed"] > 0
+    assert faiss.read_index(os.path.join(store, "index.faiss")).ntotal == 0
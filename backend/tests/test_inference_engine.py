@@ -0,0 +1,119 @@
+# tests for the quantized / ONNX inference backends
+import json
+import os
+import sys
+
+import pytest
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+torch = pytest.importorskip("torch")
+transformers = pytest.importorskip("transformers")
+
+from app.inference import engine
+from app.inference.engine import ParityError, load_runner, parity
+
+WORDS = [f"w{i}" for i in range(200)]
+TEXTS = [" ".join(WORDS[i:i + n]) for i, n in [(0, 5), (10, 40), (50, 12), (100, 3)]]
+
+
+def save_tiny(path, classifier=False):
+    os.makedirs(path, exist_ok=True)
+    with open(os.path.join(path, "vocab.txt"), "w") as f:
+        f.write("\n".join(["[PAD]", "[UNK]", "[CLS]", "[SEP]", "[MASK]"] + WORDS))
+    transformers.BertTokenizerFast(os.path.join(path, "vocab.txt")).save_pretrained(path)
+    config = transformers.BertConfig(vocab_size=205, hidden_size=64, num_hidden_layers=2,
+                                     num_attention_heads=2, intermediate_size=128, num_labels=3)
+    torch.manual_seed(0)
+    cls = transformers.BertForSequenceClassification if classifier else transformers.BertModel
+    cls(config).save_pretrained(path)
+    return path
+
+
+@pytest.fixture
+def encoder_dir(tmp_path):
+    return save_tiny(str(tmp_path / "enc"))
+
+
+def test_length_sorted_batches_keep_input_order(encoder_dir):
+    runner = load_runner(encoder_dir, "torch")
+    batched = runner.encode(TEXTS, batch_size=2)
+    single = [runner.encode([t])[0] for t in TEXTS]
+
+    assert batched.shape == (4, 64)
+    for a, b in zip(batched, single):
+        assert float(a @ b) > 0.9999
+
+
+def test_int8_matches_fp32_within_tolerance(encoder_dir):
+    report = parity(load_runner(encoder_dir, "torch"), load_runner(encoder_dir, "int8"), TEXTS)
+    assert report["ok"] and report["min_cosine"] > 0.98
+
+
+def test_onnx_export_matches_fp32(encoder_dir, tmp_path):
+    pytest.importorskip("onnxruntime")
+    onnx_runner = load_runner(encoder_dir, "onnx", export_dir=str(tmp_path / "onnx"))
+    assert onnx_runner.path.endswith(".int8.onnx")
+    assert parity(load_runner(encoder_dir, "torch"), onnx_runner, TEXTS)["ok"]
+
+
+def test_classifier_parity_and_drift_detection(tmp_path):
+    model_dir = save_tiny(str(tmp_path / "cls"), classifier=True)
+    reference = load_runner(model_dir, "torch", classifier=True)
+    assert parity(reference, load_runner(model_dir, "int8", classifier=True), TEXTS, tolerance=0.9)["ok"]
+
+    drifted = load_runner(model_dir, "torch", classifier=True)
+    with torch.no_grad():
+        drifted.model.classifier.weight.mul_(-50)
+    with pytest.raises(ParityError):
+        parity(reference, drifted, TEXTS, tolerance=0.9)
+
+
+def test_unknown_backend_falls_back_to_torch(encoder_dir, monkeypatch):
+    monkeypatch.setattr(engine, "_encoder", None)
+    monkeypatch.setattr(engine, "EMBEDDING_MODEL", encoder_dir)
+    monkeypatch.setattr(engine, "INFERENCE_BACKEND", "tpu")
+
+    assert engine.get_encoder().backend == "torch"
+
+
+def test_checkpoint_fingerprint_changes_when_retrained(encoder_dir):
+    before = engine.checkpoint_fingerprint(encoder_dir)
+    assert engine.checkpoint_fingerprint(encoder_dir) == before
+    weights = [n for n in os.listdir(encoder_dir) if n.endswith((".safetensors", ".bin"))][0]
+    st = os.stat(os.path.join(encoder_dir, weights))
+    os.utime(os.path.join(encoder_dir, weights), ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000_000))
+    assert engine.checkpoint_fingerprint(encoder_dir) != before
+
+
+def test_parity_is_checked_once_per_export(encoder_dir, tmp_path, monkeypatch):
+    candidate = load_runner(encoder_dir, "int8")
+    candidate.path = str(tmp_path / "model.int8.onnx")  # stands in for an exported graph
+    loads = []
+    real_load = engine.load_runner
+    monkeypatch.setattr(engine, "load_runner", lambda *a, **kw: loads.append(a) or real_load(*a, **kw))
+
+    first = engine.cached_parity(candidate)
+    second = engine.cached_parity(candidate)
+    assert first["ok"] and second == {**first, "cached": True}
+    assert len(loads) == 1  # the FP32 reference, on the first check only
+
+    with open(candidate.path + ".parity.json", "w") as f:
+        json.dump({"key": engine._parity_key(), "report": {**first, "ok": False}}, f)
+    with pytest.raises(ParityError):
+        engine.cached_parity(candidate)
+    assert len(loads) == 1
+
+
+def test_export_replaces_only_stale_checkpoints(encoder_dir, tmp_path):
+    out = tmp_path / "onnx"
+    for age, name in enumerate(["old", "previous", ".crashed-export"]):
+        (out / name).mkdir(parents=True)
+        os.utime(out / name, (age, age))
+
+    path = engine.export_onnx(encoder_dir, str(out), quantize=False)
+    assert path == str(out / engine.checkpoint_fingerprint(encoder_dir) / "model.onnx")
+    assert os.path.exists(path)
+    # the previous checkpoint stays for replicas still serving it; temp dirs of crashed exports go
+    assert sorted(os.listdir(out)) == sorted([".lock", "previous", engine.checkpoint_fingerprint(encoder_dir)])
+    assert engine.export_onnx(encoder_dir, str(out), quantize=False) == path
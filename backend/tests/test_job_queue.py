@@ -0,0 +1,212 @@
+# tests for the Redis Streams job queue and the worker loop, on fakeredis
+import asyncio
+import os
+import sys
+
+import pytest
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+fakeredis = pytest.importorskip("fakeredis")
+
+from app.jobs.queue import MAX_DELIVERIES, JobQueue
+
+
+@pytest.fixture
+def queue():
+    return JobQueue(fakeredis.FakeRedis(decode_responses=True), stream="test:jobs", group="test-workers")
+
+
+@pytest.fixture
+def worker(queue, monkeypatch):
+    import worker as worker_mod
+    monkeypatch.setattr(worker_mod, "get_job_queue", lambda: queue)
+    monkeypatch.setattr(worker_mod, "stopping", False)
+    monkeypatch.setattr(worker_mod, "BLOCK_MS", 10)
+    return worker_mod
+
+
+def stages(**handlers):
+    """Stage handlers for the worker; unlisted stages finish the job"""
+    async def finish(job):
+        return None, {"stage": "done"}
+    return {stage: handlers.get(stage, finish) for stage in ("extract", "analyze", "render")}
+
+
+def test_job_moves_through_stages(queue):
+    job_id = queue.submit({"document": "contract", "path": "/tmp/x.pdf"})
+    assert queue.status(job_id)["status"] == "queued"
+    assert queue.stats()["lag"] == 1
+
+    (task,) = queue.claim("w1", block_ms=100)
+    assert (task.job_id, task.stage) == (job_id, "extract")
+    queue.start(task, "w1")
+    assert queue.status(job_id)["status"] == "running"
+    queue.advance(task, "analyze", text_path="/tmp/x.txt")
+
+    (task,) = queue.claim("w2", block_ms=100)
+    assert task.stage == "analyze"
+    queue.complete(task, {"compliance_score": 75})
+
+    job = queue.status(job_id)
+    assert job["status"] == "done"
+    assert job["result"] == {"compliance_score": 75}
+    assert job["text_path"] == "/tmp/x.txt"
+    stats = queue.stats()
+    assert stats["pending"] == 0 and stats["lag"] == 0
+
+
+def test_stalled_entries_are_reclaimed(queue):
+    job_id = queue.submit({"document": "contract"})
+    (task,) = queue.claim("crashed-worker", block_ms=100)
+    assert queue.stats()["pending"] == 1
+
+    (reclaimed,) = queue.reclaim_stalled("w2", min_idle_ms=0)
+    assert reclaimed.job_id == job_id
+    assert reclaimed.deliveries == 2
+
+    queue.fail(reclaimed, "boom")
+    assert queue.status(job_id)["status"] == "failed"
+    stats = queue.stats()
+    assert stats["pending"] == 0 and stats["dead"] == 1
+
+
+def test_handler_failure_leaves_the_entry_for_a_retry(queue, worker, monkeypatch):
+    async def boom(job):
+        raise RuntimeError("LLM down")
+
+    monkeypatch.setattr(worker, "HANDLERS", stages(extract=boom))
+    job_id = queue.submit({"document": "contract"})
+    (task,) = queue.claim("w1", block_ms=10)
+    asyncio.run(worker.handle(queue, task))
+
+    job = queue.status(job_id)
+    assert job["status"] == "retrying" and job["error"] == "LLM down"
+    (retry,) = queue.reclaim_stalled("w2", min_idle_ms=0)
+    assert (retry.job_id, retry.deliveries) == (job_id, 2)
+
+
+def test_success_advances_to_the_next_stage(queue, worker, monkeypatch):
+    async def extract(job):
+        return "analyze", {"text_path": "/tmp/contract.txt"}
+
+    monkeypatch.setattr(worker, "HANDLERS", stages(extract=extract))
+    job_id = queue.submit({"document": "contract"})
+    (task,) = queue.claim("w1", block_ms=10)
+    asyncio.run(worker.handle(queue, task))
+
+    assert queue.status(job_id)["text_path"] == "/tmp/contract.txt"
+    assert queue.stats()["pending"] == 0
+    (task,) = queue.claim("w1", block_ms=10)
+    assert (task.job_id, task.stage) == (job_id, "analyze")
+
+
+def test_too_many_deliveries_go_to_the_dead_stream(queue, worker, monkeypatch):
+    called = []
+
+    async def extract(job):
+        called.append(job)
+        return None, {}
+
+    monkeypatch.setattr(worker, "HANDLERS", stages(extract=extract))
+    job_id = queue.submit({"document": "contract"})
+    (task,) = queue.claim("w1", block_ms=10)
+    task.deliveries = MAX_DELIVERIES + 1
+    asyncio.run(worker.handle(queue, task))
+
+    assert called == []
+    assert queue.status(job_id)["status"] == "failed"
+    (entry,) = queue.r.xrange(queue.dead_stream)
+    assert entry[1]["job_id"] == job_id and "Gave up" in entry[1]["error"]
+    assert queue.stats()["pending"] == 0
+
+
+def test_run_drives_a_job_through_every_stage(queue, worker, monkeypatch):
+    async def extract(job):
+        return "analyze", {}
+
+    async def analyze(job):
+        return "render", {}
+
+    async def render(job):
+        worker.stopping = True
+        return None, {"document": job["payload"]["document"]}
+
+    monkeypatch.setattr(worker, "HANDLERS", stages(extract=extract, analyze=analyze, render=render))
+    job_id = queue.submit({"document": "contract"})
+    asyncio.run(worker.run())
+
+    assert queue.status(job_id)["result"] == {"document": "contract"}
+    assert queue.stats()["pending"] == 0
+
+
+def test_long_stage_keeps_its_claim_fresh(queue, worker, monkeypatch):
+    touched = []
+    monkeypatch.setattr(worker, "HEARTBEAT_S", 0.02)
+    monkeypatch.setattr(queue, "touch", lambda task, consumer, min_idle_ms: touched.append(task.message_id) or True)
+
+    async def slow(job):
+        await asyncio.sleep(0.15)
+        return None, {}
+
+    monkeypatch.setattr(worker, "HANDLERS", stages(extract=slow))
+    queue.submit({"document": "contract"})
+    (task,) = queue.claim("w1", block_ms=10)
+    asyncio.run(worker.handle(queue, task))
+
+    assert len(touched) >= 3 and set(touched) == {task.message_id}
+
+
+def test_touch_resets_idle_time_without_counting_a_delivery(queue):
+    queue.submit({"document": "contract"})
+    (task,) = queue.claim("w1", block_ms=10)
+    assert queue.touch(task, "w1")
+
+    (pending,) = queue.r.xpending_range(queue.stream, queue.group, min="-", max="+", count=1)
+    assert pending["times_delivered"] == 1 and pending["consumer"] == "w1"
+    assert queue.reclaim_stalled("w2", min_idle_ms=60000) == []
+
+
+def test_touch_never_takes_back_a_reclaimed_entry(queue):
+    queue.submit({"document": "contract"})
+    (task,) = queue.claim("w1", block_ms=10)
+    (taken,) = queue.reclaim_stalled("w2", min_idle_ms=0)
+
+    assert not queue.touch(task, "w1")  # no longer the owner
+    assert not queue.touch(taken, "w2", min_idle_ms=60000)  # just refreshed: nothing to do
+    assert queue.touch(taken, "w2")
+    (pending,) = queue.r.xpending_range(queue.stream, queue.group, min="-", max="+", count=1)
+    assert pending["consumer"] == "w2"
+
+
+def test_reclaim_takes_one_entry_with_its_own_delivery_count(queue):
+    for _ in range(3):
+        queue.submit({"document": "contract"})
+    first, second, third = queue.claim("crashed-worker", count=3, block_ms=10)
+    queue.reclaim_stalled("w2", min_idle_ms=0)  # first: delivered twice now
+    queue.r.xack(queue.stream, queue.group, first.message_id)
+
+    (task,) = queue.reclaim_stalled("w3", min_idle_ms=0)
+    assert (task.message_id, task.deliveries) == (second.message_id, 2)
+    tasks = queue.reclaim_stalled("w3", min_idle_ms=0, count=2)
+    assert [(t.message_id, t.deliveries) for t in tasks] == [(second.message_id, 3), (third.message_id, 2)]
+
+
+def test_stage_taken_over_mid_run_is_not_advanced(queue, worker, monkeypatch):
+    monkeypatch.setattr(worker, "HEARTBEAT_S", 0.02)
+
+    async def slow(job):
+        # another worker decides this one stalled and takes the entry
+        await asyncio.to_thread(queue.reclaim_stalled, "w2", 0)
+        await asyncio.sleep(0.1)
+        return "analyze", {}
+
+    monkeypatch.setattr(worker, "HANDLERS", stages(extract=slow))
+    job_id = queue.submit({"document": "contract"})
+    (task,) = queue.claim(worker.CONSUMER, block_ms=10)
+    asyncio.run(worker.handle(queue, task))
+
+    assert queue.status(job_id)["stage"] == "extract"
+    assert queue.r.xlen(queue.stream) == 1  # no second "analyze" entry
+    (pending,) = queue.r.xpending_range(queue.stream, queue.group, min="-", max="+", count=1)
+    assert pending["consumer"] == "w2"
@@ -0,0 +1,97 @@
+# tests for the async LLM gateway against a local fake OpenAI server
+import asyncio
+import os
+import sys
+import time
+
+import pytest
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+pytest.importorskip("httpx")
+
+from app.llm.fake_openai import FakeOpenAI
+from app.llm import gateway as gateway_mod
+from app.llm.gateway import LLMError, LLMGateway, TokenBucket
+
+MESSAGES = [{"role": "user", "content": "List the compliance risks."}]
+
+
+def run(coro_factory, server, **kwargs):
+    async def main():
+        gateway = LLMGateway(base_url=server.base_url, api_key="test", **kwargs)
+        try:
+            return await coro_factory(gateway), gateway
+        finally:
+            await gateway.aclose()
+    return asyncio.run(main())
+
+
+def test_identical_inflight_requests_are_coalesced():
+    with FakeOpenAI(latency=0.2) as server:
+        results, gateway = run(
+            lambda gw: asyncio.gather(*(gw.chat(MESSAGES) for _ in range(5))), server
+        )
+
+    assert len(server.requests) == 1
+    assert gateway.coalesced == 4
+    assert len({r["id"] for r in results}) == 1
+    assert gateway.summary()["calls"] == 1
+
+
+def test_distinct_requests_are_not_coalesced():
+    with FakeOpenAI() as server:
+        run(lambda gw: asyncio.gather(gw.chat(MESSAGES), gw.chat(MESSAGES, temperature=0.5)), server)
+
+    assert len(server.requests) == 2
+
+
+def test_retries_429_then_records_metrics():
+    with FakeOpenAI(failures=[429, 503]) as server:
+        result, gateway = run(lambda gw: gw.chat(MESSAGES), server)
+
+    assert result["choices"][0]["message"]["content"]
+    summary = gateway.summary()
+    assert summary["retries"] == 2
+    assert summary["prompt_tokens"] > 0 and summary["completion_tokens"] > 0
+
+
+def test_non_retryable_error_raises():
+    with FakeOpenAI(failures=[400]) as server:
+        with pytest.raises(LLMError):
+            run(lambda gw: gw.chat(MESSAGES), server)
+
+    assert len(server.requests) == 1
+
+
+def test_token_bucket_limits_rate():
+    async def main():
+        bucket = TokenBucket(capacity=2, refill_per_second=20)
+        started = time.perf_counter()
+        for _ in range(4):
+            await bucket.acquire()
+        return time.perf_counter() - started
+
+    # 2 immediately from the burst, 2 more at 20/s
+    assert asyncio.run(main()) >= 0.09
+
+
+def test_each_event_loop_gets_its_own_gateway(monkeypatch):
+    async def use():
+        gateway = gateway_mod.get_gateway()
+        assert gateway_mod.get_gateway() is gateway
+        try:
+            await gateway.chat(MESSAGES)
+            return gateway
+        finally:
+            await gateway_mod.close_gateway()
+
+    with FakeOpenAI() as server:
+        monkeypatch.setattr(gateway_mod, "OPENAI_BASE_URL", server.base_url)
+        monkeypatch.setattr(gateway_mod, "OPENAI_API_KEY", "test")
+        first = asyncio.run(use())
+        second = asyncio.run(use())  # a gateway bound to the first loop would fail here
+
+    assert first is not second
+    assert len(server.requests) == 2
+    assert not gateway_mod._gateways
@@ -0,0 +1,123 @@
+# tests for MinHash/LSH near-duplicate detection
+import asyncio
+import os
+import random
+import sys
+import time
+
+import pytest
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+np = pytest.importorskip("numpy")
+
+from ingest.near_duplicate import (
+    NUM_PERM, NearDuplicateIndex, differing_sections, minhash, section_digests, similarity,
+)
+
+
+def contract(seed, clauses=40):
+    rng = random.Random(seed)
+    vocab = [f"term{i}" for i in range(400)]
+    return "\n\n".join(
+        f"Clause {i}. " + " ".join(rng.choice(vocab) for _ in range(30)) for i in range(clauses)
+    )
+
+
+def test_similar_documents_have_similar_signatures():
+    base = contract(1)
+    edited = base.replace("Clause 7.", "Clause 7. The vendor shall delete personal data within 30 days.")
+    other = contract(2)
+
+    assert similarity(minhash(base), minhash(edited)) > 0.9
+    assert similarity(minhash(base), minhash(other)) < 0.2
+
+
+def test_index_finds_near_duplicate_and_changed_sections(tmp_path):
+    base = contract(1)
+    edited = base.replace("Clause 7.", "Clause 7. Retention is unlimited.")
+    index = NearDuplicateIndex(str(tmp_path / "nd.sig"))
+    index.add("base", minhash(base), {"risks": [{"category": "Retention"}], "sections": section_digests(base)})
+    index.add("other", minhash(contract(2)), {"risks": []})
+
+    doc_id, score, meta = index.query(minhash(edited), threshold=0.8)
+    assert doc_id == "base" and score >= 0.8
+    changed = differing_sections(edited, meta["sections"])
+    assert len(changed) == 1 and "Retention is unlimited" in changed[0]
+
+    assert index.query(minhash(contract(3)), threshold=0.8) is None
+    assert index.query(minhash(base), exclude="base") is None
+
+
+def test_log_is_shared_between_instances(tmp_path):
+    path = str(tmp_path / "nd.sig")
+    writer, reader = NearDuplicateIndex(path), NearDuplicateIndex(path)
+    writer.add("doc", minhash(contract(1)), {"document": "a"})
+
+    assert reader.query(minhash(contract(1)))[0] == "doc"
+    assert len(NearDuplicateIndex(path)) == 1
+
+
+def test_payloads_stay_on_disk_and_merged_records_are_found(tmp_path):
+    path = str(tmp_path / "nd.sig")
+    index = NearDuplicateIndex(path, merge_every=3)
+    for i in range(7):
+        index.add(f"doc{i}", minhash(contract(i)), {"document": f"d{i}"})
+
+    # six records were folded into the sorted arrays, one is still in the buckets
+    assert (len(index._base), len(index._recent)) == (6, 1)
+    assert not hasattr(index, "meta") and index._payloads == {}
+    for i in (0, 5, 6):
+        doc_id, _, payload = index.query(minhash(contract(i)))
+        assert (doc_id, payload) == (f"doc{i}", {"document": f"d{i}"})
+    assert NearDuplicateIndex(path, merge_every=3).query(minhash(contract(2)))[0] == "doc2"
+
+
+def test_lookup_stays_fast_on_large_index():
+    index = NearDuplicateIndex()
+    rng = np.random.RandomState(0)
+    for i in range(50000):
+        index.add(i, rng.randint(0, 2**32, size=NUM_PERM, dtype=np.uint64).astype(np.uint32))
+    probe = minhash(contract(1))
+    index.add("target", probe)
+
+    started = time.perf_counter()
+    for _ in range(100):
+        assert index.query(probe)[0] == "target"
+    assert (time.perf_counter() - started) / 100 < 0.005
+
+
+def test_reuse_keeps_only_risks_whose_sections_remain(tmp_path, monkeypatch):
+    main = pytest.importorskip("main")
+    monkeypatch.setattr(main, "near_duplicates", NearDuplicateIndex(str(tmp_path / "nd.sig")))
+    sent = []
+
+    async def analyze(text, risk_types=None, mode=None, sections=None):
+        sent.append(text)
+        # one risk per section mentioning a keyword, citing that keyword
+        risks = [{"category": word, "citations": [{"start": text.index(word, s), "end": text.index(word, s) + len(word)}]}
+                 for word in ("retention", "transfer", "audit") for s, e in sections if word in text[s:e]]
+        return risks, 0
+
+    monkeypatch.setattr(main, "analyze_document_text", analyze)
+    clauses = contract(1).split("\n\n")
+    clauses[3] += " Data retention is unlimited."
+    clauses[9] += " Any transfer abroad is allowed."
+    risks, _, reuse = asyncio.run(main.analyze_with_reuse("v1", "v1", "\n\n".join(clauses)))
+    assert [r["category"] for r in risks] == ["retention", "transfer"] and reuse == {}
+
+    # v2 grows clause 1, drops the transfer wording and adds an audit clause
+    clauses[1] += " Notices are sent by email."
+    clauses[9] = clauses[9].replace(" Any transfer abroad is allowed.", "")
+    clauses[20] += " An audit happens yearly."
+    text = "\n\n".join(clauses)
+    risks, _, reuse = asyncio.run(main.analyze_with_reuse("v2", "v2", text))
+
+    assert [r["category"] for r in risks] == ["retention", "audit"]
+    assert reuse["near_duplicate_of"] == "v1" and reuse["reused_risks"] == 1
+    # only the changed clauses went to the LLM
+    assert reuse["changed_sections"] == 3 and sent[-1] == "\n\n".join(clauses[i] for i in (1, 9, 20))
+    # citations of the reused and of the new risk both point into v2's text
+    for risk in risks:
+        (citation,) = risk["citations"]
+        assert text[citation["start"]:citation["end"]] == risk["category"]
@@ -0,0 +1,60 @@
+# tests for the monthly log partition helpers (the DDL itself needs PostgreSQL)
+import csv
+import gzip
+import os
+import sys
+from datetime import datetime, timezone
+
+import pytest
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+pytest.importorskip("sqlalchemy")
+from sqlalchemy import create_engine, insert
+
+from app.models import Base, SessionLog
+from app.retention import partitions
+from app.retention.partitions import (add_months, archive_target, export_partition, maintain, months,
+                                      partition_bounds, partition_month, partition_name)
+
+
+def utc(*args):
+    return datetime(*args, tzinfo=timezone.utc)
+
+
+def test_month_arithmetic_and_names():
+    assert add_months(utc(2025, 11, 1), 3) == utc(2026, 2, 1)
+    assert add_months(utc(2025, 1, 1), -1) == utc(2024, 12, 1)
+    assert list(months(utc(2025, 11, 17), utc(2026, 1, 2))) == [utc(2025, 11, 1), utc(2025, 12, 1), utc(2026, 1, 1)]
+    name = partition_name("audit_entries", utc(2025, 7, 1))
+    assert name == "audit_entries_p2025_07" and partition_month(name) == utc(2025, 7, 1)
+    assert partition_month("audit_entries_default") is None
+    assert partition_bounds(utc(2025, 12, 1)) == "FROM ('2025-12-01T00:00:00+00:00') TO ('2026-01-01T00:00:00+00:00')"
+
+
+def test_export_writes_every_row_compressed(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'logs.db'}")
+    Base.metadata.create_all(engine)
+    with engine.begin() as conn:
+        conn.execute(insert(SessionLog), [{"user_id": f"u{i}", "query": "q,\n\"x\"", "risk_score": i / 10}
+                                          for i in range(250)])
+        path, count = export_partition(conn, "session_logs", str(tmp_path / "archive"))
+
+    assert count == 250 and path.endswith("session_logs.csv.gz")
+    with gzip.open(path, "rt", newline="") as f:
+        rows = list(csv.DictReader(f))
+    assert len(rows) == 250 and rows[3]["user_id"] == "u3" and rows[3]["query"] == "q,\n\"x\""
+    assert not os.path.exists(path + ".tmp")
+
+
+def test_maintenance_is_a_no_op_without_postgres(tmp_path):
+    assert maintain(create_engine(f"sqlite:///{tmp_path / 'x.db'}")) is None
+
+
+def test_archival_needs_an_explicit_absolute_target(tmp_path, monkeypatch):
+    monkeypatch.setattr(partitions, "PARTITION_ARCHIVE_DIR", None)
+    assert archive_target() is None
+    assert archive_target("archive/partitions") is None
+    assert archive_target(str(tmp_path)) == str(tmp_path)
+    monkeypatch.setattr(partitions, "PARTITION_ARCHIVE_DIR", str(tmp_path / "archive"))
+    assert archive_target() == str(tmp_path / "archive")
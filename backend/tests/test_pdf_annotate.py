@@ -0,0 +1,83 @@
+# tests for batched / incremental PDF annotation
+import os
+import sys
+
+import pytest
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+fitz = pytest.importorskip("fitz")
+
+from app.utils.pdf_annotate import annotate_many, annotate_pdf, group_by_page
+
+
+def make_pdf(path, pages=3):
+    doc = fitz.open()
+    for i in range(pages):
+        page = doc.new_page()
+        page.insert_text((72, 72), f"Clause {i}: data retention period")
+    doc.save(str(path))
+    doc.close()
+
+
+def count_annots(path):
+    with fitz.open(str(path)) as doc:
+        return [len(list(page.annots())) for page in doc]
+
+
+def test_group_by_page_orders_pages():
+    anns = [{"page": 2, "rect": (0, 0, 1, 1)}, {"page": 0, "rect": (0, 0, 1, 1)}, {"page": 2, "rect": (1, 1, 2, 2)}]
+    grouped = group_by_page(anns)
+    assert list(grouped) == [0, 2]
+    assert len(grouped[2]) == 2
+
+
+def test_incremental_save_appends_to_original(tmp_path):
+    src = tmp_path / "contract.pdf"
+    make_pdf(src)
+    original = src.read_bytes()
+
+    anns = [
+        {"page": 0, "rect": (72, 60, 300, 80), "note": "GDPR retention"},
+        {"page": 2, "rect": (72, 60, 300, 80)},
+    ]
+    annotate_pdf(str(src), anns)
+
+    updated = src.read_bytes()
+    assert updated.startswith(original)
+    # highlight + note on page 0, highlight on page 2
+    assert count_annots(src) == [2, 0, 1]
+
+
+def test_out_path_leaves_source_untouched(tmp_path):
+    src = tmp_path / "contract.pdf"
+    out = tmp_path / "annotated.pdf"
+    make_pdf(src)
+    original = src.read_bytes()
+
+    annotate_pdf(str(src), [{"page": 1, "rect": (72, 60, 300, 80)}], str(out))
+
+    assert src.read_bytes() == original
+    assert count_annots(out) == [0, 1, 0]
+
+
+def test_full_rewrite_when_not_incremental(tmp_path):
+    src = tmp_path / "contract.pdf"
+    make_pdf(src)
+
+    annotate_pdf(str(src), [{"page": 0, "rect": (72, 60, 300, 80)}], incremental=False)
+
+    assert count_annots(src) == [1, 0, 0]
+
+
+def test_annotate_many_runs_every_job(tmp_path):
+    jobs = []
+    for i in range(3):
+        src = tmp_path / f"doc{i}.pdf"
+        make_pdf(src, pages=2)
+        jobs.append({"in_path": str(src), "annotations": [{"page": 1, "rect": (72, 60, 300, 80)}]})
+
+    outputs = annotate_many(jobs, max_workers=2)
+
+    assert outputs == [job["in_path"] for job in jobs]
+    assert all(count_annots(p) == [0, 1] for p in outputs)
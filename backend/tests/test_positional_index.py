@@ -0,0 +1,93 @@
+# tests for the word position index behind citation highlights
+import os
+import sys
+import time
+
+import pytest
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+fitz = pytest.importorskip("fitz")
+pytest.importorskip("pdfplumber")
+
+from main import extract_text
+from app.rag.positional_index import PositionalIndex, PositionalIndexBuilder, positions_path
+from app.utils.pdf_annotate import annotate_pdf
+
+LINES = ["Clause 1: personal data is retained for seven years.",
+         "Clause 2: breaches are notified within 72 hours.",
+         "Clause 3: sub-processors require prior written consent."]
+
+
+@pytest.fixture
+def contract(tmp_path):
+    path = str(tmp_path / "contract.pdf")
+    doc = fitz.open()
+    for p in range(2):
+        page = doc.new_page()
+        for i, line in enumerate(LINES):
+            page.insert_text((72, 100 + 20 * i), line.replace("Clause", f"P{p} Clause"))
+    doc.save(path)
+    doc.close()
+    text = extract_text(path, positions_path(path))
+    return path, text, PositionalIndex.load(positions_path(path))
+
+
+def test_span_maps_to_the_word_on_the_page(contract):
+    path, text, index = contract
+    start = text.index("seven", text.index("P1 Clause 1"))
+    rects = index.span_rects(start, start + len("seven"))
+    with fitz.open(path) as doc:
+        expected = doc[1].search_for("seven")[0]
+    assert [r["page"] for r in rects] == [1]
+    x0, top, x1, bottom = rects[0]["rect"]
+    # same horizontal extent; vertically the font-size box sits inside the glyph box
+    assert abs(x0 - expected.x0) < 1 and abs(x1 - expected.x1) < 1
+    assert expected.y0 <= top < bottom <= expected.y1
+
+
+def test_multi_line_span_gives_one_rect_per_line(contract):
+    _, text, index = contract
+    start = text.index("retained", text.index("P0"))
+    end = text.index("72", text.index("P1")) + 2
+    rects = index.span_rects(start, end)
+    # rest of line 1 through line 3 on page 0, then lines 1-2 on page 1
+    assert [r["page"] for r in rects] == [0, 0, 0, 1, 1]
+    assert rects[0]["rect"][1] < rects[1]["rect"][1] < rects[2]["rect"][1]
+    assert index.span_rects(len(text) + 10, len(text) + 20) == []
+
+
+def test_chunk_ids_and_ocr_words():
+    builder = PositionalIndexBuilder()
+    page_text = "Data is kept\nfor ten years"
+    tsv = ("level\tpage_num\tblock_num\tpar_num\tline_num\tword_num\tleft\ttop\twidth\theight\tconf\ttext\n"
+           "4\t1\t1\t1\t1\t0\t100\t100\t600\t40\t-1\t\n"
+           "5\t1\t1\t1\t1\t1\t100\t100\t120\t40\t96\tData\n"
+           "5\t1\t1\t1\t1\t2\t240\t100\t60\t40\t96\tis\n"
+           "5\t1\t1\t1\t1\t3\t320\t100\t120\t40\t96\tkept\n"
+           "5\t1\t1\t1\t2\t1\t100\t160\t80\t40\t96\tfor\n"
+           "5\t1\t1\t1\t2\t2\t200\t160\t80\t40\t96\tten\n"
+           "5\t1\t1\t1\t2\t3\t300\t160\t140\t40\t96\tyears\n")
+    builder.add_ocr_words(0, 0, page_text, tsv, 72 / 200)
+    index = builder.build()
+    index.chunks = [(0, 12), (13, len(page_text))]
+
+    assert len(index) == 6
+    assert index.chunk_rects("C1") == [{"page": 0, "rect": pytest.approx((36.0, 57.6, 158.4, 72.0))}]
+    assert len(index.chunk_rects(0)) == 1
+
+
+def test_highlights_for_hundreds_of_findings(contract, tmp_path):
+    path, text, index = contract
+    spans = [(m, m + 30) for m in range(0, len(text) - 30, max(1, len(text) // 300))]
+    risks = [{"severity": "HIGH", "category": f"F{k}", "citations": [{"start": s, "end": e}]}
+             for k, (s, e) in enumerate(spans)]
+
+    started = time.perf_counter()
+    annotations = PositionalIndex.load(positions_path(path)).highlights(risks)
+    assert time.perf_counter() - started < 0.25
+    assert sum("note" in a for a in annotations) == len(risks) >= 200
+
+    out = annotate_pdf(path, annotations[:20], str(tmp_path / "annotated.pdf"))
+    with fitz.open(out) as doc:
+        assert sum(1 for page in doc for a in page.annots() if a.type[1] == "Highlight") == 20
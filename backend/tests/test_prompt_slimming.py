@@ -0,0 +1,100 @@
+# tests for retrieval-based prompt slimming
+import asyncio
+import functools
+import json
+import os
+import re
+import sys
+
+import pytest
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+np = pytest.importorskip("numpy")
+
+from app.llm.gateway import estimate_tokens
+from app.rag import prompt_slimming
+from app.rag.prompt_slimming import attach_citations, select_excerpts, slim_text
+from app.rag.slimming_eval import match_risks
+
+PROBES = {
+    "retention": "retention period deletion records stored",
+    "breach": "breach notification incident hours",
+}
+VOCAB = sorted(set(" ".join(PROBES.values()).split()) | {"party", "agreement", "hereby", "herein"})
+
+
+class BagOfWords:
+    def encode(self, texts):
+        out = np.zeros((len(texts), len(VOCAB)), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for word in text.lower().split():
+                if word in VOCAB:
+                    out[row, VOCAB.index(word)] += 1
+        return out / np.clip(np.linalg.norm(out, axis=1, keepdims=True), 1e-12, None)
+
+
+def contract():
+    boiler = "the party hereby agrees to the agreement as set out herein " * 10
+    clauses = [boiler] * 40
+    clauses[7] = "records are stored and the retention period ends with deletion " * 8
+    clauses[31] = "a breach incident requires notification within 72 hours " * 8
+    return "\n".join(clauses)
+
+
+def test_selects_topic_chunks_within_budget():
+    text = contract()
+    excerpts = select_excerpts(text, budget=400, encoder=BagOfWords(), probes=PROBES, chunk_words=80)
+
+    assert sum(estimate_tokens(text[x.start:x.end]) for x in excerpts) <= 400
+    assert {x.topic for x in excerpts} == {"retention", "breach"}
+    assert [x.start for x in excerpts] == sorted(x.start for x in excerpts)
+    body = slim_text(text, excerpts)
+    assert "retention period" in body and "72 hours" in body
+    assert estimate_tokens(body) < estimate_tokens(text) / 4
+
+
+def test_citations_resolve_to_spans():
+    text = contract()
+    excerpts = select_excerpts(text, budget=400, encoder=BagOfWords(), probes=PROBES, chunk_words=80)
+    ref = next(x.ref for x in excerpts if x.topic == "breach")
+    risks = attach_citations([{"category": "Breach", "source": [ref, "C999"]}], excerpts)
+
+    (citation,) = risks[0]["citations"]
+    assert "72 hours" in text[citation["start"]:citation["end"]]
+    assert "source" not in risks[0]
+
+
+def test_slim_mode_sends_fewer_tokens(monkeypatch):
+    pytest.importorskip("httpx")
+    import main
+    from app.llm import gateway as gateway_mod
+    from app.llm.fake_openai import FakeOpenAI
+
+    def answer(messages):
+        prompt = messages[0]["content"]
+        refs = [m.group(1) for m in re.finditer(r"\[(C\d+)\] records are stored", prompt)]
+        return json.dumps({"risks": [{"category": "Retention", "regulation": "GDPR", "severity": "HIGH",
+                                      "source": refs[:1]}]})
+
+    monkeypatch.setattr(main, "select_excerpts", functools.partial(
+        select_excerpts, encoder=BagOfWords(), probes=PROBES, chunk_words=80, budget=400))
+    monkeypatch.setattr(main, "ANALYSIS_TOKEN_BUDGET", 400)
+
+    async def run(server):
+        gateway = gateway_mod.get_gateway()
+        try:
+            full, _ = await main.analyze_document_text(contract(), mode="full")
+            slim, _ = await main.analyze_document_text(contract(), mode="slim")
+        finally:
+            await gateway_mod.close_gateway()
+        return full, slim, gateway.summary()["recent"]
+
+    with FakeOpenAI(content=answer) as server:
+        monkeypatch.setattr(gateway_mod, "OPENAI_BASE_URL", server.base_url)
+        monkeypatch.setattr(gateway_mod, "OPENAI_API_KEY", "test")
+        full, slim, calls = asyncio.run(run(server))
+
+    assert calls[1]["prompt_tokens"] < calls[0]["prompt_tokens"] / 4
+    assert match_risks(full, slim) == 1
+    assert slim[0]["citations"][0]["topic"] == "retention"
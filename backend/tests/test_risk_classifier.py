@@ -0,0 +1,93 @@
+# tests for the persisted RBI risk pre-classifier
+import os
+import random
+import sys
+import time
+
+import pytest
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+pytest.importorskip("sklearn")
+
+from app.classifier import risk_model
+from app.classifier.risk_model import OnlineTrainer, evaluate, holdout, load, save, train
+
+TOPICS = {
+    "KYC/AML": "customer due diligence money laundering beneficial owner kyc verification",
+    "Cyber Security": "cyber incident phishing malware security operations centre patching",
+    "Lending/Credit": "loan sanction credit appraisal priority sector lending interest rate",
+    "Foreign Exchange": "foreign exchange remittance fema export import forex reporting",
+}
+
+
+def corpus(n, seed=0):
+    rng = random.Random(seed)
+    texts, labels = [], []
+    for _ in range(n):
+        label = rng.choice(sorted(TOPICS))
+        words = TOPICS[label].split()
+        texts.append(" ".join(rng.choice(words) for _ in range(25)) + " bank circular")
+        labels.append(label)
+    return texts, labels
+
+
+def test_artifacts_are_versioned_and_reloaded(tmp_path):
+    texts, labels = corpus(200)
+    first = save(train(texts, labels), str(tmp_path), version="v1")
+    second = save(train(texts, labels, mode="hashing"), str(tmp_path), version="v2")
+
+    assert (first, second) == ("v1", "v2")
+    latest = load(str(tmp_path))
+    assert latest.version == "v2" and latest.meta["mode"] == "hashing"
+    assert load(str(tmp_path), "v1").meta["mode"] == "tfidf"
+    assert latest.tag(["suspicious money laundering by beneficial owner"])[0][0] == "KYC/AML"
+
+
+def test_online_training_streams_batches():
+    trainer = OnlineTrainer(sorted(TOPICS))
+    for seed in range(5):
+        trainer.partial_fit(*corpus(100, seed))
+    classifier = trainer.classifier()
+
+    texts, labels = corpus(100, seed=99)
+    predicted = [tag[0] for tag in classifier.tag(texts, threshold=0.0)]
+    assert trainer.samples == 500
+    assert sum(p == l for p, l in zip(predicted, labels)) >= 95
+
+
+def test_batch_prediction_throughput():
+    classifier = train(*corpus(400))
+    chunks, _ = corpus(5000, seed=1)
+    chunks = [c * 8 for c in chunks]  # ~200-word chunks
+
+    started = time.perf_counter()
+    proba = classifier.predict_proba(chunks)
+    elapsed = time.perf_counter() - started
+
+    assert proba.shape == (5000, len(TOPICS))
+    assert 5000 / elapsed > 1000
+
+
+def test_missing_artifact_disables_classifier(tmp_path, monkeypatch):
+    monkeypatch.setattr(risk_model, "RISK_MODEL_DIR", str(tmp_path))
+    monkeypatch.setattr(risk_model, "_classifier_loaded", False)
+    monkeypatch.setattr(risk_model, "_classifier", None)
+
+    assert risk_model.get_classifier() is None
+
+
+def test_default_model_dir_does_not_depend_on_the_cwd():
+    backend = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+    assert os.path.isabs(risk_model.RISK_MODEL_DIR)
+    assert risk_model.RISK_MODEL_DIR.startswith(backend + os.sep)
+
+
+def test_held_out_report():
+    texts, labels, test_texts, test_labels = holdout(*corpus(200), test_size=0.25)
+    assert (len(texts), len(test_texts)) == (150, 50)
+    assert set(test_labels) == set(TOPICS)
+
+    report, accuracy = evaluate(train(texts, labels), test_texts, test_labels)
+    assert "KYC/AML" in report and "precision" in report
+    assert accuracy >= 0.9
@@ -0,0 +1,119 @@
+# tests for per-stage hot-path metrics and the sampling profiler
+import asyncio
+import os
+import sys
+import time
+
+import pytest
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from fastapi.testclient import TestClient
+
+from app.observability import profiler as profiler_mod
+from app.observability import stages
+from app.observability.profiler import ProfileStore, SamplingProfiler
+from app.observability.stages import collect_trace, stage, timed
+
+local_only = pytest.mark.skipif(stages._SECONDS is not None, reason="prometheus_client holds the aggregates")
+
+
+@local_only
+def test_stage_records_duration_and_counts():
+    with stage("t_ocr", pages=2) as s:
+        s.add(bytes=100)
+        s.add(bytes=50, tokens=0)
+    agg = stages.snapshot()["t_ocr"]
+    assert agg["count"] == 1
+    assert agg["pages"] == 2 and agg["bytes"] == 150
+    assert "tokens" not in agg
+    assert sum(agg["buckets"].values()) == 1
+
+
+@local_only
+def test_stage_counts_errors():
+    with pytest.raises(ValueError):
+        with stage("t_fail"):
+            raise ValueError("boom")
+    assert stages.snapshot()["t_fail"]["errors"] == 1
+
+
+def test_timed_sync_and_async_feed_the_trace():
+    @timed("t_render", lambda result, *a, **k: {"bytes": len(result)})
+    def render(n):
+        return b"x" * n
+
+    @timed("t_llm")
+    async def ask():
+        return "ok"
+
+    with collect_trace() as trace:
+        assert render(10) == b"x" * 10
+        assert asyncio.run(ask()) == "ok"
+    assert [t["stage"] for t in trace] == ["t_render", "t_llm"]
+    assert trace[0]["bytes"] == 10
+    assert render.__name__ == "render"
+
+
+def test_trace_is_off_outside_collect_trace():
+    with collect_trace() as trace:
+        pass
+    with stage("t_outside"):
+        pass
+    assert trace == []
+
+
+def test_server_timing_header():
+    import main
+
+    def fake_extract(path):
+        with stage("extract", pages=1):
+            return "text"
+
+    client = TestClient(main.app)
+    main.app.add_api_route("/_test_stage", lambda: {"text": fake_extract("x")})
+    try:
+        res = client.get("/_test_stage")
+    finally:
+        main.app.router.routes.pop()
+    assert res.status_code == 200
+    assert res.headers["server-timing"].startswith("extract;dur=")
+    assert "server-timing" not in client.get("/health").headers
+
+
+def test_profile_endpoint_requires_profiling(monkeypatch):
+    import main
+
+    store = ProfileStore()
+    monkeypatch.setattr(main, "profiles", store)
+    client = TestClient(main.app)
+
+    monkeypatch.setattr(main, "PROFILING_ENABLED", True)
+    res = client.get("/health", headers={"X-Profile": "1"})
+    profile_id = res.headers["x-profile-id"]
+    assert client.get(f"/debug/profiles/{profile_id}").status_code == 200
+
+    monkeypatch.setattr(main, "PROFILING_ENABLED", False)
+    assert client.get(f"/debug/profiles/{profile_id}").status_code == 404
+
+
+def busy(seconds):
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        sum(range(100))
+
+
+def test_sampling_profiler_collapsed_stacks():
+    prof = SamplingProfiler(interval=0.001).start()
+    busy(0.2)
+    prof.stop()
+    assert prof.count > 0
+    lines = prof.collapsed().splitlines()
+    stack, count = next(line for line in lines if "busy (test_stage_metrics.py" in line).rsplit(" ", 1)
+    assert stack.startswith("MainThread;") and int(count) > 0
+
+    store = ProfileStore(keep=1)
+    first = store.add(prof)
+    second = store.add(prof)
+    assert store.get(first) is None and store.get(second)["samples"] == prof.count
+    assert profiler_mod.PROFILING_ENABLED is (os.environ.get("PROFILING_ENABLED", "0") == "1")
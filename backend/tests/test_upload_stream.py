@@ -0,0 +1,72 @@
+# tests for the streaming /upload_documents/stream endpoint
+import io
+import json
+import os
+import sys
+
+import pytest
+from fastapi.testclient import TestClient
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+pytest.importorskip("pdfplumber")
+canvas = pytest.importorskip("reportlab.pdfgen.canvas")
+
+import main
+from app.llm import gateway as gateway_mod
+from app.llm.fake_openai import FakeOpenAI
+from app.storage.blob_store import BlobStore
+from ingest.near_duplicate import NearDuplicateIndex
+
+
+def make_pdf(text):
+    buf = io.BytesIO()
+    c = canvas.Canvas(buf)
+    c.drawString(72, 720, text)
+    c.save()
+    return buf.getvalue()
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    monkeypatch.setattr(main, "PDF_DIR", str(tmp_path / "pdfs"))
+    monkeypatch.setattr(main, "blob_store", BlobStore(str(tmp_path / "uploads")))
+    monkeypatch.setattr(main, "near_duplicates", NearDuplicateIndex(str(tmp_path / "near_duplicates.sig")))
+    with FakeOpenAI() as server:
+        monkeypatch.setattr(gateway_mod, "OPENAI_BASE_URL", server.base_url)
+        monkeypatch.setattr(gateway_mod, "OPENAI_API_KEY", "test")
+        with TestClient(main.app) as c:
+            yield c
+
+
+def test_stream_emits_each_result_before_next_document(client):
+    files = [
+        ("files", ("first.pdf", make_pdf("Personal data is retained indefinitely."), "application/pdf")),
+        ("files", ("second.pdf", make_pdf("Vendors may access customer records."), "application/pdf")),
+    ]
+    res = client.post("/upload_documents/stream", files=files)
+
+    assert res.status_code == 200
+    assert res.headers["content-type"].startswith("application/x-ndjson")
+    events = [json.loads(line) for line in res.text.splitlines()]
+    kinds = [(e["event"], e.get("document"), e.get("stage")) for e in events]
+
+    assert kinds[0][0] == "start"
+    assert kinds[-1] == ("done", None, None)
+    first_result = kinds.index(("result", "first", None))
+    assert first_result < kinds.index(("progress", "second", "stored"))
+    assert [k[2] for k in kinds[1:first_result]] == ["stored", "extracted", "analyzed", "rendered"]
+
+    result = events[first_result]
+    assert result["risk_count"] == 1 and result["risks"][0]["regulation"] == "GDPR"
+    assert result["summary_pdf"].endswith(".pdf")
+
+
+def test_stream_supports_server_sent_events(client):
+    files = [("files", ("only.pdf", make_pdf("Consent is not recorded."), "application/pdf"))]
+    res = client.post("/upload_documents/stream", files=files, headers={"Accept": "text/event-stream"})
+
+    assert res.headers["content-type"].startswith("text/event-stream")
+    frames = [f for f in res.text.split("\n\n") if f]
+    assert frames[0].startswith("event: start\ndata: ")
+    assert frames[-1].startswith("event: done\n")
@@ -0,0 +1,150 @@
+"""Ingestion worker: claims pipeline stages from the Redis Stream job queue.
+
+Run as many copies as needed (one process per core is a good start):
+    python worker.py
+"""
+import asyncio
+import json
+import os
+import signal
+import socket
+
+from app.jobs.queue import MAX_DELIVERIES, STAGES, get_job_queue
+from app.rag.positional_index import positions_path
+from main import (PDF_DIR, analyze_with_reuse, annotate_citations, blob_store, extract_text, pre_classify,
+                  store_findings)
+from pdf_generator import generate_risk_pdf, generate_summary_pdf
+
+CONSUMER = os.environ.get("WORKER_NAME", f"{socket.gethostname()}-{os.getpid()}")
+# Entries claimed by a worker that has been silent this long are taken over
+STALL_MS = int(os.environ.get("JOB_STALL_MS", 5 * 60 * 1000))
+# A running stage refreshes its claim this often, so a long stage is never taken for a stalled one.
+# The refresh only applies to an entry idle for STALL_MS / 2, which ours is by then and one
+# another worker reclaimed (and refreshes itself) is not
+HEARTBEAT_S = STALL_MS / 1000 * 0.6
+BLOCK_MS = 5000
+
+stopping = False
+
+
+# --- Stage handlers: return (next_stage, fields) or (None, result) ---
+async def run_extract(job):
+    payload = job["payload"]
+    cached = await asyncio.to_thread(blob_store.load_result, payload["sha256"])
+    if cached:
+        return None, {**cached, "document": payload["document"], "duplicate": True}
+    text = await asyncio.to_thread(extract_text, payload["path"], positions_path(payload["path"]))
+    if not text.strip():
+        return None, {"document": payload["document"], "skipped": "No text extracted"}
+    text_path = payload["path"] + ".txt"
+    with open(text_path, "w") as f:
+        f.write(text)
+    return "analyze", {"text_path": text_path}
+
+
+async def run_analyze(job):
+    with open(job["text_path"]) as f:
+        text = f.read()
+    payload = job["payload"]
+    risk_types = await asyncio.to_thread(pre_classify, text)
+    risks, compliance_score, reuse = await analyze_with_reuse(payload["sha256"], payload["document"], text, risk_types)
+    return "render", {
+        "risks": json.dumps(risks),
+        "risk_types": json.dumps(risk_types),
+        "compliance_score": compliance_score,
+        "reuse": json.dumps(reuse),
+    }
+
+
+async def run_render(job):
+    payload = job["payload"]
+    document_name = payload["document"]
+    risks = json.loads(job["risks"])
+    compliance_score = int(job["compliance_score"])
+    risk_files = await asyncio.to_thread(
+        lambda: [generate_risk_pdf(risk, document_name, PDF_DIR) for risk in risks]
+    )
+    summary_file = await asyncio.to_thread(
+        generate_summary_pdf, risks, document_name, compliance_score, PDF_DIR
+    )
+    annotated_file = await asyncio.to_thread(annotate_citations, payload["path"], risks, document_name)
+    result = {
+        "document": document_name,
+        "sha256": payload["sha256"],
+        "compliance_score": compliance_score,
+        "risk_count": len(risks),
+        "risks": risks,
+        "risk_types": json.loads(job.get("risk_types", "{}")),
+        "risk_pdfs": risk_files,
+        "summary_pdf": summary_file,
+        **({"annotated_pdf": annotated_file} if annotated_file else {}),
+        **json.loads(job.get("reuse", "{}")),
+    }
+    await asyncio.to_thread(blob_store.save_result, payload["sha256"], result)
+    await asyncio.to_thread(store_findings, payload["sha256"], document_name, risks)
+    return None, result
+
+
+HANDLERS = {"extract": run_extract, "analyze": run_analyze, "render": run_render}
+assert set(HANDLERS) == set(STAGES)
+
+
+async def heartbeat(queue, task):
+    """Refresh the claim until cancelled; returns False once another worker owns the entry"""
+    while True:
+        await asyncio.sleep(HEARTBEAT_S)
+        try:
+            if not await asyncio.to_thread(queue.touch, task, CONSUMER, STALL_MS // 2):
+                print(f"⚠️ Job {task.job_id} stage {task.stage} was taken over by another worker")
+                return False
+        except Exception as e:
+            print(f"⚠️ Heartbeat for job {task.job_id} failed:", e)
+
+
+async def handle(queue, task):
+    if task.deliveries > MAX_DELIVERIES:
+        await asyncio.to_thread(queue.fail, task, f"Gave up after {task.deliveries - 1} attempts")
+        return
+    job = await asyncio.to_thread(queue.status, task.job_id)
+    if job is None:
+        await asyncio.to_thread(queue.fail, task, "Job state expired")
+        return
+    await asyncio.to_thread(queue.start, task, CONSUMER)
+    beat = asyncio.create_task(heartbeat(queue, task))
+    try:
+        next_stage, data = await HANDLERS[task.stage](job)
+    except Exception as e:
+        # Left unacknowledged: another worker (or this one) reclaims it after STALL_MS
+        print(f"⚠️ Job {task.job_id} stage {task.stage} failed:", e)
+        await asyncio.to_thread(queue.update, task.job_id, status="retrying", error=str(e)[:2000])
+        return
+    finally:
+        beat.cancel()
+    if beat.done() and not beat.cancelled() and beat.result() is False:
+        return  # the new owner runs this stage; advancing too would queue the next one twice
+    if next_stage:
+        await asyncio.to_thread(queue.advance, task, next_stage, **data)
+    else:
+        await asyncio.to_thread(queue.complete, task, data)
+
+
+async def run():
+    queue = get_job_queue()
+    print(f"Worker {CONSUMER} consuming {queue.stream} as {queue.group}")
+    while not stopping:
+        tasks = await asyncio.to_thread(queue.reclaim_stalled, CONSUMER, STALL_MS, 1)
+        if not tasks:
+            tasks = await asyncio.to_thread(queue.claim, CONSUMER, 1, BLOCK_MS)
+        for task in tasks:
+            await handle(queue, task)
+
+
+def stop(*_):
+    global stopping
+    stopping = True  # finish the current stage, then exit
+
+
+if __name__ == "__main__":
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+    asyncio.run(run())
@@ -1,9 +1,26 @@
-import pandas as pd
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.model_selection import train_test_split
-from sklearn.ensemble import RandomForestClassifier
-from sklearn.metrics import classification_report
-import re
+"""Train the RBI risk-type classifier and save a versioned artifact.
+
+The model itself lives in backend/app/classifier/risk_model.py; the backend
+loads the latest artifact lazily and uses it to pre-tag chunks before the
+LLM is called.
+
+    python rbi_risk_classifier.py                      # demo data, tfidf
+    python rbi_risk_classifier.py --csv circulars.csv  # columns: text,risk_type
+    python rbi_risk_classifier.py --csv big.csv --online --batch-size 5000
+
+A share of the data (``--test-size``) is held out and the classification
+report on it is printed before the artifact is saved; its accuracy is
+recorded in the artifact's meta.json.
+"""
+import argparse
+import csv
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "backend"))
+
+from app.classifier.risk_model import RISK_MODEL_DIR, OnlineTrainer, evaluate, holdout, save, train
 
 # 1. Mock Data Preparation
 # In a real scenario, you would fetch and parse actual RBI circulars.
@@ -34,45 +51,88 @@ data = {
         "Capital Adequacy"
     ]
 }
-df = pd.DataFrame(data)
-
-# 2. Text Preprocessing Function
-def preprocess_text(text):
-    text = text.lower()
-    text = re.sub(r'[^a-z\s]', '', text) # Remove punctuation and numbers
-    text = re.sub(r'\s+', ' ', text).strip() # Remove extra spaces
-    return text
-
-df['processed_text'] = df['text'].apply(preprocess_text)
-
-# 3. Feature Extraction (TF-IDF)
-vectorizer = TfidfVectorizer(max_features=1000) # Limit features for simplicity
-X = vectorizer.fit_transform(df['processed_text'])
-y = df['risk_type']
-
-# Split data into training and testing sets
-X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.3, random_state=42, stratify=y)
-
-# 4. Model Training (RandomForestClassifier)
-classifier = RandomForestClassifier(n_estimators=100, random_state=42)
-classifier.fit(X_train, y_train)
-
-# 5. Model Evaluation
-y_pred = classifier.predict(X_test)
-print("Classification Report:")
-print(classification_report(y_test, y_pred, zero_division=0))
-
-print("\\nExample Prediction:")
-new_circular_text = "RBI circular on new rules for digital banking transactions and security."
-processed_new_text = preprocess_text(new_circular_text)
-new_text_vectorized = vectorizer.transform([processed_new_text])
-predicted_risk = classifier.predict(new_text_vectorized)
-print(f"Text: '{new_circular_text}'")
-print(f"Predicted Risk Type: {predicted_risk[0]}")
-
-new_circular_text_2 = "Revised guidelines for credit disbursement by commercial banks."
-processed_new_text_2 = preprocess_text(new_circular_text_2)
-new_text_vectorized_2 = vectorizer.transform([processed_new_text_2])
-predicted_risk_2 = classifier.predict(new_text_vectorized_2)
-print(f"\\nText: '{new_circular_text_2}'")
-print(f"Predicted Risk Type: {predicted_risk_2[0]}")
+
+
+def iter_csv_batches(path, batch_size, held_out=None, test_size=0.3, max_held_out=20000):
+    """
+    Stream ``(texts, labels)`` batches without loading the whole file. With
+    ``held_out`` (a ``(texts, labels)`` pair of lists), every
+    ``1 / test_size``-th row goes there instead, up to ``max_held_out`` rows.
+    """
+    every = max(2, round(1 / test_size)) if test_size else 0
+    texts, labels = [], []
+    with open(path, newline="") as f:
+        for i, row in enumerate(csv.DictReader(f)):
+            if held_out is not None and every and i % every == 0 and len(held_out[0]) < max_held_out:
+                held_out[0].append(row["text"])
+                held_out[1].append(row["risk_type"])
+                continue
+            texts.append(row["text"])
+            labels.append(row["risk_type"])
+            if len(texts) == batch_size:
+                yield texts, labels
+                texts, labels = [], []
+    if texts:
+        yield texts, labels
+
+
+def csv_labels(path):
+    with open(path, newline="") as f:
+        return sorted({row["risk_type"] for row in csv.DictReader(f)})
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--csv", help="training data with text,risk_type columns")
+    parser.add_argument("--online", action="store_true", help="hashing vectorizer + partial_fit")
+    parser.add_argument("--batch-size", type=int, default=10000)
+    parser.add_argument("--test-size", type=float, default=0.3, help="share of the data held out for the report")
+    parser.add_argument("--out", default=RISK_MODEL_DIR)
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    if args.online and args.csv:
+        # streamed: hold out rows as they go by rather than loading the file to split it
+        held_out = ([], [])
+        trainer = OnlineTrainer(csv_labels(args.csv))
+        for texts, labels in iter_csv_batches(args.csv, args.batch_size, held_out, args.test_size):
+            trainer.partial_fit(texts, labels)
+        classifier = trainer.classifier()
+        test_texts, test_labels = held_out
+    else:
+        if args.csv:
+            texts, labels = [], []
+            for t, l in iter_csv_batches(args.csv, args.batch_size):
+                texts += t
+                labels += l
+        else:
+            texts, labels = data["text"], data["risk_type"]
+        texts, labels, test_texts, test_labels = holdout(texts, labels, args.test_size)
+        if args.online:
+            trainer = OnlineTrainer(sorted(set(labels + test_labels)))
+            for _ in range(5):
+                trainer.partial_fit(texts, labels)
+            classifier = trainer.classifier()
+        else:
+            classifier = train(texts, labels)
+
+    if test_texts:
+        report, accuracy = evaluate(classifier, test_texts, test_labels)
+        classifier.meta["eval"] = {"samples": len(test_texts), "accuracy": accuracy}
+        print(f"Classification report on {len(test_texts)} held-out samples:")
+        print(report)
+    version = save(classifier, args.out)
+    print(f"Trained {classifier.meta['mode']} model on {classifier.meta['samples']} samples "
+          f"in {time.perf_counter() - started:.1f}s -> {args.out}/{version}")
+
+    examples = [
+        "RBI circular on new rules for digital banking transactions and security.",
+        "Revised guidelines for credit disbursement by commercial banks.",
+    ]
+    for text, tag in zip(examples, classifier.tag(examples, threshold=0.0)):
+        print(f"Text: '{text}'")
+        print(f"Predicted Risk Type: {tag[0]} ({tag[1]:.2f})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""Import-time and cold-start report for the API services.
+
+Runs ``python -X importtime -c "import <module>"`` in the service directory
+and lists the most expensive imports; with ``--serve`` it also starts
+uvicorn and measures the time to the first healthy /health (liveness) and
+/ready (readiness) responses.
+
+    python scripts/import_report.py backend main --serve
+    python scripts/import_report.py advisor-agent/backend main --serve --budget 1.0
+
+Exits 1 when ``--budget`` (seconds) is exceeded by the import or by the
+first healthy response, so it can guard cold start in CI.
+"""
+import argparse
+import os
+import re
+import socket
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+
+_LINE_RE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)")
+
+
+def import_times(app_dir, module):
+    """(module, self_us, cumulative_us, depth) per import, in import order"""
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=app_dir, capture_output=True, text=True,
+    )
+    if proc.returncode != 0:
+        raise SystemExit(f"import {module} failed:\n{proc.stderr[-2000:]}")
+    rows = []
+    for line in proc.stderr.splitlines():
+        m = _LINE_RE.match(line)
+        if m:
+            rows.append((m.group(4), int(m.group(1)), int(m.group(2)), len(m.group(3)) // 2))
+    return rows
+
+
+def report(rows, module, top=15):
+    total = next((cum for name, _, cum, depth in rows if name == module and depth == 0), 0)
+    direct = sorted((r for r in rows if r[3] == 1), key=lambda r: -r[2])
+    heavy = sorted(rows, key=lambda r: -r[1])
+    lines = [f"import {module}: {total / 1e6:.3f}s", "", "slowest direct imports (cumulative):"]
+    lines += [f"  {cum / 1e3:9.1f} ms  {name}" for name, _, cum, _ in direct[:top]]
+    lines += ["", "slowest modules (self):"]
+    lines += [f"  {own / 1e3:9.1f} ms  {name}" for name, own, _, _ in heavy[:top]]
+    return total / 1e6, "\n".join(lines)
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _wait_for(url, deadline):
+    while time.monotonic() < deadline:
+        try:
+            with urllib.request.urlopen(url, timeout=1) as res:
+                if res.status == 200:
+                    return True
+        except (urllib.error.URLError, ConnectionError, OSError):
+            pass
+        time.sleep(0.02)
+    return False
+
+
+def cold_start(app_dir, module, timeout=60):
+    """Seconds from process start to the first 200 on /health and on /ready"""
+    port = _free_port()
+    started = time.monotonic()
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", f"{module}:app", "--port", str(port), "--log-level", "warning"],
+        cwd=app_dir, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        deadline = started + timeout
+        base = f"http://127.0.0.1:{port}"
+        healthy = time.monotonic() - started if _wait_for(base + "/health", deadline) else None
+        ready = time.monotonic() - started if _wait_for(base + "/ready", deadline) else None
+        return healthy, ready
+    finally:
+        proc.terminate()
+        proc.wait(timeout=10)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("app_dir", help="service directory, e.g. backend")
+    parser.add_argument("module", nargs="?", default="main")
+    parser.add_argument("--top", type=int, default=15)
+    parser.add_argument("--serve", action="store_true", help="also time /health and /ready under uvicorn")
+    parser.add_argument("--timeout", type=float, default=60, help="seconds to wait for /health and /ready")
+    parser.add_argument("--budget", type=float, help="fail when import or first /health exceeds this")
+    args = parser.parse_args()
+
+    app_dir = os.path.abspath(args.app_dir)
+    seconds, text = report(import_times(app_dir, args.module), args.module, args.top)
+    print(text)
+    worst = seconds
+    if args.serve:
+        healthy, ready = cold_start(app_dir, args.module, args.timeout)
+        fmt = lambda s: f"{s:.3f}s" if s is not None else f"not within {args.timeout:.0f}s"
+        print(f"\nfirst healthy /health: {fmt(healthy)}\nfirst 200 on /ready:   {fmt(ready)}")
+        worst = max(worst, healthy if healthy is not None else float("inf"))
+    if args.budget is not None and worst > args.budget:
+        print(f"\n❌ cold start {worst:.3f}s exceeds the {args.budget:.3f}s budget")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
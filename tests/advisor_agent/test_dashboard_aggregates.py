@@ -0,0 +1,99 @@
+import os
+import random
+import sys
+
+import pytest
+
+fakeredis = pytest.importorskip("fakeredis")
+
+AGENT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "../../advisor-agent/backend"))
+sys.path.insert(0, AGENT_DIR)
+from dashboard_aggregates import DashboardAggregates, document_score, records_from_session_logs
+sys.path.remove(AGENT_DIR)
+
+SEVERITIES = ["CRITICAL", "HIGH", "MEDIUM", "LOW"]
+
+
+@pytest.fixture
+def dash():
+    return DashboardAggregates(fakeredis.FakeRedis(decode_responses=True), top_keep=50)
+
+
+def corpus(n, seed=0):
+    rng = random.Random(seed)
+    docs = {}
+    for i in range(n):
+        findings = [{"severity": rng.choice(SEVERITIES), "regulation": rng.choice(["GDPR", "SOX"])}
+                    for _ in range(rng.randint(0, 3))]
+        docs[f"d{i}"] = {"doc_id": f"d{i}", "file": f"f{i}.pdf", "user_id": f"u{i % 3}",
+                         "findings": findings, "ts": 1_700_000_000 + i}
+    return docs
+
+
+def test_counts_match_a_full_recompute(dash):
+    docs = corpus(300)
+    for rec in docs.values():
+        dash.record(**rec)
+    # re-ingesting replaces a document's numbers instead of double counting
+    docs["d5"]["findings"] = [{"severity": "CRITICAL", "regulation": "HIPAA"}]
+    dash.record(**docs["d5"])
+
+    view = dash.overview("executive")
+    findings = [f for rec in docs.values() for f in rec["findings"]]
+    assert view["documents"] == 300
+    assert view["findings"] == len(findings)
+    assert view["by_severity"] == {s: sum(f["severity"] == s for f in findings)
+                                   for s in SEVERITIES if any(f["severity"] == s for f in findings)}
+    assert view["score"] == round(sum(document_score(r["findings"]) for r in docs.values()) / 300)
+    assert sum(view["score_distribution"].values()) == 300
+    assert view["top_issues"][0]["severity"] == "Critical"
+
+    auditor = dash.overview("auditor", user_id="u0")
+    assert auditor["documents"] == 100 and auditor["by_regulation"]["GDPR"] > 0
+    assert auditor["recent_flags"] == sorted(auditor["recent_flags"], key=lambda f: -f["timestamp"])
+    assert {f["user_id"] for f in auditor["recent_flags"]} == {"u0"}
+
+
+def test_reconcile_repairs_drift(dash):
+    docs = corpus(100)
+    for rec in docs.values():
+        dash.record(**rec)
+    expected = dash.overview("executive")
+    dash.r.hincrby("dash:all:counts", "documents", 7)  # a lost or duplicated event
+    dash.record("ghost", "ghost.pdf", "u9", [{"severity": "HIGH"}], ts=1_700_000_000)
+
+    assert dash.reconcile(docs.values()) == 100
+    assert dash.overview("executive") == expected
+    assert dash.overview("auditor", user_id="u9")["documents"] == 0
+    assert not dash.r.keys("dash:rebuild:*")
+    assert dash.try_lock() and not dash.try_lock()
+
+
+def test_reconcile_keeps_uploads_the_database_has_not_seen_yet(dash):
+    docs = corpus(50)
+    for rec in docs.values():
+        dash.record(**rec)
+    # still in the outbox: recorded live, not in session_logs yet
+    dash.record("fresh", "fresh.pdf", "u0", [{"severity": "CRITICAL"}])
+    # re-uploaded just now with new findings; the database still has the old row
+    dash.record("d1", "f1.pdf", "u1", [])
+
+    assert dash.reconcile(docs.values()) == 51
+    view = dash.overview("executive")
+    assert view["documents"] == 51 and view["top_issues"][0]["doc"] == "fresh.pdf"
+    assert dash.overview("auditor", user_id="u1")["findings"] == sum(
+        len(r["findings"]) for k, r in docs.items() if r["user_id"] == "u1" and k != "d1")
+
+    # once past the watermark, the database's view wins again
+    assert dash.reconcile(docs.values(), watermark=float("inf")) == 50
+    assert dash.overview("executive")["documents"] == 50
+
+
+def test_session_logs_keep_latest_upload_per_file():
+    rows = [
+        {"user_id": "u1", "file": "a.pdf", "status": "uploaded", "severity": "Critical", "timestamp": "2025-01-01T00:00:00Z"},
+        {"user_id": "u1", "file": "a.pdf", "status": "uploaded", "severity": None, "timestamp": "2025-01-02T00:00:00"},
+        {"user_id": "u1", "file": "b.pdf", "status": "failed", "timestamp": "2025-01-02T00:00:00"},
+    ]
+    records = list(records_from_session_logs(rows))
+    assert [(r["doc_id"], r["findings"]) for r in records] == [("u1:a.pdf", [])]
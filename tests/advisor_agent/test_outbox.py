@@ -0,0 +1,200 @@
+import asyncio
+import json
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+httpx = pytest.importorskip("httpx")
+
+# ✅ advisor-agent backend is its own build context; drop it from the path
+# again so `from main import app` elsewhere still resolves to backend/main.py
+AGENT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "../../advisor-agent/backend"))
+sys.path.insert(0, AGENT_DIR)
+import outbox as outbox_mod
+from outbox import Dispatcher, Outbox, http_senders
+sys.path.remove(AGENT_DIR)
+
+
+class MockServer:
+    """Local stand-in for Slack/Jira/Supabase with scripted responses"""
+
+    def __init__(self, statuses=None, delay=0.0):
+        self.requests = []
+        self.statuses = list(statuses or [])
+        self.delay = delay
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers["Content-Length"]))
+                server.requests.append((self.path, json.loads(body)))
+                time.sleep(server.delay)
+                status = server.statuses.pop(0) if server.statuses else 200
+                self.send_response(status)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+
+            def log_message(self, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.httpd.server_port}"
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.httpd.shutdown()
+
+
+@pytest.fixture
+def fast_retries(monkeypatch):
+    monkeypatch.setattr(outbox_mod, "OUTBOX_BACKOFF_BASE", 0.01)
+    monkeypatch.setattr(outbox_mod, "OUTBOX_POLL_INTERVAL", 0.01)
+    monkeypatch.setattr(outbox_mod, "OUTBOX_MAX_ATTEMPTS", 3)
+
+
+async def drain(box, senders, until, timeout=5.0):
+    dispatcher = Dispatcher(box, senders)
+    await dispatcher.start()
+    deadline = time.monotonic() + timeout
+    while not until() and time.monotonic() < deadline:
+        await asyncio.sleep(0.01)
+    await dispatcher.stop()
+
+
+def test_enqueue_does_not_wait_for_slow_target(tmp_path, fast_retries):
+    server = MockServer(delay=1.0)
+    box = Outbox(str(tmp_path / "outbox.db"))
+    senders = http_senders(jira_url=server.url, jira_user="u", jira_token="t")
+
+    async def scenario():
+        dispatcher = Dispatcher(box, senders)
+        await dispatcher.start()
+        started = time.perf_counter()
+        box.enqueue("jira", {"fields": {"summary": "Flagged doc"}})
+        elapsed = time.perf_counter() - started
+        while box.stats():
+            await asyncio.sleep(0.01)
+        await dispatcher.stop()
+        return elapsed
+
+    try:
+        assert asyncio.run(scenario()) < 0.1
+        assert server.requests[0][0] == "/rest/api/3/issue"
+    finally:
+        server.close()
+
+
+def test_supabase_rows_are_batched(tmp_path, fast_retries):
+    server = MockServer()
+    box = Outbox(str(tmp_path / "outbox.db"))
+    for i in range(5):
+        box.enqueue("supabase", {"table": "session_logs", "row": {"file": f"doc{i}.pdf"}})
+    senders = http_senders(supabase_url=server.url, supabase_key="key")
+
+    try:
+        asyncio.run(drain(box, senders, until=lambda: not box.stats()))
+        assert len(server.requests) == 1
+        path, rows = server.requests[0]
+        assert path == "/rest/v1/session_logs"
+        assert [r["file"] for r in rows] == [f"doc{i}.pdf" for i in range(5)]
+    finally:
+        server.close()
+
+
+def test_retries_then_dead_letters(tmp_path, fast_retries):
+    server = MockServer(statuses=[503, 200, 500, 500, 500, 400])
+    box = Outbox(str(tmp_path / "outbox.db"))
+    senders = http_senders(slack_webhook=server.url + "/hook")
+
+    try:
+        box.enqueue("slack", {"text": "recovers"})
+        asyncio.run(drain(box, senders, until=lambda: not box.stats()))
+        assert len(server.requests) == 2
+
+        box.enqueue("slack", {"text": "gives up"})
+        asyncio.run(drain(box, senders, until=lambda: box.stats().get("dead")))
+        box.enqueue("slack", {"text": "bad request"})
+        asyncio.run(drain(box, senders, until=lambda: box.stats().get("dead") == 2))
+
+        dead = box.dead_letters()
+        assert [d["payload"]["text"] for d in dead] == ["bad request", "gives up"]
+        assert [d["attempts"] for d in dead] == [1, 3]
+    finally:
+        server.close()
+
+
+def test_claims_are_requeued_only_after_their_lease_expires(tmp_path):
+    path = str(tmp_path / "outbox.db")
+    box = Outbox(path, owner="a", lease=0.2)
+    box.enqueue("slack", {"text": "hello"})
+    assert len(box.claim_due(10)) == 1
+
+    # another dispatcher sharing the file must not steal a live claim
+    peer = Outbox(path, owner="b", lease=0.2)
+    peer.recover()
+    assert peer.claim_due(10) == []
+
+    time.sleep(0.25)  # "a" died without finishing
+    peer.recover()
+    assert [row[2] for row in peer.claim_due(10)] == [{"text": "hello"}]
+    # the stale owner can no longer change the row
+    box.mark_failed([1], 0, "late failure")
+    box.mark_done([1])
+    assert box.stats() == {"inflight": 1}
+
+
+def test_stop_cancels_slow_deliveries_and_releases_their_rows(tmp_path, fast_retries):
+    server = MockServer(delay=2.0)
+    box = Outbox(str(tmp_path / "outbox.db"))
+    senders = http_senders(slack_webhook=server.url + "/hook")
+
+    async def scenario():
+        dispatcher = Dispatcher(box, senders)
+        await dispatcher.start()
+        box.enqueue("slack", {"text": "slow"})
+        while not server.requests:
+            await asyncio.sleep(0.01)
+        started = time.perf_counter()
+        await dispatcher.stop(timeout=0.05)
+        assert not dispatcher._inflight and dispatcher._client.is_closed
+        return time.perf_counter() - started
+
+    try:
+        assert asyncio.run(scenario()) < 1.0
+        # not counted as a failed attempt; the next dispatcher sends it
+        assert box.stats() == {"pending": 1}
+        assert [row[3] for row in box.claim_due(10)] == [0]
+    finally:
+        server.close()
+
+
+def test_rows_queued_behind_a_busy_target_keep_their_lease(tmp_path, fast_retries):
+    server = MockServer(delay=0.2)
+    path = str(tmp_path / "outbox.db")
+    box = Outbox(path, owner="a", lease=0.3)
+    peer = Outbox(path, owner="b", lease=0.3)
+    senders = http_senders(jira_url=server.url, jira_user="u", jira_token="t")
+
+    async def scenario():
+        dispatcher = Dispatcher(box, senders, concurrency={"jira": 1})
+        await dispatcher.start()
+        for i in range(5):
+            box.enqueue("jira", {"fields": {"summary": f"doc{i}"}})
+        while not server.requests:  # all five are claimed by now
+            await asyncio.sleep(0.01)
+        stolen = []
+        while box.stats():  # ~1 s of sends, over three leases
+            stolen += peer.claim_due(10)
+            await asyncio.sleep(0.05)
+        await dispatcher.stop()
+        return stolen
+
+    try:
+        assert asyncio.run(scenario()) == []
+        assert sorted(body["fields"]["summary"] for _, body in server.requests) == [f"doc{i}" for i in range(5)]
+    finally:
+        server.close()
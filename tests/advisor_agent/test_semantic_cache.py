@@ -0,0 +1,113 @@
+import os
+import sys
+import time
+
+import pytest
+
+np = pytest.importorskip("numpy")
+fakeredis = pytest.importorskip("fakeredis")
+
+AGENT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "../../advisor-agent/backend"))
+sys.path.insert(0, AGENT_DIR)
+from semantic_cache import SemanticCache
+sys.path.remove(AGENT_DIR)
+
+VOCAB = ["data", "retention", "period", "what", "is", "the", "how", "long", "kept", "breach", "notify", "deadline"]
+SYNONYMS = {"kept": "retention", "long": "period"}
+
+
+def bag_of_words(text):
+    """Tiny deterministic embedder: paraphrases share most of their words"""
+    vec = np.zeros(len(VOCAB), dtype=np.float32)
+    for word in text.lower().replace("?", "").split():
+        word = SYNONYMS.get(word, word)
+        if word in VOCAB:
+            vec[VOCAB.index(word)] += 1
+    return vec
+
+
+@pytest.fixture
+def cache():
+    return SemanticCache(fakeredis.FakeRedis(decode_responses=True), bag_of_words, threshold=0.7)
+
+
+def test_paraphrase_hits_and_unrelated_misses(cache):
+    cache.store("acme", "What is the data retention period?", "Seven years.")
+
+    hit = cache.lookup("acme", "how long is data kept?")
+    assert hit["answer"] == "Seven years." and hit["similarity"] >= 0.7
+    assert cache.lookup("acme", "breach notify deadline") is None
+    assert cache.lookup("other-tenant", "What is the data retention period?") is None
+    assert cache.stats()["hit_rate"] == pytest.approx(1 / 3, abs=1e-3)
+
+
+def test_reingestion_invalidates_answers(cache):
+    cache.store("acme", "What is the data retention period?", "Seven years.")
+    cache.invalidate("acme")
+
+    assert cache.lookup("acme", "What is the data retention period?") is None
+    cache.store("acme", "What is the data retention period?", "Five years.")
+    assert cache.lookup("acme", "what is the data retention period")["answer"] == "Five years."
+
+
+def test_entries_expire_and_are_shared_between_processes(cache):
+    cache.store("acme", "breach notify deadline", "72 hours.")
+    replica = SemanticCache(cache.r, bag_of_words, threshold=0.7)
+    assert replica.lookup("acme", "breach notify deadline?")["answer"] == "72 hours."
+
+    replica.ttl = 0
+    time.sleep(0.01)
+    assert replica.lookup("acme", "breach notify deadline") is None
+
+
+def test_replica_sees_entries_stored_after_it_loaded_the_scope(cache):
+    replica = SemanticCache(cache.r, bag_of_words, threshold=0.7)
+    assert replica.lookup("acme", "breach notify deadline") is None  # scope loaded, empty
+
+    cache.store("acme", "breach notify deadline", "72 hours.")
+    cache.store("acme", "data retention period", "Five years.")
+    assert replica.lookup("acme", "breach notify deadline?")["answer"] == "72 hours."
+    assert len(replica.indexes[replica.scope("acme")]) == 2
+    # its own store is not pulled in twice
+    replica.store("acme", "cross border transfer rules", "Adequacy decision.")
+    assert replica.lookup("acme", "unrelated question entirely") is None
+    assert len(replica.indexes[replica.scope("acme")]) == 3
+
+
+def test_lookup_is_fast_with_many_entries():
+    cache = SemanticCache(fakeredis.FakeRedis(decode_responses=True), lambda q: vectors[q], threshold=0.99)
+    rng = np.random.RandomState(0)
+    vectors = {f"q{i}": rng.randn(384).astype(np.float32) for i in range(2000)}
+    for q in list(vectors)[:2000]:
+        cache.store("acme", q, q.upper())
+
+    started = time.perf_counter()
+    for q in list(vectors)[:100]:
+        assert cache.lookup("acme", q)["answer"] == q.upper()
+    assert (time.perf_counter() - started) / 100 < 0.01
+
+
+def test_full_scope_evicts_oldest_entries(cache):
+    cache.max_entries = 2
+    cache.store("acme", "What is the data retention period?", "Seven years.")
+    cache.store("acme", "breach notify deadline", "72 hours.")
+    cache.store("acme", "how long is data kept", "Still seven years.")
+
+    assert cache.lookup("acme", "breach notify deadline")["answer"] == "72 hours."
+    assert cache.lookup("acme", "What is the data retention period?")["answer"] == "Still seven years."
+    assert len(cache.r.hgetall(f"semcache:{cache.scope('acme')}")) == 2
+    assert cache.stats()["evictions"] == 1
+
+
+def test_caller_supplied_embedding_is_not_recomputed():
+    calls = []
+
+    def embed(text):
+        calls.append(text)
+        return bag_of_words(text)
+
+    cache = SemanticCache(fakeredis.FakeRedis(decode_responses=True), embed, threshold=0.7)
+    vec = embed("breach notify deadline")
+    assert cache.lookup("acme", "breach notify deadline", embedding=vec) is None
+    cache.store("acme", "breach notify deadline", "72 hours.", embedding=vec)
+    assert calls == ["breach notify deadline"]
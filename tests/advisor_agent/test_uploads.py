@@ -0,0 +1,48 @@
+import asyncio
+import hashlib
+import io
+import os
+import sys
+
+import pytest
+
+pytest.importorskip("fastapi")
+from fastapi import HTTPException, UploadFile
+
+AGENT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "../../advisor-agent/backend"))
+sys.path.insert(0, AGENT_DIR)
+import uploads
+sys.path.remove(AGENT_DIR)
+
+
+@pytest.fixture(autouse=True)
+def upload_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(uploads, "UPLOAD_DIR", str(tmp_path))
+    monkeypatch.setattr(uploads, "CHUNK_SIZE", 1000)
+    return tmp_path
+
+
+def store(data, max_bytes=10_000):
+    return asyncio.run(uploads.store_upload(UploadFile(io.BytesIO(data), filename="a.pdf"), max_bytes))
+
+
+def test_upload_is_hashed_while_streamed_and_deduplicated():
+    data = os.urandom(4500)
+    digest, path, size, duplicate = store(data)
+    assert digest == hashlib.sha256(data).hexdigest() and size == 4500 and not duplicate
+    with open(path, "rb") as f:
+        assert f.read() == data
+    assert store(data)[1:] == (path, 4500, True)
+
+
+def test_oversized_upload_leaves_nothing_behind(upload_dir):
+    with pytest.raises(HTTPException) as e:
+        store(b"x" * 12_000)
+    assert e.value.status_code == 413
+    assert os.listdir(upload_dir / "tmp") == []
+
+
+def test_content_length_rejects_before_parsing():
+    assert not uploads.body_too_large(None, 1000)
+    assert not uploads.body_too_large(str(1000 + uploads.MULTIPART_OVERHEAD), 1000)
+    assert uploads.body_too_large(str(1001 + uploads.MULTIPART_OVERHEAD), 1000)
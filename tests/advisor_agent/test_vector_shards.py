@@ -0,0 +1,115 @@
+import os
+import sys
+import time
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+AGENT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "../../advisor-agent/backend"))
+sys.path.insert(0, AGENT_DIR)
+from vector_shards import ShardCache, ShardedVectorStore
+sys.path.remove(AGENT_DIR)
+
+DIM = 32
+
+
+def random_vectors(n, seed):
+    return np.random.RandomState(seed).randn(n, DIM).astype(np.float32)
+
+
+def brute_force(vectors, query, k):
+    v = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+    return list(np.argsort(-(v @ (query / np.linalg.norm(query))))[:k])
+
+
+def test_fan_out_matches_brute_force_across_shards(tmp_path):
+    store = ShardedVectorStore(str(tmp_path), shard_size=300, workers=4)
+    vectors = random_vectors(1000, 0)
+    store.add("acme", vectors[:600], [{"i": i} for i in range(600)])
+    store.add("acme", vectors[600:], [{"i": i} for i in range(600, 1000)])
+
+    assert store.stats("acme")["tenant"] == {"dim": DIM, "shards": 4, "vectors": 1000}
+    query = random_vectors(1, 1)[0]
+    hits = store.search("acme", query, k=10)
+    assert [h["i"] for h in hits] == brute_force(vectors, query, 10)
+    assert hits[0]["score"] >= hits[-1]["score"]
+
+
+def test_tenants_are_isolated(tmp_path):
+    store = ShardedVectorStore(str(tmp_path))
+    store.add("a", random_vectors(5, 2), [{"t": "a"}] * 5)
+    store.add("b", random_vectors(5, 3), [{"t": "b"}] * 5)
+
+    assert {h["t"] for h in store.search("a", random_vectors(1, 4)[0], k=10)} == {"a"}
+    assert store.search("nobody", random_vectors(1, 4)[0]) == []
+    store.delete_tenant("a")
+    assert store.search("a", random_vectors(1, 4)[0]) == []
+
+
+def test_similar_looking_ids_never_share_storage(tmp_path):
+    root = tmp_path / "store"
+    store = ShardedVectorStore(str(root))
+    for tenant in ("a@b", "a_b", "..", "../x"):
+        store.add(tenant, random_vectors(3, 2), [{"t": tenant}] * 3)
+
+    for tenant in ("a@b", "a_b", "..", "../x"):
+        assert {h["t"] for h in store.search(tenant, random_vectors(1, 4)[0], k=10)} == {tenant}
+        assert store.manifest(tenant)["tenant"] == tenant
+    assert sorted(os.listdir(tmp_path)) == ["store"]
+    assert len(os.listdir(root)) == 4
+
+
+def test_cache_accounts_bytes_and_sees_appends(tmp_path):
+    cache = ShardCache(max_bytes=100 * DIM * 4 * 2)
+    store = ShardedVectorStore(str(tmp_path), shard_size=100, cache=cache)
+    store.add("t", random_vectors(300, 5), [{}] * 300)
+    query = random_vectors(1, 6)[0]
+
+    store.search("t", query)
+    store.search("t", query)
+    stats = cache.stats()
+    assert stats["bytes"] <= stats["max_bytes"] and stats["evictions"] > 0
+
+    store.add("t", random_vectors(1, 7) * 0 + query, [{"new": True}])
+    assert store.search("t", query, k=1)[0].get("new")
+
+
+def test_latency_independent_of_tenant_count(tmp_path):
+    store = ShardedVectorStore(str(tmp_path), shard_size=2000)
+    store.add("target", random_vectors(2000, 8), [{}] * 2000)
+    query = random_vectors(1, 9)[0]
+
+    def timed():
+        store.search("target", query)
+        started = time.perf_counter()
+        for _ in range(20):
+            store.search("target", query)
+        return (time.perf_counter() - started) / 20
+
+    alone = timed()
+    for t in range(200):
+        store.add(f"tenant-{t}", random_vectors(200, t), [{}] * 200)
+    assert timed() < alone * 3 + 0.002
+
+
+@pytest.mark.parametrize("old_manifest", [False, True])
+def test_rows_of_an_interrupted_add_are_dropped(tmp_path, old_manifest):
+    store = ShardedVectorStore(str(tmp_path))
+    vectors = random_vectors(15, 3)
+    store.add("acme", vectors[:10], [{"i": i} for i in range(10)])
+    shard_dir = store._shard_dir("acme", 0)
+    # a crash after appending 3 vectors and 2 metadata lines, before the manifest
+    with open(os.path.join(shard_dir, "vectors.f32"), "ab") as f:
+        f.write(random_vectors(3, 4).tobytes())
+    with open(os.path.join(shard_dir, "meta.jsonl"), "a") as f:
+        f.write('{"i": "lost"}\n{"i": "lost"}\n')
+    if old_manifest:
+        manifest = store.manifest("acme")
+        del manifest["shards"][0]["meta_bytes"]
+        store._save_manifest("acme", manifest)
+
+    store.add("acme", vectors[10:], [{"i": i} for i in range(10, 15)])
+    assert os.path.getsize(os.path.join(shard_dir, "vectors.f32")) == 15 * DIM * 4
+    for i in range(15):
+        assert store.search("acme", vectors[i], k=1)[0]["i"] == i
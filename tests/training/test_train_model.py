@@ -0,0 +1,111 @@
+# tests for sequence packing in train_model.py
+import os
+import sys
+
+import pytest
+
+np = pytest.importorskip("numpy")
+torch = pytest.importorskip("torch")
+transformers = pytest.importorskip("transformers")
+datasets = pytest.importorskip("datasets")
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+sys.path.insert(0, ROOT)
+sys.path.append(os.path.join(ROOT, "backend"))
+
+import train_model
+from train_model import PackedCollator, PackedSequenceClassifier, pack
+
+
+@pytest.fixture
+def tiny_model(tmp_path):
+    config = transformers.BertConfig(vocab_size=50, hidden_size=32, num_hidden_layers=2,
+                                     num_attention_heads=2, intermediate_size=64)
+    transformers.BertModel(config).save_pretrained(str(tmp_path))
+    return str(tmp_path)
+
+
+@pytest.fixture
+def tiny_checkpoint(tmp_path):
+    """Tiny BERT plus a word-level tokenizer, both loadable from one directory"""
+    words = ["data", "is", "kept", "forever", "deleted", "after", "a", "year", "shared", "with", "vendors"]
+    vocab = tmp_path / "vocab.txt"
+    vocab.write_text("\n".join(["[PAD]", "[UNK]", "[CLS]", "[SEP]", "[MASK]"] + words))
+    transformers.BertTokenizerFast(vocab_file=str(vocab)).save_pretrained(str(tmp_path / "base"))
+    config = transformers.BertConfig(vocab_size=16, hidden_size=32, num_hidden_layers=2,
+                                     num_attention_heads=2, intermediate_size=64)
+    transformers.BertModel(config).save_pretrained(str(tmp_path / "base"))
+    return str(tmp_path / "base")
+
+
+def examples():
+    seqs = [[2, 5, 6, 7, 3], [2, 8, 3], [2, 9, 10, 11, 12, 13, 3], [2, 14, 15, 3]]
+    return datasets.Dataset.from_dict({
+        "input_ids": seqs, "labels": [0, 1, 0, 1], "length": [len(s) for s in seqs],
+    })
+
+
+def test_pack_fills_rows_without_splitting_examples():
+    packed = pack(examples(), max_length=10)
+
+    assert sorted(packed["length"]) == [9, 10]
+    assert sum(len(r) for r in packed["labels"]) == 4
+    for ids, cls in zip(packed["input_ids"], packed["cls_positions"]):
+        assert all(ids[p] == 2 for p in cls)
+
+
+def test_packed_examples_match_unpacked_logits(tiny_model):
+    torch.manual_seed(0)
+    model = PackedSequenceClassifier(tiny_model, num_labels=2).eval()
+    ds = examples()
+    batch = PackedCollator(pad_token_id=0)(list(pack(ds, max_length=10)))
+
+    with torch.no_grad():
+        packed = model(**{k: v for k, v in batch.items() if k != "labels"}).logits
+        alone = {}
+        for ex in ds:
+            ids = torch.tensor([ex["input_ids"]])
+            single = PackedCollator(pad_token_id=0)([{
+                "input_ids": ex["input_ids"], "segment_ids": [1] * len(ex["input_ids"]),
+                "position_ids": list(range(len(ex["input_ids"]))), "cls_positions": [0], "labels": [0],
+            }])
+            alone[tuple(ids[0].tolist())] = model(**{k: v for k, v in single.items() if k != "labels"}).logits[0]
+
+    rows, cols = batch["cls_index"].T.tolist()
+    for logit, r, c in zip(packed, rows, cols):
+        start = c
+        row = batch["input_ids"][r].tolist()
+        end = row.index(3, start) + 1
+        assert torch.allclose(logit, alone[tuple(row[start:end])], atol=1e-5)
+
+
+def test_packed_run_saves_a_loadable_classifier(tiny_checkpoint, tmp_path):
+    engine = pytest.importorskip("app.inference.engine")
+    rows = ["data is kept forever,1", "data is deleted after a year,0", "data is shared with vendors,1",
+            "data is kept,0"] * 4
+    (tmp_path / "train.csv").write_text("text,label\n" + "\n".join(rows))
+    out = str(tmp_path / "model")
+    train_model.main(["--model", tiny_checkpoint, "--train", str(tmp_path / "train.csv"), "--eval", "",
+                      "--pack", "--max-length", "32", "--batch-size", "4", "--max-steps", "2",
+                      "--output-dir", str(tmp_path / "results"), "--save-to", out])
+
+    model = transformers.AutoModelForSequenceClassification.from_pretrained(out).eval()
+    assert model.config.num_labels == 2
+    classifier = engine.load_classifier(out, backend="torch")
+    proba = classifier.predict_proba(["data is kept forever", "data is deleted after a year"])
+    assert proba.shape == (2, 2) and np.allclose(proba.sum(axis=1), 1, atol=1e-5)
+
+
+def test_saved_checkpoint_scores_like_the_packed_model(tiny_model, tmp_path):
+    torch.manual_seed(0)
+    packed_model = PackedSequenceClassifier(tiny_model, num_labels=2).eval()
+    packed_model.save_pretrained(str(tmp_path / "saved"))
+    loaded = transformers.AutoModelForSequenceClassification.from_pretrained(str(tmp_path / "saved")).eval()
+
+    batch = PackedCollator(pad_token_id=0)(list(pack(examples(), max_length=10)))
+    with torch.no_grad():
+        packed = packed_model(**{k: v for k, v in batch.items() if k != "labels"}).logits
+        for logit, (r, c) in zip(packed, batch["cls_index"].tolist()):
+            row = batch["input_ids"][r].tolist()
+            ids = torch.tensor([row[c:row.index(3, c) + 1]])
+            assert torch.allclose(logit, loaded(input_ids=ids).logits[0], atol=1e-5)
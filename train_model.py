@@ -1,103 +1,287 @@
+"""Fine-tune a sequence classifier on the clause dataset.
 
-from transformers import AutoTokenizer, AutoModelForSequenceClassification, TrainingArguments, Trainer
-from datasets import Dataset
-import numpy as np
-# import evaluate # No longer needed for custom accuracy
+Throughput on CPU comes from not computing on padding:
+
+- examples are tokenized without padding and padded per batch by a data
+  collator (to a multiple of 8)
+- ``group_by_length`` batches examples of similar length together
+- ``--pack`` concatenates several short examples into one sequence with a
+  block-diagonal attention mask and per-example position ids, and classifies
+  each example from its own [CLS] token
+
+Datasets are read from CSV files (``text,label`` columns) through
+``datasets``, which memory-maps them from an on-disk Arrow cache; pass
+``--streaming`` to iterate files too large to convert up front.
+
+    python train_model.py --train data/train.csv --eval data/test.csv --pack
+"""
+import argparse
+import bisect
 import os
-from sklearn.metrics import accuracy_score
+import time
 
-# Set a temporary cache directory for datasets (though we're using a dummy dataset now, good practice)
-os.environ["HF_DATASETS_CACHE"] = "/tmp/hf_cache"
-
-# 2. Choose a Pre-trained Model and Tokenizer
-model_name = "bert-base-uncased"
-tokenizer = AutoTokenizer.from_pretrained(model_name)
-model = AutoModelForSequenceClassification.from_pretrained(model_name, num_labels=2) # Assuming binary classification
-
-# 3. Prepare Your Dataset - Using a dummy in-memory dataset
-dummy_data = {
-    "text": [
-        "This movie is great! I loved it.",
-        "This is a terrible film, really bad.",
-        "A fantastic experience, highly recommended.",
-        "What a waste of time. So boring.",
-        "Absolutely brilliant and captivating.",
-        "I regret watching this. It was awful."
-    ],
-    "label": [1, 0, 1, 0, 1, 0] # 1 for positive, 0 for negative
-}
-
-dataset = Dataset.from_dict(dummy_data)
-
-# Define a tokenization function
-def tokenize_function(examples):
-    # Ensure examples["text"] is treated as a list of strings
-    text_input = examples["text"]
-    if not isinstance(text_input, list):
-        text_input = [text_input]
-    return tokenizer(text_input, padding="max_length", truncation=True)
-
-# Apply the tokenization
-# Changed batched=False to True and adjusted tokenize_function for batching
-tokenized_datasets = dataset.map(tokenize_function, batched=True)
-
-# Rename the 'label' column to 'labels'
-tokenized_datasets = tokenized_datasets.rename_columns({"label": "labels"})
-
-# Format for PyTorch
-tokenized_datasets.set_format("torch", columns=["input_ids", "attention_mask", "labels"])
-
-# Define train and test splits (split the dummy dataset)
-train_size = int(0.8 * len(tokenized_datasets))
-test_size = len(tokenized_datasets) - train_size
-train_dataset = tokenized_datasets.select(range(train_size))
-eval_dataset = tokenized_datasets.select(range(train_size, train_size + test_size))
-
-
-# 4. Define Training Arguments
-training_args = TrainingArguments(
-    output_dir="./results",
-    num_train_epochs=1,              # Reduced epochs for quicker demonstration
-    per_device_train_batch_size=2,   # Reduced batch size for quicker demonstration due to small dataset
-    per_device_eval_batch_size=2,
-    warmup_steps=10,                 # Reduced warmup steps
-    weight_decay=0.01,
-    logging_dir="./logs",
-    logging_steps=1,
-    evaluation_strategy="epoch",
-    save_strategy="epoch",
-    load_best_model_at_end=True,
-    metric_for_best_model="accuracy",
+import numpy as np
+import torch
+from datasets import load_dataset
+from sklearn.metrics import accuracy_score
+from torch import nn
+from transformers import (
+    AutoModelForSequenceClassification, AutoTokenizer, DataCollatorWithPadding,
+    Trainer, TrainerCallback, TrainingArguments,
 )
+from transformers.modeling_outputs import SequenceClassifierOutput
+
+# Set a temporary cache directory for datasets
+os.environ.setdefault("HF_DATASETS_CACHE", "/tmp/hf_cache")
+
+
+# --- Data ---
+def load_clauses(train_path, eval_path=None, streaming=False):
+    files = {"train": train_path}
+    if eval_path:
+        files["eval"] = eval_path
+    return load_dataset("csv", data_files=files, streaming=streaming)
+
+
+def tokenize(dataset, tokenizer, max_length):
+    def encode(batch):
+        enc = tokenizer(batch["text"], truncation=True, max_length=max_length)
+        enc["length"] = [len(ids) for ids in enc["input_ids"]]
+        return enc
+
+    columns = [c for c in (dataset.column_names or []) if c not in ("label",)]
+    return dataset.map(encode, batched=True, remove_columns=columns).rename_column("label", "labels")
+
+
+def pack(dataset, max_length, batch_size=1024):
+    """Pack tokenized examples into sequences of at most ``max_length``.
+
+    Longest examples are placed first, each into the open row it fills most
+    tightly (best-fit decreasing), which keeps the packed rows close to full.
+    Open rows are kept sorted by free space, so finding one is a binary
+    search, and examples are read in that order a batch at a time. Each row
+    records the segment of every token and the [CLS] position and label of
+    every example in it.
+    """
+    order = np.argsort(-np.asarray(dataset["length"]), kind="stable")
+    rows = []  # [used, input_ids, segment_ids, position_ids, cls_positions, labels]
+    open_rows = []  # sorted (free space, row number)
+    for batch in dataset.select(order).iter(batch_size=batch_size):
+        for ids, label in zip(batch["input_ids"], batch["labels"]):
+            at = bisect.bisect_left(open_rows, (len(ids), -1))
+            if at < len(open_rows):
+                free, r = open_rows.pop(at)
+            else:
+                free, r = max_length, len(rows)
+                rows.append([0, [], [], [], [], []])
+            row = rows[r]
+            segment = len(row[4]) + 1
+            row[4].append(row[0])
+            row[5].append(label)
+            row[1].extend(ids)
+            row[2].extend([segment] * len(ids))
+            row[3].extend(range(len(ids)))
+            row[0] += len(ids)
+            if free > len(ids):
+                bisect.insort(open_rows, (free - len(ids), r))
+    from datasets import Dataset
+    return Dataset.from_dict({
+        "input_ids": [r[1] for r in rows],
+        "segment_ids": [r[2] for r in rows],
+        "position_ids": [r[3] for r in rows],
+        "cls_positions": [r[4] for r in rows],
+        "labels": [r[5] for r in rows],
+        "length": [r[0] for r in rows],
+    })
+
+
+class PackedCollator:
+    """Pad packed rows and flatten their per-example labels"""
+
+    def __init__(self, pad_token_id, pad_to_multiple_of=8):
+        self.pad_token_id = pad_token_id
+        self.multiple = pad_to_multiple_of
+
+    def __call__(self, features):
+        width = max(len(f["input_ids"]) for f in features)
+        width = -(-width // self.multiple) * self.multiple
+        batch = {k: torch.zeros(len(features), width, dtype=torch.long)
+                 for k in ("input_ids", "segment_ids", "position_ids")}
+        batch["input_ids"].fill_(self.pad_token_id)
+        cls_index, labels = [], []
+        for row, f in enumerate(features):
+            n = len(f["input_ids"])
+            for key in ("input_ids", "segment_ids", "position_ids"):
+                batch[key][row, :n] = torch.tensor(f[key])
+            cls_index += [(row, p) for p in f["cls_positions"]]
+            labels += f["labels"]
+        batch["cls_index"] = torch.tensor(cls_index)
+        batch["labels"] = torch.tensor(labels)
+        return batch
+
+
+class PackedSequenceClassifier(nn.Module):
+    """BERT-style sequence classifier that classifies every packed example separately.
+
+    Tokens only attend within their own segment, and position ids restart at
+    each example, so a packed example sees exactly what it would alone. Each
+    example's [CLS] token goes through the wrapped model's own pooler and
+    head, so ``save_pretrained`` writes an ordinary checkpoint that
+    ``AutoModelForSequenceClassification`` loads for unpacked inference.
+    """
+
+    def __init__(self, model_name, num_labels):
+        super().__init__()
+        self.model = AutoModelForSequenceClassification.from_pretrained(model_name, num_labels=num_labels)
+        self.config = self.model.config
+        if getattr(self.model.base_model, "pooler", None) is None or not hasattr(self.model, "dropout"):
+            raise ValueError(f"--pack needs a pooler + linear head (BERT-style), not {type(self.model).__name__}")
+
+    def forward(self, input_ids, segment_ids, position_ids, cls_index, labels=None):
+        same = segment_ids[:, :, None] == segment_ids[:, None, :]
+        # padding tokens attend to themselves only, so no row is fully masked
+        eye = torch.eye(input_ids.shape[1], dtype=torch.bool, device=input_ids.device)
+        mask = (same & (segment_ids[:, None, :] != 0)) | eye
+        encoder = self.model.base_model
+        hidden = encoder(input_ids, attention_mask=mask[:, None], position_ids=position_ids).last_hidden_state
+        # the pooler reads the first token of each sequence: give it one [CLS] per example
+        pooled = encoder.pooler(hidden[cls_index[:, 0], cls_index[:, 1]][:, None])
+        logits = self.model.classifier(self.model.dropout(pooled))
+        loss = None
+        if labels is not None:
+            loss = nn.functional.cross_entropy(logits, labels)
+        return SequenceClassifierOutput(loss=loss, logits=logits)
+
+    def save_pretrained(self, path, **kwargs):
+        self.model.save_pretrained(path, **kwargs)
+
+
+# --- Throughput reporting ---
+class TokenCounter:
+    """Wraps a collator and counts real (non-padding) and padded tokens"""
+
+    def __init__(self, collator):
+        self.collator = collator
+        self.real = 0
+        self.padded = 0
+
+    def __call__(self, features):
+        batch = self.collator(features)
+        self.padded += batch["input_ids"].numel()
+        if "segment_ids" in batch:
+            self.real += int((batch["segment_ids"] != 0).sum())
+        else:
+            self.real += int(batch["attention_mask"].sum())
+        return batch
+
+
+class ThroughputCallback(TrainerCallback):
+    def __init__(self, counter):
+        self.counter = counter
+        self.started = None
+
+    def on_train_begin(self, args, state, control, **kwargs):
+        self.started = time.perf_counter()
+        self.counter.real = self.counter.padded = 0
+
+    def on_log(self, args, state, control, logs=None, **kwargs):
+        if logs is None or self.started is None:
+            return
+        elapsed = time.perf_counter() - self.started
+        logs["tokens_per_sec"] = round(self.counter.real / elapsed, 1)
+        if self.counter.padded:
+            logs["padding_ratio"] = round(1 - self.counter.real / self.counter.padded, 3)
+
+
+def length_grouping(enabled):
+    # transformers 5 replaced the group_by_length flag with a sampling strategy
+    if "train_sampling_strategy" in TrainingArguments.__dataclass_fields__:
+        return {"train_sampling_strategy": "group_by_length" if enabled else "random"}
+    return {"group_by_length": enabled}
+
 
-# 5. Set Up Evaluation Metrics (Custom accuracy calculation)
 def compute_metrics(eval_pred):
     logits, labels = eval_pred
     predictions = np.argmax(logits, axis=-1)
     return {"accuracy": accuracy_score(labels, predictions)}
 
-# 6. Create a Trainer and Train Your Model
-trainer = Trainer(
-    model=model,
-    args=training_args,
-    train_dataset=train_dataset,
-    eval_dataset=eval_dataset,
-    compute_metrics=compute_metrics,
-    tokenizer=tokenizer,
-)
 
-print("Starting model training...")
-trainer.train()
-print("Model training finished.")
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model", default="bert-base-uncased")
+    parser.add_argument("--train", default="data/train.csv")
+    parser.add_argument("--eval", default="data/test.csv")
+    parser.add_argument("--num-labels", type=int, default=2)
+    parser.add_argument("--max-length", type=int, default=512)
+    parser.add_argument("--batch-size", type=int, default=16)
+    parser.add_argument("--epochs", type=float, default=1)
+    parser.add_argument("--max-steps", type=int, default=-1, help="required with --streaming")
+    parser.add_argument("--pack", action="store_true", help="pack short examples into one sequence")
+    parser.add_argument("--streaming", action="store_true")
+    parser.add_argument("--output-dir", default="./results")
+    parser.add_argument("--save-to", default="./my_fine_tuned_model")
+    args = parser.parse_args(argv)
+
+    tokenizer = AutoTokenizer.from_pretrained(args.model)
+    raw = load_clauses(args.train, args.eval, streaming=args.streaming)
+    train_dataset = tokenize(raw["train"], tokenizer, args.max_length)
+    eval_dataset = tokenize(raw["eval"], tokenizer, args.max_length) if "eval" in raw else None
+
+    if args.pack:
+        if args.streaming:
+            parser.error("--pack needs the whole training set; drop --streaming")
+        train_dataset = pack(train_dataset, args.max_length)
+        if eval_dataset is not None:
+            eval_dataset = pack(eval_dataset, args.max_length)
+        model = PackedSequenceClassifier(args.model, args.num_labels)
+        collator = PackedCollator(tokenizer.pad_token_id)
+    else:
+        model = AutoModelForSequenceClassification.from_pretrained(args.model, num_labels=args.num_labels)
+        collator = DataCollatorWithPadding(tokenizer, pad_to_multiple_of=8)
+    counter = TokenCounter(collator)
+
+    training_args = TrainingArguments(
+        output_dir=args.output_dir,
+        num_train_epochs=args.epochs,
+        max_steps=args.max_steps,
+        per_device_train_batch_size=args.batch_size,
+        per_device_eval_batch_size=args.batch_size,
+        **length_grouping(not args.streaming),
+        length_column_name="length",
+        warmup_steps=10,
+        weight_decay=0.01,
+        logging_steps=10,
+        eval_strategy="epoch" if eval_dataset is not None and not args.streaming else "no",
+        save_strategy="no",
+        # packed rows carry cls_positions, which the collator turns into cls_index
+        remove_unused_columns=not args.pack,
+    )
+
+    trainer = Trainer(
+        model=model,
+        args=training_args,
+        train_dataset=train_dataset,
+        eval_dataset=eval_dataset,
+        data_collator=counter,
+        compute_metrics=compute_metrics,
+        callbacks=[ThroughputCallback(counter)],
+    )
+    print("Starting model training...")
+    trainer.train()
+    print("Model training finished.")
+
+    if eval_dataset is not None and not args.streaming:
+        print("Evaluation results:", trainer.evaluate())
 
-# 7. Evaluate and Save Your Model
-print("Evaluating model...")
-results = trainer.evaluate()
-print("Evaluation results:", results)
+    print("Saving model...")
+    if args.pack:
+        # the wrapped PreTrainedModel and its config, not the packing wrapper
+        model.save_pretrained(args.save_to)
+    else:
+        trainer.save_model(args.save_to)
+    tokenizer.save_pretrained(args.save_to)
+    print(f"Model saved to {args.save_to}")
 
-print("Saving model...")
-trainer.save_model("./my_fine_tuned_model")
-print("Model saved to ./my_fine_tuned_model")
 
-# 8. (Optional) Push to Hugging Face Hub - uncomment and configure if needed
-# trainer.push_to_hub("my-awesome-model")
+if __name__ == "__main__":
+    main()